@@ -0,0 +1,62 @@
+"""Add frequently-bought-together tables
+
+Revision ID: add_bought_together
+Revises: add_search_queries
+Create Date: 2024-02-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_bought_together'
+down_revision = 'add_search_queries'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'product_order_counts',
+        sa.Column('product_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_table(
+        'product_co_occurrences',
+        sa.Column('product_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('other_product_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['other_product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id', 'other_product_id')
+    )
+    op.create_table(
+        'product_bought_together',
+        sa.Column('product_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('neighbor_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('co_orders', sa.Integer(), nullable=False),
+        sa.Column('confidence', sa.Float(), nullable=False),
+        sa.Column('lift', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['neighbor_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id', 'rank')
+    )
+    op.create_table(
+        'co_occurrence_state',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('orders_counted', sa.Integer(), nullable=False),
+        sa.Column('counted_until', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('co_occurrence_state')
+    op.drop_table('product_bought_together')
+    op.drop_table('product_co_occurrences')
+    op.drop_table('product_order_counts')
@@ -0,0 +1,48 @@
+"""Add unique index on cart lines (user, product, size, color)
+
+Revision ID: add_cart_unique_line
+Revises: add_product_variants
+Create Date: 2024-02-28 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_cart_unique_line'
+down_revision = 'add_product_variants'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Merge duplicate lines left by concurrent adds into the oldest one
+    op.execute("""
+        WITH ranked AS (
+            SELECT id,
+                   first_value(id) OVER w AS keep_id,
+                   sum(quantity) OVER (PARTITION BY user_id, product_id, coalesce(size, ''), coalesce(color, '')) AS total
+            FROM cart
+            WINDOW w AS (
+                PARTITION BY user_id, product_id, coalesce(size, ''), coalesce(color, '')
+                ORDER BY created_at, id
+            )
+        ),
+        merged AS (
+            UPDATE cart SET quantity = ranked.total
+            FROM ranked
+            WHERE cart.id = ranked.id AND ranked.id = ranked.keep_id AND cart.quantity <> ranked.total
+        )
+        DELETE FROM cart USING ranked
+        WHERE cart.id = ranked.id AND ranked.id <> ranked.keep_id
+    """)
+    op.create_index(
+        'ux_cart_user_product_size_color', 'cart',
+        ['user_id', 'product_id', sa.text("coalesce(size, '')"), sa.text("coalesce(color, '')")],
+        unique=True
+    )
+
+
+def downgrade():
+    op.drop_index('ux_cart_user_product_size_color', table_name='cart')
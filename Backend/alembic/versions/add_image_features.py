@@ -0,0 +1,31 @@
+"""Add image feature vectors for visual similarity
+
+Revision ID: add_image_features
+Revises: add_user_recommendations
+Create Date: 2024-02-24 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_image_features'
+down_revision = 'add_user_recommendations'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'image_features',
+        sa.Column('path', sa.String(length=500), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('vector', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('path')
+    )
+
+
+def downgrade():
+    op.drop_table('image_features')
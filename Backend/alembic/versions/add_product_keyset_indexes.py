@@ -0,0 +1,36 @@
+"""Add composite indexes for keyset pagination of product listings
+
+Revision ID: add_product_keyset_indexes
+Revises: add_product_trigram_indexes
+Create Date: 2024-02-12 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_keyset_indexes'
+down_revision = 'add_product_trigram_indexes'
+branch_labels = None
+depends_on = None
+
+# (index name, columns) - every index covers active products only
+KEYSET_INDEXES = [
+    ('ix_products_active_created_at_id', ['created_at', 'id']),
+    ('ix_products_active_price_id', ['price', 'id']),
+    ('ix_products_active_name_id', ['name', 'id']),
+    ('ix_products_active_category_created_at_id', ['category', 'created_at', 'id']),
+    ('ix_products_active_category_price_id', ['category', 'price', 'id']),
+    ('ix_products_active_category_name_id', ['category', 'name', 'id']),
+]
+
+
+def upgrade():
+    for name, columns in KEYSET_INDEXES:
+        op.create_index(name, 'products', columns, postgresql_where=sa.text('is_active'))
+
+
+def downgrade():
+    for name, _columns in reversed(KEYSET_INDEXES):
+        op.drop_index(name, table_name='products')
@@ -0,0 +1,75 @@
+"""Add denormalized review aggregates to products
+
+Revision ID: add_product_rating_aggregates
+Revises: add_product_keyset_indexes
+Create Date: 2024-02-14 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_rating_aggregates'
+down_revision = 'add_product_keyset_indexes'
+branch_labels = None
+depends_on = None
+
+RATING_AVERAGE_SQL = "CASE WHEN rating_count > 0 THEN rating_sum::float8 / rating_count ELSE 0 END"
+
+
+def upgrade():
+    op.add_column('products', sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('products', sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+    op.add_column(
+        'products',
+        sa.Column('rating_histogram', postgresql.ARRAY(sa.Integer()), server_default='{0,0,0,0,0}', nullable=False)
+    )
+    op.add_column(
+        'products',
+        sa.Column('rating_average', sa.Float(), sa.Computed(RATING_AVERAGE_SQL, persisted=True))
+    )
+
+    # Backfill from approved reviews
+    op.execute("""
+        UPDATE products p SET
+            rating_count = agg.rating_count,
+            rating_sum = agg.rating_sum,
+            rating_histogram = agg.rating_histogram
+        FROM (
+            SELECT
+                product_id,
+                count(*) AS rating_count,
+                sum(rating) AS rating_sum,
+                ARRAY[
+                    count(*) FILTER (WHERE rating = 1),
+                    count(*) FILTER (WHERE rating = 2),
+                    count(*) FILTER (WHERE rating = 3),
+                    count(*) FILTER (WHERE rating = 4),
+                    count(*) FILTER (WHERE rating = 5)
+                ]::integer[] AS rating_histogram
+            FROM reviews
+            WHERE is_approved
+            GROUP BY product_id
+        ) agg
+        WHERE agg.product_id = p.id
+    """)
+
+    op.create_index(
+        'ix_products_active_rating_average_id', 'products', ['rating_average', 'id'],
+        postgresql_where=sa.text('is_active')
+    )
+    op.create_index(
+        'ix_products_active_category_rating_average_id', 'products', ['category', 'rating_average', 'id'],
+        postgresql_where=sa.text('is_active')
+    )
+
+
+def downgrade():
+    op.drop_index('ix_products_active_category_rating_average_id', table_name='products')
+    op.drop_index('ix_products_active_rating_average_id', table_name='products')
+    op.drop_column('products', 'rating_average')
+    op.drop_column('products', 'rating_histogram')
+    op.drop_column('products', 'rating_sum')
+    op.drop_column('products', 'rating_count')
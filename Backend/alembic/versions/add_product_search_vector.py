@@ -0,0 +1,47 @@
+"""Add weighted full-text search vector to products
+
+Revision ID: add_product_search_vector
+Revises: add_google_oauth
+Create Date: 2024-02-01 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.models.sqlalchemy_models import PRODUCT_TAGS_TO_TEXT_DDL, PRODUCT_SEARCH_VECTOR_SQL
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_search_vector'
+down_revision = 'add_google_oauth'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Immutable helper so tags can be part of a generated column
+    op.execute(PRODUCT_TAGS_TO_TEXT_DDL)
+
+    # Generated tsvector column (name A, category/brand/tags B, description C)
+    op.add_column(
+        'products',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(PRODUCT_SEARCH_VECTOR_SQL, persisted=True),
+            nullable=True
+        )
+    )
+
+    # GIN index backing the @@ match in /search/products
+    op.create_index(
+        'ix_products_search_vector', 'products', ['search_vector'],
+        postgresql_using='gin'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_products_search_vector', table_name='products')
+    op.drop_column('products', 'search_vector')
+    op.execute('DROP FUNCTION IF EXISTS zorel_tags_to_text(text[])')
@@ -0,0 +1,43 @@
+"""Add product trending score table
+
+Revision ID: add_product_trending_scores
+Revises: add_product_rating_aggregates
+Create Date: 2024-02-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_trending_scores'
+down_revision = 'add_product_rating_aggregates'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'product_trending_scores',
+        sa.Column('product_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('category', sa.String(length=100), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('scored_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_index('ix_product_trending_scores_score', 'product_trending_scores', ['score'])
+    op.create_index('ix_product_trending_scores_category_score', 'product_trending_scores', ['category', 'score'])
+
+    # Each refresh scans only the window since the previous one
+    op.create_index('ix_order_items_created_at', 'order_items', ['created_at'])
+    op.create_index('ix_reviews_created_at', 'reviews', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_reviews_created_at', table_name='reviews')
+    op.drop_index('ix_order_items_created_at', table_name='order_items')
+    op.drop_index('ix_product_trending_scores_category_score', table_name='product_trending_scores')
+    op.drop_index('ix_product_trending_scores_score', table_name='product_trending_scores')
+    op.drop_table('product_trending_scores')
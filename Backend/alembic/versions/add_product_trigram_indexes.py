@@ -0,0 +1,34 @@
+"""Add pg_trgm indexes for fuzzy product search
+
+Revision ID: add_product_trigram_indexes
+Revises: add_product_search_vector
+Create Date: 2024-02-05 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_trigram_indexes'
+down_revision = 'add_product_search_vector'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # Trigram GIN indexes serve %, <% and ILIKE '%term%' on name and category
+    op.create_index(
+        'ix_products_name_trgm', 'products', ['name'],
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_products_category_trgm', 'products', ['category'],
+        postgresql_using='gin', postgresql_ops={'category': 'gin_trgm_ops'}
+    )
+
+
+def downgrade():
+    op.drop_index('ix_products_category_trgm', table_name='products')
+    op.drop_index('ix_products_name_trgm', table_name='products')
@@ -0,0 +1,78 @@
+"""Add product variants with per-variant stock
+
+Revision ID: add_product_variants
+Revises: add_image_features
+Create Date: 2024-02-26 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_variants'
+down_revision = 'add_image_features'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'product_variants',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('product_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('size', sa.String(length=50), server_default='', nullable=False),
+        sa.Column('color', sa.String(length=50), server_default='', nullable=False),
+        sa.Column('sku', sa.String(length=100), nullable=True),
+        sa.Column('stock_quantity', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sku')
+    )
+    op.create_index(
+        'ux_product_variants_product_size_color', 'product_variants',
+        ['product_id', 'size', 'color'], unique=True
+    )
+    op.create_index(
+        'ix_product_variants_in_stock_size_color', 'product_variants',
+        ['size', 'color', 'product_id'], postgresql_where=sa.text('stock_quantity > 0')
+    )
+    op.create_index(
+        'ix_product_variants_in_stock_color', 'product_variants',
+        ['color', 'product_id'], postgresql_where=sa.text('stock_quantity > 0')
+    )
+
+    # One variant per listed size x color. Existing products only have a
+    # product-level stock count, which can't be split by option: the first
+    # combination gets all of it and the others start at zero, so the total
+    # (kept on products.stock_quantity) is unchanged until the variants are edited.
+    op.execute("""
+        INSERT INTO product_variants (id, product_id, size, color, stock_quantity)
+        SELECT gen_random_uuid(), p.id, left(s.size, 50), left(c.color, 50),
+               CASE WHEN s.position = 1 AND c.position = 1 THEN coalesce(p.stock_quantity, 0) ELSE 0 END
+        FROM products p
+        CROSS JOIN LATERAL unnest(
+            CASE WHEN cardinality(p.sizes) > 0 THEN p.sizes ELSE ARRAY['']::varchar[] END
+        ) WITH ORDINALITY AS s(size, position)
+        CROSS JOIN LATERAL unnest(
+            CASE WHEN cardinality(p.colors) > 0 THEN p.colors ELSE ARRAY['']::varchar[] END
+        ) WITH ORDINALITY AS c(color, position)
+        WHERE cardinality(p.sizes) > 0 OR cardinality(p.colors) > 0
+        ON CONFLICT DO NOTHING
+    """)
+    # Duplicate options collapse into one variant above; recompute the summary
+    op.execute("""
+        UPDATE products p SET stock_quantity = v.total
+        FROM (SELECT product_id, sum(stock_quantity) AS total FROM product_variants GROUP BY product_id) v
+        WHERE p.id = v.product_id AND p.stock_quantity IS DISTINCT FROM v.total
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_product_variants_in_stock_color', table_name='product_variants')
+    op.drop_index('ix_product_variants_in_stock_size_color', table_name='product_variants')
+    op.drop_index('ux_product_variants_product_size_color', table_name='product_variants')
+    op.drop_table('product_variants')
@@ -0,0 +1,33 @@
+"""Add search query log table
+
+Revision ID: add_search_queries
+Revises: add_product_trending_scores
+Create Date: 2024-02-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_search_queries'
+down_revision = 'add_product_trending_scores'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'search_queries',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('query', sa.String(length=255), nullable=False),
+        sa.Column('result_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_search_queries_created_at', 'search_queries', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_search_queries_created_at', table_name='search_queries')
+    op.drop_table('search_queries')
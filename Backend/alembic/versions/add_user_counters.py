@@ -0,0 +1,50 @@
+"""Add per-user account summary counters
+
+Revision ID: add_user_counters
+Revises: add_cart_unique_line
+Create Date: 2024-03-01 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_user_counters'
+down_revision = 'add_cart_unique_line'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user_counters',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('order_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('lifetime_spend', sa.Float(), server_default='0', nullable=False),
+        sa.Column('cart_quantity', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('wishlist_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('unread_notifications', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Backfill one row per user
+    op.execute("""
+        INSERT INTO user_counters (user_id, order_count, lifetime_spend, cart_quantity, wishlist_count, unread_notifications)
+        SELECT
+            u.id,
+            (SELECT count(*) FROM orders o WHERE o.user_id = u.id),
+            (SELECT coalesce(sum(o.total_amount), 0) FROM orders o
+             WHERE o.user_id = u.id AND o.payment_status = 'COMPLETED'),
+            (SELECT coalesce(sum(c.quantity), 0) FROM cart c WHERE c.user_id = u.id),
+            (SELECT count(*) FROM wishlist w WHERE w.user_id = u.id),
+            (SELECT count(*) FROM notifications n WHERE n.user_id = u.id AND NOT n.is_read)
+        FROM users u
+    """)
+
+
+def downgrade():
+    op.drop_table('user_counters')
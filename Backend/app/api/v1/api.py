@@ -3,7 +3,7 @@ from app.api.v1.endpoints import (
     auth, products, orders, notifications, pages, admin, payments,
     coupons, reviews, wishlist, upload, search, analytics, admin_auth, whatsapp, admin_requests,
     admin_products, admin_orders, admin_customers, admin_invoices, admin_analytics,
-    cart, customer_orders, customer_profile, google_oauth
+    cart, customer_orders, customer_profile, customer_summary, google_oauth, feeds
 )
 
 api_router = APIRouter()
@@ -21,6 +21,7 @@ api_router.include_router(reviews.router, prefix="/reviews", tags=["reviews"])
 api_router.include_router(wishlist.router, prefix="/wishlist", tags=["wishlist"])
 api_router.include_router(upload.router, prefix="/upload", tags=["upload"])
 api_router.include_router(search.router, prefix="/search", tags=["search"])
+api_router.include_router(feeds.router, prefix="/feeds", tags=["feeds"])
 api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
 api_router.include_router(admin_auth.router, prefix="/admin", tags=["admin-auth"])
 api_router.include_router(whatsapp.router, prefix="/whatsapp", tags=["whatsapp"])
@@ -37,3 +38,4 @@ api_router.include_router(admin_analytics.router, prefix="/admin/analytics", tag
 api_router.include_router(cart.router, prefix="/cart", tags=["cart"])
 api_router.include_router(customer_orders.router, prefix="/customer/orders", tags=["customer-orders"])
 api_router.include_router(customer_profile.router, prefix="/customer/profile", tags=["customer-profile"])
+api_router.include_router(customer_summary.router, prefix="/customer/summary", tags=["customer-summary"])
@@ -12,6 +12,7 @@ from app.schemas.notification import NotificationResponse
 from app.core.security import require_roles
 from app.core.exceptions import NotFoundException
 from app.core.postgresql import get_db
+from app.services.product_projection import parse_fields, projection_columns, project_row, projected_json
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_, desc
 
@@ -232,44 +233,32 @@ async def get_all_users(
 @router.get("/products", response_model=List[ProductResponse])
 async def get_all_products_admin(
     current_user: User = Depends(require_roles(UserRole.ADMIN)),
-    status: Optional[str] = Query(None),
+    status: Optional[str] = Query(None, regex="^(active|inactive)$"),
     category: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = Query(None, description='Sparse fieldset: "card" or a comma-separated list of fields'),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all products including inventory (Admin only)"""
-    query = {}
+    projection = parse_fields(fields)
+    
+    query = select(Product)
     if status:
-        query["status"] = status
+        query = query.where(Product.is_active == (status == "active"))
     if category:
-        query["category"] = category
+        query = query.where(Product.category == category)
     
     skip = (page - 1) * limit
-    products = await Product.find(query).sort("created_at", -1).skip(skip).limit(limit).to_list()
+    query = query.order_by(desc(Product.created_at)).offset(skip).limit(limit)
+    if projection:
+        query = query.with_only_columns(*projection_columns(projection))
     
-    return [
-        ProductResponse(
-            id=str(product.id),
-            name=product.name,
-            description=product.description,
-            description_arabic=product.description_arabic,
-            price=product.price,
-            discount_price=product.discount_price,
-            images=product.images,
-            category=product.category,
-            tags=product.tags,
-            specifications=product.specifications,
-            variants=product.variants,
-            colors=product.colors,
-            status=product.status,
-            is_new=product.is_new,
-            is_on_sale=product.is_on_sale,
-            rating=product.rating,
-            review_count=product.review_count,
-            created_at=product.created_at
-        )
-        for product in products
-    ]
+    result = await db.execute(query)
+    if projection:
+        return projected_json([project_row(row, projection) for row in result.all()])
+    
+    return [ProductResponse.from_orm(product) for product in result.scalars().all()]
 
 
 
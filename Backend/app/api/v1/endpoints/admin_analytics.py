@@ -199,7 +199,8 @@ async def get_product_analytics(
                 "product_name": product.name,
                 "total_sold": 0,  # Placeholder - would need order items table
                 "total_revenue": 0.0,  # Placeholder - would need order items table
-                "average_rating": 4.5,  # Placeholder - implement rating system
+                "average_rating": round(product.rating_average or 0, 1),
+                "review_count": product.rating_count,
                 "views": 0,  # Placeholder - implement view tracking
                 "conversion_rate": 0.0,  # Placeholder - implement conversion tracking
                 "last_sold": None  # Placeholder - would need order items table
@@ -1,20 +1,30 @@
 from typing import List, Optional
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import StreamingResponse
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from sqlalchemy import select, and_, or_, desc, asc, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
+from sqlalchemy.exc import IntegrityError
 import uuid
 import logging
 
 from app.models.sqlalchemy_models import Product, User
-from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse, ProductListResponse
+from app.schemas.product import (
+    ProductCreate, ProductUpdate, ProductResponse, ProductListResponse,
+    ProductVariantResponse, ProductVariantsUpdate
+)
 from app.core.security import get_current_active_user, require_roles, UserRole
 from app.core.postgresql import get_db
-from app.core.exceptions import NotFoundException, ForbiddenException, ConflictException, BadRequestException
+from app.core.exceptions import (
+    NotFoundException, ForbiddenException, ConflictException, BadRequestException, ValidationException
+)
 from app.services.file_service import FileService
+from app.services.catalog_service import catalog_service
+from app.services.product_bulk_service import product_bulk_service, detect_format
+from app.services.variant_service import variant_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -120,6 +130,60 @@ async def get_admin_products(
         )
 
 
+@router.post("/import")
+@limiter.limit("5/minute")
+async def import_products(
+    request: Request,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv or ndjson (default: from the file extension)"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(UserRole.ADMIN, UserRole.SUPER_ADMIN))
+):
+    """Bulk create/update products from CSV or NDJSON, matched by SKU (Admin only)"""
+    fmt = detect_format(file.filename, format)
+    try:
+        report = await product_bulk_service.import_products(db, file.file, fmt)
+    except IntegrityError as e:
+        await db.rollback()
+        logger.warning(f"Bulk product import rejected: {e.orig}")
+        raise ConflictException("Import conflicts with existing products (e.g. a duplicate slug); nothing was imported")
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error importing products: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to import products"
+        )
+    
+    changed = report.pop("changed")
+    if changed:
+        await catalog_service.products_bulk_changed(changed)
+    
+    logger.info(
+        f"Bulk product import by user {current_user.id}: "
+        f"{report['created']} created, {report['updated']} updated, {report['failed']} failed"
+    )
+    return report
+
+
+@router.get("/export")
+@limiter.limit("10/minute")
+async def export_products(
+    request: Request,
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    is_active: Optional[bool] = Query(None),
+    current_user: User = Depends(require_roles(UserRole.ADMIN, UserRole.SUPER_ADMIN))
+):
+    """Stream the product catalog as CSV or NDJSON (Admin only)"""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"products-{datetime.utcnow():%Y%m%d}.{format}"
+    return StreamingResponse(
+        product_bulk_service.export_products(format, is_active),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.get("/{product_id}", response_model=ProductResponse)
 @limiter.limit("60/minute")
 async def get_admin_product(
@@ -198,9 +262,13 @@ async def create_product(
         )
         
         db.add(product)
+        await db.flush()
+        await variant_service.sync_options(db, [product.id])
         await db.commit()
         await db.refresh(product)
         
+        await catalog_service.product_changed(product)
+        
         logger.info(f"Product created: {product.id} by user {current_user.id}")
         return ProductResponse.from_orm(product)
         
@@ -247,20 +315,27 @@ async def update_product(
                 raise ConflictException("A product with this SKU already exists")
         
         # Update product fields
+        previous_slug, previous_category = product.slug, product.category
         update_data = product_data.dict(exclude_unset=True)
+        await variant_service.check_product_update(db, product.id, update_data)
         for field, value in update_data.items():
             if hasattr(product, field):
                 setattr(product, field, value)
         
         product.updated_at = datetime.utcnow()
+        if "sizes" in update_data or "colors" in update_data:
+            await db.flush()
+            await variant_service.sync_options(db, [product.id])
         
         await db.commit()
         await db.refresh(product)
         
+        await catalog_service.product_changed(product, previous_slug, previous_category)
+        
         logger.info(f"Product updated: {product.id} by user {current_user.id}")
         return ProductResponse.from_orm(product)
         
-    except (NotFoundException, ConflictException):
+    except (NotFoundException, ConflictException, ValidationException):
         raise
     except Exception as e:
         await db.rollback()
@@ -323,6 +398,8 @@ async def delete_product(
         await db.delete(product)
         await db.commit()
         
+        await catalog_service.product_removed(product_uuid, product.slug)
+        
         logger.info(f"Product deleted: {product.id} by user {current_user.id}")
         return {"message": "Product deleted successfully", "product_id": product_id}
         
@@ -367,6 +444,8 @@ async def toggle_product_status(
         await db.commit()
         await db.refresh(product)
         
+        await catalog_service.product_changed(product)
+        
         status_text = "activated" if is_active else "deactivated"
         logger.info(f"Product {status_text}: {product.id} by user {current_user.id}")
         
@@ -417,6 +496,8 @@ async def toggle_product_featured(
         await db.commit()
         await db.refresh(product)
         
+        await catalog_service.product_changed(product)
+        
         status_text = "featured" if is_featured else "unfeatured"
         logger.info(f"Product {status_text}: {product.id} by user {current_user.id}")
         
@@ -493,6 +574,7 @@ async def upload_product_images(
         
         await db.commit()
         await db.refresh(product)
+        await catalog_service.product_changed(product)
         
         logger.info(f"Images uploaded for product {product.id} by user {current_user.id}")
         return {
@@ -513,6 +595,57 @@ async def upload_product_images(
         )
 
 
+@router.put("/{product_id}/variants", response_model=List[ProductVariantResponse])
+@limiter.limit("30/minute")
+async def replace_product_variants(
+    request: Request,
+    product_id: str,
+    variants_data: ProductVariantsUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(UserRole.ADMIN, UserRole.SUPER_ADMIN))
+):
+    """Replace a product's size/color variants and their stock (Admin only)"""
+    try:
+        # Validate UUID format
+        try:
+            product_uuid = uuid.UUID(product_id)
+        except ValueError:
+            raise NotFoundException("Invalid product ID format")
+        
+        # Get existing product
+        result = await db.execute(select(Product).where(Product.id == product_uuid))
+        product = result.scalar_one_or_none()
+        
+        if not product:
+            raise NotFoundException("Product not found")
+        
+        # Sizes, colors and stock_quantity on the product are derived from the variants
+        variants = await variant_service.replace_variants(db, product, variants_data.variants)
+        product.updated_at = datetime.utcnow()
+        response = [ProductVariantResponse.from_orm(variant) for variant in variants]
+        
+        await db.commit()
+        await db.refresh(product)
+        await catalog_service.product_changed(product)
+        
+        logger.info(f"Variants replaced for product {product.id} by user {current_user.id}")
+        return response
+        
+    except (NotFoundException, ValidationException):
+        raise
+    except IntegrityError as e:
+        await db.rollback()
+        logger.warning(f"Variant update rejected for product {product_id}: {e.orig}")
+        raise ConflictException("A variant SKU is already used by another variant")
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error replacing variants for product {product_id}: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to update product variants"
+        )
+
+
 @router.get("/stats/summary")
 @limiter.limit("30/minute")
 async def get_product_stats(
@@ -1,5 +1,7 @@
 from datetime import timedelta, datetime
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from typing import Optional
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Header
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from sqlalchemy import select
@@ -9,20 +11,44 @@ from app.core.security import (
     verify_password, 
     get_password_hash, 
     create_access_token,
+    verify_guest_cart_token,
     get_current_active_user
 )
 from app.models.sqlalchemy_models import User, UserRole
 from app.schemas.user import UserCreate, UserLogin, UserResponse, Token, UserUpdate
 from app.core.postgresql import get_db
 from app.core.exceptions import ConflictException, UnauthorizedException, InvalidCredentialsException, AccountDeactivatedException
+from app.services.guest_cart_service import guest_cart_service
+from app.services.pricing_service import pricing_service
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 limiter = Limiter(key_func=get_remote_address)
 
 
+async def _merge_guest_cart(db: AsyncSession, user: User, cart_token: Optional[str]) -> None:
+    """Keep the cart built before signing in; a failed merge doesn't fail the login"""
+    cart_id = verify_guest_cart_token(cart_token)
+    if cart_id is None:
+        return
+    # Read before merging: a failed merge rolls back, which expires `user`, and
+    # reloading it from the except block would fail on an AsyncSession
+    user_id, email = user.id, user.email
+    try:
+        if await guest_cart_service.merge_into_user(db, cart_id, user_id):
+            await pricing_service.cart_changed(user_id)
+    except Exception as e:
+        logger.error(f"Error merging guest cart for user {email}: {str(e)}")
+
+
 @router.post("/register", response_model=Token)
 @limiter.limit("5/minute")
-async def register(request: Request, user_data: UserCreate, db: AsyncSession = Depends(get_db)):
+async def register(
+    request: Request,
+    user_data: UserCreate,
+    x_cart_token: Optional[str] = Header(None, description="Guest cart token to merge into the new account's cart"),
+    db: AsyncSession = Depends(get_db)
+):
     """Register a new user"""
     # Check if user already exists by email
     result = await db.execute(select(User).where(User.email == user_data.email))
@@ -81,6 +107,9 @@ async def register(request: Request, user_data: UserCreate, db: AsyncSession = D
         updated_at=user.updated_at
     )
     
+    # After the response is built: a failed merge rolls back, which expires `user`
+    await _merge_guest_cart(db, user, x_cart_token)
+    
     return Token(
         access_token=access_token,
         token_type="bearer",
@@ -91,7 +120,12 @@ async def register(request: Request, user_data: UserCreate, db: AsyncSession = D
 
 @router.post("/login", response_model=Token)
 @limiter.limit("10/minute")
-async def login(request: Request, user_credentials: UserLogin, db: AsyncSession = Depends(get_db)):
+async def login(
+    request: Request,
+    user_credentials: UserLogin,
+    x_cart_token: Optional[str] = Header(None, description="Guest cart token to merge into the user's cart"),
+    db: AsyncSession = Depends(get_db)
+):
     """Login user and return JWT token"""
     # Find user by email
     result = await db.execute(select(User).where(User.email == user_credentials.email))
@@ -135,6 +169,9 @@ async def login(request: Request, user_credentials: UserLogin, db: AsyncSession
         updated_at=user.updated_at
     )
     
+    # After the response is built: a failed merge rolls back, which expires `user`
+    await _merge_guest_cart(db, user, x_cart_token)
+    
     return Token(
         access_token=access_token,
         token_type="bearer",
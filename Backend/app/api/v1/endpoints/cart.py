@@ -1,84 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header
 from typing import List, Optional
 from datetime import datetime
+import uuid
 from sqlalchemy import select, and_, or_, desc, asc, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.sqlalchemy_models import Cart, User, Product
 from app.schemas.cart import (
-    CartItemCreate, CartItemUpdate, CartItemResponse, CartResponse, CartCountResponse
+    CartItemCreate, CartItemUpdate, CartItemResponse, CartResponse, CartCountResponse, CartBatchRequest,
+    GuestCartResponse
 )
 from app.core.postgresql import get_db
 from app.core.security import get_current_active_user
+from app.schemas.product import ProductResponse
+from app.services.bought_together_service import bought_together_service
+from app.services.cart_service import cart_service
+from app.services.guest_cart_service import guest_cart_service
+from app.services.pricing_service import pricing_service
+from app.services.user_counter_service import user_counter_service
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Constants
-SHIPPING_COST = 9.99
-TAX_RATE = 0.08  # 8% tax rate
+
+def _cart_response(user: User, quote: dict) -> CartResponse:
+    items = quote["items"]
+    
+    # Create response (using first cart item's timestamps if available)
+    created_at = items[0]["created_at"] if items else datetime.utcnow()
+    updated_at = items[0]["updated_at"] if items else datetime.utcnow()
+    
+    return CartResponse(
+        id="cart",  # Cart doesn't have a single ID in SQLAlchemy model
+        user_id=str(user.id),
+        items=[CartItemResponse(**item) for item in items],
+        total_items=quote["total_items"],
+        subtotal=quote["subtotal"],
+        discount=quote["discount"],
+        shipping_cost=quote["shipping_cost"],
+        tax=quote["tax"],
+        total=quote["total"],
+        coupon_code=quote["coupon_code"],
+        coupon_error=quote["coupon_error"],
+        quote_version=quote["version"],
+        created_at=created_at,
+        updated_at=updated_at
+    )
 
 
 @router.get("/", response_model=CartResponse)
 async def get_my_cart(
+    coupon_code: Optional[str] = Query(None, description="Coupon to price the cart with"),
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get current user's shopping cart"""
+    """Get current user's shopping cart, priced by the checkout pricing rules"""
     try:
-        # Get cart items for current user
-        result = await db.execute(
-            select(Cart, Product)
-            .join(Product, Cart.product_id == Product.id)
-            .where(Cart.user_id == current_user.id, Product.is_active == True)
-        )
-        cart_data = result.fetchall()
-        
-        # Process cart items
-        cart_items = []
-        subtotal = 0.0
-        total_items = 0
-        
-        for cart_item, product in cart_data:
-            item_subtotal = product.price * cart_item.quantity
-            subtotal += item_subtotal
-            total_items += cart_item.quantity
-            
-            cart_items.append(CartItemResponse(
-                id=str(cart_item.id),
-                product_id=str(cart_item.product_id),
-                product_name=product.name,
-                product_image=product.images[0] if product.images else "/placeholder.svg",
-                product_price=product.price,
-                quantity=cart_item.quantity,
-                size=cart_item.size,
-                color=cart_item.color,
-                subtotal=item_subtotal,
-                created_at=cart_item.created_at,
-                updated_at=cart_item.updated_at
-            ))
-        
-        # Calculate totals
-        shipping_cost = SHIPPING_COST if subtotal > 0 else 0
-        tax = subtotal * TAX_RATE
-        total = subtotal + shipping_cost + tax
-        
-        # Create response (using first cart item's timestamps if available)
-        created_at = cart_data[0][0].created_at if cart_data else datetime.utcnow()
-        updated_at = cart_data[0][0].updated_at if cart_data else datetime.utcnow()
-        
-        return CartResponse(
-            id="cart",  # Cart doesn't have a single ID in SQLAlchemy model
-            user_id=str(current_user.id),
-            items=cart_items,
-            total_items=total_items,
-            subtotal=subtotal,
-            shipping_cost=shipping_cost,
-            tax=tax,
-            total=total,
-            created_at=created_at,
-            updated_at=updated_at
-        )
+        quote = await pricing_service.cart_quote(db, current_user.id, coupon_code)
+        return _cart_response(current_user, quote)
         
     except Exception as e:
         logger.error(f"Error fetching cart: {str(e)}")
@@ -94,94 +74,45 @@ async def add_to_cart(
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Add a product to cart"""
+    """Add a product to cart, or add to the quantity of the same product/size/color line"""
     try:
-        # Verify product exists and is active
-        product_result = await db.execute(
-            select(Product).where(Product.id == item_data.product_id, Product.is_active == True)
-        )
-        product = product_result.scalar_one_or_none()
-        
-        if not product:
+        try:
+            product_uuid = uuid.UUID(item_data.product_id)
+        except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Product not found"
             )
         
-        # Check stock quantity
-        if product.stock_quantity and item_data.quantity > product.stock_quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Only {product.stock_quantity} items available in stock"
-            )
-        
-        # Check if product is already in cart
-        existing_cart_result = await db.execute(
-            select(Cart).where(
-                Cart.user_id == current_user.id,
-                Cart.product_id == item_data.product_id,
-                Cart.size == item_data.size,
-                Cart.color == item_data.color
-            )
+        # One statement: insert or increment, with the availability and stock checks
+        line = await cart_service.add_item(
+            db, current_user.id, product_uuid, item_data.quantity, item_data.size, item_data.color
         )
-        existing_cart_item = existing_cart_result.scalar_one_or_none()
-        
-        if existing_cart_item:
-            # Update quantity
-            new_quantity = existing_cart_item.quantity + item_data.quantity
-            
-            # Check stock again
-            if product.stock_quantity and new_quantity > product.stock_quantity:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Only {product.stock_quantity} items available in stock"
-                )
-            
-            existing_cart_item.quantity = new_quantity
-            existing_cart_item.updated_at = datetime.utcnow()
-            
-            await db.commit()
-            await db.refresh(existing_cart_item)
-            
-            updated_item = existing_cart_item
-        else:
-            # Add new item
-            new_cart_item = Cart(
-                user_id=current_user.id,
-                product_id=product.id,
-                quantity=item_data.quantity,
-                size=item_data.size,
-                color=item_data.color
-            )
-            
-            db.add(new_cart_item)
-            await db.commit()
-            await db.refresh(new_cart_item)
-            
-            updated_item = new_cart_item
+        await user_counter_service.apply(db, current_user.id, cart_quantity=item_data.quantity)
+        await db.commit()
+        await pricing_service.cart_changed(current_user.id)
         
         logger.info(f"Product {item_data.product_id} added to cart for user {current_user.email}")
         
-        # Return the updated item
-        item_subtotal = product.price * updated_item.quantity
-        
         return CartItemResponse(
-            id=str(updated_item.id),
-            product_id=str(updated_item.product_id),
-            product_name=product.name,
-            product_image=product.images[0] if product.images else "/placeholder.svg",
-            product_price=product.price,
-            quantity=updated_item.quantity,
-            size=updated_item.size,
-            color=updated_item.color,
-            subtotal=item_subtotal,
-            created_at=updated_item.created_at,
-            updated_at=updated_item.updated_at
+            id=str(line.id),
+            product_id=str(line.product_id),
+            product_name=line.name,
+            product_image=line.images[0] if line.images else "/placeholder.svg",
+            product_price=line.price,
+            quantity=line.quantity,
+            size=line.size,
+            color=line.color,
+            subtotal=line.price * line.quantity,
+            created_at=line.created_at,
+            updated_at=line.updated_at
         )
         
     except HTTPException:
+        await db.rollback()
         raise
     except Exception as e:
+        await db.rollback()
         logger.error(f"Error adding to cart: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -198,9 +129,10 @@ async def update_cart_item(
 ):
     """Update a cart item"""
     try:
-        # Find cart item
+        # Find cart item, locked so the counter delta below is taken from the
+        # quantity this update replaces, not one a concurrent write changed
         cart_result = await db.execute(
-            select(Cart).where(Cart.id == cart_item_id, Cart.user_id == current_user.id)
+            select(Cart).where(Cart.id == cart_item_id, Cart.user_id == current_user.id).with_for_update()
         )
         cart_item = cart_result.scalar_one_or_none()
         
@@ -229,6 +161,9 @@ async def update_cart_item(
             )
         
         # Update item
+        await user_counter_service.apply(
+            db, current_user.id, cart_quantity=item_update.quantity - cart_item.quantity
+        )
         cart_item.quantity = item_update.quantity
         cart_item.size = item_update.size
         cart_item.color = item_update.color
@@ -236,6 +171,7 @@ async def update_cart_item(
         
         await db.commit()
         await db.refresh(cart_item)
+        await pricing_service.cart_changed(current_user.id)
         
         logger.info(f"Cart item updated for product {cart_item.product_id} by user {current_user.email}")
         
@@ -243,6 +179,12 @@ async def update_cart_item(
         
     except HTTPException:
         raise
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This product is already in your cart in that size and color"
+        )
     except Exception as e:
         logger.error(f"Error updating cart item: {str(e)}")
         raise HTTPException(
@@ -259,11 +201,13 @@ async def remove_from_cart(
 ):
     """Remove a product from cart"""
     try:
-        # Find and delete cart item
+        # Delete cart item, counting the quantity the delete actually removed
         result = await db.execute(
-            select(Cart).where(Cart.id == cart_item_id, Cart.user_id == current_user.id)
+            Cart.__table__.delete()
+            .where(Cart.id == cart_item_id, Cart.user_id == current_user.id)
+            .returning(Cart.__table__.c.product_id, Cart.__table__.c.quantity)
         )
-        cart_item = result.scalar_one_or_none()
+        cart_item = result.first()
         
         if not cart_item:
             raise HTTPException(
@@ -271,8 +215,9 @@ async def remove_from_cart(
                 detail="Cart item not found"
             )
         
-        await db.delete(cart_item)
+        await user_counter_service.apply(db, current_user.id, cart_quantity=-cart_item.quantity)
         await db.commit()
+        await pricing_service.cart_changed(current_user.id)
         
         logger.info(f"Product {cart_item.product_id} removed from cart for user {current_user.email}")
         
@@ -288,6 +233,44 @@ async def remove_from_cart(
         )
 
 
+@router.post("/batch", response_model=CartResponse)
+async def batch_update_cart(
+    batch: CartBatchRequest,
+    coupon_code: Optional[str] = Query(None, description="Coupon to price the cart with"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Apply several add/update/remove operations in one transaction and return the updated cart"""
+    try:
+        change = await cart_service.apply_batch(db, current_user.id, batch.operations)
+        await user_counter_service.apply(db, current_user.id, cart_quantity=change)
+        await db.commit()
+        await pricing_service.cart_changed(current_user.id)
+        
+        logger.info(f"{len(batch.operations)} cart operations applied for user {current_user.email}")
+        
+        quote = await pricing_service.cart_quote(db, current_user.id, coupon_code)
+        return _cart_response(current_user, quote)
+        
+    except HTTPException:
+        await db.rollback()
+        raise
+    except IntegrityError:
+        # A concurrent write to the same lines
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Your cart changed meanwhile, please reload it and try again"
+        )
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error applying cart operations: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update cart"
+        )
+
+
 @router.delete("/clear")
 async def clear_cart(
     current_user: User = Depends(get_current_active_user),
@@ -296,10 +279,12 @@ async def clear_cart(
     """Clear all items from cart"""
     try:
         # Delete all cart items for user
-        await db.execute(
-            Cart.__table__.delete().where(Cart.user_id == current_user.id)
+        result = await db.execute(
+            Cart.__table__.delete().where(Cart.user_id == current_user.id).returning(Cart.__table__.c.quantity)
         )
+        await user_counter_service.apply(db, current_user.id, cart_quantity=-sum(result.scalars().all()))
         await db.commit()
+        await pricing_service.cart_changed(current_user.id)
         
         logger.info(f"Cart cleared for user {current_user.email}")
         
@@ -313,6 +298,27 @@ async def clear_cart(
         )
 
 
+@router.get("/bought-together", response_model=List[ProductResponse])
+async def get_cart_bought_together(
+    limit: int = Query(4, ge=1, le=20),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get products frequently bought together with the items in the cart"""
+    try:
+        result = await db.execute(select(Cart.product_id).where(Cart.user_id == current_user.id))
+        product_ids = list({row[0] for row in result.fetchall()})
+        neighbors = await bought_together_service.for_products(db, product_ids, limit)
+        return [ProductResponse.from_orm(product) for product, _lift in neighbors]
+        
+    except Exception as e:
+        logger.error(f"Error fetching cart recommendations: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch cart recommendations"
+        )
+
+
 @router.get("/count", response_model=CartCountResponse)
 async def get_cart_count(
     current_user: User = Depends(get_current_active_user),
@@ -334,3 +340,136 @@ async def get_cart_count(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to get cart count"
         )
+
+
+# Guest cart ----------------------------------------------------------------
+# For visitors who aren't signed in: kept in Redis under the token returned as
+# `cart_token` (send it back as X-Cart-Token). Login and registration merge it
+# into the user's cart when given the same header.
+
+CART_TOKEN_HEADER = Header(None, alias="X-Cart-Token", description="Guest cart token; omit to start a new cart")
+
+
+async def _guest_cart_response(
+    db: AsyncSession, cart_id: str, cart_token: str, coupon_code: Optional[str] = None
+) -> GuestCartResponse:
+    quote = await guest_cart_service.quote(db, cart_id, coupon_code)
+    return GuestCartResponse(cart_token=cart_token, **quote)
+
+
+@router.get("/guest", response_model=GuestCartResponse)
+async def get_guest_cart(
+    coupon_code: Optional[str] = Query(None, description="Coupon to price the cart with"),
+    x_cart_token: Optional[str] = CART_TOKEN_HEADER,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a guest cart, priced by the checkout pricing rules"""
+    try:
+        cart_id, cart_token = guest_cart_service.resolve(x_cart_token)
+        return await _guest_cart_response(db, cart_id, cart_token, coupon_code)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching guest cart: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch cart"
+        )
+
+
+@router.post("/guest/add", response_model=GuestCartResponse)
+async def add_to_guest_cart(
+    item_data: CartItemCreate,
+    x_cart_token: Optional[str] = CART_TOKEN_HEADER,
+    db: AsyncSession = Depends(get_db)
+):
+    """Add a product to a guest cart (starting one if no token is given)"""
+    try:
+        try:
+            product_uuid = uuid.UUID(item_data.product_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Product not found"
+            )
+        
+        cart_id, cart_token = guest_cart_service.resolve(x_cart_token)
+        await guest_cart_service.add_item(
+            db, cart_id, product_uuid, item_data.quantity, item_data.size, item_data.color
+        )
+        return await _guest_cart_response(db, cart_id, cart_token)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error adding to guest cart: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to add to cart"
+        )
+
+
+@router.put("/guest/update/{item_id}", response_model=GuestCartResponse)
+async def update_guest_cart_item(
+    item_id: str,
+    item_update: CartItemUpdate,
+    x_cart_token: Optional[str] = CART_TOKEN_HEADER,
+    db: AsyncSession = Depends(get_db)
+):
+    """Update a guest cart item"""
+    try:
+        cart_id, cart_token = guest_cart_service.resolve(x_cart_token)
+        await guest_cart_service.update_item(
+            db, cart_id, item_id, item_update.quantity, item_update.size, item_update.color
+        )
+        return await _guest_cart_response(db, cart_id, cart_token)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating guest cart item: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update cart item"
+        )
+
+
+@router.delete("/guest/remove/{item_id}", response_model=GuestCartResponse)
+async def remove_from_guest_cart(
+    item_id: str,
+    x_cart_token: Optional[str] = CART_TOKEN_HEADER,
+    db: AsyncSession = Depends(get_db)
+):
+    """Remove an item from a guest cart"""
+    try:
+        cart_id, cart_token = guest_cart_service.resolve(x_cart_token)
+        await guest_cart_service.remove_item(cart_id, item_id)
+        return await _guest_cart_response(db, cart_id, cart_token)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error removing from guest cart: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to remove from cart"
+        )
+
+
+@router.delete("/guest/clear")
+async def clear_guest_cart(x_cart_token: Optional[str] = CART_TOKEN_HEADER):
+    """Empty a guest cart"""
+    try:
+        cart_id, _token = guest_cart_service.resolve(x_cart_token)
+        await guest_cart_service.clear(cart_id)
+        return {"message": "Cart cleared successfully"}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error clearing guest cart: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to clear cart"
+        )
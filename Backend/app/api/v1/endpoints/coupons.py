@@ -8,6 +8,7 @@ from app.schemas.coupon import CouponCreate, CouponUpdate, CouponResponse, Coupo
 from app.core.security import get_current_active_user, require_roles, UserRole
 from app.core.exceptions import NotFoundException, ConflictException, ValidationException
 from app.core.postgresql import get_db
+from app.services.pricing_service import pricing_service
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, desc, asc, func
 
@@ -213,6 +214,7 @@ async def create_coupon(
     db.add(coupon)
     await db.commit()
     await db.refresh(coupon)
+    await pricing_service.prices_changed()
     
     return CouponResponse(
         id=str(coupon.id),
@@ -265,6 +267,7 @@ async def update_coupon(
     
     await db.commit()
     await db.refresh(coupon)
+    await pricing_service.prices_changed()
     
     return CouponResponse(
         id=str(coupon.id),
@@ -312,6 +315,7 @@ async def delete_coupon(
     coupon.status = CouponStatus.INACTIVE
     await db.commit()
     await db.refresh(coupon)
+    await pricing_service.prices_changed()
     
     return {"message": "Coupon deleted successfully"}
 
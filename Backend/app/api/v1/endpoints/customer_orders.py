@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import List, Optional
 from datetime import datetime, date
-from app.models.sqlalchemy_models import Order, OrderStatus, PaymentStatus, User, Cart
-from app.schemas.order import OrderCreate, OrderResponse
+import uuid
+from app.models.sqlalchemy_models import Order, OrderItem, OrderStatus, PaymentMethod, PaymentStatus, User, Cart
+from app.schemas.order import OrderCreate, OrderResponse, OrderItemResponse
 from app.core.security import get_current_active_user
+from app.core.exceptions import BadRequestException, ConflictException, ValidationException
 from app.services.notification_service import NotificationService
+from app.services.pricing_service import pricing_service
+from app.services.user_counter_service import counted_spend, user_counter_service
 from app.core.postgresql import get_db
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, desc, asc, func
@@ -170,79 +174,122 @@ async def get_order_details(
         )
 
 
+def _new_order_number() -> str:
+    return f"ORD-{datetime.now().strftime('%Y%m%d%H%M%S')}-{str(uuid.uuid4())[:8].upper()}"
+
+
+async def _place_order(
+    db: AsyncSession,
+    current_user: User,
+    priced: dict,
+    customer_name: str,
+    customer_email: str,
+    customer_phone: Optional[str],
+    shipping_address: dict,
+    notes: Optional[str] = None
+) -> OrderResponse:
+    """Write an order and its items from priced lines and redeem the coupon; commits"""
+    if priced["coupon_error"]:
+        raise ValidationException(priced["coupon_error"])
+    
+    order = Order(
+        id=uuid.uuid4(),
+        user_id=current_user.id,
+        customer_name=customer_name,
+        customer_email=customer_email,
+        customer_phone=customer_phone,
+        order_number=_new_order_number(),
+        status=OrderStatus.PENDING,
+        total_amount=priced["total"],
+        gst_amount=priced["tax"],
+        payment_method=PaymentMethod.ONLINE,
+        payment_status=PaymentStatus.PENDING,
+        shipping_address=shipping_address,
+        customer_notes=notes
+    )
+    db.add(order)
+    order_items = [
+        OrderItem(
+            order_id=order.id,
+            product_id=uuid.UUID(line["product_id"]),
+            quantity=line["quantity"],
+            price=line["product_price"],
+            size=line["size"],
+            color=line["color"]
+        )
+        for line in priced["items"]
+    ]
+    db.add_all(order_items)
+    if priced["coupon_code"]:
+        await pricing_service.redeem_coupon(db, priced["coupon_code"])
+    await user_counter_service.apply(
+        db, current_user.id, order_count=1, lifetime_spend=counted_spend(order)
+    )
+    
+    await db.commit()
+    await db.refresh(order)
+    
+    # Send notification to admin
+    notification_service = NotificationService()
+    await notification_service.send_order_request_notification(order)
+    
+    return OrderResponse(
+        id=str(order.id),
+        customer_name=order.customer_name,
+        customer_email=order.customer_email,
+        customer_phone=order.customer_phone,
+        shipping_address=order.shipping_address,
+        items=[
+            OrderItemResponse(
+                id=str(item.id),
+                product_id=str(item.product_id),
+                quantity=item.quantity,
+                price=item.price,
+                product_name=line["product_name"],
+                product_image=line["product_image"]
+            )
+            for item, line in zip(order_items, priced["items"])
+        ],
+        status=order.status,
+        payment_status=order.payment_status,
+        payment_method=order.payment_method,
+        total_amount=order.total_amount,
+        tracking_number=order.tracking_number,
+        notes=order.customer_notes,
+        created_at=order.created_at,
+        updated_at=order.updated_at
+    )
+
+
 @router.post("/create", response_model=OrderResponse)
 async def create_order(
     order_data: OrderCreate,
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Create a new order from cart or direct purchase"""
+    """Create an order for a direct purchase, priced from the catalog"""
     try:
-        from app.models.sqlalchemy_models import OrderStatus, PaymentStatus, PaymentMethod
-        import uuid
-        
-        # Calculate totals
-        subtotal = sum(item.price * item.quantity for item in order_data.items)
-        shipping_cost = 9.99 if subtotal < 200 else 0  # Free shipping over $200
-        tax = subtotal * 0.08  # 8% tax
-        total = subtotal + shipping_cost + tax
-        
-        # Create order
-        order = Order(
-            id=uuid.uuid4(),
-            user_id=current_user.id,
-            order_number=f"ORD-{datetime.now().strftime('%Y%m%d%H%M%S')}-{str(uuid.uuid4())[:8].upper()}",
-            status=OrderStatus.PENDING,
-            total_amount=total,
-            gst_amount=tax,
-            payment_method=PaymentMethod.CREDIT_CARD,
-            payment_status=PaymentStatus.PENDING,
+        priced = await pricing_service.price_items(db, order_data.items, order_data.coupon_code)
+        if not priced["items"]:
+            raise BadRequestException("Order has no items")
+        
+        order = await _place_order(
+            db, current_user, priced,
+            customer_name=order_data.customer_name,
+            customer_email=order_data.customer_email,
+            customer_phone=order_data.customer_phone,
             shipping_address=order_data.shipping_address,
-            customer_notes=order_data.notes,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
+            notes=order_data.notes
         )
         
-        db.add(order)
-        await db.commit()
-        await db.refresh(order)
-        
-        # Send notification to admin
-        notification_service = NotificationService()
-        await notification_service.send_order_request_notification(order)
-        
-        logger.info(f"Order created: {str(order.id)} by user {current_user.email}")
-        
-        return OrderResponse(
-            id=str(order.id),
-            user_id=str(order.user_id),
-            order_number=order.order_number,
-            status=order.status.value,
-            total_amount=order.total_amount,
-            gst_amount=order.gst_amount,
-            payment_method=order.payment_method.value,
-            payment_status=order.payment_status.value,
-            payment_reference=order.payment_reference,
-            payment_date=order.payment_date,
-            shipping_address=order.shipping_address,
-            billing_address=order.billing_address,
-            shipping_company=order.shipping_company,
-            tracking_number=order.tracking_number,
-            estimated_delivery=order.estimated_delivery,
-            actual_delivery=order.actual_delivery,
-            admin_notes=order.admin_notes,
-            internal_notes=order.internal_notes,
-            assigned_to=order.assigned_to,
-            customer_notes=order.customer_notes,
-            communication_log=order.communication_log,
-            confirmed_at=order.confirmed_at,
-            shipped_at=order.shipped_at,
-            delivered_at=order.delivered_at,
-            created_at=order.created_at,
-            updated_at=order.updated_at
-        )
+        logger.info(f"Order created: {order.id} by user {current_user.email}")
+        return order
         
+    except (BadRequestException, ValidationException):
+        await db.rollback()
+        raise
     except Exception as e:
+        await db.rollback()
         logger.error(f"Error creating order: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -252,114 +299,44 @@ async def create_order(
 
 @router.post("/create-from-cart", response_model=OrderResponse)
 async def create_order_from_cart(
+    coupon_code: Optional[str] = Query(None),
+    quote_version: Optional[str] = Query(None, description="quote_version of the cart the customer reviewed"),
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Create an order from the user's cart"""
+    """Create an order from the user's cart, at the totals of its current quote"""
     try:
-        # Get user's cart
-        cart_query = select(Cart).where(Cart.user_id == current_user.id)
-        cart_result = await db.execute(cart_query)
-        cart = cart_result.scalar_one_or_none()
-        
-        if not cart or not cart.items:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Cart is empty"
-            )
-        
-        # Convert cart items to order items
-        order_items = []
-        for cart_item in cart.items:
-            order_items.append({
-                "product_id": cart_item.product_id,
-                "product_name": "",  # Will be filled from product data
-                "product_image": "",  # Will be filled from product data
-                "quantity": cart_item.quantity,
-                "price": 0.0,  # Will be filled from product data
-                "size": cart_item.size,
-                "color": cart_item.color
-            })
-        
-        # Get product details and calculate totals
-        subtotal = 0.0
-        for item in order_items:
-            # Note: In a real implementation, you'd fetch product details here
-            # For now, we'll use placeholder values
-            item["product_name"] = "Product Name"  # Fetch from Product model
-            item["product_image"] = "/placeholder.svg"  # Fetch from Product model
-            item["price"] = 100.0  # Fetch from Product model
-            subtotal += item["price"] * item["quantity"]
-        
-        shipping_cost = 9.99 if subtotal < 200 else 0
-        tax = subtotal * 0.08
-        total = subtotal + shipping_cost + tax
-        
-        # Create order
-        from app.models.sqlalchemy_models import OrderStatus, PaymentStatus, PaymentMethod
-        import uuid
-        
-        order = Order(
-            id=uuid.uuid4(),
-            user_id=current_user.id,
-            order_number=f"ORD-{datetime.now().strftime('%Y%m%d%H%M%S')}-{str(uuid.uuid4())[:8].upper()}",
-            status=OrderStatus.PENDING,
-            total_amount=total,
-            gst_amount=tax,
-            payment_method=PaymentMethod.CREDIT_CARD,
-            payment_status=PaymentStatus.PENDING,
-            shipping_address=current_user.addresses[0] if current_user.addresses else None,  # Use default address
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
+        quote = await pricing_service.cart_quote(db, current_user.id, coupon_code)
+        
+        if not quote["items"]:
+            raise BadRequestException("Cart is empty")
+        if quote_version and quote_version != quote["version"]:
+            raise ConflictException("Your cart or its prices changed, please review it before placing the order")
+        if not current_user.addresses:
+            raise BadRequestException("Add a shipping address before placing an order")
+        
+        # Clear the quoted rows, checked against the rows and product prices as
+        # they are now: nothing is charged from a stale quote
+        await pricing_service.take_quoted_cart(db, current_user.id, quote)
+        await user_counter_service.apply(db, current_user.id, cart_quantity=-quote["total_items"])
+        
+        order = await _place_order(
+            db, current_user, quote,
+            customer_name=current_user.name,
+            customer_email=current_user.email,
+            customer_phone=current_user.phone,
+            shipping_address=current_user.addresses[0]  # Use default address
         )
+        await pricing_service.cart_changed(current_user.id)
         
-        db.add(order)
-        await db.commit()
-        await db.refresh(order)
-        
-        # Clear cart after successful order creation
-        cart.items = []
-        await db.commit()
-        await db.refresh(cart)
-        
-        # Send notification to admin
-        notification_service = NotificationService()
-        await notification_service.send_order_request_notification(order)
+        logger.info(f"Order created from cart: {order.id} by user {current_user.email}")
+        return order
         
-        logger.info(f"Order created from cart: {str(order.id)} by user {current_user.email}")
-        
-        return OrderResponse(
-            id=str(order.id),
-            user_id=str(order.user_id),
-            order_number=order.order_number,
-            status=order.status.value,
-            total_amount=order.total_amount,
-            gst_amount=order.gst_amount,
-            payment_method=order.payment_method.value,
-            payment_status=order.payment_status.value,
-            payment_reference=order.payment_reference,
-            payment_date=order.payment_date,
-            shipping_address=order.shipping_address,
-            billing_address=order.billing_address,
-            shipping_company=order.shipping_company,
-            tracking_number=order.tracking_number,
-            estimated_delivery=order.estimated_delivery,
-            actual_delivery=order.actual_delivery,
-            admin_notes=order.admin_notes,
-            internal_notes=order.internal_notes,
-            assigned_to=order.assigned_to,
-            customer_notes=order.customer_notes,
-            communication_log=order.communication_log,
-            confirmed_at=order.confirmed_at,
-            shipped_at=order.shipped_at,
-            delivered_at=order.delivered_at,
-            created_at=order.created_at,
-            updated_at=order.updated_at
-        )
-        
-    except HTTPException:
+    except (BadRequestException, ConflictException, ValidationException):
+        await db.rollback()
         raise
     except Exception as e:
+        await db.rollback()
         logger.error(f"Error creating order from cart: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
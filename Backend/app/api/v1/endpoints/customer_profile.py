@@ -6,6 +6,7 @@ from app.models.sqlalchemy_models import User
 from app.schemas.user import UserUpdate, Address
 from app.core.security import get_current_active_user, get_password_hash, verify_password
 from app.core.postgresql import get_db
+from app.services.user_counter_service import user_counter_service
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, desc, asc
 import logging
@@ -353,31 +354,13 @@ async def get_profile_stats(
 ):
     """Get user profile statistics"""
     try:
-        from app.models.sqlalchemy_models import Order, PaymentStatus, Wishlist, Cart
-        from sqlalchemy import select, func
-        
-        # Get order statistics
-        orders_query = select(Order).where(Order.user_id == current_user.id)
-        orders_result = await db.execute(orders_query)
-        orders = orders_result.scalars().all()
-        total_orders = len(orders)
-        total_spent = sum(order.total_amount for order in orders if order.payment_status == PaymentStatus.COMPLETED)
-        
-        # Get wishlist count
-        wishlist_query = select(func.count(Wishlist.id)).where(Wishlist.user_id == current_user.id)
-        wishlist_result = await db.execute(wishlist_query)
-        wishlist_count = wishlist_result.scalar() or 0
-        
-        # Get cart count
-        cart_query = select(func.sum(Cart.quantity)).where(Cart.user_id == current_user.id)
-        cart_result = await db.execute(cart_query)
-        cart_count = cart_result.scalar() or 0
+        counters = await user_counter_service.summary(db, current_user.id)
         
         return {
-            "total_orders": total_orders,
-            "total_spent": total_spent,
-            "wishlist_count": wishlist_count,
-            "cart_count": cart_count,
+            "total_orders": counters["order_count"],
+            "total_spent": counters["lifetime_spend"],
+            "wishlist_count": counters["wishlist_count"],
+            "cart_count": counters["cart_quantity"],
             "member_since": current_user.created_at
         }
         
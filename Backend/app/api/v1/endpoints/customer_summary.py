@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.sqlalchemy_models import User
+from app.schemas.user import AccountSummaryResponse
+from app.core.security import get_current_active_user
+from app.core.postgresql import get_db
+from app.services.user_counter_service import user_counter_service
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/", response_model=AccountSummaryResponse)
+async def get_account_summary(
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the current user's header badges and account totals in one read"""
+    try:
+        return AccountSummaryResponse(**await user_counter_service.summary(db, current_user.id))
+        
+    except Exception as e:
+        logger.error(f"Error fetching account summary: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch account summary"
+        )
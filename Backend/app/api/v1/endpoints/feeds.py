@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from app.core.config import settings
+from app.core.exceptions import NotFoundException
+from app.core.conditional import make_etag, is_not_modified, not_modified, set_validators
+from app.services.feed_service import feed_service
+
+router = APIRouter()
+limiter = Limiter(key_func=get_remote_address)
+
+XML_MEDIA_TYPE = "application/xml"
+TSV_MEDIA_TYPE = "text/tab-separated-values"
+
+
+def _shard_url(index: int) -> str:
+    return f"{settings.BACKEND_URL.rstrip('/')}/api/v1/feeds/sitemaps/products-{index}.xml"
+
+
+@router.get("/sitemap.xml")
+@limiter.limit("60/minute")
+async def get_sitemap_index(request: Request):
+    """Sitemap index listing the product sitemap shards"""
+    manifest = await feed_service.ensure_ready()
+    body = feed_service.sitemap_index(manifest, _shard_url)
+    etag, last_modified = make_etag(body), feed_service.last_modified(manifest)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    response = Response(content=body, media_type=XML_MEDIA_TYPE)
+    set_validators(response, etag, last_modified)
+    return response
+
+
+@router.get("/sitemaps/products-{index}.xml")
+@limiter.limit("60/minute")
+async def get_sitemap_shard(request: Request, index: int):
+    """One product sitemap shard (at most 50,000 URLs), served from disk"""
+    manifest = await feed_service.ensure_ready()
+    if not 0 <= index < manifest["shards"]:
+        raise NotFoundException("Sitemap not found")
+    etag = make_etag(manifest["shards"], manifest["signatures"][str(index)])
+    last_modified = feed_service.last_modified(manifest, index)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    response = FileResponse(feed_service.shard_path(manifest["shards"], index, "sitemap"), media_type=XML_MEDIA_TYPE)
+    set_validators(response, etag, last_modified)
+    return response
+
+
+@router.get("/products.{format}")
+@limiter.limit("60/minute")
+async def get_product_feed(request: Request, format: str):
+    """Google Merchant product feed as RSS XML (products.xml) or TSV (products.tsv)"""
+    if format not in ("xml", "tsv"):
+        raise NotFoundException("Feed format must be xml or tsv")
+    manifest = await feed_service.ensure_ready()
+    etag = make_etag(format, manifest["shards"], sorted(manifest["signatures"].items()))
+    last_modified = feed_service.last_modified(manifest)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    response = StreamingResponse(
+        feed_service.stream_feed(manifest, format),
+        media_type=XML_MEDIA_TYPE if format == "xml" else TSV_MEDIA_TYPE
+    )
+    set_validators(response, etag, last_modified)
+    return response
@@ -17,6 +17,7 @@ from app.schemas.notification import (
 from app.core.postgresql import get_db
 from app.core.security import get_current_active_user, require_roles, UserRole
 from app.services.notification_service import NotificationService
+from app.services.user_counter_service import user_counter_service
 
 router = APIRouter()
 limiter = Limiter(key_func=get_remote_address)
@@ -42,6 +43,7 @@ async def send_email_notification(
     )
     
     db.add(notification)
+    await user_counter_service.apply(db, notification.user_id, unread_notifications=1)
     await db.commit()
     await db.refresh(notification)
     
@@ -75,6 +77,7 @@ async def send_whatsapp_notification(
     )
     
     db.add(notification)
+    await user_counter_service.apply(db, notification.user_id, unread_notifications=1)
     await db.commit()
     await db.refresh(notification)
     
@@ -22,9 +22,11 @@ from app.schemas.order import (
     OrderFilters
 )
 from app.core.security import get_current_active_user, require_roles, UserRole
-from app.core.exceptions import NotFoundException, ForbiddenException
+from app.core.exceptions import NotFoundException, ForbiddenException, ValidationException
 from app.core.postgresql import get_db
 from app.services.notification_service import NotificationService
+from app.services.pricing_service import pricing_service
+from app.services.user_counter_service import counted_spend, user_counter_service
 
 router = APIRouter()
 limiter = Limiter(key_func=get_remote_address)
@@ -40,10 +42,10 @@ async def create_order(
 ):
     """Create a new order request"""
     try:
-        # Calculate totals
-        subtotal = sum(item.price * item.quantity for item in order_data.items)
-        tax = subtotal * 0.0833  # 8.33% tax
-        total = subtotal + order_data.shipping_cost + tax
+        # Totals from catalog prices; client-supplied prices and shipping are ignored
+        priced = await pricing_service.price_items(db, order_data.items, order_data.coupon_code)
+        if priced["coupon_error"]:
+            raise ValidationException(priced["coupon_error"])
         
         # Create order
         order = Order(
@@ -53,8 +55,8 @@ async def create_order(
             customer_phone=order_data.customer_phone,
             order_number=f"ORD-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{str(current_user.id)[:8]}",
             status=OrderStatus.PENDING,
-            total_amount=total,
-            gst_amount=tax,
+            total_amount=priced["total"],
+            gst_amount=priced["tax"],
             payment_method=PaymentMethod.ONLINE,
             payment_status=PaymentStatus.PENDING,
             shipping_address=order_data.shipping_address,
@@ -62,26 +64,27 @@ async def create_order(
         )
         
         db.add(order)
-        await db.commit()
-        await db.refresh(order)
+        await db.flush()
         
         # Create order items
-        for item in order_data.items:
-            # Convert product_id to UUID if it's a string
-            try:
-                product_uuid = uuid.UUID(item.product_id) if isinstance(item.product_id, str) else item.product_id
-            except ValueError:
-                raise HTTPException(status_code=400, detail=f"Invalid product_id format: {item.product_id}")
-            
+        for line in priced["items"]:
             order_item = OrderItem(
                 order_id=order.id,
-                product_id=product_uuid,
-                quantity=item.quantity,
-                price=item.price
+                product_id=uuid.UUID(line["product_id"]),
+                quantity=line["quantity"],
+                price=line["product_price"],
+                size=line["size"],
+                color=line["color"]
             )
             db.add(order_item)
+        if priced["coupon_code"]:
+            await pricing_service.redeem_coupon(db, priced["coupon_code"])
+        await user_counter_service.apply(
+            db, current_user.id, order_count=1, lifetime_spend=counted_spend(order)
+        )
         
         await db.commit()
+        await db.refresh(order)
         
         # Send notification to admin
         notification_service = NotificationService()
@@ -117,6 +120,9 @@ async def create_order(
             updated_at=order.updated_at
         )
     
+    except ValidationException:
+        await db.rollback()
+        raise
     except Exception as e:
         await db.rollback()
         print(f"Error creating order: {e}")
@@ -1,6 +1,6 @@
 from typing import List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from app.models.sqlalchemy_models import Page, User
@@ -8,8 +8,9 @@ from app.schemas.page import PageCreate, PageUpdate, PageResponse
 from app.core.security import get_current_active_user, require_roles, UserRole
 from app.core.exceptions import NotFoundException, ConflictException
 from app.core.postgresql import get_db
+from app.core.conditional import make_etag, is_not_modified, not_modified, set_validators
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, desc, asc
+from sqlalchemy import select, and_, or_, desc, asc, func
 
 router = APIRouter()
 limiter = Limiter(key_func=get_remote_address)
@@ -19,22 +20,33 @@ limiter = Limiter(key_func=get_remote_address)
 @limiter.limit("60/minute")
 async def get_page(
     request: Request, 
+    response: Response,
     slug: str,
     db: AsyncSession = Depends(get_db)
 ):
     """Get page content by slug"""
-    query = select(Page).where(
+    # Validate against the timestamps first so a 304 never loads the page content
+    version_query = select(Page.id, func.coalesce(Page.updated_at, Page.created_at)).where(
         and_(
             Page.slug == slug,
             Page.is_published == True
         )
     )
-    result = await db.execute(query)
-    page = result.scalar_one_or_none()
+    version_result = await db.execute(version_query)
+    version = version_result.one_or_none()
     
-    if not page:
+    if not version:
         raise NotFoundException("Page not found")
     
+    page_id, last_modified = version
+    etag = make_etag(page_id, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    
+    result = await db.execute(select(Page).where(Page.id == page_id))
+    page = result.scalar_one()
+    
     return PageResponse(
         id=str(page.id),
         slug=page.slug,
@@ -1,163 +1,275 @@
 from typing import List, Optional
+import json
+import uuid
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from sqlalchemy import select, and_, or_, desc, asc, func
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.sqlalchemy_models import Product
-from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse, ProductListResponse
+from app.schemas.product import (
+    ProductCreate, ProductUpdate, ProductResponse, ProductListResponse,
+    ProductBatchRequest, ProductBatchResponse, ProductFilters, ProductVariantResponse
+)
 from app.models.sqlalchemy_models import User
 from app.core.security import get_current_active_user, require_roles, UserRole
 from app.core.postgresql import get_db
-from app.core.exceptions import NotFoundException, ForbiddenException
+from app.core.exceptions import NotFoundException, ForbiddenException, ValidationException
+from app.core.conditional import conditional_json, is_not_modified, not_modified, set_validators
+from app.services.search_service import search_service
+from app.services.facet_service import facet_service
+from app.services.catalog_service import catalog_service, BATCH_MAX_REFS
+from app.services.catalog_query import CatalogQuery, SORT_COLUMNS, next_cursor
+from app.services.landing_pages import landing_pages
+from app.services.search_log import search_log
+from app.services.bought_together_service import bought_together_service
+from app.services.recommendation_service import recommendation_service
+from app.services.similarity_index import similarity_index
+from app.services.variant_service import variant_service
+from app.services.product_projection import parse_fields, project_row, projected_json
 
 router = APIRouter()
 limiter = Limiter(key_func=get_remote_address)
 
+def _product_list(products, fields: Optional[List[str]], validators, **page_info):
+    """ProductListResponse, or a projected JSON body when `fields` was requested"""
+    if fields is None:
+        return ProductListResponse(
+            products=[ProductResponse.from_orm(product) for product in products],
+            **page_info
+        )
+    response = projected_json({
+        "products": [project_row(row, fields) for row in products],
+        "suggestions": [],
+        **page_info
+    })
+    # Returned directly, so the validators set on the injected response must be copied
+    set_validators(response, *validators)
+    return response
+
+
+async def _has_landing_pages(category: Optional[str]) -> bool:
+    """Landing payloads exist for the unfiltered listing and each active category"""
+    if category is None:
+        return True
+    return category in json.loads(await catalog_service.get_categories())["categories"]
+
 
 @router.get("/", response_model=ProductListResponse)
 @limiter.limit("60/minute")
 async def get_products(
     request: Request,
+    response: Response,
     category: Optional[str] = Query(None),
     min_price: Optional[float] = Query(None),
     max_price: Optional[float] = Query(None),
     tags: Optional[str] = Query(None),
     is_featured: Optional[bool] = Query(None),
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
     search: Optional[str] = Query(None),
+    size: Optional[str] = Query(None, description="Comma-separated sizes; matches products with such a variant"),
+    color: Optional[str] = Query(None, description="Comma-separated colors; matches products with such a variant"),
+    in_stock: bool = Query(False, description="Only products, or matching size/color variants, in stock"),
     sort_by: str = Query("created_at"),
     sort_order: str = Query("desc"),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = Query(None, description="Opaque cursor from next_cursor (keyset pagination)"),
+    include_facets: bool = Query(False, description="Include facet counts for the current filters"),
+    fields: Optional[str] = Query(None, description='Sparse fieldset: "card" or a comma-separated list of fields'),
     db: AsyncSession = Depends(get_db)
 ):
     """Get all products with filtering and pagination"""
-    # Build base query
-    query = select(Product).where(Product.is_active == True)
-    
-    # Apply filters
-    if category:
-        query = query.where(Product.category == category)
-    if min_price is not None:
-        query = query.where(Product.price >= min_price)
-    if max_price is not None:
-        query = query.where(Product.price <= max_price)
-    if tags:
-        tag_list = [tag.strip() for tag in tags.split(",")]
-        query = query.where(Product.tags.overlap(tag_list))
-    if is_featured is not None:
-        query = query.where(Product.is_featured == is_featured)
-    if search:
-        search_filter = or_(
-            Product.name.ilike(f"%{search}%"),
-            Product.description.ilike(f"%{search}%"),
-            Product.tags.overlap([search])
-        )
-        query = query.where(search_filter)
+    projection = parse_fields(fields)
+    filters = ProductFilters(
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        tags=tags,
+        is_featured=is_featured,
+        min_rating=min_rating,
+        search=search,
+        sizes=size,
+        colors=color,
+        in_stock=in_stock
+    )
     
-    # Apply sorting
-    if sort_by == "price":
-        if sort_order == "asc":
-            query = query.order_by(asc(Product.price))
-        else:
-            query = query.order_by(desc(Product.price))
-    elif sort_by == "name":
-        if sort_order == "asc":
-            query = query.order_by(asc(Product.name))
-        else:
-            query = query.order_by(desc(Product.name))
-    else:  # created_at
-        if sort_order == "asc":
-            query = query.order_by(asc(Product.created_at))
-        else:
-            query = query.order_by(desc(Product.created_at))
+    if sort_by not in SORT_COLUMNS:
+        sort_by = "created_at"
+    if sort_order != "asc":
+        sort_order = "desc"
     
-    # Get total count
-    count_query = select(func.count(Product.id)).where(Product.is_active == True)
-    if category:
-        count_query = count_query.where(Product.category == category)
-    if min_price is not None:
-        count_query = count_query.where(Product.price >= min_price)
-    if max_price is not None:
-        count_query = count_query.where(Product.price <= max_price)
-    if tags:
-        tag_list = [tag.strip() for tag in tags.split(",")]
-        count_query = count_query.where(Product.tags.overlap(tag_list))
-    if is_featured is not None:
-        count_query = count_query.where(Product.is_featured == is_featured)
-    if search:
-        search_filter = or_(
-            Product.name.ilike(f"%{search}%"),
-            Product.description.ilike(f"%{search}%"),
-            Product.tags.overlap([search])
-        )
-        count_query = count_query.where(search_filter)
+    # Default category listings are served from precomputed payloads, validated by their content
+    if (
+        projection is None
+        and not after
+        and landing_pages.serves(filters, sort_by, sort_order, page, limit)
+        and await _has_landing_pages(category)
+    ):
+        body = await landing_pages.get(category, sort_by, sort_order, page, include_facets)
+        return conditional_json(request, body)
     
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
+    # Revalidation is answered from the catalog version, before any listing query runs
+    etag, last_modified = await catalog_service.listing_validators(request.url.query)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
     
-    # Apply pagination
-    offset = (page - 1) * limit
-    query = query.offset(offset).limit(limit)
+    catalog_query = CatalogQuery(filters)
+    facets = await facet_service.facet_counts(db, catalog_query.where) if include_facets else None
     
-    # Execute query
-    result = await db.execute(query)
-    products = result.scalars().all()
-    
-    # Calculate total pages
-    total_pages = (total + limit - 1) // limit
+    # Cursor mode: seek past the last row of the previous page instead of OFFSET
+    if after:
+        products, total, has_more = await catalog_query.fetch_after(db, sort_by, sort_order, after, limit, projection)
+        total_pages = None
+    else:
+        products, total, has_more = await catalog_query.fetch_page(db, sort_by, sort_order, page, limit, projection)
+        total_pages = (total + limit - 1) // limit
     
-    return ProductListResponse(
-        products=[ProductResponse.from_orm(product) for product in products],
+    return _product_list(
+        products,
+        projection,
+        (etag, last_modified),
         total=total,
         page=page,
         limit=limit,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_cursor(products, sort_by, sort_order) if has_more else None,
+        facets=facets
     )
 
 
 @router.get("/categories")
 @limiter.limit("60/minute")
-async def get_categories(request: Request, db: AsyncSession = Depends(get_db)):
+async def get_categories(request: Request):
     """Get all product categories"""
-    result = await db.execute(select(Product.category).distinct().where(Product.is_active == True))
-    categories = [row[0] for row in result.fetchall()]
-    return {"categories": categories}
+    body = await catalog_service.get_categories()
+    return conditional_json(request, body)
 
 
 @router.get("/slug/{slug}", response_model=ProductResponse)
 @limiter.limit("60/minute")
 async def get_product_by_slug(
     slug: str,
-    request: Request,
-    db: AsyncSession = Depends(get_db)
+    request: Request
 ):
     """Get a specific product by slug"""
-    result = await db.execute(select(Product).where(Product.slug == slug, Product.is_active == True))
-    product = result.scalar_one_or_none()
+    body = await catalog_service.get_product_by_slug(slug)
     
-    if not product:
+    if body is None:
         raise NotFoundException("Product not found")
     
-    return ProductResponse.from_orm(product)
+    return conditional_json(request, body, catalog_service.last_modified(body))
+
+
+async def _product_batch(refs: List[str]) -> Response:
+    """Batch lookup response assembled from the cached product bodies"""
+    refs = [ref.strip() for ref in refs if ref and ref.strip()]
+    if not refs:
+        raise ValidationException("Provide at least one product id or slug")
+    if len(refs) > BATCH_MAX_REFS:
+        raise ValidationException(f"At most {BATCH_MAX_REFS} products can be fetched at once")
+    products, missing = await catalog_service.get_products_batch(refs)
+    body = b'{"products":[' + b",".join(products) + b'],"missing":' + json.dumps(missing).encode() + b"}"
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/batch", response_model=ProductBatchResponse)
+@limiter.limit("60/minute")
+async def get_products_batch(
+    request: Request,
+    ids: List[str] = Query(..., description="Product ids and/or slugs; repeat the parameter or comma-separate")
+):
+    """Get several products by id or slug in one request, in the order requested"""
+    return await _product_batch([ref for value in ids for ref in value.split(",")])
+
+
+@router.post("/batch", response_model=ProductBatchResponse)
+@limiter.limit("60/minute")
+async def post_products_batch(
+    request: Request,
+    payload: ProductBatchRequest
+):
+    """Batch lookup for id lists too long for a query string"""
+    return await _product_batch(payload.ids)
+
+
+@router.get("/recommended", response_model=List[ProductResponse])
+@limiter.limit("60/minute")
+async def get_recommended_products(
+    request: Request,
+    limit: int = Query(12, ge=1, le=50),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get personalized recommendations, falling back to trending products"""
+    products = await recommendation_service.for_user(db, current_user.id, limit)
+    return [ProductResponse.from_orm(product) for product in products]
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
 @limiter.limit("60/minute")
 async def get_product(
     product_id: str,
-    request: Request,
-    db: AsyncSession = Depends(get_db)
+    request: Request
 ):
     """Get a specific product by ID"""
-    result = await db.execute(select(Product).where(Product.id == product_id, Product.is_active == True))
-    product = result.scalar_one_or_none()
+    body = await catalog_service.get_product(product_id)
     
-    if not product:
+    if body is None:
         raise NotFoundException("Product not found")
     
-    return ProductResponse.from_orm(product)
+    return conditional_json(request, body, catalog_service.last_modified(body))
+
+
+@router.get("/{product_id}/bought-together", response_model=List[ProductResponse])
+@limiter.limit("60/minute")
+async def get_bought_together(
+    product_id: str,
+    request: Request,
+    limit: int = Query(4, ge=1, le=20),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get products frequently bought together with a product"""
+    try:
+        product_uuid = uuid.UUID(product_id)
+    except ValueError:
+        raise NotFoundException("Product not found")
+    # Neighbors are precomputed by the bought-together background job
+    neighbors = await bought_together_service.for_product(db, product_uuid, limit)
+    return [ProductResponse.from_orm(product) for product, _lift in neighbors]
+
+
+@router.get("/{product_id}/variants", response_model=List[ProductVariantResponse])
+@limiter.limit("60/minute")
+async def get_product_variants(
+    product_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the size/color variants of a product with their stock"""
+    try:
+        product_uuid = uuid.UUID(product_id)
+    except ValueError:
+        raise NotFoundException("Product not found")
+    result = await db.execute(select(Product.id).where(Product.id == product_uuid, Product.is_active == True))
+    if result.scalar_one_or_none() is None:
+        raise NotFoundException("Product not found")
+    return await variant_service.list_for_product(db, product_uuid)
+
+
+@router.get("/{product_id}/similar", response_model=List[ProductResponse])
+@limiter.limit("60/minute")
+async def get_similar_products(
+    product_id: str,
+    request: Request,
+    limit: int = Query(8, ge=1, le=50)
+):
+    """Get products that look similar (image color and texture)"""
+    matches = similarity_index.similar(product_id, limit)
+    products, _missing = await catalog_service.get_products_batch([match_id for match_id, _score in matches])
+    return Response(content=b"[" + b",".join(products) + b"]", media_type="application/json")
 
 
 @router.post("/", response_model=ProductResponse)
@@ -171,8 +283,11 @@ async def create_product(
     """Create a new product (Admin only)"""
     product = Product(**product_data.dict())
     db.add(product)
+    await db.flush()
+    await variant_service.sync_options(db, [product.id])
     await db.commit()
     await db.refresh(product)
+    await catalog_service.product_changed(product)
     
     return ProductResponse.from_orm(product)
 
@@ -194,15 +309,21 @@ async def update_product(
         raise NotFoundException("Product not found")
     
     # Update fields
+    previous_slug, previous_category = product.slug, product.category
     update_data = product_data.dict(exclude_unset=True)
+    await variant_service.check_product_update(db, product.id, update_data)
     for field, value in update_data.items():
         if hasattr(product, field):
             setattr(product, field, value)
     
     product.updated_at = datetime.utcnow()
+    if "sizes" in update_data or "colors" in update_data:
+        await db.flush()
+        await variant_service.sync_options(db, [product.id])
     
     await db.commit()
     await db.refresh(product)
+    await catalog_service.product_changed(product, previous_slug, previous_category)
     
     return ProductResponse.from_orm(product)
 
@@ -227,6 +348,7 @@ async def delete_product(
     product.updated_at = datetime.utcnow()
     
     await db.commit()
+    await catalog_service.product_changed(product)
     
     return {"message": "Product deleted successfully"}
 
@@ -235,19 +357,11 @@ async def delete_product(
 @limiter.limit("60/minute")
 async def get_featured_products(
     request: Request,
-    limit: int = Query(10, ge=1, le=50),
-    db: AsyncSession = Depends(get_db)
+    limit: int = Query(10, ge=1, le=50)
 ):
     """Get featured products"""
-    result = await db.execute(
-        select(Product)
-        .where(Product.is_active == True, Product.is_featured == True)
-        .order_by(desc(Product.created_at))
-        .limit(limit)
-    )
-    products = result.scalars().all()
-    
-    return [ProductResponse.from_orm(product) for product in products]
+    body = await catalog_service.get_featured(limit)
+    return conditional_json(request, body)
 
 
 @router.get("/search/", response_model=ProductListResponse)
@@ -255,41 +369,31 @@ async def get_featured_products(
 async def search_products(
     request: Request,
     q: str = Query(..., min_length=1),
+    fuzzy: bool = Query(False, description="Typo-tolerant trigram matching"),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     db: AsyncSession = Depends(get_db)
 ):
     """Search products by query"""
-    # Build search query
-    search_filter = or_(
-        Product.name.ilike(f"%{q}%"),
-        Product.description.ilike(f"%{q}%"),
-        Product.tags.overlap([q]),
-        Product.category.ilike(f"%{q}%")
-    )
-    
-    query = select(Product).where(Product.is_active == True, search_filter)
-    
-    # Get total count
-    count_query = select(func.count(Product.id)).where(Product.is_active == True, search_filter)
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
-    
-    # Apply pagination
-    offset = (page - 1) * limit
-    query = query.offset(offset).limit(limit)
-    
-    # Execute query
-    result = await db.execute(query)
-    products = result.scalars().all()
+    catalog_query = CatalogQuery(ProductFilters(search=q, search_mode="fuzzy" if fuzzy else "substring"))
+    products, total, _has_more = await catalog_query.fetch_page(db, "relevance", "desc", page, limit)
     
     # Calculate total pages
     total_pages = (total + limit - 1) // limit
     
+    if page == 1:
+        search_log.record(q, total)
+    
+    # Offer did-you-mean terms when the exact search finds nothing
+    suggestions = []
+    if total == 0 and not fuzzy:
+        suggestions = await search_service.did_you_mean(db, q)
+    
     return ProductListResponse(
         products=[ProductResponse.from_orm(product) for product in products],
         total=total,
         page=page,
         limit=limit,
-        total_pages=total_pages
-    )
\ No newline at end of file
+        total_pages=total_pages,
+        suggestions=suggestions
+    )
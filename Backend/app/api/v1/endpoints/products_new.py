@@ -3,14 +3,16 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from sqlalchemy import select, and_, or_, desc, asc, func
+from sqlalchemy import select, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.sqlalchemy_models import Product
-from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse, ProductListResponse
+from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse, ProductListResponse, ProductFilters
 from app.models.sqlalchemy_models import User
 from app.core.security import get_current_active_user, require_roles, UserRole
 from app.core.postgresql import get_db
 from app.core.exceptions import NotFoundException, ForbiddenException
+from app.services.search_service import search_service
+from app.services.catalog_query import CatalogQuery
 
 router = APIRouter()
 limiter = Limiter(key_func=get_remote_address)
@@ -33,77 +35,15 @@ async def get_products(
     db: AsyncSession = Depends(get_db)
 ):
     """Get all products with filtering and pagination"""
-    # Build base query
-    query = select(Product).where(Product.is_active == True)
-    
-    # Apply filters
-    if category:
-        query = query.where(Product.category == category)
-    if min_price is not None:
-        query = query.where(Product.price >= min_price)
-    if max_price is not None:
-        query = query.where(Product.price <= max_price)
-    if tags:
-        tag_list = [tag.strip() for tag in tags.split(",")]
-        query = query.where(Product.tags.overlap(tag_list))
-    if is_featured is not None:
-        query = query.where(Product.is_featured == is_featured)
-    if search:
-        search_filter = or_(
-            Product.name.ilike(f"%{search}%"),
-            Product.description.ilike(f"%{search}%"),
-            Product.tags.overlap([search])
-        )
-        query = query.where(search_filter)
-    
-    # Apply sorting
-    if sort_by == "price":
-        if sort_order == "asc":
-            query = query.order_by(asc(Product.price))
-        else:
-            query = query.order_by(desc(Product.price))
-    elif sort_by == "name":
-        if sort_order == "asc":
-            query = query.order_by(asc(Product.name))
-        else:
-            query = query.order_by(desc(Product.name))
-    else:  # created_at
-        if sort_order == "asc":
-            query = query.order_by(asc(Product.created_at))
-        else:
-            query = query.order_by(desc(Product.created_at))
-    
-    # Get total count
-    count_query = select(func.count(Product.id)).where(Product.is_active == True)
-    if category:
-        count_query = count_query.where(Product.category == category)
-    if min_price is not None:
-        count_query = count_query.where(Product.price >= min_price)
-    if max_price is not None:
-        count_query = count_query.where(Product.price <= max_price)
-    if tags:
-        tag_list = [tag.strip() for tag in tags.split(",")]
-        count_query = count_query.where(Product.tags.overlap(tag_list))
-    if is_featured is not None:
-        count_query = count_query.where(Product.is_featured == is_featured)
-    if search:
-        search_filter = or_(
-            Product.name.ilike(f"%{search}%"),
-            Product.description.ilike(f"%{search}%"),
-            Product.tags.overlap([search])
-        )
-        count_query = count_query.where(search_filter)
-    
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
-    
-    # Apply pagination
-    offset = (page - 1) * limit
-    query = query.offset(offset).limit(limit)
-    
-    # Execute query
-    result = await db.execute(query)
-    products = result.scalars().all()
+    catalog_query = CatalogQuery(ProductFilters(
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        tags=tags,
+        is_featured=is_featured,
+        search=search
+    ))
+    products, total, _has_more = await catalog_query.fetch_page(db, sort_by, sort_order, page, limit)
     
     # Calculate total pages
     total_pages = (total + limit - 1) // limit
@@ -238,41 +178,28 @@ async def get_featured_products(
 async def search_products(
     request: Request,
     q: str = Query(..., min_length=1),
+    fuzzy: bool = Query(False, description="Typo-tolerant trigram matching"),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     db: AsyncSession = Depends(get_db)
 ):
     """Search products by query"""
-    # Build search query
-    search_filter = or_(
-        Product.name.ilike(f"%{q}%"),
-        Product.description.ilike(f"%{q}%"),
-        Product.tags.overlap([q]),
-        Product.category.ilike(f"%{q}%")
-    )
-    
-    query = select(Product).where(Product.is_active == True, search_filter)
-    
-    # Get total count
-    count_query = select(func.count(Product.id)).where(Product.is_active == True, search_filter)
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
-    
-    # Apply pagination
-    offset = (page - 1) * limit
-    query = query.offset(offset).limit(limit)
-    
-    # Execute query
-    result = await db.execute(query)
-    products = result.scalars().all()
+    catalog_query = CatalogQuery(ProductFilters(search=q, search_mode="fuzzy" if fuzzy else "substring"))
+    products, total, _has_more = await catalog_query.fetch_page(db, "relevance", "desc", page, limit)
     
     # Calculate total pages
     total_pages = (total + limit - 1) // limit
     
+    # Offer did-you-mean terms when the exact search finds nothing
+    suggestions = []
+    if total == 0 and not fuzzy:
+        suggestions = await search_service.did_you_mean(db, q)
+    
     return ProductListResponse(
         products=[ProductResponse.from_orm(product) for product in products],
         total=total,
         page=page,
         limit=limit,
-        total_pages=total_pages
+        total_pages=total_pages,
+        suggestions=suggestions
     )
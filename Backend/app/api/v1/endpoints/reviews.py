@@ -4,20 +4,41 @@ from datetime import datetime
 import uuid
 from sqlalchemy import select, and_, or_, desc, asc, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.sqlalchemy_models import Review, User, Product, Order
+from app.models.sqlalchemy_models import Review, User, Product, Order, OrderItem, PaymentStatus
 from app.schemas.review import (
     ReviewCreate, ReviewUpdate, ReviewResponse, ReviewWithUser, 
     ReviewStats, ReviewListResponse, ReviewHelpfulUpdate
 )
 from app.core.postgresql import get_db
-from app.core.security import get_current_active_user
+from app.core.security import get_current_active_user, require_roles, UserRole
 from app.services.file_service import FileService
+from app.services.rating_service import rating_service
+from app.services.catalog_service import catalog_service
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+async def _get_review_for_update(db: AsyncSession, review_id: str) -> Review:
+    """Load and row-lock a review, raising 404 if it doesn't exist"""
+    try:
+        review_uuid = uuid.UUID(review_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Review not found"
+        )
+    result = await db.execute(select(Review).where(Review.id == review_uuid).with_for_update())
+    review = result.scalar_one_or_none()
+    if not review:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Review not found"
+        )
+    return review
+
+
 @router.get("/product/{product_id}", response_model=ReviewListResponse)
 async def get_product_reviews(
     product_id: str,
@@ -68,16 +89,12 @@ async def get_product_reviews(
             else:
                 query = query.order_by(desc(Review.created_at))
         
-        # Get total count
-        count_query = select(func.count(Review.id)).where(
-            Review.product_id == product_id,
-            Review.is_approved == True
-        )
+        # Totals come from the aggregates kept on the product row
+        stats = rating_service.stats(product)
         if rating_filter:
-            count_query = count_query.where(Review.rating == rating_filter)
-        
-        total_result = await db.execute(count_query)
-        total = total_result.scalar()
+            total = stats["rating_distribution"][rating_filter]
+        else:
+            total = stats["total_reviews"]
         
         # Apply pagination
         offset = (page - 1) * limit
@@ -108,24 +125,6 @@ async def get_product_reviews(
                 user_profile_image=user.profile_image
             ))
         
-        # Get review statistics
-        stats_query = select(
-            func.count(Review.id).label('total_reviews'),
-            func.avg(Review.rating).label('average_rating')
-        ).where(Review.product_id == product_id, Review.is_approved == True)
-        
-        stats_result = await db.execute(stats_query)
-        stats_data = stats_result.fetchone()
-        
-        # Get rating distribution
-        rating_dist_query = select(
-            Review.rating,
-            func.count(Review.id).label('count')
-        ).where(Review.product_id == product_id, Review.is_approved == True).group_by(Review.rating)
-        
-        rating_dist_result = await db.execute(rating_dist_query)
-        rating_distribution = {row[0]: row[1] for row in rating_dist_result.fetchall()}
-        
         # Calculate total pages
         total_pages = (total + limit - 1) // limit
         
@@ -135,11 +134,7 @@ async def get_product_reviews(
             page=page,
             limit=limit,
             total_pages=total_pages,
-            stats=ReviewStats(
-                total_reviews=stats_data[0] or 0,
-                average_rating=float(stats_data[1] or 0),
-                rating_distribution=rating_distribution
-            )
+            stats=ReviewStats(**stats)
         )
         
     except HTTPException:
@@ -171,34 +166,7 @@ async def get_product_review_stats(
                 detail="Product not found"
             )
         
-        # Get review statistics
-        stats_query = select(
-            func.count(Review.id).label('total_reviews'),
-            func.avg(Review.rating).label('average_rating')
-        ).where(Review.product_id == product_id, Review.is_approved == True)
-        
-        stats_result = await db.execute(stats_query)
-        stats_data = stats_result.fetchone()
-        
-        # Get rating distribution
-        rating_dist_query = select(
-            Review.rating,
-            func.count(Review.id).label('count')
-        ).where(Review.product_id == product_id, Review.is_approved == True).group_by(Review.rating)
-        
-        rating_dist_result = await db.execute(rating_dist_query)
-        rating_distribution = {row[0]: row[1] for row in rating_dist_result.fetchall()}
-        
-        # Ensure all ratings 1-5 are present
-        for rating in range(1, 6):
-            if rating not in rating_distribution:
-                rating_distribution[rating] = 0
-        
-        return ReviewStats(
-            total_reviews=stats_data[0] or 0,
-            average_rating=float(stats_data[1] or 0),
-            rating_distribution=rating_distribution
-        )
+        return ReviewStats(**rating_service.stats(product))
         
     except HTTPException:
         raise
@@ -223,19 +191,27 @@ async def create_review(
     """Create a new review"""
     try:
         # Verify product exists
-        product = await Product.get(product_id)
-        if not product:
+        try:
+            product_uuid = uuid.UUID(product_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Product not found"
+            )
+        product_result = await db.execute(
+            select(Product.id).where(Product.id == product_uuid, Product.is_active == True)
+        )
+        if product_result.scalar_one_or_none() is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Product not found"
             )
         
         # Check if user already reviewed this product
-        existing_review = await Review.find_one({
-            "user_id": str(current_user.id),
-            "product_id": product_id
-        })
-        if existing_review:
+        existing_result = await db.execute(
+            select(Review.id).where(Review.user_id == current_user.id, Review.product_id == product_uuid)
+        )
+        if existing_result.scalar_one_or_none() is not None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="You have already reviewed this product"
@@ -244,12 +220,17 @@ async def create_review(
         # Check if user has purchased this product (for verified purchase)
         is_verified_purchase = False
         if current_user.role.value == "customer":
-            purchase_check = await Order.find_one({
-                "user_id": str(current_user.id),
-                "payment_status": PaymentStatus.PAID,
-                "items.product_id": product_id
-            })
-            is_verified_purchase = purchase_check is not None
+            purchase_result = await db.execute(
+                select(OrderItem.id)
+                .join(Order, OrderItem.order_id == Order.id)
+                .where(
+                    Order.user_id == current_user.id,
+                    Order.payment_status == PaymentStatus.COMPLETED,
+                    OrderItem.product_id == product_uuid
+                )
+                .limit(1)
+            )
+            is_verified_purchase = purchase_result.scalar_one_or_none() is not None
         
         # Upload images if provided
         uploaded_images = []
@@ -276,8 +257,8 @@ async def create_review(
         
         # Create review
         review = Review(
-            user_id=str(current_user.id),
-            product_id=product_id,
+            user_id=current_user.id,
+            product_id=product_uuid,
             rating=rating,
             title=title,
             comment=comment,
@@ -286,15 +267,18 @@ async def create_review(
         )
         
         db.add(review)
+        await db.flush()
+        slug = await rating_service.apply(db, product_uuid, None, rating_service.counted_rating(review))
         await db.commit()
         await db.refresh(review)
+        await catalog_service.product_stats_changed(product_uuid, slug)
         
         logger.info(f"Review created for product {product_id} by user {current_user.email}")
         
         return ReviewResponse(
             id=str(review.id),
-            user_id=review.user_id,
-            product_id=review.product_id,
+            user_id=str(review.user_id),
+            product_id=str(review.product_id),
             rating=review.rating,
             title=review.title,
             comment=review.comment,
@@ -322,26 +306,23 @@ async def update_review(
     title: Optional[str] = Form(None),
     comment: Optional[str] = Form(None),
     images: List[UploadFile] = File([]),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a review"""
     try:
-        # Get review
-        review = await Review.get(review_id)
-        if not review:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Review not found"
-            )
+        # Get review (locked so concurrent edits apply their rating changes in turn)
+        review = await _get_review_for_update(db, review_id)
         
         # Check if user owns this review
-        if review.user_id != str(current_user.id):
+        if review.user_id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only edit your own reviews"
             )
         
         # Update fields
+        counted_before = rating_service.counted_rating(review)
         if rating is not None:
             review.rating = rating
         if title is not None:
@@ -376,15 +357,18 @@ async def update_review(
             # Replace existing images
             review.images = uploaded_images
         
+        slug = await rating_service.apply(db, review.product_id, counted_before, rating_service.counted_rating(review))
         await db.commit()
         await db.refresh(review)
+        if slug:
+            await catalog_service.product_stats_changed(review.product_id, slug)
         
         logger.info(f"Review updated: {review_id} by user {current_user.email}")
         
         return ReviewResponse(
             id=str(review.id),
-            user_id=review.user_id,
-            product_id=review.product_id,
+            user_id=str(review.user_id),
+            product_id=str(review.product_id),
             rating=review.rating,
             title=review.title,
             comment=review.comment,
@@ -408,20 +392,16 @@ async def update_review(
 @router.delete("/{review_id}")
 async def delete_review(
     review_id: str,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a review"""
     try:
-        # Get review
-        review = await Review.get(review_id)
-        if not review:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Review not found"
-            )
+        # Get review (locked so concurrent edits apply their rating changes in turn)
+        review = await _get_review_for_update(db, review_id)
         
         # Check if user owns this review
-        if review.user_id != str(current_user.id):
+        if review.user_id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only delete your own reviews"
@@ -433,8 +413,11 @@ async def delete_review(
             for image_url in review.images:
                 await file_service.delete_file(image_url)
         
+        slug = await rating_service.apply(db, review.product_id, rating_service.counted_rating(review), None)
         await db.delete(review)
         await db.commit()
+        if slug:
+            await catalog_service.product_stats_changed(review.product_id, slug)
         
         logger.info(f"Review deleted: {review_id} by user {current_user.email}")
         
@@ -450,6 +433,51 @@ async def delete_review(
         )
 
 
+@router.put("/{review_id}/approval", response_model=ReviewResponse)
+async def set_review_approval(
+    review_id: str,
+    is_approved: bool = Form(...),
+    current_user: User = Depends(require_roles(UserRole.ADMIN, UserRole.SUPER_ADMIN)),
+    db: AsyncSession = Depends(get_db)
+):
+    """Approve or hide a review (Admin only)"""
+    try:
+        review = await _get_review_for_update(db, review_id)
+        
+        counted_before = rating_service.counted_rating(review)
+        review.is_approved = is_approved
+        slug = await rating_service.apply(db, review.product_id, counted_before, rating_service.counted_rating(review))
+        await db.commit()
+        await db.refresh(review)
+        if slug:
+            await catalog_service.product_stats_changed(review.product_id, slug)
+        
+        logger.info(f"Review {review_id} approval set to {is_approved} by {current_user.email}")
+        
+        return ReviewResponse(
+            id=str(review.id),
+            user_id=str(review.user_id),
+            product_id=str(review.product_id),
+            rating=review.rating,
+            title=review.title,
+            comment=review.comment,
+            images=review.images,
+            is_verified_purchase=review.is_verified_purchase,
+            is_approved=review.is_approved,
+            helpful_count=review.helpful_count,
+            created_at=review.created_at
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating review approval: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update review approval"
+        )
+
+
 @router.get("/user/my-reviews", response_model=List[ReviewResponse])
 async def get_my_reviews(
     current_user: User = Depends(get_current_active_user),
@@ -467,8 +495,8 @@ async def get_my_reviews(
         return [
             ReviewResponse(
                 id=str(review.id),
-                user_id=review.user_id,
-                product_id=review.product_id,
+                user_id=str(review.user_id),
+                product_id=str(review.product_id),
                 rating=review.rating,
                 title=review.title,
                 comment=review.comment,
@@ -1,14 +1,22 @@
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from app.models.sqlalchemy_models import Product, User
-from app.schemas.product import ProductResponse
+from app.models.sqlalchemy_models import User
+from app.schemas.product import ProductResponse, ProductFilters
 from app.core.security import get_current_active_user, require_roles, UserRole
-from app.core.exceptions import ValidationException
 from app.core.postgresql import get_db
+from app.core.conditional import is_not_modified, not_modified, set_validators
+from app.services.search_service import search_service
+from app.services.facet_service import facet_service
+from app.services.suggestion_index import suggestion_index
+from app.services.catalog_service import catalog_service
+from app.services.trending_service import trending_service
+from app.services.search_log import search_log
+from app.services.catalog_query import CatalogQuery
+from app.services.product_projection import parse_fields, project_row, projected_json
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, desc, asc, func
+from urllib.parse import quote
 import re
 
 router = APIRouter()
@@ -19,6 +27,7 @@ limiter = Limiter(key_func=get_remote_address)
 @limiter.limit("60/minute")
 async def search_products(
     request: Request,
+    response: Response,
     q: str = Query(..., min_length=2, description="Search query"),
     category: Optional[str] = Query(None),
     min_price: Optional[float] = Query(None, ge=0),
@@ -27,90 +36,56 @@ async def search_products(
     is_new: Optional[bool] = Query(None),
     is_on_sale: Optional[bool] = Query(None),
     min_rating: Optional[float] = Query(None, ge=0, le=5),
+    size: Optional[str] = Query(None, description="Comma-separated sizes; matches products with such a variant"),
+    color: Optional[str] = Query(None, description="Comma-separated colors; matches products with such a variant"),
+    in_stock: bool = Query(False, description="Only products, or matching size/color variants, in stock"),
     sort_by: str = Query("relevance", regex="^(relevance|price|rating|newest|oldest)$"),
     sort_order: str = Query("desc", regex="^(asc|desc)$"),
+    fuzzy: bool = Query(False, description="Typo-tolerant trigram matching"),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = Query(None, description='Sparse fieldset: "card" or a comma-separated list of fields'),
     db: AsyncSession = Depends(get_db)
 ):
     """Advanced product search with filtering and sorting"""
-    
-    # Build SQLAlchemy query
-    query = select(Product).where(Product.is_active == True)
-    
-    # Text search
-    if q:
-        # Create text search using ILIKE for case-insensitive search
-        search_terms = re.findall(r'\b\w+\b', q.lower())
-        if search_terms:
-            search_conditions = []
-            for term in search_terms:
-                search_conditions.extend([
-                    Product.name.ilike(f"%{term}%"),
-                    Product.description.ilike(f"%{term}%"),
-                    Product.category.ilike(f"%{term}%")
-                ])
-            query = query.where(or_(*search_conditions))
-    
-    # Category filter
-    if category:
-        query = query.where(Product.category.ilike(f"%{category}%"))
-    
-    # Price range filter
-    if min_price is not None:
-        query = query.where(Product.price >= min_price)
-    if max_price is not None:
-        query = query.where(Product.price <= max_price)
-    
-    # Tags filter
-    if tags:
-        tag_list = [tag.strip() for tag in tags.split(",")]
-        query = query.where(Product.tags.overlap(tag_list))
-    
-    # Boolean filters
-    if is_new is not None:
-        # For new products, check if created within last 30 days
-        from datetime import datetime, timedelta
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        if is_new:
-            query = query.where(Product.created_at >= thirty_days_ago)
-        else:
-            query = query.where(Product.created_at < thirty_days_ago)
-    
-    if is_on_sale is not None:
-        # Check if there's a discount (original_price > price)
-        if is_on_sale:
-            query = query.where(Product.original_price > Product.price)
-        else:
-            query = query.where(Product.original_price <= Product.price)
-    
-    # Rating filter (would need to join with reviews table for actual rating)
-    # For now, we'll skip this as it requires a more complex query
-    
-    # Calculate offset
-    offset = (page - 1) * limit
-    
-    # Sort options
-    sort_column = Product.created_at  # default
-    if sort_by == "price":
-        sort_column = Product.price
-    elif sort_by == "newest":
-        sort_column = Product.created_at
-    elif sort_by == "oldest":
-        sort_column = Product.created_at
-    
-    # Apply sorting
-    if sort_order == "desc":
-        query = query.order_by(desc(sort_column))
-    else:
-        query = query.order_by(asc(sort_column))
-    
-    # Apply pagination
-    query = query.offset(offset).limit(limit)
-    
-    # Execute query
-    result = await db.execute(query)
-    products = result.scalars().all()
+    projection = parse_fields(fields)
+    
+    catalog_query = CatalogQuery(ProductFilters(
+        search=q,
+        search_mode="fuzzy" if fuzzy else "fulltext",
+        category=category,
+        category_contains=True,
+        min_price=min_price,
+        max_price=max_price,
+        tags=tags,
+        is_new=is_new,
+        is_on_sale=is_on_sale,
+        min_rating=min_rating,
+        sizes=size,
+        colors=color,
+        in_stock=in_stock
+    ))
+    # newest/oldest both order by creation time in the requested direction
+    sort_key = "created_at" if sort_by in ("newest", "oldest") else sort_by
+    products, total, _has_more = await catalog_query.fetch_page(
+        db, sort_key, sort_order, page, limit, projection
+    )
+    
+    # Logged asynchronously; pagination of the same search isn't counted again
+    if page == 1:
+        search_log.record(q, total)
+    
+    # Offer did-you-mean terms when the exact search finds nothing
+    if not products and not fuzzy and page == 1:
+        suggestions = await search_service.did_you_mean(db, q)
+        if suggestions:
+            response.headers["X-Did-You-Mean"] = ",".join(quote(term) for term in suggestions)
+    
+    if projection:
+        projected = projected_json([project_row(row, projection) for row in products])
+        if "X-Did-You-Mean" in response.headers:
+            projected.headers["X-Did-You-Mean"] = response.headers["X-Did-You-Mean"]
+        return projected
     
     # Convert to response format
     return [
@@ -135,6 +110,8 @@ async def search_products(
             is_featured=product.is_featured,
             seo_title=product.seo_title,
             seo_description=product.seo_description,
+            rating_average=product.rating_average or 0,
+            rating_count=product.rating_count or 0,
             created_at=product.created_at,
             updated_at=product.updated_at
         )
@@ -150,187 +127,89 @@ async def get_search_suggestions(
     limit: int = Query(10, ge=1, le=20),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get search suggestions based on query"""
-    
-    # Get product name suggestions
-    product_query = select(Product.name).where(
-        and_(
-            Product.is_active == True,
-            Product.name.ilike(f"{q}%")
-        )
-    ).limit(limit)
-    product_result = await db.execute(product_query)
-    products = [row[0] for row in product_result.fetchall()]
+    """Get search suggestions based on query (served from the in-memory prefix index)"""
+    if not suggestion_index.is_ready:
+        await suggestion_index.rebuild(db)
     
-    # Get category suggestions
-    category_query = select(Product.category).where(
-        and_(
-            Product.is_active == True,
-            Product.category.ilike(f"{q}%")
-        )
-    ).distinct().limit(5)
-    category_result = await db.execute(category_query)
-    categories = [row[0] for row in category_result.fetchall()]
-    
-    # Get tag suggestions (simplified - would need more complex query for array overlap)
-    tag_query = select(Product.tags).where(
-        and_(
-            Product.is_active == True,
-            Product.tags.any(q)  # Check if any tag starts with q
-        )
-    ).limit(5)
-    tag_result = await db.execute(tag_query)
-    tags = []
-    for row in tag_result.fetchall():
-        if row[0]:  # if tags array is not None
-            matching_tags = [tag for tag in row[0] if tag.lower().startswith(q.lower())]
-            tags.extend(matching_tags[:2])  # Limit to 2 per product
-    
-    suggestions = {
-        "products": products[:5],
-        "categories": categories[:5],
-        "tags": list(set(tags))[:5]  # Remove duplicates and limit
-    }
-    
-    return suggestions
+    return suggestion_index.suggest(q, limit)
 
 
 @router.get("/filters")
 @limiter.limit("60/minute")
 async def get_search_filters(
     request: Request,
+    response: Response,
+    q: Optional[str] = Query(None, description="Restrict facet counts to a search query"),
+    category: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    tags: Optional[str] = Query(None),
+    is_on_sale: Optional[bool] = Query(None),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get available search filters"""
-    
-    # Get all categories
-    category_query = select(Product.category).where(Product.is_active == True).distinct()
-    category_result = await db.execute(category_query)
-    categories = [row[0] for row in category_result.fetchall()]
-    
-    # Get all tags (simplified - would need more complex query for array aggregation)
-    tag_query = select(Product.tags).where(Product.is_active == True)
-    tag_result = await db.execute(tag_query)
-    all_tags = set()
-    for row in tag_result.fetchall():
-        if row[0]:  # if tags array is not None
-            all_tags.update(row[0])
-    tags = list(all_tags)
-    
-    # Get price range
-    price_stats_query = select(
-        func.min(Product.price).label('min_price'),
-        func.max(Product.price).label('max_price'),
-        func.avg(Product.price).label('avg_price')
-    ).where(Product.is_active == True)
-    price_stats_result = await db.execute(price_stats_query)
-    price_stats = price_stats_result.first()
-    
-    price_range = {
-        "min_price": float(price_stats.min_price) if price_stats.min_price else 0,
-        "max_price": float(price_stats.max_price) if price_stats.max_price else 1000,
-        "avg_price": float(price_stats.avg_price) if price_stats.avg_price else 50
-    }
+    """Get available search filters with facet counts for the current filter set"""
+    etag, last_modified = await catalog_service.listing_validators(request.url.query)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    
+    # Current filter set; a query without searchable words doesn't narrow the facets
+    searchable = q if q and search_service.tsquery(q) is not None else None
+    catalog_query = CatalogQuery(ProductFilters(
+        search=searchable,
+        search_mode="fulltext",
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        tags=tags,
+        is_on_sale=is_on_sale
+    ))
+    
+    # Categories, tags, sizes, colors, price buckets and price range in one round trip
+    facets = await facet_service.facet_counts(db, catalog_query.where)
+    price_range = facets["price_range"]
     
     return {
-        "categories": sorted(categories),
-        "tags": sorted(tags),
+        "categories": sorted(item["value"] for item in facets["categories"]),
+        "tags": sorted(item["value"] for item in facets["tags"]),
         "price_range": {
-            "min": price_range.get("min_price", 0),
-            "max": price_range.get("max_price", 1000),
-            "avg": price_range.get("avg_price", 50)
+            "min": price_range["min"] if price_range["min"] is not None else 0,
+            "max": price_range["max"] if price_range["max"] is not None else 1000,
+            "avg": price_range["avg"] if price_range["avg"] is not None else 50
         },
         "filters": {
             "is_new": True,
             "is_on_sale": True,
             "rating": [1, 2, 3, 4, 5]
-        }
+        },
+        "facets": facets
     }
 
 
-@router.get("/trending")
+@router.get("/trending", response_model=List[ProductResponse])
 @limiter.limit("60/minute")
 async def get_trending_products(
     request: Request,
     limit: int = Query(10, ge=1, le=50),
-    category: Optional[str] = Query(None)
+    category: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get trending products based on recent orders and reviews"""
-    
-    # This is a simplified trending algorithm
-    # In a real implementation, you'd analyze order history, view counts, etc.
-    
-    query = {"status": ProductStatus.ACTIVE}
-    if category:
-        query["category"] = category
-    
-    # Get products with high ratings and recent reviews
-    products_query = select(Product).where(
-        and_(
-            Product.rating >= 4.0,
-            Product.review_count >= 5
-        )
-    ).order_by(desc(Product.rating)).limit(limit)
-    
-    result = await db.execute(products_query)
-    products = result.scalars().all()
-    
-    return [
-        ProductResponse(
-            id=str(product.id),
-            name=product.name,
-            description=product.description,
-            description_arabic=product.description_arabic,
-            price=product.price,
-            discount_price=product.discount_price,
-            images=product.images,
-            category=product.category,
-            tags=product.tags,
-            specifications=product.specifications,
-            variants=product.variants,
-            colors=product.colors,
-            status=product.status,
-            is_new=product.is_new,
-            is_on_sale=product.is_on_sale,
-            rating=product.rating,
-            review_count=product.review_count,
-            created_at=product.created_at
-        )
-        for product in products
-    ]
+    # Scores are precomputed by the trending background job
+    trending = await trending_service.top_products(db, limit, category)
+    return [ProductResponse.from_orm(product) for product, _score in trending]
 
 
 @router.get("/popular-searches")
 @limiter.limit("60/minute")
 async def get_popular_searches(
     request: Request,
-    limit: int = Query(10, ge=1, le=20)
+    limit: int = Query(10, ge=1, le=20),
+    period: str = Query("day", regex="^(day|week)$")
 ):
-    """Get popular search terms (placeholder - would need search analytics)"""
-    
-    # This would typically come from search analytics
-    # For now, return popular categories and tags
-    from app.core.postgresql import get_db
-    
-    db = next(get_db())
-    popular_categories_query = select(
-        Product.category,
-        func.count(Product.id).label('count')
-    ).where(Product.status == ProductStatus.ACTIVE).group_by(
-        Product.category
-    ).order_by(desc(func.count(Product.id))).limit(limit)
-    
-    popular_categories_result = await db.execute(popular_categories_query)
-    popular_categories = [
-        {"_id": row.category, "count": row.count}
-        for row in popular_categories_result
-    ]
-    
-    # For tags, we'll need to handle the array field differently
-    # This is a simplified version - would need proper array handling
-    popular_tags = []  # Placeholder - would need proper array aggregation
-    
+    """Get the most frequent search terms, and those that found nothing, for the current day or week"""
     return {
-        "categories": [{"term": item["_id"], "count": item["count"]} for item in popular_categories],
-        "tags": [{"term": item["_id"], "count": item["count"]} for item in popular_tags]
+        "period": period,
+        "terms": search_log.popular(period, limit),
+        "zero_results": search_log.popular(period, limit, zero_results=True)
     }
@@ -5,6 +5,7 @@ from slowapi.util import get_remote_address
 from app.models.sqlalchemy_models import User
 from app.core.security import get_current_active_user, require_roles, UserRole
 from app.services.file_service import FileService
+from app.services.similarity_index import index_uploaded_images
 from app.core.exceptions import ValidationException
 
 router = APIRouter()
@@ -38,6 +39,9 @@ async def upload_product_images(
         if not saved_files:
             raise HTTPException(status_code=500, detail="Failed to save files")
         
+        # Visual similarity descriptors are computed once, here
+        await index_uploaded_images(saved_files)
+        
         return {
             "message": f"Successfully uploaded {len(saved_files)} files",
             "files": saved_files
@@ -10,6 +10,7 @@ from app.schemas.wishlist import (
 )
 from app.core.postgresql import get_db
 from app.core.security import get_current_active_user
+from app.services.user_counter_service import user_counter_service
 import logging
 
 logger = logging.getLogger(__name__)
@@ -116,6 +117,7 @@ async def add_to_wishlist(
         )
         
         db.add(new_wishlist_item)
+        await user_counter_service.apply(db, current_user.id, wishlist_count=1)
         await db.commit()
         await db.refresh(new_wishlist_item)
         
@@ -149,12 +151,12 @@ async def remove_from_wishlist(
 ):
     """Remove a product from wishlist"""
     try:
-        # Find and delete wishlist item
+        # Delete wishlist item; only a delete that removed the row is counted
         result = await db.execute(
-            select(Wishlist).where(
+            Wishlist.__table__.delete().where(
                 Wishlist.user_id == current_user.id,
                 Wishlist.product_id == product_id
-            )
+            ).returning(Wishlist.__table__.c.id)
         )
         wishlist_item = result.scalar_one_or_none()
         
@@ -164,7 +166,7 @@ async def remove_from_wishlist(
                 detail="Product not found in wishlist"
             )
         
-        await db.delete(wishlist_item)
+        await user_counter_service.apply(db, current_user.id, wishlist_count=-1)
         await db.commit()
         
         logger.info(f"Product {product_id} removed from wishlist for user {current_user.email}")
@@ -287,9 +289,10 @@ async def clear_wishlist(
     """Clear all items from wishlist"""
     try:
         # Delete all wishlist items for user
-        await db.execute(
+        result = await db.execute(
             Wishlist.__table__.delete().where(Wishlist.user_id == current_user.id)
         )
+        await user_counter_service.apply(db, current_user.id, wishlist_count=-result.rowcount)
         await db.commit()
         
         logger.info(f"Wishlist cleared for user {current_user.email}")
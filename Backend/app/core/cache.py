@@ -0,0 +1,450 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from collections import OrderedDict
+import asyncio
+import json
+import logging
+import time
+import uuid
+from fastapi.encoders import jsonable_encoder
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[Any]]
+# Loads the values for several (unprefixed) keys at once; keys without a value are left out
+BatchLoader = Callable[[List[str]], Awaitable[Dict[str, Any]]]
+
+# SET unless the key was invalidated since its loader read the generation
+# (ARGV[3], '' when the key had none)
+STORE_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[3] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+
+def generation_key(key: str) -> str:
+    return f"{key}:generation"
+
+
+def _generation(value: Optional[bytes]) -> str:
+    return value.decode() if value is not None else ""
+
+
+class CatalogCache:
+    """
+    Two-level read-through cache for catalog responses.
+
+    L1 is a small in-process LRU with a short TTL; L2 is Redis, shared by all
+    workers. Entries carry a "fresh until" timestamp and are kept for an extra
+    stale window: a stale hit is served immediately while a single background
+    task reloads it (stale-while-revalidate). Concurrent misses for the same key
+    share one loader call. If Redis is unreachable the cache degrades to L1 only.
+
+    Invalidations and version bumps are always sent to Redis, even while reads
+    back off, and any that fail are replayed before Redis is used again, so a
+    blip never leaves other workers serving an entry that was invalidated.
+    An invalidation also replaces the key's generation token; a load reads the
+    token before it starts and its store checks it atomically, so a load in any
+    worker that read the old row can't put it back, while later loads store as usual.
+    """
+
+    def __init__(self):
+        self._l1: "OrderedDict[str, Tuple[bytes, float, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[asyncio.Task] = set()
+        # Bumped on invalidation so a load that started before a write isn't stored
+        self._generation: Dict[str, int] = {}
+        self._redis: Optional[redis.Redis] = None
+        self._redis_down_until = 0.0
+        # Writes that must reach Redis but failed: key -> (envelope, ttl), or None to delete
+        self._pending: Dict[str, Optional[Tuple[bytes, int]]] = {}
+
+    # Redis helpers -------------------------------------------------------
+
+    def _client(self, force: bool = False) -> Optional[redis.Redis]:
+        if not force and time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            self._redis = redis.from_url(
+                settings.REDIS_URL,
+                socket_timeout=settings.CACHE_REDIS_TIMEOUT_SECONDS,
+                socket_connect_timeout=settings.CACHE_REDIS_TIMEOUT_SECONDS
+            )
+        return self._redis
+
+    def _redis_failed(self, error: Exception) -> None:
+        # Back off so an unavailable Redis doesn't add a timeout to every request
+        logger.warning(f"Catalog cache: Redis unavailable, using local cache only ({error})")
+        self._redis_down_until = time.monotonic() + settings.CACHE_REDIS_RETRY_SECONDS
+
+    async def _connected(self) -> Optional[redis.Redis]:
+        """Client outside the backoff, once writes that failed earlier have been replayed"""
+        client = self._client()
+        if client is None or not self._pending:
+            return client
+        pending, self._pending = self._pending, {}
+        return client if await self._write(client, pending) else None
+
+    async def _write(self, client: redis.Redis, writes: Dict[str, Optional[Tuple[bytes, int]]]) -> bool:
+        """Apply invalidations and bumps in one round trip; on failure keep them for replay"""
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for key, write in writes.items():
+                    if write is None:
+                        pipe.delete(key)
+                        pipe.set(generation_key(key), uuid.uuid4().hex, ex=settings.CACHE_GENERATION_TTL_SECONDS)
+                    else:
+                        pipe.set(key, write[0], ex=write[1])
+                await pipe.execute()
+        except (RedisError, OSError) as e:
+            # Writes queued since keep precedence over the ones being replayed
+            self._pending = {**writes, **self._pending}
+            self._redis_failed(e)
+            return False
+        return True
+
+    async def _write_through(self, writes: Dict[str, Optional[Tuple[bytes, int]]]) -> None:
+        # Ignores the backoff: a lost invalidation would serve stale data from every worker
+        writes = {**self._pending, **writes}
+        self._pending = {}
+        if writes and await self._write(self._client(force=True), writes):
+            self._redis_down_until = 0.0
+
+    async def _redis_get(self, key: str) -> Optional[bytes]:
+        client = await self._connected()
+        if client is None:
+            return None
+        try:
+            return await client.get(key)
+        except (RedisError, OSError) as e:
+            self._redis_failed(e)
+            return None
+
+    async def _redis_generation(self, key: str) -> Optional[str]:
+        """Generation token to store a load of `key` under; None if Redis can't be read"""
+        client = await self._connected()
+        if client is None:
+            return None
+        try:
+            return _generation(await client.get(generation_key(key)))
+        except (RedisError, OSError) as e:
+            self._redis_failed(e)
+            return None
+
+    async def _redis_mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        values = await self._redis_read_many(keys)
+        return values if values is not None else [None] * len(keys)
+
+    async def _redis_read_many(self, keys: List[str]) -> Optional[List[Optional[bytes]]]:
+        """MGET, or None when Redis couldn't be read"""
+        client = await self._connected()
+        if client is None or not keys:
+            return None
+        try:
+            return await client.mget(keys)
+        except (RedisError, OSError) as e:
+            self._redis_failed(e)
+            return None
+
+    async def _redis_set_many(self, values: Dict[str, Tuple[bytes, str]], ttl: int) -> Set[str]:
+        """
+        Store several (envelope, generation) pairs in one round trip; returns
+        the keys refused because they were invalidated since
+        """
+        client = await self._connected()
+        if client is None or not values:
+            return set()
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for key, (value, generation) in values.items():
+                    pipe.eval(STORE_SCRIPT, 2, key, generation_key(key), value, ttl, generation)
+                stored = await pipe.execute()
+        except (RedisError, OSError) as e:
+            self._redis_failed(e)
+            return set()
+        return {key for key, ok in zip(values, stored) if not ok}
+
+    async def _redis_set(self, key: str, value: bytes, ttl: int, generation: Optional[str] = None) -> bool:
+        """
+        Store an envelope, only under `generation` when given; False if the key
+        was invalidated since that generation was read
+        """
+        client = await self._connected()
+        if client is None:
+            return True
+        try:
+            if generation is None:
+                await client.set(key, value, ex=ttl)
+                return True
+            return bool(await client.eval(STORE_SCRIPT, 2, key, generation_key(key), value, ttl, generation))
+        except (RedisError, OSError) as e:
+            self._redis_failed(e)
+            return True
+
+    # L1 helpers ------------------------------------------------------------
+
+    def _l1_get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        entry = self._l1.get(key)
+        if entry is None:
+            return None
+        body, fresh_until, expires_at = entry
+        if time.time() >= expires_at:
+            del self._l1[key]
+            return None
+        self._l1.move_to_end(key)
+        return body, fresh_until
+
+    def _l1_set(self, key: str, body: bytes, fresh_until: float) -> None:
+        expires_at = min(fresh_until, time.time() + settings.CACHE_L1_TTL_SECONDS)
+        self._l1[key] = (body, fresh_until, expires_at)
+        self._l1.move_to_end(key)
+        while len(self._l1) > settings.CACHE_L1_MAX_ENTRIES:
+            self._l1.popitem(last=False)
+
+    # Public API ------------------------------------------------------------
+
+    async def get_or_load(self, key: str, loader: Loader, ttl: Optional[int] = None) -> Optional[bytes]:
+        """
+        Return the serialized JSON body for `key`, loading it on a miss.
+        Returns None (and caches nothing) when the loader returns None.
+        """
+        key = f"{settings.CACHE_KEY_PREFIX}{key}"
+        ttl = ttl or settings.CACHE_TTL_SECONDS
+
+        local = self._l1_get(key)
+        if local is not None:
+            body, fresh_until = local
+            if time.time() >= fresh_until:
+                self._refresh_in_background(key, loader, ttl)
+            return body
+
+        cached = await self._redis_get(key)
+        if cached is not None:
+            envelope = json.loads(cached)
+            body = envelope["body"].encode()
+            fresh_until = envelope["fresh_until"]
+            self._l1_set(key, body, fresh_until)
+            if time.time() >= fresh_until:
+                self._refresh_in_background(key, loader, ttl)
+            return body
+
+        return await self._load(key, loader, ttl)
+
+    async def get_many_or_load(
+        self,
+        keys: List[str],
+        loader: BatchLoader,
+        ttl: Optional[int] = None
+    ) -> Dict[str, bytes]:
+        """
+        Bodies for several keys: fresh hits come from L1, then a single Redis
+        MGET, and everything else from one `loader` call with the missing keys.
+        Stale entries count as misses so the batch load refreshes them. Keys the
+        loader has no value for are absent from the result.
+        """
+        ttl = ttl or settings.CACHE_TTL_SECONDS
+        now = time.time()
+        found: Dict[str, bytes] = {}
+
+        remote: List[str] = []
+        for key in keys:
+            local = self._l1_get(f"{settings.CACHE_KEY_PREFIX}{key}")
+            if local is not None and now < local[1]:
+                found[key] = local[0]
+            else:
+                remote.append(key)
+
+        missing: List[str] = []
+        remote_keys = [f"{settings.CACHE_KEY_PREFIX}{key}" for key in remote]
+        # Generations come with the values, read before the loader runs
+        cached = await self._redis_read_many(remote_keys + [generation_key(key) for key in remote_keys])
+        if cached is None:
+            cached = [None] * (2 * len(remote))
+            redis_generations: Dict[str, Optional[str]] = dict.fromkeys(remote)
+        else:
+            redis_generations = {key: _generation(value) for key, value in zip(remote, cached[len(remote):])}
+        for key, value in zip(remote, cached):
+            if value is not None:
+                envelope = json.loads(value)
+                if now < envelope["fresh_until"]:
+                    body = envelope["body"].encode()
+                    self._l1_set(f"{settings.CACHE_KEY_PREFIX}{key}", body, envelope["fresh_until"])
+                    found[key] = body
+                    continue
+            missing.append(key)
+
+        if not missing:
+            return found
+
+        generations = {key: self._generation.get(f"{settings.CACHE_KEY_PREFIX}{key}", 0) for key in missing}
+        started = time.monotonic()
+        values = await loader(missing)
+        fresh_until = time.time() + ttl
+        envelopes: Dict[str, Tuple[bytes, str]] = {}
+        bodies: Dict[str, bytes] = {}
+        for key in missing:
+            if values.get(key) is None:
+                continue
+            body = json.dumps(jsonable_encoder(values[key]), separators=(",", ":"))
+            found[key] = body.encode()
+            full_key = f"{settings.CACHE_KEY_PREFIX}{key}"
+            if self._generation.get(full_key, 0) != generations[key]:
+                # Invalidated while loading: serve this result but don't cache it
+                continue
+            bodies[full_key] = found[key]
+            if redis_generations[key] is not None:
+                envelope = json.dumps({"body": body, "fresh_until": fresh_until}).encode()
+                envelopes[full_key] = (envelope, redis_generations[key])
+        refused: Set[str] = set()
+        if time.monotonic() - started < settings.CACHE_GENERATION_TTL_SECONDS:
+            refused = await self._redis_set_many(envelopes, ttl + settings.CACHE_STALE_SECONDS)
+        for full_key, body in bodies.items():
+            if full_key not in refused:
+                self._l1_set(full_key, body, fresh_until)
+        return found
+
+    async def _load(self, key: str, loader: Loader, ttl: int) -> Optional[bytes]:
+        """Run the loader once per key, letting concurrent callers await the same result"""
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            body = await self._load_and_store(key, loader, ttl)
+            future.set_result(body)
+            return body
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an un-awaited future doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                # Loader was cancelled; release the waiters instead of leaving them hanging
+                future.cancel()
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _load_and_store(self, key: str, loader: Loader, ttl: int) -> Optional[bytes]:
+        generation = self._generation.get(key, 0)
+        redis_generation = await self._redis_generation(key)
+        started = time.monotonic()
+        value = await loader()
+        if value is None:
+            return None
+        body = json.dumps(jsonable_encoder(value), separators=(",", ":"))
+        if self._generation.get(key, 0) != generation:
+            # Invalidated while loading: serve this result but don't cache it
+            return body.encode()
+        return await self._store(key, body, ttl, started=started, generation=redis_generation)
+
+    async def _store(
+        self,
+        key: str,
+        body: str,
+        ttl: int,
+        local: bool = True,
+        started: Optional[float] = None,
+        generation: Optional[str] = None
+    ) -> bytes:
+        """
+        Cache a body in Redis and (with `local`) L1. A load that began at
+        `started` is stored only under the `generation` read before it began:
+        if the key was invalidated in any worker since, nothing is stored. It
+        isn't written to Redis when the generation couldn't be read, or when the
+        load outlasted the generation's lifetime, as the token may have expired.
+        """
+        fresh_until = time.time() + ttl
+        envelope = json.dumps({"body": body, "fresh_until": fresh_until}).encode()
+        stored = True
+        if started is None:
+            stored = await self._redis_set(key, envelope, ttl + settings.CACHE_STALE_SECONDS)
+        elif generation is not None and time.monotonic() - started < settings.CACHE_GENERATION_TTL_SECONDS:
+            stored = await self._redis_set(key, envelope, ttl + settings.CACHE_STALE_SECONDS, generation)
+        encoded = body.encode()
+        if local and stored:
+            self._l1_set(key, encoded, fresh_until)
+        return encoded
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Fresh cached body for `key` without loading, or None"""
+        key = f"{settings.CACHE_KEY_PREFIX}{key}"
+        local = self._l1_get(key)
+        if local is not None:
+            return local[0] if time.time() < local[1] else None
+        cached = await self._redis_get(key)
+        if cached is None:
+            return None
+        envelope = json.loads(cached)
+        if time.time() >= envelope["fresh_until"]:
+            return None
+        body = envelope["body"].encode()
+        self._l1_set(key, body, envelope["fresh_until"])
+        return body
+
+    async def get_shared(self, keys: List[str]) -> List[Optional[bytes]]:
+        """
+        Fresh bodies for several keys from Redis only (None where missing), for
+        entries that must look the same from every worker. Pair with set(local=False).
+        """
+        now = time.time()
+        bodies: List[Optional[bytes]] = []
+        for value in await self._redis_mget([f"{settings.CACHE_KEY_PREFIX}{key}" for key in keys]):
+            envelope = json.loads(value) if value is not None else None
+            bodies.append(envelope["body"].encode() if envelope and now < envelope["fresh_until"] else None)
+        return bodies
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None, local: bool = True) -> None:
+        """
+        Store a value computed outside a loader (e.g. as a by-product of another
+        query). With local=False it is only written to Redis, not the in-process L1.
+        """
+        body = json.dumps(jsonable_encoder(value), separators=(",", ":"))
+        await self._store(f"{settings.CACHE_KEY_PREFIX}{key}", body, ttl or settings.CACHE_TTL_SECONDS, local)
+
+    def _refresh_in_background(self, key: str, loader: Loader, ttl: int) -> None:
+        if key in self._inflight:
+            return
+
+        async def refresh():
+            try:
+                await self._load(key, loader, ttl)
+            except Exception as e:
+                logger.error(f"Catalog cache: background refresh of {key} failed: {e}")
+
+        task = asyncio.create_task(refresh())
+        self._refreshing.add(task)
+        task.add_done_callback(self._refreshing.discard)
+
+    async def invalidate(self, *keys: str) -> None:
+        """Drop keys from both cache levels"""
+        full_keys = [f"{settings.CACHE_KEY_PREFIX}{key}" for key in keys]
+        for key in full_keys:
+            self._l1.pop(key, None)
+            self._generation[key] = self._generation.get(key, 0) + 1
+            self._inflight.pop(key, None)
+        await self._write_through({key: None for key in full_keys})
+
+    async def bump(self, key: str, ttl: int) -> None:
+        """
+        Replace a shared version token (read with get_shared) by a new random
+        one. Like invalidate, it is sent even while Redis is backing off.
+        """
+        body = json.dumps(uuid.uuid4().hex)
+        envelope = json.dumps({"body": body, "fresh_until": time.time() + ttl}).encode()
+        await self._write_through({f"{settings.CACHE_KEY_PREFIX}{key}": (envelope, ttl)})
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+
+catalog_cache = CatalogCache()
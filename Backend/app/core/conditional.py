@@ -0,0 +1,82 @@
+from typing import Any, Optional
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+from fastapi import Request, Response
+
+# Clients may store responses but must revalidate them with the validators below
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag derived from the given parts (bytes are hashed as-is)"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\x00")
+    return f'W/"{digest.hexdigest()}"'
+
+
+def http_date(value: datetime) -> str:
+    """Format a datetime as an HTTP-date (Last-Modified)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" are equivalent for GET revalidation
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def is_not_modified(request: Request, etag: Optional[str], last_modified: Optional[datetime] = None) -> bool:
+    """
+    Evaluate If-None-Match / If-Modified-Since against the current validators.
+    If-Modified-Since is only consulted when no If-None-Match was sent (RFC 9110).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag is not None and _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        # HTTP-dates have one-second resolution
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def set_validators(response: Response, etag: Optional[str], last_modified: Optional[datetime] = None) -> None:
+    """Attach ETag / Last-Modified / Cache-Control to a response"""
+    if etag is not None:
+        response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(etag: Optional[str], last_modified: Optional[datetime] = None) -> Response:
+    """Empty 304 response carrying the validators"""
+    response = Response(status_code=304)
+    set_validators(response, etag, last_modified)
+    return response
+
+
+def conditional_json(request: Request, body: bytes, last_modified: Optional[datetime] = None) -> Response:
+    """Serve an already-serialized JSON body, or a 304 if the client's copy is current"""
+    etag = make_etag(body)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    response = Response(content=body, media_type="application/json")
+    set_validators(response, etag, last_modified)
+    return response
@@ -68,10 +68,81 @@ class Settings(BaseSettings):
     
     # Frontend URL
     FRONTEND_URL: str = "http://localhost:3000"
+    # Public backend URL, for absolute links in sitemaps and product feeds
+    BACKEND_URL: str = "http://localhost:8000"
     
     # Redis Configuration
     REDIS_URL: str = "redis://localhost:6379"
     
+    # Catalog cache (Redis L2 + in-process L1)
+    CACHE_KEY_PREFIX: str = "zorel:"
+    CACHE_TTL_SECONDS: int = 300
+    CACHE_STALE_SECONDS: int = 3600
+    CACHE_L1_TTL_SECONDS: int = 10
+    CACHE_L1_MAX_ENTRIES: int = 5000
+    CACHE_REDIS_TIMEOUT_SECONDS: float = 0.5
+    CACHE_REDIS_RETRY_SECONDS: int = 30
+    # Lifetime of the generation token an invalidation leaves on a key, which keeps a
+    # load in another worker that read the old row from storing it back; loads running
+    # longer than this aren't written to Redis
+    CACHE_GENERATION_TTL_SECONDS: int = 300
+    # Cache lifetime of the catalog version behind listing ETags (write hooks also invalidate it)
+    CATALOG_VERSION_TTL_SECONDS: int = 30
+    # Listing totals above this are served from a cached count instead of count(*) OVER ()
+    CATALOG_APPROX_COUNT_THRESHOLD: int = 10000
+    CATALOG_COUNT_TTL_SECONDS: int = 300
+    # Precomputed category landing pages (first N pages per category and sort, plus facets)
+    CATALOG_LANDING_PAGES: int = 3
+    CATALOG_LANDING_PAGE_SIZE: int = 20
+    CATALOG_LANDING_REFRESH_SECONDS: int = 600
+    CATALOG_LANDING_TTL_SECONDS: int = 900
+    
+    # Checkout pricing (one rule set for cart totals and orders)
+    PRICING_TAX_RATE: float = 0.08
+    PRICING_SHIPPING_COST: float = 9.99
+    PRICING_FREE_SHIPPING_THRESHOLD: float = 200.0  # Order value after discount
+    PRICING_QUOTE_TTL_SECONDS: int = 900
+
+    # Guest carts (kept in Redis until login, expiry slides on every use)
+    GUEST_CART_TTL_SECONDS: int = 604800
+    GUEST_CART_MAX_LINES: int = 50
+    
+    # Search
+    SUGGESTION_INDEX_REFRESH_SECONDS: int = 300
+    
+    # Sitemap and product feeds (generated shards are cached on disk)
+    FEED_DIR: str = "feeds"
+    FEED_REFRESH_SECONDS: int = 900
+    FEED_CURRENCY: str = "USD"
+    FEED_BRAND: str = "ZOREL LEATHER"
+    
+    # Visual similarity
+    SIMILARITY_INDEX_REFRESH_SECONDS: int = 600
+    SIMILARITY_BACKFILL_LIMIT: int = 200  # Images without a stored vector analysed per rebuild
+    
+    # Trending products
+    TRENDING_HALF_LIFE_HOURS: float = 72
+    TRENDING_REFRESH_SECONDS: int = 300
+    TRENDING_REVIEW_WEIGHT: float = 2.0
+    
+    # Frequently bought together
+    BOUGHT_TOGETHER_REFRESH_SECONDS: int = 900
+    BOUGHT_TOGETHER_TOP_N: int = 10
+    BOUGHT_TOGETHER_MIN_CO_ORDERS: int = 2
+    
+    # Personalized recommendations (implicit ALS, trained by scripts/train_recommendations.py)
+    RECOMMENDER_FACTORS: int = 32
+    RECOMMENDER_ITERATIONS: int = 15
+    RECOMMENDER_REGULARIZATION: float = 0.1
+    RECOMMENDER_ALPHA: float = 20.0
+    RECOMMENDER_TOP_N: int = 50
+    
+    # Search query log
+    SEARCH_LOG_FLUSH_SECONDS: int = 5
+    SEARCH_LOG_BATCH_SIZE: int = 500
+    SEARCH_LOG_BUFFER_SIZE: int = 10000
+    SEARCH_TOP_K_CAPACITY: int = 500
+    
     # Additional API Keys
     GOOGLE_MAPS_API_KEY: str = ""
     SENDGRID_API_KEY: str = ""
@@ -58,6 +58,11 @@ class BadRequestException(CustomHTTPException):
         super().__init__(status_code=400, detail=detail, error_code="BAD_REQUEST")
 
 
+class ServiceUnavailableException(CustomHTTPException):
+    def __init__(self, detail: str = "Service temporarily unavailable"):
+        super().__init__(status_code=503, detail=detail, error_code="SERVICE_UNAVAILABLE")
+
+
 class InternalServerException(CustomHTTPException):
     def __init__(self, detail: str = "Internal server error"):
         super().__init__(status_code=500, detail=detail, error_code="INTERNAL_SERVER_ERROR")
@@ -0,0 +1,67 @@
+from typing import Any, Dict, Optional, Tuple
+from datetime import datetime
+import base64
+import json
+import uuid
+from sqlalchemy import tuple_
+from sqlalchemy.sql.elements import ColumnElement
+from app.core.exceptions import ValidationException
+
+
+def _decode_sort_value(sort_by: str, value: Any) -> Any:
+    """A cursor's sort value, checked against the type of the sort key"""
+    if sort_by == "created_at":
+        if not isinstance(value, str):
+            raise TypeError("created_at cursor value must be an ISO timestamp")
+        return datetime.fromisoformat(value)
+    if sort_by in ("price", "rating"):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError(f"{sort_by} cursor value must be a number")
+        return float(value)
+    if not isinstance(value, str):
+        raise TypeError(f"{sort_by} cursor value must be a string")
+    return value
+
+
+def encode_cursor(sort_by: str, sort_order: str, sort_value: Any, row_id: Any) -> str:
+    """Encode the position after a row as an opaque, URL-safe cursor"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = {"s": sort_by, "o": sort_order, "k": sort_value, "id": str(row_id)}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str) -> Tuple[Any, uuid.UUID]:
+    """
+    Decode a cursor produced by encode_cursor. The cursor must have been issued
+    for the same sort, otherwise the keyset position would be meaningless.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload: Dict[str, Any] = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        sort_value = _decode_sort_value(sort_by, payload["k"])
+        row_id = uuid.UUID(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise ValidationException("Invalid pagination cursor")
+
+    if payload.get("s") != sort_by or payload.get("o") != sort_order:
+        raise ValidationException("Pagination cursor does not match the requested sort order")
+    return sort_value, row_id
+
+
+def keyset_condition(
+    sort_column: ColumnElement,
+    id_column: ColumnElement,
+    sort_order: str,
+    cursor_value: Any,
+    cursor_id: Optional[uuid.UUID]
+) -> ColumnElement:
+    """
+    Row-value comparison that seeks past the cursor. Matches an ORDER BY of
+    (sort_column, id_column) in the same direction, so a composite index on
+    those columns turns every page into a single index range scan.
+    """
+    if sort_order == "asc":
+        return tuple_(sort_column, id_column) > tuple_(cursor_value, cursor_id)
+    return tuple_(sort_column, id_column) < tuple_(cursor_value, cursor_id)
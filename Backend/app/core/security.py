@@ -54,6 +54,19 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
+def create_guest_cart_token(cart_id: str) -> str:
+    """Create a signed token naming a guest cart (it expires with the cart, not the token)"""
+    return jwt.encode({"guest_cart": cart_id}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def verify_guest_cart_token(token: Optional[str]) -> Optional[str]:
+    """Guest cart id of a cart token, or None if it's missing or not a valid cart token"""
+    payload = verify_token(token) if token else None
+    if payload is None:
+        return None
+    return payload.get("guest_cart")
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
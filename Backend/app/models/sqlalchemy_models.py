@@ -1,10 +1,11 @@
 from sqlalchemy import (
     Column, Integer, String, Boolean, DateTime, Text, 
-    Float, ForeignKey, Enum, JSON, ARRAY, UUID
+    Float, ForeignKey, Enum, JSON, UUID, Computed, Index, DDL, event,
+    LargeBinary
 )
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID as PostgresUUID
-from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import UUID as PostgresUUID, TSVECTOR, ARRAY
+from sqlalchemy.sql import func, text
 from app.core.postgresql import Base
 from enum import Enum as PyEnum
 import uuid
@@ -69,6 +70,27 @@ class User(Base):
     wishlist_items = relationship("Wishlist", back_populates="user")
     cart_items = relationship("Cart", back_populates="user")
 
+# Full-text search document for products: name is weighted A, category/subcategory/
+# brand/tags B and description C. Generated columns only accept immutable expressions,
+# so tags go through an IMMUTABLE wrapper around array_to_string.
+PRODUCT_TAGS_TO_TEXT_DDL = """
+CREATE OR REPLACE FUNCTION zorel_tags_to_text(text[]) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$ SELECT coalesce(array_to_string($1, ' '), '') $$
+"""
+
+PRODUCT_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(category, '') || ' ' || "
+    "coalesce(subcategory, '') || ' ' || coalesce(brand, '') || ' ' || "
+    "zorel_tags_to_text(tags::text[])), 'B') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'C')"
+)
+
+# Mean of approved review ratings, derived from the counters kept on the product row
+PRODUCT_RATING_AVERAGE_SQL = (
+    "CASE WHEN rating_count > 0 THEN rating_sum::float8 / rating_count ELSE 0 END"
+)
+
 # Product Model
 class Product(Base):
     __tablename__ = "products"
@@ -94,15 +116,87 @@ class Product(Base):
     tags = Column(ARRAY(String), default=list)  # Product tags
     seo_title = Column(String(255), nullable=True)
     seo_description = Column(Text, nullable=True)
+    search_vector = Column(TSVECTOR, Computed(PRODUCT_SEARCH_VECTOR_SQL, persisted=True))
+    # Approved-review aggregates, maintained by rating_service in the review's transaction
+    rating_count = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_sum = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_histogram = Column(ARRAY(Integer), default=lambda: [0] * 5, server_default="{0,0,0,0,0}", nullable=False)  # 1..5 stars
+    rating_average = Column(Float, Computed(PRODUCT_RATING_AVERAGE_SQL, persisted=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    __table_args__ = (
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+        # Trigram indexes for typo-tolerant (fuzzy) search
+        Index(
+            "ix_products_name_trgm", "name",
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}
+        ),
+        Index(
+            "ix_products_category_trgm", "category",
+            postgresql_using="gin", postgresql_ops={"category": "gin_trgm_ops"}
+        ),
+        # Keyset pagination for storefront listings: (sort key, id) per sort option,
+        # globally and within a category, over active products only
+        Index("ix_products_active_created_at_id", "created_at", "id", postgresql_where=text("is_active")),
+        Index("ix_products_active_price_id", "price", "id", postgresql_where=text("is_active")),
+        Index("ix_products_active_name_id", "name", "id", postgresql_where=text("is_active")),
+        Index(
+            "ix_products_active_category_created_at_id", "category", "created_at", "id",
+            postgresql_where=text("is_active")
+        ),
+        Index(
+            "ix_products_active_category_price_id", "category", "price", "id",
+            postgresql_where=text("is_active")
+        ),
+        Index(
+            "ix_products_active_category_name_id", "category", "name", "id",
+            postgresql_where=text("is_active")
+        ),
+        # Rating sort and min_rating range scans
+        Index("ix_products_active_rating_average_id", "rating_average", "id", postgresql_where=text("is_active")),
+        Index(
+            "ix_products_active_category_rating_average_id", "category", "rating_average", "id",
+            postgresql_where=text("is_active")
+        ),
+    )
+    
     # Relationships
     order_items = relationship("OrderItem", back_populates="product")
     reviews = relationship("Review", back_populates="product")
     wishlist_items = relationship("Wishlist", back_populates="product")
     cart_items = relationship("Cart", back_populates="product")
 
+event.listen(Product.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+event.listen(Product.__table__, "before_create", DDL(PRODUCT_TAGS_TO_TEXT_DDL))
+
+# Sellable size/color combination of a product with its own stock
+class ProductVariant(Base):
+    __tablename__ = "product_variants"
+    
+    id = Column(PostgresUUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    product_id = Column(PostgresUUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    size = Column(String(50), nullable=False, default="", server_default="")  # "" = not sized
+    color = Column(String(50), nullable=False, default="", server_default="")  # "" = single color
+    sku = Column(String(100), unique=True, nullable=True)
+    stock_quantity = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    __table_args__ = (
+        # One row per combination; also serves the per-product lookups
+        Index("ux_product_variants_product_size_color", "product_id", "size", "color", unique=True),
+        # size/color filters with in-stock only: index-only EXISTS probes
+        Index(
+            "ix_product_variants_in_stock_size_color", "size", "color", "product_id",
+            postgresql_where=text("stock_quantity > 0")
+        ),
+        Index(
+            "ix_product_variants_in_stock_color", "color", "product_id",
+            postgresql_where=text("stock_quantity > 0")
+        ),
+    )
+
 # Order Model
 class Order(Base):
     __tablename__ = "orders"
@@ -153,7 +247,7 @@ class OrderItem(Base):
     price = Column(Float, nullable=False)  # Price at time of order
     size = Column(String(50), nullable=True)
     color = Column(String(50), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     
     # Relationships
     order = relationship("Order", back_populates="order_items")
@@ -173,7 +267,7 @@ class Review(Base):
     is_verified_purchase = Column(Boolean, default=False, nullable=False)
     is_approved = Column(Boolean, default=True, nullable=False)
     helpful_count = Column(Integer, default=0, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
@@ -210,6 +304,14 @@ class Cart(Base):
     # Relationships
     user = relationship("User", back_populates="cart_items")
     product = relationship("Product", back_populates="cart_items")
+    
+    __table_args__ = (
+        # One line per product variant; size/color may be NULL, which a plain unique index wouldn't collapse
+        Index(
+            "ux_cart_user_product_size_color", "user_id", "product_id",
+            func.coalesce(size, text("''")), func.coalesce(color, text("''")), unique=True
+        ),
+    )
 
 # Invoice Model
 class Invoice(Base):
@@ -302,3 +404,95 @@ class Coupon(Base):
     valid_until = Column(DateTime, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+# Trending Score Model (maintained by trending_service)
+class ProductTrendingScore(Base):
+    __tablename__ = "product_trending_scores"
+    
+    product_id = Column(PostgresUUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    category = Column(String(100), nullable=False)  # Copied from the product for per-category top-N
+    score = Column(Float, nullable=False)  # Time-decayed order volume + review velocity
+    scored_at = Column(DateTime(timezone=True), nullable=False)  # Time the score is valued at
+    
+    __table_args__ = (
+        Index("ix_product_trending_scores_score", "score"),
+        Index("ix_product_trending_scores_category_score", "category", "score"),
+    )
+
+# Frequently-bought-together index (maintained by bought_together_service)
+class ProductOrderCount(Base):
+    __tablename__ = "product_order_counts"
+    
+    product_id = Column(PostgresUUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    orders = Column(Integer, nullable=False)  # Counted orders containing the product
+
+class ProductCoOccurrence(Base):
+    __tablename__ = "product_co_occurrences"
+    
+    # Stored in both directions so each product's pairs are one index range
+    product_id = Column(PostgresUUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    other_product_id = Column(PostgresUUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    orders = Column(Integer, nullable=False)  # Counted orders containing both
+
+class ProductBoughtTogether(Base):
+    __tablename__ = "product_bought_together"
+    
+    product_id = Column(PostgresUUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)  # 1 = strongest neighbor
+    neighbor_id = Column(PostgresUUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    co_orders = Column(Integer, nullable=False)
+    confidence = Column(Float, nullable=False)  # P(neighbor | product)
+    lift = Column(Float, nullable=False)  # confidence / P(neighbor)
+
+class CoOccurrenceState(Base):
+    __tablename__ = "co_occurrence_state"
+    
+    id = Column(Integer, primary_key=True)  # Single row
+    orders_counted = Column(Integer, nullable=False)
+    counted_until = Column(DateTime(timezone=True), nullable=False)  # Orders created up to here are counted
+
+# Personalized recommendations (written by the batch recommender)
+class UserRecommendation(Base):
+    __tablename__ = "user_recommendations"
+    
+    user_id = Column(PostgresUUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    product_ids = Column(ARRAY(PostgresUUID(as_uuid=True)), nullable=False)  # Best first
+    generated_at = Column(DateTime(timezone=True), nullable=False)
+
+# Account summary counters (maintained by user_counter_service)
+class UserCounters(Base):
+    __tablename__ = "user_counters"
+    
+    user_id = Column(PostgresUUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    order_count = Column(Integer, default=0, server_default="0", nullable=False)
+    lifetime_spend = Column(Float, default=0.0, server_default="0", nullable=False)  # Orders with payment completed
+    cart_quantity = Column(Integer, default=0, server_default="0", nullable=False)
+    wishlist_count = Column(Integer, default=0, server_default="0", nullable=False)
+    unread_notifications = Column(Integer, default=0, server_default="0", nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Catalog version behind listing ETags (bumped by catalog_service write hooks)
+class CatalogVersion(Base):
+    __tablename__ = "catalog_version"
+    
+    id = Column(Integer, primary_key=True)  # Single row
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+# Visual descriptor per uploaded image (see image_features)
+class ImageFeature(Base):
+    __tablename__ = "image_features"
+    
+    path = Column(String(500), primary_key=True)  # As stored in Product.images
+    version = Column(Integer, nullable=False)  # FEATURE_VERSION used to compute it
+    vector = Column(LargeBinary, nullable=False)  # float32 bytes
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# Search Query Log Model (written in batches by search_log)
+class SearchQuery(Base):
+    __tablename__ = "search_queries"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    query = Column(String(255), nullable=False)  # Normalized (lowercased, single-spaced)
+    result_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional, Literal
 from datetime import datetime
 import uuid
 
@@ -37,14 +37,62 @@ class CartResponse(BaseModel):
     items: List[CartItemResponse]
     total_items: int
     subtotal: float
+    discount: float = 0.0
     shipping_cost: float
     tax: float
     total: float
+    coupon_code: Optional[str] = None
+    coupon_error: Optional[str] = None
+    quote_version: Optional[str] = None  # Pass to checkout to reject totals that changed since
     created_at: datetime
     updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+class GuestCartItemResponse(BaseModel):
+    id: str
+    product_id: str
+    product_name: str
+    product_image: str
+    product_price: float
+    quantity: int
+    size: Optional[str] = None
+    color: Optional[str] = None
+    subtotal: float
+
+class GuestCartResponse(BaseModel):
+    cart_token: str  # Send back as X-Cart-Token, and to login/register to keep the cart
+    items: List[GuestCartItemResponse]
+    total_items: int
+    subtotal: float
+    discount: float = 0.0
+    shipping_cost: float
+    tax: float
+    total: float
+    coupon_code: Optional[str] = None
+    coupon_error: Optional[str] = None
+
+class CartBatchOperation(BaseModel):
+    op: Literal["add", "update", "remove"]
+    product_id: Optional[str] = None  # add
+    cart_item_id: Optional[str] = None  # update, remove
+    quantity: Optional[int] = Field(None, ge=1)  # add, update
+    size: Optional[str] = None
+    color: Optional[str] = None
+
+    @model_validator(mode='after')
+    def validate_fields(self):
+        if self.op == "add" and not self.product_id:
+            raise ValueError('product_id is required to add an item')
+        if self.op != "add" and not self.cart_item_id:
+            raise ValueError(f'cart_item_id is required to {self.op} an item')
+        if self.op != "remove" and self.quantity is None:
+            raise ValueError(f'quantity is required to {self.op} an item')
+        return self
+
+class CartBatchRequest(BaseModel):
+    operations: List[CartBatchOperation] = Field(..., min_length=1, max_length=100)
+
 class CartCountResponse(BaseModel):
     count: int
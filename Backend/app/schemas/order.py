@@ -12,7 +12,9 @@ class OrderItemBase(BaseModel):
 
 
 class OrderItemCreate(OrderItemBase):
-    pass
+    price: Optional[float] = None  # Ignored: items are priced from the catalog
+    size: Optional[str] = None
+    color: Optional[str] = None
 
 
 class OrderItemResponse(OrderItemBase):
@@ -31,7 +33,8 @@ class OrderBase(BaseModel):
 
 
 class OrderCreate(OrderBase):
-    shipping_cost: float = Field(default=0.0, ge=0)
+    shipping_cost: float = Field(default=0.0, ge=0)  # Ignored: shipping is computed by the pricing rules
+    coupon_code: Optional[str] = None
 
 
 class OrderUpdate(BaseModel):
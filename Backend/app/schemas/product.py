@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator, model_validator
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Union, Literal
 from datetime import datetime
 import uuid
 import re
@@ -107,6 +107,8 @@ class ProductUpdate(BaseModel):
 class ProductResponse(ProductBase):
     id: Union[str, uuid.UUID]
     is_active: bool
+    rating_average: float = Field(default=0, description="Mean approved review rating")
+    rating_count: int = Field(default=0, description="Number of approved reviews")
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -122,7 +124,71 @@ class ProductResponse(ProductBase):
 
 class ProductListResponse(BaseModel):
     products: List[ProductResponse]
-    total: int
+    total: Optional[int] = Field(None, description="Omitted for cursor pages")
     page: int
     limit: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = Field(None, description="Pass as `after` to fetch the next page")
+    facets: Optional[Dict[str, Any]] = Field(None, description="Facet counts when include_facets=true")
+    suggestions: List[str] = Field(default=[], description="Did-you-mean terms when a search finds nothing")
+
+class ProductVariantBase(BaseModel):
+    size: str = Field(default="", max_length=50, description='Size, or "" when the product is not sized')
+    color: str = Field(default="", max_length=50, description='Color, or "" for a single-color product')
+    sku: Optional[str] = Field(None, max_length=100, description="Variant stock keeping unit")
+    stock_quantity: int = Field(default=0, ge=0, description="Units in stock for this variant")
+
+    @field_validator('size', 'color')
+    @classmethod
+    def strip_option(cls, v):
+        return v.strip()
+
+class ProductVariantResponse(ProductVariantBase):
+    id: Union[str, uuid.UUID]
+    product_id: Union[str, uuid.UUID]
+
+    @field_validator('id', 'product_id', mode='before')
+    @classmethod
+    def convert_uuid_to_str(cls, v):
+        if isinstance(v, uuid.UUID):
+            return str(v)
+        return v
+
+    class Config:
+        from_attributes = True
+
+class ProductVariantsUpdate(BaseModel):
+    variants: List[ProductVariantBase] = Field(..., description="The complete set of variants; missing ones are removed")
+
+class ProductBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, description="Product ids and/or slugs, in the order to return them")
+
+class ProductBatchResponse(BaseModel):
+    products: List[ProductResponse]
+    missing: List[str] = Field(default=[], description="Requested ids/slugs with no active product")
+
+class ProductFilters(BaseModel):
+    """Catalog filter set shared by the listing and search endpoints (compiled by catalog_query)"""
+    category: Optional[str] = None
+    category_contains: bool = Field(default=False, description="Match category with ILIKE instead of equality")
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    tags: List[str] = Field(default=[], description="Match products with any of these tags")
+    is_featured: Optional[bool] = None
+    is_new: Optional[bool] = None
+    is_on_sale: Optional[bool] = None
+    min_rating: Optional[float] = None
+    search: Optional[str] = None
+    search_mode: Literal["substring", "fulltext", "fuzzy"] = "substring"
+    sizes: List[str] = Field(default=[], description="Match products with a variant in any of these sizes")
+    colors: List[str] = Field(default=[], description="Match products with a variant in any of these colors")
+    in_stock: bool = Field(default=False, description="Only products (or matching variants) with stock")
+
+    @field_validator('tags', 'sizes', 'colors', mode='before')
+    @classmethod
+    def split_tags(cls, v):
+        if v is None:
+            return []
+        if isinstance(v, str):
+            return [tag.strip() for tag in v.split(",") if tag.strip()]
+        return v
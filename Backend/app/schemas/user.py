@@ -71,3 +71,10 @@ class Token(BaseModel):
 class PasswordChange(BaseModel):
     current_password: str
     new_password: str = Field(..., min_length=8, max_length=100)
+
+class AccountSummaryResponse(BaseModel):
+    order_count: int
+    lifetime_spend: float  # Orders with payment completed
+    cart_quantity: int
+    wishlist_count: int
+    unread_notifications: int
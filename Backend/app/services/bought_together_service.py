@@ -0,0 +1,216 @@
+from typing import Any, List, Optional, Sequence, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import logging
+from sqlalchemy import select, delete, func, desc, Float, cast, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.postgresql import AsyncSessionLocal
+from app.models.sqlalchemy_models import (
+    Product, Order, OrderItem, ProductOrderCount, ProductCoOccurrence,
+    ProductBoughtTogether, CoOccurrenceState
+)
+from app.services.trending_service import EXCLUDED_ORDER_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# pg_try_advisory_xact_lock key, so only one worker counts each window
+BOUGHT_TOGETHER_LOCK_ID = 720_002
+# Orders committed slightly after their created_at must still land in a later window
+INGEST_LAG = timedelta(minutes=1)
+STATE_ID = 1
+
+
+def _among(column, product_ids: Sequence[Any]):
+    """`column = ANY(:anchor_ids)` as one array bind"""
+    return column == any_(bindparam("anchor_ids", list(product_ids), type_=ARRAY(column.type)))
+
+
+class BoughtTogetherService:
+    """
+    "Frequently bought together" from order baskets.
+
+    Each refresh counts only orders created since the previous one: per-product
+    order counts and per-pair co-occurrence counts are accumulated with
+    set-based GROUP BYs over the new baskets. The top-N neighbors (by lift,
+    with a minimum co-order support) of the products whose pair counts changed
+    are then re-ranked into product_bought_together, so reads are a single
+    primary-key range scan and a refresh costs what the new orders touched.
+    """
+
+    def window_baskets(self, since: Optional[datetime], as_of: datetime):
+        """Distinct (order, product) pairs for orders created in (since, as_of]"""
+        # Items are inserted with their order, so they share its transaction timestamp
+        # and a window boundary never splits a basket
+        query = (
+            select(OrderItem.order_id, OrderItem.product_id)
+            .join(Order, OrderItem.order_id == Order.id)
+            .where(OrderItem.created_at <= as_of, Order.status.notin_(EXCLUDED_ORDER_STATUSES))
+            .distinct()
+        )
+        if since is not None:
+            query = query.where(OrderItem.created_at > since)
+        return query.cte("baskets")
+
+    def pair_counts_query(self, baskets):
+        """Co-occurrence count of every ordered product pair within the baskets"""
+        other = baskets.alias("other_baskets")
+        return (
+            select(baskets.c.product_id, other.c.product_id.label("other_product_id"), func.count().label("orders"))
+            .join(other, (other.c.order_id == baskets.c.order_id) & (other.c.product_id != baskets.c.product_id))
+            .group_by(baskets.c.product_id, other.c.product_id)
+        )
+
+    def ranking_query(self, total_orders: int, product_ids: Optional[Sequence[Any]] = None):
+        """Top-N neighbors per product with confidence and lift, for `product_ids` if given"""
+        pair = ProductCoOccurrence
+        product_counts = aliased(ProductOrderCount)
+        other_counts = aliased(ProductOrderCount)
+        confidence = cast(pair.orders, Float) / cast(product_counts.orders, Float)
+        lift = confidence * total_orders / cast(other_counts.orders, Float)
+        ranked = (
+            select(
+                pair.product_id,
+                pair.other_product_id.label("neighbor_id"),
+                pair.orders.label("co_orders"),
+                confidence.label("confidence"),
+                lift.label("lift"),
+                func.row_number().over(
+                    partition_by=pair.product_id,
+                    order_by=(desc(lift), desc(pair.orders), pair.other_product_id)
+                ).label("rank")
+            )
+            .join(product_counts, product_counts.product_id == pair.product_id)
+            .join(other_counts, other_counts.product_id == pair.other_product_id)
+            .join(Product, Product.id == pair.other_product_id)
+            .where(Product.is_active == True, pair.orders >= settings.BOUGHT_TOGETHER_MIN_CO_ORDERS)
+        )
+        if product_ids is not None:
+            ranked = ranked.where(_among(pair.product_id, product_ids))
+        ranked = ranked.subquery("ranked")
+        return (
+            select(
+                ranked.c.product_id, ranked.c.rank, ranked.c.neighbor_id,
+                ranked.c.co_orders, ranked.c.confidence, ranked.c.lift
+            )
+            .where(ranked.c.rank <= settings.BOUGHT_TOGETHER_TOP_N)
+        )
+
+    async def refresh(self, db: AsyncSession) -> bool:
+        """
+        Count orders created since the last refresh and re-rank neighbors, in
+        one transaction. Returns False if another worker holds the lock.
+        """
+        locked = await db.execute(select(func.pg_try_advisory_xact_lock(BOUGHT_TOGETHER_LOCK_ID)))
+        if not locked.scalar():
+            await db.rollback()
+            return False
+
+        now = (await db.execute(select(func.now()))).scalar()
+        as_of = now - INGEST_LAG
+        state = await db.get(CoOccurrenceState, STATE_ID)
+        since = state.counted_until if state is not None else None
+        if since is not None and since >= as_of:
+            await db.rollback()
+            return True
+
+        baskets = self.window_baskets(since, as_of)
+        new_orders = (await db.execute(select(func.count(func.distinct(baskets.c.order_id))))).scalar()
+        total_orders = (state.orders_counted if state is not None else 0) + new_orders
+
+        if new_orders:
+            counts = insert(ProductOrderCount).from_select(
+                ["product_id", "orders"],
+                select(baskets.c.product_id, func.count()).group_by(baskets.c.product_id)
+            )
+            await db.execute(counts.on_conflict_do_update(
+                index_elements=[ProductOrderCount.product_id],
+                set_={"orders": ProductOrderCount.orders + counts.excluded.orders}
+            ))
+            pairs = insert(ProductCoOccurrence).from_select(
+                ["product_id", "other_product_id", "orders"], self.pair_counts_query(baskets)
+            )
+            changed = await db.execute(pairs.on_conflict_do_update(
+                index_elements=[ProductCoOccurrence.product_id, ProductCoOccurrence.other_product_id],
+                set_={"orders": ProductCoOccurrence.orders + pairs.excluded.orders}
+            ).returning(ProductCoOccurrence.product_id))
+            anchors = list(set(changed.scalars().all()))
+            # Only anchors with new pairs are re-ranked, so the cost follows the
+            # new orders. The total order count scales all of an anchor's lifts
+            # alike, so it never reorders the others; they keep their lifts and
+            # neighbor order counts from their last re-rank until they get new pairs.
+            if anchors:
+                await db.execute(
+                    delete(ProductBoughtTogether)
+                    .where(_among(ProductBoughtTogether.product_id, anchors))
+                    .execution_options(synchronize_session=False)
+                )
+                await db.execute(
+                    insert(ProductBoughtTogether).from_select(
+                        ["product_id", "rank", "neighbor_id", "co_orders", "confidence", "lift"],
+                        self.ranking_query(total_orders, anchors)
+                    )
+                )
+
+        stmt = insert(CoOccurrenceState).values(id=STATE_ID, orders_counted=total_orders, counted_until=as_of)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[CoOccurrenceState.id],
+            set_={"orders_counted": stmt.excluded.orders_counted, "counted_until": stmt.excluded.counted_until}
+        ))
+        await db.commit()
+        return True
+
+    async def for_product(self, db: AsyncSession, product_id: Any, limit: int) -> List[Tuple[Product, float]]:
+        """Active products most often bought with one product, strongest first"""
+        result = await db.execute(
+            select(Product, ProductBoughtTogether.lift)
+            .join(ProductBoughtTogether, ProductBoughtTogether.neighbor_id == Product.id)
+            .where(ProductBoughtTogether.product_id == product_id, Product.is_active == True)
+            .order_by(ProductBoughtTogether.rank)
+            .limit(limit)
+        )
+        return [(product, lift) for product, lift in result.all()]
+
+    def for_products_query(self, product_ids: Sequence[Any], limit: int):
+        """Neighbors of a set of products (e.g. a cart), excluding the set itself"""
+        strength = func.max(ProductBoughtTogether.lift)
+        return (
+            select(Product, strength.label("lift"))
+            .join(ProductBoughtTogether, ProductBoughtTogether.neighbor_id == Product.id)
+            .where(
+                ProductBoughtTogether.product_id.in_(product_ids),
+                ProductBoughtTogether.neighbor_id.notin_(product_ids),
+                Product.is_active == True
+            )
+            .group_by(Product.id)
+            .order_by(desc(strength), Product.id)
+            .limit(limit)
+        )
+
+    async def for_products(self, db: AsyncSession, product_ids: Sequence[Any], limit: int) -> List[Tuple[Product, float]]:
+        """Products most often bought with any of `product_ids`"""
+        if not product_ids:
+            return []
+        result = await db.execute(self.for_products_query(product_ids, limit))
+        return [(product, lift) for product, lift in result.all()]
+
+
+bought_together_service = BoughtTogetherService()
+
+
+async def refresh_bought_together() -> None:
+    """Run one co-occurrence refresh in its own session, logging failures"""
+    try:
+        async with AsyncSessionLocal() as db:
+            await bought_together_service.refresh(db)
+    except Exception as e:
+        logger.error(f"Failed to refresh bought-together index: {e}")
+
+
+async def refresh_bought_together_periodically() -> None:
+    """Background task that folds new orders into the bought-together index"""
+    while True:
+        await refresh_bought_together()
+        await asyncio.sleep(settings.BOUGHT_TOGETHER_REFRESH_SECONDS)
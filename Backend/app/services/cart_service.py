@@ -0,0 +1,310 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+import logging
+import uuid
+from sqlalchemy import select, any_, bindparam, func, literal, literal_column
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.exceptions import BadRequestException, NotFoundException
+from app.models.sqlalchemy_models import Cart, Product
+from app.schemas.cart import CartBatchOperation
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_id(value: str, index: int, what: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise NotFoundException(f"Operation {index}: {what} not found")
+
+
+def check_stock(product: Product, quantity: int, index: Optional[int] = None) -> None:
+    """Reject a line quantity above the product's stock (a stock of 0 is not tracked)"""
+    if product.stock_quantity and quantity > product.stock_quantity:
+        prefix = f"Operation {index}: " if index is not None else ""
+        raise BadRequestException(f"{prefix}Only {product.stock_quantity} items available in stock")
+
+
+# Conflict target of ux_cart_user_product_size_color. The empty strings are
+# inlined: a bind parameter would keep Postgres from inferring the index.
+CART_LINE_KEY = [
+    Cart.user_id,
+    Cart.product_id,
+    func.coalesce(Cart.size, literal_column("''")),
+    func.coalesce(Cart.color, literal_column("''")),
+]
+
+
+def line_key(row_or_product_id: Any, size: Optional[str] = None, color: Optional[str] = None) -> Tuple[Any, str, str]:
+    """A cart row's identity as the unique index sees it (NULL size/color == '')"""
+    if isinstance(row_or_product_id, Cart):
+        row = row_or_product_id
+        return row.product_id, row.size or "", row.color or ""
+    return row_or_product_id, size or "", color or ""
+
+
+def _within_stock(quantity, stock) -> Any:
+    # A stock of 0 is not tracked, as in check_stock
+    return quantity <= func.coalesce(func.nullif(stock, 0), quantity)
+
+
+class CartService:
+    """Cart writes: atomic single-line adds and batches touching several lines"""
+
+    def add_statement(
+        self,
+        user_id: Any,
+        product_id: uuid.UUID,
+        quantity: int,
+        size: Optional[str],
+        color: Optional[str]
+    ):
+        """
+        Add `quantity` of a product variant to a cart in one statement: insert
+        the line, or on conflict with the existing line add to its quantity.
+        Both branches only write if the product is active and the resulting
+        quantity is in stock. Returns the line joined with the product's name,
+        images and price, or nothing when a check failed.
+        """
+        line = select(
+            literal(uuid.uuid4(), Cart.id.type),
+            literal(user_id, Cart.user_id.type),
+            Product.id,
+            literal(quantity),
+            literal(size, Cart.size.type),
+            literal(color, Cart.color.type),
+        ).where(
+            Product.id == product_id,
+            Product.is_active == True,
+            _within_stock(literal(quantity), Product.stock_quantity)
+        )
+        statement = insert(Cart).from_select(["id", "user_id", "product_id", "quantity", "size", "color"], line)
+        stock = select(Product.stock_quantity).where(Product.id == product_id).scalar_subquery()
+        upserted = statement.on_conflict_do_update(
+            index_elements=CART_LINE_KEY,
+            set_={"quantity": Cart.quantity + statement.excluded.quantity, "updated_at": func.now()},
+            where=_within_stock(Cart.quantity + statement.excluded.quantity, stock)
+        ).returning(Cart).cte("upserted")
+        return (
+            select(upserted, Product.name, Product.images, Product.price)
+            .join(Product, Product.id == upserted.c.product_id)
+        )
+
+    async def add_item(
+        self,
+        db: AsyncSession,
+        user_id: Any,
+        product_id: uuid.UUID,
+        quantity: int,
+        size: Optional[str] = None,
+        color: Optional[str] = None
+    ) -> Any:
+        """
+        Add to a cart line atomically (safe under double submits and parallel
+        tabs). Returns the line row with product fields; raises when the product
+        is unavailable or the stock doesn't cover the new quantity. The caller commits.
+        """
+        result = await db.execute(self.add_statement(user_id, product_id, quantity, size, color))
+        row = result.first()
+        if row is not None:
+            return row
+
+        # Nothing written: find out which check failed
+        product = (await db.execute(
+            select(Product).where(Product.id == product_id, Product.is_active == True)
+        )).scalar_one_or_none()
+        if product is None:
+            raise NotFoundException("Product not found")
+        raise BadRequestException(f"Only {product.stock_quantity} items available in stock")
+
+    def merge_statement(self, user_id: Any, lines: List[Dict[str, Any]]):
+        """
+        One multi-row upsert adding `lines` (product_id, quantity, size, color,
+        each a distinct line key) to a user's cart. A line already in the cart
+        gets the quantities added, capped at the product's stock but never below
+        what the cart already held. Selects the change in the cart's total
+        quantity: `existing` reads the cart as it was before the upsert, since
+        all parts of the statement share one snapshot.
+        """
+        statement = insert(Cart).values([
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "product_id": line["product_id"],
+                "quantity": line["quantity"],
+                "size": line["size"],
+                "color": line["color"],
+            }
+            for line in lines
+        ])
+        merged = Cart.quantity + statement.excluded.quantity
+        # Spelled out: SQLAlchemy won't correlate a subquery in ON CONFLICT with the inserted row
+        stock = select(Product.stock_quantity).where(Product.id == literal_column("excluded.product_id")).scalar_subquery()
+        upserted = statement.on_conflict_do_update(
+            index_elements=CART_LINE_KEY,
+            set_={
+                "quantity": func.least(merged, func.greatest(Cart.quantity, func.coalesce(func.nullif(stock, 0), merged))),
+                "updated_at": func.now()
+            }
+        ).returning(Cart.id, Cart.quantity).cte("upserted")
+        existing = select(Cart.id, Cart.quantity).where(Cart.user_id == user_id).cte("existing")
+        return (
+            select(func.coalesce(func.sum(upserted.c.quantity - func.coalesce(existing.c.quantity, 0)), 0))
+            .select_from(upserted.outerjoin(existing, existing.c.id == upserted.c.id))
+        )
+
+    async def merge_lines(self, db: AsyncSession, user_id: Any, lines: List[Dict[str, Any]]) -> int:
+        """
+        Merge lines kept outside the database (a guest cart) into a user's cart
+        with one product query and one upsert. Lines for unavailable products are
+        dropped and quantities are capped at stock. Returns the change in the
+        cart's total quantity. The caller commits.
+        """
+        if not lines:
+            return 0
+        result = await db.execute(self.products_query(list({line["product_id"] for line in lines})))
+        products = {product.id: product for product in result.scalars().all() if product.is_active}
+
+        merged = []
+        for line in lines:
+            product = products.get(line["product_id"])
+            if product is None:
+                continue
+            quantity = min(line["quantity"], product.stock_quantity) if product.stock_quantity else line["quantity"]
+            merged.append({**line, "quantity": quantity})
+        if not merged:
+            return 0
+        result = await db.execute(self.merge_statement(user_id, merged))
+        return result.scalar_one()
+
+    def products_query(self, product_ids: List[uuid.UUID]):
+        """Products by id as one `= ANY(:param)` array bind"""
+        return select(Product).where(
+            Product.id == any_(bindparam("product_ids", product_ids, type_=ARRAY(Product.id.type)))
+        )
+
+    async def apply_batch(self, db: AsyncSession, user_id: Any, operations: List[CartBatchOperation]) -> int:
+        """
+        Apply add/update/remove operations to a user's cart, in order, with one
+        cart query and one product query. Stock is checked for every line an
+        operation leaves behind; if any operation fails nothing is written.
+        Returns the change in the cart's total quantity, measured against the
+        rows as locked here so a concurrent write can't skew it. The caller commits.
+        """
+        result = await db.execute(select(Cart).where(Cart.user_id == user_id).with_for_update())
+        rows: Dict[uuid.UUID, Cart] = {row.id: row for row in result.scalars().all()}
+        quantity_before = sum(row.quantity for row in rows.values())
+
+        # Resolve every referenced product first so they load in one query
+        product_ids = set()
+        for index, operation in enumerate(operations):
+            if operation.op == "add":
+                product_ids.add(_parse_id(operation.product_id, index, "Product"))
+            else:
+                row = rows.get(_parse_id(operation.cart_item_id, index, "Cart item"))
+                if row is not None:
+                    product_ids.add(row.product_id)
+        result = await db.execute(self.products_query(list(product_ids)))
+        products = {product.id: product for product in result.scalars().all() if product.is_active}
+
+        lines: Dict[Tuple[Any, str, str], Cart] = {line_key(row): row for row in rows.values()}
+        # Rows loaded from the database and deleted by this batch, by their stored key
+        removed: Dict[Tuple[Any, str, str], Cart] = {}
+        stored_keys = {row_id: line_key(row) for row_id, row in rows.items()}
+        added: List[Cart] = []
+        now = datetime.utcnow()
+
+        def take_line(key: Tuple[Any, str, str]) -> Optional[Cart]:
+            # A deleted row is revived rather than inserting its key again, since
+            # the flush inserts before it deletes and the two would collide
+            row = lines.get(key)
+            if row is None and key in removed:
+                row = lines[key] = removed.pop(key)
+                row.quantity = 0
+                row.size, row.color = key[1] or None, key[2] or None
+                rows[row.id] = row
+            return row
+
+        def drop(row: Cart) -> None:
+            lines.pop(line_key(row), None)
+            rows.pop(row.id, None)
+            if row in added:
+                added.remove(row)
+            else:
+                removed[stored_keys[row.id]] = row
+
+        for index, operation in enumerate(operations):
+            if operation.op == "add":
+                product = products.get(uuid.UUID(operation.product_id))
+                if product is None:
+                    raise NotFoundException(f"Operation {index}: Product not found")
+                key = line_key(product.id, operation.size, operation.color)
+                row = take_line(key)
+                if row is None:
+                    row = lines[key] = Cart(
+                        id=uuid.uuid4(),
+                        user_id=user_id,
+                        product_id=product.id,
+                        quantity=0,
+                        size=operation.size,
+                        color=operation.color
+                    )
+                    rows[row.id] = row
+                    added.append(row)
+                row.quantity += operation.quantity
+                row.updated_at = now
+                check_stock(product, row.quantity, index)
+                continue
+
+            row = rows.get(uuid.UUID(operation.cart_item_id))
+            if row is None:
+                raise NotFoundException(f"Operation {index}: Cart item not found")
+            if operation.op == "remove":
+                drop(row)
+                continue
+
+            product = products.get(row.product_id)
+            if product is None:
+                raise BadRequestException(f"Operation {index}: Product is not available")
+            key = line_key(row.product_id, operation.size, operation.color)
+            if key != line_key(row):
+                other = take_line(key)
+                if other is not None:
+                    # Moved onto the size/color of another line: merge into it
+                    drop(row)
+                    other.quantity += operation.quantity
+                    other.updated_at = now
+                    check_stock(product, other.quantity, index)
+                    continue
+                lines.pop(line_key(row), None)
+                lines[key] = row
+            row.quantity = operation.quantity
+            row.size = operation.size
+            row.color = operation.color
+            row.updated_at = now
+            check_stock(product, row.quantity, index)
+
+        # The flush updates rows in primary-key order, not operation order, so a
+        # line moving onto the key another line is leaving could be written
+        # first and hit the unique index. Park the moved lines on keys of their
+        # own and flush before moving them into place. (Updates are flushed
+        # before inserts, so new lines on a vacated key are already safe.)
+        moved = [row for row in rows.values() if row not in added and line_key(row) != stored_keys[row.id]]
+        vacated = {stored_keys[row.id] for row in moved}
+        if any(line_key(row) in vacated for row in moved):
+            targets = [(row, row.size, row.color) for row in moved]
+            for row in moved:
+                row.size, row.color = f"~{row.id.hex}", None
+            await db.flush()
+            for row, size, color in targets:
+                row.size, row.color = size, color
+
+        db.add_all(added)
+        for row in removed.values():
+            await db.delete(row)
+        await db.flush()
+        return sum(row.quantity for row in rows.values()) - quantity_before
+
+
+cart_service = CartService()
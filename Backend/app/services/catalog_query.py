@@ -0,0 +1,214 @@
+from typing import Any, List, Optional, Sequence, Tuple
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
+import logging
+from sqlalchemy import select, and_, or_, desc, asc, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+from app.core.cache import catalog_cache
+from app.core.config import settings
+from app.core.exceptions import ValidationException
+from app.core.pagination import decode_cursor, encode_cursor, keyset_condition
+from app.models.sqlalchemy_models import Product
+from app.schemas.product import ProductFilters
+from app.services.search_service import search_service
+from app.services.product_projection import projection_columns
+from app.services.variant_service import variant_service
+
+logger = logging.getLogger(__name__)
+
+SORT_COLUMNS = {
+    "created_at": Product.created_at,
+    "price": Product.price,
+    "name": Product.name,
+    "rating": Product.rating_average,
+}
+# Products created within this many days count as new
+NEW_PRODUCT_DAYS = 30
+TOTAL_LABEL = "catalog_total"
+
+# (rows, total, has_more); rows are Product objects, or Row objects for a projection
+CatalogPage = Tuple[List[Any], Optional[int], bool]
+
+
+def next_cursor(rows: List[Any], sort_by: str, sort_order: str) -> Optional[str]:
+    """Cursor pointing after the last row of a page"""
+    if not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor(sort_by, sort_order, getattr(last, SORT_COLUMNS[sort_by].key), last.id)
+
+
+class CatalogQuery:
+    """
+    Compiles a ProductFilters set into SQL once and runs the listing queries
+    built from it. Offset pages fetch the rows and `count(*) OVER ()` in one
+    statement; when a filter set is known to match more than
+    CATALOG_APPROX_COUNT_THRESHOLD products its cached count is reused and the
+    window is skipped, so large listings stay a plain index-ordered LIMIT.
+    """
+
+    def __init__(self, filters: ProductFilters):
+        self.filters = filters
+        # Relevance expression when the filters include a text search
+        self.rank: Optional[ColumnElement] = None
+        self.conditions = self._compile()
+
+    def _compile(self) -> List[ColumnElement]:
+        f = self.filters
+        conditions: List[ColumnElement] = [Product.is_active == True]
+
+        if f.search:
+            if f.search_mode == "fulltext":
+                # Full-text search against the GIN-indexed search_vector column
+                tsquery = search_service.tsquery(f.search)
+                if tsquery is None:
+                    raise ValidationException("Search query must contain at least one word")
+                conditions.append(search_service.match(tsquery))
+                self.rank = search_service.rank(tsquery)
+            elif f.search_mode == "fuzzy":
+                # Trigram similarity on name/category, served by the gin_trgm_ops indexes
+                conditions.append(search_service.fuzzy_match(f.search))
+                self.rank = search_service.fuzzy_rank(f.search)
+            else:
+                conditions.append(or_(
+                    Product.name.ilike(f"%{f.search}%"),
+                    Product.description.ilike(f"%{f.search}%"),
+                    Product.category.ilike(f"%{f.search}%"),
+                    Product.tags.overlap([f.search])
+                ))
+
+        if f.category:
+            if f.category_contains:
+                conditions.append(Product.category.ilike(f"%{f.category}%"))
+            else:
+                conditions.append(Product.category == f.category)
+        if f.min_price is not None:
+            conditions.append(Product.price >= f.min_price)
+        if f.max_price is not None:
+            conditions.append(Product.price <= f.max_price)
+        if f.tags:
+            conditions.append(Product.tags.overlap(f.tags))
+        if f.is_featured is not None:
+            conditions.append(Product.is_featured == f.is_featured)
+        if f.is_new is not None:
+            new_since = datetime.now(timezone.utc) - timedelta(days=NEW_PRODUCT_DAYS)
+            conditions.append(Product.created_at >= new_since if f.is_new else Product.created_at < new_since)
+        if f.is_on_sale is not None:
+            # On sale means there's a discount (original_price > price)
+            if f.is_on_sale:
+                conditions.append(Product.original_price > Product.price)
+            else:
+                conditions.append(Product.original_price <= Product.price)
+        if f.min_rating is not None:
+            # Denormalized review average
+            conditions.append(Product.rating_average >= f.min_rating)
+        if f.sizes or f.colors:
+            # EXISTS probe on the variant indexes; one variant must match size and color
+            conditions.append(variant_service.match_condition(f.sizes, f.colors, f.in_stock))
+        elif f.in_stock:
+            # Total stock (the sum of the variants for products that have them)
+            conditions.append(Product.stock_quantity > 0)
+        return conditions
+
+    @property
+    def where(self) -> ColumnElement:
+        return and_(*self.conditions)
+
+    def sort_column(self, sort_by: str) -> ColumnElement:
+        return SORT_COLUMNS.get(sort_by, Product.created_at)
+
+    def order_by(self, sort_by: str, sort_order: str) -> List[ColumnElement]:
+        """ORDER BY clauses; id is the tie-breaker that keeps pages (and keyset cursors) exact"""
+        direction = asc if sort_order == "asc" else desc
+        if sort_by == "relevance" and self.rank is not None:
+            return [direction(self.rank), direction(Product.created_at), direction(Product.id)]
+        return [direction(self.sort_column(sort_by)), direction(Product.id)]
+
+    def select(self, projection: Optional[Sequence[str]] = None, *extra: ColumnElement):
+        """Filtered select of full products, or of the projected columns plus `extra`"""
+        if projection:
+            return select(*projection_columns(projection, *extra)).where(*self.conditions)
+        return select(Product).where(*self.conditions)
+
+    def count_statement(self):
+        return select(func.count()).select_from(Product).where(*self.conditions)
+
+    def count_key(self) -> str:
+        digest = hashlib.sha1(self.filters.model_dump_json().encode()).hexdigest()
+        return f"catalog:count:{digest}"
+
+    async def prepare(self, db: AsyncSession) -> None:
+        """Session setup the compiled filters need (trigram threshold for fuzzy search)"""
+        if self.filters.search and self.filters.search_mode == "fuzzy":
+            await search_service.enable_fuzzy(db)
+
+    def _rows(self, result, projection: Optional[Sequence[str]]) -> List[Any]:
+        rows = result.all()
+        return rows if projection else [row[0] for row in rows]
+
+    async def fetch_page(
+        self,
+        db: AsyncSession,
+        sort_by: str,
+        sort_order: str,
+        page: int,
+        limit: int,
+        projection: Optional[Sequence[str]] = None
+    ) -> CatalogPage:
+        """One offset page and the total number of matches, in one round trip"""
+        await self.prepare(db)
+        count_key = self.count_key()
+        cached = await catalog_cache.get(count_key)
+        estimate = json.loads(cached) if cached is not None else None
+
+        sort_column = self.sort_column(sort_by)
+        query = self.select(projection, sort_column, Product.id).order_by(*self.order_by(sort_by, sort_order))
+        offset = (page - 1) * limit
+        if estimate is not None and estimate >= settings.CATALOG_APPROX_COUNT_THRESHOLD:
+            result = await db.execute(query.offset(offset).limit(limit + 1))
+            rows = self._rows(result, projection)
+            total = estimate
+        else:
+            result = await db.execute(
+                query.add_columns(func.count().over().label(TOTAL_LABEL)).offset(offset).limit(limit + 1)
+            )
+            raw = result.all()
+            if raw:
+                total = raw[0]._mapping[TOTAL_LABEL]
+            elif offset:
+                # Past the last page the window has no row to report on
+                total = (await db.execute(self.count_statement())).scalar()
+            else:
+                total = 0
+            rows = raw if projection else [row[0] for row in raw]
+            if total >= settings.CATALOG_APPROX_COUNT_THRESHOLD:
+                await catalog_cache.set(count_key, total, ttl=settings.CATALOG_COUNT_TTL_SECONDS)
+
+        has_more = len(rows) > limit
+        return rows[:limit], total, has_more
+
+    async def fetch_after(
+        self,
+        db: AsyncSession,
+        sort_by: str,
+        sort_order: str,
+        after: str,
+        limit: int,
+        projection: Optional[Sequence[str]] = None
+    ) -> CatalogPage:
+        """Keyset page after a cursor (no total)"""
+        if sort_by not in SORT_COLUMNS:
+            raise ValidationException("Cursor pagination needs one of: " + ", ".join(SORT_COLUMNS))
+        await self.prepare(db)
+        sort_column = self.sort_column(sort_by)
+        cursor_value, cursor_id = decode_cursor(after, sort_by, sort_order)
+        query = (
+            self.select(projection, sort_column, Product.id)
+            .where(keyset_condition(sort_column, Product.id, sort_order, cursor_value, cursor_id))
+            .order_by(*self.order_by(sort_by, sort_order))
+            .limit(limit + 1)
+        )
+        rows = self._rows(await db.execute(query), projection)
+        return rows[:limit], None, len(rows) > limit
@@ -0,0 +1,262 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+import json
+import uuid
+import logging
+from sqlalchemy import select, desc, func, or_, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from app.core.config import settings
+from app.core.cache import catalog_cache
+from app.core.conditional import make_etag
+from app.core.postgresql import AsyncSessionLocal
+from app.models.sqlalchemy_models import CatalogVersion, Product
+from app.schemas.product import ProductResponse
+from app.services.suggestion_index import suggestion_index, build_suggestion_index
+from app.services.landing_pages import landing_pages
+from app.services.pricing_service import pricing_service
+
+logger = logging.getLogger(__name__)
+
+# Featured lists are cached per requested limit (1..FEATURED_MAX_LIMIT)
+FEATURED_MAX_LIMIT = 50
+# Ids/slugs accepted by one batch lookup
+BATCH_MAX_REFS = 250
+
+CATEGORIES_KEY = "catalog:categories"
+VERSION_KEY = "catalog:version"
+
+
+def product_id_key(product_id: Any) -> str:
+    return f"catalog:product:id:{product_id}"
+
+
+def product_slug_key(slug: str) -> str:
+    return f"catalog:product:slug:{slug}"
+
+
+def featured_key(limit: int) -> str:
+    return f"catalog:featured:{limit}"
+
+
+FEATURED_KEYS = [featured_key(limit) for limit in range(1, FEATURED_MAX_LIMIT + 1)]
+
+
+def version_bump_statement():
+    """Increment the single catalog version row (created at 1 if missing)"""
+    statement = insert(CatalogVersion).values(id=1, version=1)
+    return statement.on_conflict_do_update(
+        index_elements=[CatalogVersion.id],
+        set_={"version": CatalogVersion.version + 1, "updated_at": func.now()}
+    )
+
+
+class CatalogService:
+    """
+    Cached storefront reads (product detail, categories, featured list) and the
+    hooks product writes call to keep caches, in-memory indexes, the
+    precomputed landing pages and cart quotes in sync.
+    Loaders open their own session because stale entries are refreshed in the
+    background, after the originating request has finished.
+    """
+
+    async def _load_product(self, *conditions) -> Optional[Dict[str, Any]]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Product).where(Product.is_active == True, *conditions))
+            product = result.scalar_one_or_none()
+            if product is None:
+                return None
+            return ProductResponse.from_orm(product).model_dump()
+
+    async def get_product(self, product_id: str) -> Optional[bytes]:
+        """Serialized active product by id, or None"""
+        try:
+            product_uuid = uuid.UUID(product_id)
+        except ValueError:
+            return None
+        return await catalog_cache.get_or_load(
+            product_id_key(product_uuid),
+            lambda: self._load_product(Product.id == product_uuid)
+        )
+
+    async def get_product_by_slug(self, slug: str) -> Optional[bytes]:
+        """Serialized active product by slug, or None"""
+        return await catalog_cache.get_or_load(
+            product_slug_key(slug),
+            lambda: self._load_product(Product.slug == slug)
+        )
+
+    def batch_query(self, ids: List[uuid.UUID], slugs: List[str]):
+        """Active products matching any of the ids or slugs, as `= ANY(:param)` array binds"""
+        return select(Product).where(
+            Product.is_active == True,
+            or_(
+                Product.id == any_(bindparam("ids", ids, type_=ARRAY(Product.id.type))),
+                Product.slug == any_(bindparam("slugs", slugs, type_=ARRAY(Product.slug.type)))
+            )
+        )
+
+    async def _load_batch(self, keys: List[str], refs: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        ids = [ref for key, ref in refs.items() if key in keys and isinstance(ref, uuid.UUID)]
+        slugs = [ref for key, ref in refs.items() if key in keys and isinstance(ref, str)]
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(self.batch_query(ids, slugs))
+            products = result.scalars().all()
+        wanted = set(keys)
+        loaded: Dict[str, Dict[str, Any]] = {}
+        for product in products:
+            payload = ProductResponse.from_orm(product).model_dump()
+            for key in (product_id_key(product.id), product_slug_key(product.slug)):
+                if key in wanted:
+                    loaded[key] = payload
+        return loaded
+
+    async def get_products_batch(self, refs: List[str]) -> Tuple[List[bytes], List[str]]:
+        """
+        Serialized active products for a list of ids and/or slugs, in request
+        order (duplicates collapsed), plus the refs that matched nothing.
+        Cache misses are resolved together in one query.
+        """
+        keys: Dict[str, Any] = {}
+        key_for_ref: Dict[str, str] = {}
+        for ref in refs:
+            if ref in key_for_ref:
+                continue
+            try:
+                product_uuid = uuid.UUID(ref)
+            except ValueError:
+                key = product_slug_key(ref)
+                keys[key] = ref
+            else:
+                key = product_id_key(product_uuid)
+                keys[key] = product_uuid
+            key_for_ref[ref] = key
+
+        bodies = await catalog_cache.get_many_or_load(
+            list(keys), lambda missing: self._load_batch(missing, keys)
+        )
+        products: List[bytes] = []
+        missing: List[str] = []
+        for ref, key in key_for_ref.items():
+            if key in bodies:
+                products.append(bodies[key])
+            else:
+                missing.append(ref)
+        return products, missing
+
+    async def _load_categories(self) -> Dict[str, List[str]]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Product.category).distinct().where(Product.is_active == True))
+            return {"categories": [row[0] for row in result.fetchall()]}
+
+    async def get_categories(self) -> bytes:
+        """Serialized {"categories": [...]} payload"""
+        return await catalog_cache.get_or_load(CATEGORIES_KEY, self._load_categories)
+
+    async def _load_featured(self, limit: int) -> List[Dict[str, Any]]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Product)
+                .where(Product.is_active == True, Product.is_featured == True)
+                .order_by(desc(Product.created_at))
+                .limit(limit)
+            )
+            return [ProductResponse.from_orm(product).model_dump() for product in result.scalars().all()]
+
+    async def get_featured(self, limit: int) -> bytes:
+        """Serialized list of featured products, newest first"""
+        return await catalog_cache.get_or_load(featured_key(limit), lambda: self._load_featured(limit))
+
+    async def _load_version(self) -> Dict[str, Any]:
+        async with AsyncSessionLocal() as db:
+            row = await db.get(CatalogVersion, 1)
+            if row is None:
+                return {"version": 0, "last_modified": None}
+            return {"version": row.version, "last_modified": row.updated_at}
+
+    async def _bump_version(self) -> None:
+        # Own transaction: hooks run after the product write has committed
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(version_bump_statement())
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Failed to bump the catalog version: {e}")
+
+    async def catalog_version(self) -> Tuple[str, Optional[datetime]]:
+        """
+        Cheap version token and last-modified time for the whole catalog, used
+        to validate listing responses without running the listing query. The
+        version is a counter every product write hook increments, so unlike
+        row counts or timestamps it changes with each edit.
+        """
+        body = await catalog_cache.get_or_load(
+            VERSION_KEY, self._load_version, ttl=settings.CATALOG_VERSION_TTL_SECONDS
+        )
+        version = json.loads(body)
+        last_modified = version["last_modified"]
+        return body.decode(), datetime.fromisoformat(last_modified) if last_modified else None
+
+    async def listing_validators(self, variant: str) -> Tuple[str, Optional[datetime]]:
+        """ETag / Last-Modified for a catalog listing; `variant` identifies the query (e.g. its query string)"""
+        version, last_modified = await self.catalog_version()
+        return make_etag(version, variant), last_modified
+
+    def last_modified(self, body: bytes) -> Optional[datetime]:
+        """updated_at (or created_at) of a serialized product"""
+        product = json.loads(body)
+        value = product.get("updated_at") or product.get("created_at")
+        return datetime.fromisoformat(value) if value else None
+
+    async def product_changed(
+        self,
+        product: Product,
+        previous_slug: Optional[str] = None,
+        previous_category: Optional[str] = None
+    ) -> None:
+        """Call after a product was created, updated or (de)activated and committed"""
+        suggestion_index.upsert_product(product)
+        landing_pages.mark_changed(product.category, previous_category)
+        keys = [product_id_key(product.id), CATEGORIES_KEY, VERSION_KEY, *FEATURED_KEYS]
+        for slug in {product.slug, previous_slug}:
+            if slug:
+                keys.append(product_slug_key(slug))
+        await self._bump_version()
+        await catalog_cache.invalidate(*keys)
+        await pricing_service.prices_changed()
+
+    async def products_bulk_changed(self, products: List[Tuple[Any, Optional[str]]]) -> None:
+        """Call after a bulk write with the (id, slug) of every touched product"""
+        keys = [CATEGORIES_KEY, VERSION_KEY, *FEATURED_KEYS]
+        for product_id, slug in products:
+            keys.append(product_id_key(product_id))
+            if slug:
+                keys.append(product_slug_key(slug))
+        await self._bump_version()
+        await catalog_cache.invalidate(*keys)
+        await pricing_service.prices_changed()
+        landing_pages.mark_changed()
+        # Cheaper to rebuild once than to patch the index per product
+        await build_suggestion_index()
+
+    async def product_stats_changed(self, product_id: Any, slug: Optional[str] = None) -> None:
+        """Call after derived product fields (e.g. review aggregates) changed and were committed"""
+        # Landing pages sorted by rating catch up on their periodic rebuild
+        keys = [product_id_key(product_id), VERSION_KEY, *FEATURED_KEYS]
+        if slug:
+            keys.append(product_slug_key(slug))
+        await self._bump_version()
+        await catalog_cache.invalidate(*keys)
+
+    async def product_removed(self, product_id: Any, slug: Optional[str] = None) -> None:
+        """Call after a product was hard-deleted and committed"""
+        suggestion_index.remove_product(product_id)
+        landing_pages.mark_changed()
+        keys = [product_id_key(product_id), CATEGORIES_KEY, VERSION_KEY, *FEATURED_KEYS]
+        if slug:
+            keys.append(product_slug_key(slug))
+        await self._bump_version()
+        await catalog_cache.invalidate(*keys)
+        await pricing_service.prices_changed()
+
+
+catalog_service = CatalogService()
@@ -0,0 +1,133 @@
+from typing import Any, Dict, List, Optional
+import logging
+from sqlalchemy import select, func, literal_column, union_all, tuple_, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+from app.models.sqlalchemy_models import Product
+
+logger = logging.getLogger(__name__)
+
+# Price band thresholds for the histogram facet (width_bucket with explicit bounds)
+PRICE_BUCKET_THRESHOLDS: List[float] = [0, 50, 100, 150, 200, 300, 500, 1000]
+
+# Array facets that are unnested per product
+ARRAY_FACETS = {
+    "tags": Product.tags,
+    "sizes": Product.sizes,
+    "colors": Product.colors,
+}
+
+# GROUPING(category, price_bucket, kind, value) bitmask for each grouping set
+GROUPING_CATEGORY = 0b0111
+GROUPING_PRICE_BUCKET = 0b1011
+GROUPING_ARRAY_VALUE = 0b1100
+GROUPING_TOTAL = 0b1111
+
+
+class FacetService:
+    """Facet counts for a product filter set, computed in one SQL round trip"""
+
+    def build_query(self, where: Optional[ColumnElement] = None):
+        """
+        Build the facet statement. Each matching product is joined to one
+        "self" row plus one row per tag/size/color; a single GROUP BY
+        GROUPING SETS then yields category counts, price buckets, array value
+        counts and the overall totals together.
+        """
+        base = select(
+            Product.id,
+            Product.category,
+            Product.price,
+            *[column.label(kind) for kind, column in ARRAY_FACETS.items()]
+        )
+        if where is not None:
+            base = base.where(where)
+        filtered = base.cte("filtered")
+
+        rows = [select(literal_column("NULL::text").label("kind"), literal_column("NULL::text").label("value"))]
+        for kind in ARRAY_FACETS:
+            rows.append(select(
+                literal_column(f"'{kind}'::text").label("kind"),
+                func.unnest(filtered.c[kind]).label("value")
+            ).correlate(filtered))
+        facet_rows = union_all(*rows).lateral("facet_rows")
+
+        # Thresholds are inlined so the GROUP BY expression matches the select list
+        thresholds = ", ".join(str(float(bound)) for bound in PRICE_BUCKET_THRESHOLDS)
+        price_bucket = func.width_bucket(
+            filtered.c.price,
+            literal_column(f"ARRAY[{thresholds}]::float8[]")
+        )
+        is_self_row = facet_rows.c.kind.is_(None)
+
+        return (
+            select(
+                filtered.c.category,
+                price_bucket.label("price_bucket"),
+                facet_rows.c.kind,
+                facet_rows.c.value,
+                func.count().filter(is_self_row).label("products"),
+                func.count().filter(facet_rows.c.kind.isnot(None)).label("hits"),
+                func.min(filtered.c.price).filter(is_self_row).label("min_price"),
+                func.max(filtered.c.price).filter(is_self_row).label("max_price"),
+                func.avg(filtered.c.price).filter(is_self_row).label("avg_price"),
+                func.grouping(
+                    filtered.c.category, price_bucket, facet_rows.c.kind, facet_rows.c.value
+                ).label("grouping_id"),
+            )
+            .select_from(filtered.join(facet_rows, true()))
+            .group_by(func.grouping_sets(
+                tuple_(filtered.c.category),
+                tuple_(price_bucket),
+                tuple_(facet_rows.c.kind, facet_rows.c.value),
+                tuple_(),
+            ))
+        )
+
+    def _price_bucket_label(self, bucket: int) -> Dict[str, Optional[float]]:
+        thresholds = PRICE_BUCKET_THRESHOLDS
+        low = thresholds[bucket - 1] if bucket >= 1 else None
+        high = thresholds[bucket] if bucket < len(thresholds) else None
+        return {"min": low, "max": high}
+
+    def parse_rows(self, rows) -> Dict[str, Any]:
+        """Fold grouping-set rows into the facet response structure"""
+        facets: Dict[str, Any] = {
+            "total": 0,
+            "categories": [],
+            "price_buckets": [],
+            "price_range": {"min": None, "max": None, "avg": None},
+        }
+        array_counts: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in ARRAY_FACETS}
+
+        for row in rows:
+            if row.grouping_id == GROUPING_CATEGORY:
+                facets["categories"].append({"value": row.category, "count": row.products})
+            elif row.grouping_id == GROUPING_PRICE_BUCKET and row.price_bucket is not None:
+                facets["price_buckets"].append({
+                    **self._price_bucket_label(row.price_bucket),
+                    "count": row.products
+                })
+            elif row.grouping_id == GROUPING_ARRAY_VALUE and row.kind is not None and row.value:
+                array_counts[row.kind].append({"value": row.value, "count": row.hits})
+            elif row.grouping_id == GROUPING_TOTAL:
+                facets["total"] = row.products
+                facets["price_range"] = {
+                    "min": float(row.min_price) if row.min_price is not None else None,
+                    "max": float(row.max_price) if row.max_price is not None else None,
+                    "avg": float(row.avg_price) if row.avg_price is not None else None,
+                }
+
+        facets["categories"].sort(key=lambda item: (-item["count"], item["value"]))
+        facets["price_buckets"].sort(key=lambda item: item["min"] if item["min"] is not None else float("-inf"))
+        for kind, counts in array_counts.items():
+            facets[kind] = sorted(counts, key=lambda item: (-item["count"], item["value"]))
+        return facets
+
+    async def facet_counts(self, db: AsyncSession, where: Optional[ColumnElement] = None) -> Dict[str, Any]:
+        """Facet counts (categories, tags, sizes, colors, price buckets) for the filter set"""
+        result = await db.execute(self.build_query(where))
+        return self.parse_rows(result.fetchall())
+
+
+facet_service = FacetService()
@@ -0,0 +1,367 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from datetime import datetime
+from xml.sax.saxutils import escape
+import asyncio
+import json
+import logging
+import math
+import os
+import uuid
+import aiofiles
+from sqlalchemy import select, func, cast, String, BigInteger, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.postgresql import AsyncSessionLocal
+from app.models.sqlalchemy_models import Product
+
+logger = logging.getLogger(__name__)
+
+# pg advisory lock key, so only one worker regenerates the files at a time
+FEED_LOCK_ID = 720_003
+# Sitemap protocol limit per file, and the average shard size aimed for. Shards
+# are fixed UUID ranges, so sizes vary slightly; the headroom keeps them under the limit.
+SITEMAP_MAX_URLS = 50_000
+SHARD_TARGET_SIZE = 40_000
+FEED_FETCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+# Shards are ranges of the first 32 bits of the product id
+PREFIX_SPACE = 2 ** 32
+
+# Google Merchant limits
+MAX_TITLE_LENGTH = 150
+MAX_DESCRIPTION_LENGTH = 5000
+MAX_ADDITIONAL_IMAGES = 10
+
+FORMATS = ("sitemap", "xml", "tsv")
+SUFFIXES = {"sitemap": "sitemap.xml", "xml": "items.xml", "tsv": "rows.tsv"}
+MANIFEST = "manifest.json"
+# [count, latest change, id checksum] of a shard without active products
+EMPTY_SIGNATURE = [0, None, 0]
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+TSV_COLUMNS = [
+    "id", "title", "description", "link", "image_link", "additional_image_link", "availability",
+    "price", "sale_price", "brand", "condition", "product_type", "mpn",
+]
+
+FEED_COLUMNS = [
+    Product.id, Product.slug, Product.name, Product.description, Product.price,
+    Product.original_price, Product.images, Product.category, Product.subcategory,
+    Product.brand, Product.sku, Product.stock_quantity, Product.created_at, Product.updated_at,
+]
+
+
+def listed():
+    """Products that appear in the feeds: active and addressable by a slug"""
+    return (Product.is_active == True) & Product.slug.isnot(None)
+
+
+def shard_count(total: int) -> int:
+    return max(1, math.ceil(total / SHARD_TARGET_SIZE))
+
+
+def shard_bounds(index: int, shards: int) -> Tuple[Optional[uuid.UUID], Optional[uuid.UUID]]:
+    """[low, high) product id range of a shard; None means unbounded"""
+    def boundary(i: int) -> uuid.UUID:
+        # ceil(i * 2^32 / shards): the first prefix that `shard_expression` puts in shard i
+        return uuid.UUID(int=(-(-i * PREFIX_SPACE // shards)) << 96)
+    low = boundary(index) if index > 0 else None
+    high = boundary(index + 1) if index + 1 < shards else None
+    return low, high
+
+
+def shard_expression(shards: int):
+    """SQL shard number of a product id, matching `shard_bounds`"""
+    prefix = literal_column("('x' || left(replace(products.id::text, '-', ''), 8))::bit(32)")
+    return cast(prefix, BigInteger) * shards // PREFIX_SPACE
+
+
+def _lastmod(row: Any) -> datetime:
+    return row.updated_at or row.created_at
+
+
+def _absolute(url: str) -> str:
+    if url.startswith(("http://", "https://")):
+        return url
+    return f"{settings.BACKEND_URL.rstrip('/')}/{url.lstrip('/')}"
+
+
+def product_url(slug: str) -> str:
+    return f"{settings.FRONTEND_URL.rstrip('/')}/product/{slug}"
+
+
+def _price(value: float) -> str:
+    return f"{value:.2f} {settings.FEED_CURRENCY}"
+
+
+def merchant_item(row: Any) -> Dict[str, str]:
+    """Google Merchant attributes for one product row (missing optional attributes are empty)"""
+    on_sale = row.original_price is not None and row.original_price > row.price
+    images = [_absolute(image) for image in (row.images or [])]
+    product_type = " > ".join(part for part in (row.category, row.subcategory) if part)
+    return {
+        "id": str(row.id),
+        "title": row.name[:MAX_TITLE_LENGTH],
+        "description": (row.description or row.name)[:MAX_DESCRIPTION_LENGTH],
+        "link": product_url(row.slug),
+        "image_link": images[0] if images else "",
+        "additional_image_link": ",".join(images[1:MAX_ADDITIONAL_IMAGES + 1]),
+        "availability": "in_stock" if (row.stock_quantity or 0) > 0 else "out_of_stock",
+        "price": _price(row.original_price if on_sale else row.price),
+        "sale_price": _price(row.price) if on_sale else "",
+        "brand": row.brand or settings.FEED_BRAND,
+        "condition": "new",
+        "product_type": product_type,
+        "mpn": row.sku or "",
+    }
+
+
+def sitemap_entry(row: Any) -> str:
+    return (
+        f"<url><loc>{escape(product_url(row.slug))}</loc>"
+        f"<lastmod>{_lastmod(row).isoformat()}</lastmod></url>\n"
+    )
+
+
+def merchant_xml_entry(item: Dict[str, str]) -> str:
+    parts = ["<item>"]
+    for name, value in item.items():
+        if not value:
+            continue
+        if name == "additional_image_link":
+            parts.extend(f"<g:{name}>{escape(link)}</g:{name}>" for link in value.split(","))
+        elif name in ("title", "description", "link"):
+            parts.append(f"<{name}>{escape(value)}</{name}>")
+        else:
+            parts.append(f"<g:{name}>{escape(value)}</g:{name}>")
+    parts.append("</item>\n")
+    return "".join(parts)
+
+
+def merchant_tsv_entry(item: Dict[str, str]) -> str:
+    # Tabs and line breaks would split the row
+    return "\t".join(" ".join(item[name].split()) for name in TSV_COLUMNS) + "\n"
+
+
+def sitemap_header() -> str:
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+
+
+def merchant_header(fmt: str) -> str:
+    if fmt == "tsv":
+        return "\t".join(TSV_COLUMNS) + "\n"
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n<channel>\n'
+        f"<title>{escape(settings.FEED_BRAND)}</title>\n"
+        f"<link>{escape(settings.FRONTEND_URL)}</link>\n"
+        f"<description>{escape(settings.FEED_BRAND)} products</description>\n"
+    )
+
+
+def merchant_footer(fmt: str) -> str:
+    return "" if fmt == "tsv" else "</channel>\n</rss>\n"
+
+
+class FeedService:
+    """
+    Sitemap shards and the Google Merchant product feed, cached on disk.
+
+    Active products are split into fixed id ranges of roughly
+    SHARD_TARGET_SIZE products. Each refresh compares a cheap per-shard
+    signature (count, latest updated_at, id checksum) with the manifest of the
+    last run and regenerates only the shards that changed: one server-side
+    cursor pass per shard writes its sitemap file and its merchant XML/TSV
+    fragments. Feeds are served by concatenating the fragments from disk.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+
+    @property
+    def directory(self) -> str:
+        return self._directory or settings.FEED_DIR
+
+    def shard_path(self, shards: int, index: int, fmt: str) -> str:
+        # The shard count is part of the name so a re-split never mixes old and new ranges
+        return os.path.join(self.directory, f"products-{shards}-{index}.{SUFFIXES[fmt]}")
+
+    def read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.directory, MANIFEST)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        path = os.path.join(self.directory, MANIFEST)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(f"{path}.tmp", path)
+
+    def signature_query(self, shards: int):
+        """Per-shard count, latest change and id checksum of the listed products"""
+        shard = shard_expression(shards).label("shard")
+        return (
+            select(
+                shard,
+                func.count(),
+                func.max(func.coalesce(Product.updated_at, Product.created_at)),
+                func.sum(func.hashtext(cast(Product.id, String)))
+            )
+            .where(listed())
+            .group_by(shard)
+        )
+
+    def shard_query(self, index: int, shards: int):
+        """Listed products of one shard in id order"""
+        low, high = shard_bounds(index, shards)
+        query = select(*FEED_COLUMNS).where(listed())
+        if low is not None:
+            query = query.where(Product.id >= low)
+        if high is not None:
+            query = query.where(Product.id < high)
+        return query.order_by(Product.id)
+
+    async def _write_shard(self, db: AsyncSession, index: int, shards: int) -> int:
+        """Stream one shard into its three files (written next to them, then renamed)"""
+        paths = {fmt: self.shard_path(shards, index, fmt) for fmt in FORMATS}
+        files = {fmt: await aiofiles.open(f"{path}.tmp", "w", encoding="utf-8") for fmt, path in paths.items()}
+        written = 0
+        try:
+            await files["sitemap"].write(sitemap_header())
+            result = await db.stream(self.shard_query(index, shards).execution_options(yield_per=FEED_FETCH_SIZE))
+            async for partition in result.partitions():
+                items = [merchant_item(row) for row in partition]
+                await files["sitemap"].write("".join(sitemap_entry(row) for row in partition))
+                await files["xml"].write("".join(merchant_xml_entry(item) for item in items))
+                await files["tsv"].write("".join(merchant_tsv_entry(item) for item in items))
+                written += len(partition)
+            await files["sitemap"].write("</urlset>\n")
+        finally:
+            for f in files.values():
+                await f.close()
+        for fmt, path in paths.items():
+            os.replace(f"{path}.tmp", path)
+        return written
+
+    def _remove_stale_files(self, *generations: Optional[int]) -> None:
+        """Delete shard files of every shard count except `generations`"""
+        kept = {
+            os.path.basename(self.shard_path(shards, index, fmt))
+            for shards in generations if shards
+            for index in range(shards) for fmt in FORMATS
+        }
+        for name in os.listdir(self.directory):
+            if name.startswith("products-") and name not in kept:
+                os.remove(os.path.join(self.directory, name))
+
+    def changed_shards(self, previous: Dict[str, Any], shards: int, signatures: Dict[int, List[Any]]) -> List[int]:
+        """Shards whose signature differs from the last run's, or whose files are missing"""
+        if previous.get("shards") != shards:
+            return list(range(shards))
+        return [
+            index for index in range(shards)
+            if previous["signatures"].get(str(index)) != signatures.get(index, EMPTY_SIGNATURE)
+            or not all(os.path.exists(self.shard_path(shards, index, fmt)) for fmt in FORMATS)
+        ]
+
+    async def refresh(self, db: AsyncSession, wait: bool = False) -> Optional[int]:
+        """
+        Regenerate the shards whose signature changed. Returns how many were
+        written, or None if another worker holds the lock (`wait` blocks instead).
+        """
+        if wait:
+            await db.execute(select(func.pg_advisory_xact_lock(FEED_LOCK_ID)))
+        else:
+            locked = await db.execute(select(func.pg_try_advisory_xact_lock(FEED_LOCK_ID)))
+            if not locked.scalar():
+                await db.rollback()
+                return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        previous = self.read_manifest() or {}
+        total = (await db.execute(select(func.count()).select_from(Product).where(listed()))).scalar()
+        shards = shard_count(total)
+        result = await db.execute(self.signature_query(shards))
+        signatures = {
+            int(shard): [count, lastmod.isoformat() if lastmod else None, int(checksum or 0)]
+            for shard, count, lastmod, checksum in result.all()
+        }
+
+        regenerated = self.changed_shards(previous, shards, signatures)
+        for index in regenerated:
+            count = signatures.get(index, EMPTY_SIGNATURE)[0]
+            if count > SITEMAP_MAX_URLS:
+                logger.warning(f"Feed shard {index} has {count} products, above the sitemap limit")
+            await self._write_shard(db, index, shards)
+
+        self._write_manifest({
+            "shards": shards,
+            "signatures": {str(index): signatures.get(index, EMPTY_SIGNATURE) for index in range(shards)},
+            "generated_at": datetime.utcnow().isoformat(),
+        })
+        # The previous shard split stays until the next refresh, so feeds that
+        # started streaming from the old manifest can finish
+        self._remove_stale_files(shards, previous.get("shards"))
+        await db.commit()
+        if regenerated:
+            logger.info(f"Regenerated {len(regenerated)} of {shards} feed shards ({total} products)")
+        return len(regenerated)
+
+    async def ensure_ready(self) -> Dict[str, Any]:
+        """Manifest of the generated files, generating them first if this is the first request"""
+        manifest = self.read_manifest()
+        if manifest is None:
+            async with AsyncSessionLocal() as db:
+                await self.refresh(db, wait=True)
+            manifest = self.read_manifest()
+        return manifest
+
+    def sitemap_index(self, manifest: Dict[str, Any], shard_url) -> str:
+        """Sitemap index listing every shard with its latest product change"""
+        parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n']
+        for index in range(manifest["shards"]):
+            lastmod = manifest["signatures"][str(index)][1]
+            parts.append(f"<sitemap><loc>{escape(shard_url(index))}</loc>")
+            if lastmod:
+                parts.append(f"<lastmod>{lastmod}</lastmod>")
+            parts.append("</sitemap>\n")
+        parts.append("</sitemapindex>\n")
+        return "".join(parts)
+
+    def last_modified(self, manifest: Dict[str, Any], index: Optional[int] = None) -> Optional[datetime]:
+        """Latest product change in one shard, or in all of them"""
+        signatures: List[List[Any]] = list(manifest["signatures"].values())
+        if index is not None:
+            signatures = [manifest["signatures"][str(index)]]
+        lastmods = [signature[1] for signature in signatures if signature[1]]
+        return datetime.fromisoformat(max(lastmods)) if lastmods else None
+
+    async def stream_feed(self, manifest: Dict[str, Any], fmt: str) -> AsyncIterator[bytes]:
+        """Merchant feed assembled from the shard fragments, read in chunks"""
+        yield merchant_header(fmt).encode()
+        for index in range(manifest["shards"]):
+            async with aiofiles.open(self.shard_path(manifest["shards"], index, fmt), "rb") as f:
+                while chunk := await f.read(READ_CHUNK_SIZE):
+                    yield chunk
+        yield merchant_footer(fmt).encode()
+
+
+feed_service = FeedService()
+
+
+async def refresh_feeds() -> None:
+    """Run one feed refresh in its own session, logging failures"""
+    try:
+        async with AsyncSessionLocal() as db:
+            await feed_service.refresh(db)
+    except Exception as e:
+        logger.error(f"Failed to refresh sitemap/product feed: {e}")
+
+
+async def refresh_feeds_periodically() -> None:
+    """Background task that regenerates changed feed shards"""
+    while True:
+        await refresh_feeds()
+        await asyncio.sleep(settings.FEED_REFRESH_SECONDS)
@@ -0,0 +1,222 @@
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import uuid
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.exceptions import BadRequestException, NotFoundException, ServiceUnavailableException
+from app.core.security import create_guest_cart_token, verify_guest_cart_token
+from app.models.sqlalchemy_models import Product
+from app.services.cart_service import cart_service, check_stock
+from app.services.pricing_service import pricing_service, product_line
+from app.services.user_counter_service import user_counter_service
+
+logger = logging.getLogger(__name__)
+
+
+def cart_key(cart_id: str) -> str:
+    return f"{settings.CACHE_KEY_PREFIX}guest_cart:{cart_id}"
+
+
+def line_field(product_id: Any, size: Optional[str], color: Optional[str]) -> str:
+    """Hash field of a guest cart line; NULL and '' size/color are the same line, as in the cart index"""
+    return f"{product_id}|{size or ''}|{color or ''}"
+
+
+def parse_field(field: str) -> Tuple[str, Optional[str], Optional[str]]:
+    product_id, size, color = field.split("|", 2)
+    return product_id, size or None, color or None
+
+
+def line_id(field: str) -> str:
+    """Stable id of a guest cart line, for update/remove"""
+    return hashlib.sha1(field.encode()).hexdigest()[:16]
+
+
+class GuestCartService:
+    """
+    Carts of visitors who aren't signed in, kept in Redis so browsing writes
+    nothing to Postgres. Each cart is a hash of line field -> quantity named by
+    a signed cart token; its expiry slides with every use. On login or
+    registration the cart is claimed and merged into the user's cart rows.
+    Unlike the catalog cache, Redis is the only copy here, so when it is
+    unreachable guest cart requests fail instead of degrading.
+    """
+
+    def __init__(self):
+        self._redis: Optional[redis.Redis] = None
+
+    def _client(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.from_url(
+                settings.REDIS_URL,
+                socket_timeout=settings.CACHE_REDIS_TIMEOUT_SECONDS,
+                socket_connect_timeout=settings.CACHE_REDIS_TIMEOUT_SECONDS
+            )
+        return self._redis
+
+    async def _execute(self, *commands: Tuple[str, ...]) -> List[Any]:
+        """Run commands in one MULTI/EXEC round trip"""
+        try:
+            async with self._client().pipeline(transaction=True) as pipe:
+                for name, *args in commands:
+                    getattr(pipe, name)(*args)
+                return await pipe.execute()
+        except (RedisError, OSError) as e:
+            logger.error(f"Guest cart: Redis unavailable ({e})")
+            raise ServiceUnavailableException("Guest cart is temporarily unavailable")
+
+    def resolve(self, token: Optional[str]) -> Tuple[str, str]:
+        """Cart id and token for a request; a missing or invalid token starts a new cart"""
+        cart_id = verify_guest_cart_token(token)
+        if cart_id is None:
+            cart_id = uuid.uuid4().hex
+            token = create_guest_cart_token(cart_id)
+        return cart_id, token
+
+    async def entries(self, cart_id: str) -> Dict[str, int]:
+        """Line field -> quantity, refreshing the cart's expiry"""
+        key = cart_key(cart_id)
+        values, _ = await self._execute(("hgetall", key), ("expire", key, settings.GUEST_CART_TTL_SECONDS))
+        return {field.decode(): int(quantity) for field, quantity in values.items()}
+
+    async def _product(self, db: AsyncSession, product_id: Any) -> Product:
+        result = await db.execute(select(Product).where(Product.id == product_id, Product.is_active == True))
+        product = result.scalar_one_or_none()
+        if product is None:
+            raise NotFoundException("Product not found")
+        return product
+
+    def _find(self, entries: Dict[str, int], item_id: str) -> str:
+        for field in entries:
+            if line_id(field) == item_id:
+                return field
+        raise NotFoundException("Cart item not found")
+
+    def lines(self, entries: Dict[str, int]) -> List[Dict[str, Any]]:
+        """Entries as lines (field, product_id, quantity, size, color), e.g. for CartService.merge_lines"""
+        lines = []
+        for field, quantity in entries.items():
+            product_id, size, color = parse_field(field)
+            try:
+                product_id = uuid.UUID(product_id)
+            except ValueError:
+                continue
+            lines.append({"field": field, "product_id": product_id, "quantity": quantity, "size": size, "color": color})
+        return lines
+
+    async def quote(self, db: AsyncSession, cart_id: str, coupon_code: Optional[str] = None) -> Dict[str, Any]:
+        """Priced guest cart by the checkout pricing rules; lines of unavailable products are left out"""
+        lines = self.lines(await self.entries(cart_id))
+        products = {}
+        if lines:
+            result = await db.execute(cart_service.products_query(list({line["product_id"] for line in lines})))
+            products = {product.id: product for product in result.scalars().all() if product.is_active}
+
+        priced = []
+        for line in lines:
+            product = products.get(line["product_id"])
+            if product is not None:
+                priced.append({
+                    "id": line_id(line["field"]),
+                    **product_line(product, line["quantity"], line["size"], line["color"])
+                })
+        return await pricing_service.quote_lines(db, priced, coupon_code)
+
+    async def add_item(
+        self,
+        db: AsyncSession,
+        cart_id: str,
+        product_id: uuid.UUID,
+        quantity: int,
+        size: Optional[str] = None,
+        color: Optional[str] = None
+    ) -> None:
+        """Add to a guest cart line, checking availability and stock (reads only)"""
+        product = await self._product(db, product_id)
+        entries = await self.entries(cart_id)
+        field = line_field(product.id, size, color)
+        if field not in entries and len(entries) >= settings.GUEST_CART_MAX_LINES:
+            raise BadRequestException("Cart is full")
+        check_stock(product, entries.get(field, 0) + quantity)
+
+        key = cart_key(cart_id)
+        await self._execute(("hincrby", key, field, quantity), ("expire", key, settings.GUEST_CART_TTL_SECONDS))
+
+    async def update_item(
+        self,
+        db: AsyncSession,
+        cart_id: str,
+        item_id: str,
+        quantity: int,
+        size: Optional[str] = None,
+        color: Optional[str] = None
+    ) -> None:
+        """Set a guest cart line's quantity and size/color; moving onto another line merges into it"""
+        entries = await self.entries(cart_id)
+        field = self._find(entries, item_id)
+        product = await self._product(db, uuid.UUID(parse_field(field)[0]))
+        new_field = line_field(product.id, size, color)
+        if new_field != field and new_field in entries:
+            quantity += entries[new_field]
+        check_stock(product, quantity)
+
+        key = cart_key(cart_id)
+        await self._execute(
+            ("hdel", key, field),
+            ("hset", key, new_field, quantity),
+            ("expire", key, settings.GUEST_CART_TTL_SECONDS)
+        )
+
+    async def remove_item(self, cart_id: str, item_id: str) -> None:
+        entries = await self.entries(cart_id)
+        await self._execute(("hdel", cart_key(cart_id), self._find(entries, item_id)))
+
+    async def clear(self, cart_id: str) -> None:
+        await self._execute(("delete", cart_key(cart_id)))
+
+    async def claim(self, cart_id: str) -> Dict[str, int]:
+        """
+        Read and delete a guest cart in one transaction, so two logins with the
+        same token can't both merge it. Pair with restore() if the merge fails.
+        """
+        key = cart_key(cart_id)
+        values, _ = await self._execute(("hgetall", key), ("delete", key))
+        return {field.decode(): int(quantity) for field, quantity in values.items()}
+
+    async def restore(self, cart_id: str, entries: Dict[str, int]) -> None:
+        """Put claimed lines back, adding to anything written to the cart since"""
+        key = cart_key(cart_id)
+        commands = [("hincrby", key, field, quantity) for field, quantity in entries.items()]
+        await self._execute(*commands, ("expire", key, settings.GUEST_CART_TTL_SECONDS))
+
+    async def merge_into_user(self, db: AsyncSession, cart_id: str, user_id: Any) -> int:
+        """
+        Move a guest cart into a user's cart with one bulk upsert, and commit.
+        The guest cart is claimed first and put back if the merge fails.
+        Returns the change in the cart's total quantity.
+        """
+        entries = await self.claim(cart_id)
+        if not entries:
+            return 0
+        try:
+            added = await cart_service.merge_lines(db, user_id, self.lines(entries))
+            await user_counter_service.apply(db, user_id, cart_quantity=added)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            await self.restore(cart_id, entries)
+            raise
+        logger.info(f"Merged {len(entries)} guest cart lines into the cart of user {user_id}")
+        return added
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+
+guest_cart_service = GuestCartService()
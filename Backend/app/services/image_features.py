@@ -0,0 +1,116 @@
+from typing import Optional, Tuple
+import numpy as np
+from PIL import Image
+
+# Bump when the descriptor changes so stored vectors are recomputed
+FEATURE_VERSION = 1
+
+# Images are downscaled before analysis; enough detail for grain, cheap to process
+ANALYSIS_SIZE = 128
+# Lab histogram bins (L, a, b) and the a/b range they cover
+LAB_BINS = (4, 6, 6)
+AB_RANGE = (-60.0, 60.0)
+# Gradient magnitude and orientation histograms for texture (pebbled vs. smooth)
+TEXTURE_BINS = 8
+MAX_LOG_GRADIENT = float(np.log1p(50.0))
+TEXTURE_WEIGHT = 0.5
+# Near-white, low-chroma pixels are treated as studio background
+BACKGROUND_LIGHTNESS = 90.0
+BACKGROUND_CHROMA = 8.0
+MIN_FOREGROUND_FRACTION = 0.05
+
+FEATURE_DIM = int(np.prod(LAB_BINS)) + 2 * TEXTURE_BINS
+
+# sRGB (D65) to XYZ, and the D65 reference white
+RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """CIE Lab for an (..., 3) array of sRGB values in [0, 1]"""
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = (linear @ RGB_TO_XYZ.T) / D65_WHITE
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16.0 / 116.0)
+    lightness = 116.0 * f[..., 1] - 16.0
+    a = 500.0 * (f[..., 0] - f[..., 1])
+    b = 200.0 * (f[..., 1] - f[..., 2])
+    return np.stack([lightness, a, b], axis=-1)
+
+
+def foreground_mask(lab: np.ndarray) -> np.ndarray:
+    """Pixels that are not plain white background (all pixels if too few remain)"""
+    chroma = np.hypot(lab[..., 1], lab[..., 2])
+    mask = ~((lab[..., 0] > BACKGROUND_LIGHTNESS) & (chroma < BACKGROUND_CHROMA))
+    if mask.mean() < MIN_FOREGROUND_FRACTION:
+        return np.ones_like(mask)
+    return mask
+
+
+def interior(mask: np.ndarray, radius: int = 2) -> np.ndarray:
+    """Mask eroded by `radius` pixels, so the product outline doesn't count as texture"""
+    eroded = mask.copy()
+    for _ in range(radius):
+        shrunk = eroded.copy()
+        shrunk[1:, :] &= eroded[:-1, :]
+        shrunk[:-1, :] &= eroded[1:, :]
+        shrunk[:, 1:] &= eroded[:, :-1]
+        shrunk[:, :-1] &= eroded[:, 1:]
+        eroded = shrunk
+    return eroded if eroded.any() else mask
+
+
+def _normalized(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def color_histogram(lab: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Square-rooted (Hellinger) joint Lab histogram of the foreground"""
+    pixels = lab[mask]
+    pixels = np.column_stack([
+        np.clip(pixels[:, 0], 0.0, 100.0),
+        np.clip(pixels[:, 1], *AB_RANGE),
+        np.clip(pixels[:, 2], *AB_RANGE),
+    ])
+    histogram, _edges = np.histogramdd(pixels, bins=LAB_BINS, range=((0.0, 100.0), AB_RANGE, AB_RANGE))
+    histogram = histogram.ravel()
+    return np.sqrt(histogram / max(histogram.sum(), 1.0))
+
+
+def texture_descriptor(lightness: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Histograms of gradient strength and (strength-weighted) orientation of the foreground"""
+    gy, gx = np.gradient(lightness)
+    magnitude = np.hypot(gx, gy)[mask]
+    orientation = np.mod(np.arctan2(gy, gx), np.pi)[mask]
+    strength, _edges = np.histogram(
+        np.minimum(np.log1p(magnitude), MAX_LOG_GRADIENT), bins=TEXTURE_BINS, range=(0.0, MAX_LOG_GRADIENT)
+    )
+    direction, _edges = np.histogram(orientation, bins=TEXTURE_BINS, range=(0.0, np.pi), weights=magnitude)
+    strength = strength / max(strength.sum(), 1.0)
+    direction = direction / max(direction.sum(), 1e-9)
+    return np.sqrt(np.concatenate([strength, direction]))
+
+
+def features_from_rgb(rgb: np.ndarray) -> np.ndarray:
+    """Unit-length float32 descriptor for an (h, w, 3) sRGB array in [0, 1]"""
+    lab = rgb_to_lab(rgb)
+    mask = foreground_mask(lab)
+    color = _normalized(color_histogram(lab, mask))
+    texture = _normalized(texture_descriptor(lab[..., 0], interior(mask))) * TEXTURE_WEIGHT
+    return _normalized(np.concatenate([color, texture])).astype(np.float32)
+
+
+def extract_features(path: str, size: Tuple[int, int] = (ANALYSIS_SIZE, ANALYSIS_SIZE)) -> Optional[np.ndarray]:
+    """Descriptor for an image file, or None if it cannot be read"""
+    try:
+        with Image.open(path) as img:
+            img = img.convert("RGB")
+            img.thumbnail(size)
+            rgb = np.asarray(img, dtype=np.float64) / 255.0
+    except (OSError, ValueError):
+        return None
+    return features_from_rgb(rgb)
@@ -0,0 +1,208 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+import time
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import catalog_cache
+from app.core.config import settings
+from app.core.postgresql import AsyncSessionLocal
+from app.models.sqlalchemy_models import Product
+from app.schemas.product import ProductFilters, ProductResponse
+from app.services.catalog_query import CatalogQuery, next_cursor
+from app.services.facet_service import facet_service
+
+logger = logging.getLogger(__name__)
+
+# Sort orders offered on the storefront category pages
+LANDING_SORTS: List[Tuple[str, str]] = [
+    ("created_at", "desc"),
+    ("price", "asc"),
+    ("price", "desc"),
+    ("rating", "desc"),
+]
+# Writes arriving within this window are refreshed together
+REFRESH_DEBOUNCE_SECONDS = 1.0
+# Landing key segment for the unfiltered "all products" listing
+ALL_PRODUCTS = "*"
+
+
+def landing_page_key(category: Optional[str], sort_by: str, sort_order: str, page: int) -> str:
+    return f"catalog:landing:page:{category or ALL_PRODUCTS}:{sort_by}:{sort_order}:{page}"
+
+
+def landing_facets_key(category: Optional[str]) -> str:
+    return f"catalog:landing:facets:{category or ALL_PRODUCTS}"
+
+
+def landing_body(page: bytes, facets: Optional[bytes]) -> bytes:
+    """ProductListResponse body from a stored page (a JSON object without `facets`) and facet counts"""
+    return page[:-1] + b',"facets":' + (facets if facets is not None else b"null") + b"}"
+
+
+class LandingPages:
+    """
+    Ready-to-send JSON for the default category listings: the first
+    CATALOG_LANDING_PAGES pages of every category (and of the unfiltered
+    catalog) in each LANDING_SORTS order, plus each category's facet counts.
+
+    Payloads live in the catalog cache and are rebuilt by a background task,
+    on a timer and shortly after product writes mark their category changed,
+    so landing requests never wait on the listing or facet queries. Requests
+    with any other filter, page size or projection go to the database as usual.
+    """
+
+    def __init__(self):
+        # Categories written to since the last rebuild
+        self._changed: Set[str] = set()
+        self._refresh_all = False
+        self._changed_event = asyncio.Event()
+
+    def serves(self, filters: ProductFilters, sort_by: str, sort_order: str, page: int, limit: int) -> bool:
+        """Whether a listing request is one of the precomputed combinations"""
+        return (
+            filters == ProductFilters(category=filters.category)
+            and (sort_by, sort_order) in LANDING_SORTS
+            and page <= settings.CATALOG_LANDING_PAGES
+            and limit == settings.CATALOG_LANDING_PAGE_SIZE
+        )
+
+    def _page_payloads(
+        self,
+        products: List[Product],
+        total: int,
+        has_more: bool,
+        sort_by: str,
+        sort_order: str
+    ) -> Dict[int, Dict[str, Any]]:
+        """Split the rows of the first N pages (fetched as one) into per-page payloads"""
+        size = settings.CATALOG_LANDING_PAGE_SIZE
+        total_pages = (total + size - 1) // size
+        payloads: Dict[int, Dict[str, Any]] = {}
+        for page in range(1, settings.CATALOG_LANDING_PAGES + 1):
+            rows = products[(page - 1) * size:page * size]
+            more = len(products) > page * size or (has_more and page == settings.CATALOG_LANDING_PAGES)
+            payloads[page] = {
+                "products": [ProductResponse.from_orm(product).model_dump() for product in rows],
+                "total": total,
+                "page": page,
+                "limit": size,
+                "total_pages": total_pages,
+                "next_cursor": next_cursor(rows, sort_by, sort_order) if more else None,
+                "suggestions": [],
+            }
+        return payloads
+
+    async def _build_pages(
+        self,
+        db: AsyncSession,
+        category: Optional[str],
+        sort_by: str,
+        sort_order: str
+    ) -> Dict[int, Dict[str, Any]]:
+        # All precomputed pages of one sort order in a single query
+        products, total, has_more = await CatalogQuery(ProductFilters(category=category)).fetch_page(
+            db, sort_by, sort_order, 1, settings.CATALOG_LANDING_PAGES * settings.CATALOG_LANDING_PAGE_SIZE
+        )
+        return self._page_payloads(products, total, has_more, sort_by, sort_order)
+
+    async def _load_page(self, category: Optional[str], sort_by: str, sort_order: str, page: int) -> Dict[str, Any]:
+        async with AsyncSessionLocal() as db:
+            return (await self._build_pages(db, category, sort_by, sort_order))[page]
+
+    async def _load_facets(self, category: Optional[str]) -> Dict[str, Any]:
+        async with AsyncSessionLocal() as db:
+            return await facet_service.facet_counts(db, CatalogQuery(ProductFilters(category=category)).where)
+
+    async def get(
+        self,
+        category: Optional[str],
+        sort_by: str,
+        sort_order: str,
+        page: int,
+        include_facets: bool
+    ) -> bytes:
+        """Serialized ProductListResponse for a precomputed combination (loaded on a cold cache)"""
+        ttl = settings.CATALOG_LANDING_TTL_SECONDS
+        body = await catalog_cache.get_or_load(
+            landing_page_key(category, sort_by, sort_order, page),
+            lambda: self._load_page(category, sort_by, sort_order, page),
+            ttl=ttl
+        )
+        facets = None
+        if include_facets:
+            facets = await catalog_cache.get_or_load(
+                landing_facets_key(category), lambda: self._load_facets(category), ttl=ttl
+            )
+        return landing_body(body, facets)
+
+    async def refresh_category(self, db: AsyncSession, category: Optional[str]) -> None:
+        """Recompute and store every payload of one category (None: the unfiltered listing)"""
+        ttl = settings.CATALOG_LANDING_TTL_SECONDS
+        facets = await facet_service.facet_counts(db, CatalogQuery(ProductFilters(category=category)).where)
+        await catalog_cache.set(landing_facets_key(category), facets, ttl=ttl)
+        for sort_by, sort_order in LANDING_SORTS:
+            for page, payload in (await self._build_pages(db, category, sort_by, sort_order)).items():
+                await catalog_cache.set(landing_page_key(category, sort_by, sort_order, page), payload, ttl=ttl)
+
+    async def refresh(self, db: AsyncSession, categories: Optional[Set[Optional[str]]] = None) -> int:
+        """Rebuild the given categories, or every active category when None; returns how many were rebuilt"""
+        started = time.monotonic()
+        if categories is None:
+            result = await db.execute(select(Product.category).distinct().where(Product.is_active == True))
+            categories = {None, *(row[0] for row in result.fetchall())}
+        for category in categories:
+            await self.refresh_category(db, category)
+        logger.info(f"Refreshed {len(categories)} category landing pages in {time.monotonic() - started:.1f}s")
+        return len(categories)
+
+    def mark_changed(self, *categories: Optional[str]) -> None:
+        """
+        Queue a rebuild after a product write. No arguments means every
+        category (e.g. a deleted product's category is no longer known).
+        """
+        if categories:
+            self._changed.update(category for category in categories if category)
+        else:
+            self._refresh_all = True
+        self._changed_event.set()
+
+    async def wait_for_changes(self, timeout: float) -> Optional[Set[Optional[str]]]:
+        """
+        Sleep until a write marks categories changed or `timeout` elapses.
+        Returns the categories to rebuild (always including the unfiltered
+        listing), or None for a full rebuild.
+        """
+        try:
+            await asyncio.wait_for(self._changed_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            self._changed, self._refresh_all = set(), False
+            return None
+        # Let a burst of writes (e.g. an admin editing several products) settle
+        await asyncio.sleep(REFRESH_DEBOUNCE_SECONDS)
+        self._changed_event.clear()
+        changed, refresh_all = self._changed, self._refresh_all
+        self._changed, self._refresh_all = set(), False
+        if refresh_all:
+            return None
+        return {None, *changed}
+
+
+landing_pages = LandingPages()
+
+
+async def refresh_landing_pages(categories: Optional[Set[Optional[str]]] = None) -> None:
+    """Run one landing page rebuild in its own session, logging failures"""
+    try:
+        async with AsyncSessionLocal() as db:
+            await landing_pages.refresh(db, categories)
+    except Exception as e:
+        logger.error(f"Failed to refresh category landing pages: {e}")
+
+
+async def refresh_landing_pages_periodically() -> None:
+    """Background task that precomputes landing pages, then keeps them current"""
+    categories = None
+    while True:
+        await refresh_landing_pages(categories)
+        categories = await landing_pages.wait_for_changes(settings.CATALOG_LANDING_REFRESH_SECONDS)
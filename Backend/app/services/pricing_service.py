@@ -0,0 +1,303 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+import hashlib
+import json
+import logging
+import uuid
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, update, delete, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import catalog_cache
+from app.core.config import settings
+from app.core.exceptions import ConflictException, ValidationException
+from app.models.sqlalchemy_models import Cart, Coupon, Product
+
+logger = logging.getLogger(__name__)
+
+PRICES_EPOCH_KEY = "pricing:epoch"
+# Epochs must outlive every quote stored under them, or an expired epoch could
+# fall back to a value an old quote was versioned with
+EPOCH_TTL_SECONDS = 86400
+PLACEHOLDER_IMAGE = "/placeholder.svg"
+CENT = Decimal("0.01")
+
+
+def quote_key(user_id: Any) -> str:
+    return f"pricing:quote:{user_id}"
+
+
+def cart_epoch_key(user_id: Any) -> str:
+    return f"pricing:cart:{user_id}"
+
+
+def money(value: float) -> float:
+    """Round to cents, half up"""
+    return float(Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP))
+
+
+def normalize_code(code: Optional[str]) -> Optional[str]:
+    return code.strip().upper() or None if code else None
+
+
+def coupon_discount(coupon: Optional[Coupon], subtotal: float, now: datetime) -> Tuple[float, Optional[str]]:
+    """Discount a coupon gives on `subtotal`, or 0 and the reason it doesn't apply"""
+    if coupon is None:
+        return 0.0, "Invalid coupon code"
+    if not coupon.is_active:
+        return 0.0, "Coupon is not active"
+    if coupon.valid_from and coupon.valid_from > now:
+        return 0.0, "Coupon is not yet valid"
+    if coupon.valid_until and coupon.valid_until < now:
+        return 0.0, "Coupon has expired"
+    if coupon.usage_limit is not None and coupon.used_count >= coupon.usage_limit:
+        return 0.0, "Coupon usage limit exceeded"
+    if coupon.minimum_amount and subtotal < coupon.minimum_amount:
+        return 0.0, f"Minimum order amount of ${coupon.minimum_amount:.2f} required"
+
+    if coupon.discount_type == "percentage":
+        discount = subtotal * coupon.discount_value / 100
+        if coupon.maximum_discount:
+            discount = min(discount, coupon.maximum_discount)
+    else:
+        discount = coupon.discount_value
+    return money(min(discount, subtotal)), None
+
+
+def price_lines(
+    lines: List[Dict[str, Any]],
+    coupon_code: Optional[str] = None,
+    coupon: Optional[Coupon] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Totals for lines carrying `product_price` and `quantity`, in one pass: the
+    coupon discounts the subtotal, shipping is free from the threshold (after
+    discount) and tax applies to the discounted subtotal, not to shipping.
+    Each line gets its `subtotal`.
+    """
+    for line in lines:
+        line["subtotal"] = money(line["product_price"] * line["quantity"])
+    subtotal = money(sum(line["subtotal"] for line in lines))
+
+    discount, coupon_error = 0.0, None
+    if coupon_code:
+        discount, coupon_error = coupon_discount(coupon, subtotal, now or datetime.utcnow())
+    taxable = money(subtotal - discount)
+
+    if not lines or taxable >= settings.PRICING_FREE_SHIPPING_THRESHOLD:
+        shipping_cost = 0.0
+    else:
+        shipping_cost = money(settings.PRICING_SHIPPING_COST)
+    tax = money(taxable * settings.PRICING_TAX_RATE)
+
+    return {
+        "items": lines,
+        "total_items": sum(line["quantity"] for line in lines),
+        "subtotal": subtotal,
+        "discount": discount,
+        "shipping_cost": shipping_cost,
+        "tax": tax,
+        "total": money(taxable + shipping_cost + tax),
+        "coupon_code": coupon_code,
+        "coupon_error": coupon_error,
+    }
+
+
+def product_line(product: Product, quantity: int, size: Optional[str], color: Optional[str]) -> Dict[str, Any]:
+    """A line for price_lines at the product's catalog price"""
+    return {
+        "product_id": str(product.id),
+        "product_name": product.name,
+        "product_image": product.images[0] if product.images else PLACEHOLDER_IMAGE,
+        "product_price": product.price,
+        "quantity": quantity,
+        "size": size,
+        "color": color,
+    }
+
+
+class PricingService:
+    """
+    The one place checkout totals are computed, always from catalog prices.
+
+    Cart quotes are cached in Redis (not the per-worker L1, so every worker sees
+    the same quote) and versioned by a prices epoch, bumped on product and
+    coupon writes, a per-user cart epoch, bumped on cart writes, the coupon code
+    and the pricing rules. A cached quote whose version is outdated is priced
+    again; checkout reuses the current quote instead of recomputing totals.
+    """
+
+    def _version(self, prices_epoch: Optional[bytes], cart_epoch: Optional[bytes], coupon_code: Optional[str]) -> str:
+        digest = hashlib.sha1()
+        for part in (
+            prices_epoch, cart_epoch, coupon_code,
+            settings.PRICING_TAX_RATE, settings.PRICING_SHIPPING_COST, settings.PRICING_FREE_SHIPPING_THRESHOLD
+        ):
+            digest.update(part if isinstance(part, bytes) else str(part).encode())
+            digest.update(b"\x00")
+        return digest.hexdigest()[:20]
+
+    async def _load_coupon(self, db: AsyncSession, code: str) -> Optional[Coupon]:
+        result = await db.execute(select(Coupon).where(Coupon.code == code))
+        return result.scalar_one_or_none()
+
+    async def _cart_lines(self, db: AsyncSession, user_id: Any) -> List[Dict[str, Any]]:
+        result = await db.execute(
+            select(Cart, Product)
+            .join(Product, Cart.product_id == Product.id)
+            .where(Cart.user_id == user_id, Product.is_active == True)
+            .order_by(Cart.created_at, Cart.id)
+        )
+        lines = []
+        for cart_item, product in result.all():
+            line = product_line(product, cart_item.quantity, cart_item.size, cart_item.color)
+            line.update(id=str(cart_item.id), created_at=cart_item.created_at, updated_at=cart_item.updated_at)
+            lines.append(line)
+        return lines
+
+    async def cart_quote(self, db: AsyncSession, user_id: Any, coupon_code: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Priced cart of a user (active products only) with its `version`. Served
+        from the cached quote while nothing it depends on has changed.
+        """
+        code = normalize_code(coupon_code)
+        # Epochs are read before the cart, so a write landing meanwhile outdates this quote
+        prices_epoch, cart_epoch, cached = await catalog_cache.get_shared(
+            [PRICES_EPOCH_KEY, cart_epoch_key(user_id), quote_key(user_id)]
+        )
+        version = self._version(prices_epoch, cart_epoch, code)
+        if cached is not None:
+            quote = json.loads(cached)
+            if quote["version"] == version:
+                return quote
+
+        lines = await self._cart_lines(db, user_id)
+        coupon = await self._load_coupon(db, code) if code else None
+        quote = jsonable_encoder({"version": version, **price_lines(lines, code, coupon)})
+        await catalog_cache.set(quote_key(user_id), quote, ttl=settings.PRICING_QUOTE_TTL_SECONDS, local=False)
+        return quote
+
+    async def price_items(
+        self,
+        db: AsyncSession,
+        items: List[Any],
+        coupon_code: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Price items given directly (objects with product_id, quantity and
+        optional size/color) at current catalog prices; client prices are never used
+        """
+        product_ids = []
+        for item in items:
+            try:
+                product_ids.append(uuid.UUID(str(item.product_id)))
+            except ValueError:
+                raise ValidationException(f"Invalid product_id format: {item.product_id}")
+        result = await db.execute(select(Product).where(Product.id.in_(product_ids), Product.is_active == True))
+        products = {product.id: product for product in result.scalars().all()}
+
+        lines = []
+        for product_id, item in zip(product_ids, items):
+            product = products.get(product_id)
+            if product is None:
+                raise ValidationException(f"Product {product_id} is not available")
+            lines.append(product_line(product, item.quantity, getattr(item, "size", None), getattr(item, "color", None)))
+
+        return await self.quote_lines(db, lines, coupon_code)
+
+    async def quote_lines(
+        self,
+        db: AsyncSession,
+        lines: List[Dict[str, Any]],
+        coupon_code: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """price_lines for lines built with product_line, loading the coupon"""
+        code = normalize_code(coupon_code)
+        coupon = await self._load_coupon(db, code) if code else None
+        return price_lines(lines, code, coupon)
+
+    def redeem_statement(self, code: str, now: datetime):
+        """Guarded increment of a coupon's uses: only while it is active, in its validity window and under its limit"""
+        return (
+            update(Coupon)
+            .where(
+                Coupon.code == code,
+                Coupon.is_active == True,
+                Coupon.valid_from <= now,
+                Coupon.valid_until >= now,
+                or_(Coupon.usage_limit.is_(None), Coupon.used_count < Coupon.usage_limit)
+            )
+            .values(used_count=Coupon.used_count + 1)
+            .returning(Coupon.id)
+        )
+
+    async def redeem_coupon(self, db: AsyncSession, code: str) -> None:
+        """
+        Count one use of a coupon at checkout; fails if it was deactivated, expired
+        or had its last use taken since it was quoted. The caller commits.
+        """
+        # Naive UTC, like the validity check in coupon_discount
+        result = await db.execute(self.redeem_statement(code, datetime.utcnow()))
+        if result.scalar_one_or_none() is None:
+            raise ValidationException("Coupon is no longer valid or its usage limit was reached")
+
+    def checkout_statement(self, user_id: Any, cart_ids: List[uuid.UUID]):
+        """
+        Delete cart rows, selecting each deleted row's quantity with its product's
+        current price and availability. The products are locked for share, so a
+        price write waits for the checkout to commit.
+        """
+        deleted = (
+            delete(Cart)
+            .where(Cart.user_id == user_id, Cart.id.in_(cart_ids))
+            .returning(Cart.id, Cart.product_id, Cart.quantity)
+            .cte("deleted")
+        )
+        return (
+            select(deleted.c.id, deleted.c.quantity, Product.price, Product.is_active)
+            .join(Product, Product.id == deleted.c.product_id)
+            .with_for_update(read=True, of=Product)
+        )
+
+    async def take_quoted_cart(self, db: AsyncSession, user_id: Any, quote: Dict[str, Any]) -> None:
+        """
+        Delete the cart rows a quote priced, checking them in the same statement:
+        the same rows and quantities, with every product still active at the
+        quoted price. The quote's version alone can't be trusted for that, as an
+        epoch bump is lost while Redis is unreachable. On a mismatch, rolls back,
+        outdates the cached quotes and raises a conflict. Does not commit.
+        """
+        quoted = {item["id"]: item for item in quote["items"]}
+        result = await db.execute(self.checkout_statement(user_id, [uuid.UUID(item_id) for item_id in quoted]))
+        rows = {str(cart_id): (quantity, price, is_active) for cart_id, quantity, price, is_active in result.all()}
+        cart_matches = {cart_id: row[0] for cart_id, row in rows.items()} == {
+            cart_id: item["quantity"] for cart_id, item in quoted.items()
+        }
+        prices_match = all(
+            is_active and price == quoted[cart_id]["product_price"]
+            for cart_id, (_quantity, price, is_active) in rows.items()
+        )
+        if cart_matches and prices_match:
+            return
+
+        await db.rollback()
+        if not cart_matches:
+            await self.cart_changed(user_id)
+        if not prices_match:
+            await self.prices_changed()
+        raise ConflictException("Your cart or its prices changed, please review it before placing the order")
+
+    async def _bump(self, key: str) -> None:
+        await catalog_cache.bump(key, ttl=EPOCH_TTL_SECONDS)
+
+    async def cart_changed(self, user_id: Any) -> None:
+        """Call after a user's cart rows were written and committed"""
+        await self._bump(cart_epoch_key(user_id))
+
+    async def prices_changed(self) -> None:
+        """Call after product prices/availability or coupons changed and were committed"""
+        await self._bump(PRICES_EPOCH_KEY)
+
+
+pricing_service = PricingService()
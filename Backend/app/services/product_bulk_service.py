@@ -0,0 +1,340 @@
+from typing import Any, AsyncIterator, Dict, IO, Iterator, List, Optional, Tuple
+import asyncio
+import csv
+import io
+import itertools
+import json
+import logging
+import re
+from pydantic import ValidationError
+from sqlalchemy import select, func, cast, text, literal, literal_column, table, column, case, or_, any_, Text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.exceptions import BadRequestException
+from app.core.postgresql import AsyncSessionLocal
+from app.models.sqlalchemy_models import Product
+from app.schemas.product import ProductCreate
+from app.services.variant_service import variant_service
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+
+# Columns accepted on import and written on export, in file order
+PRODUCT_COLUMNS = [
+    "sku", "name", "slug", "description", "price", "original_price", "category",
+    "subcategory", "brand", "images", "specifications", "features", "sizes",
+    "colors", "stock_quantity", "is_active", "is_featured", "tags",
+    "seo_title", "seo_description",
+]
+LIST_COLUMNS = {"images", "features", "sizes", "colors", "tags"}
+BOOL_COLUMNS = {"is_active", "is_featured"}
+JSON_COLUMNS = {"specifications"}
+
+# CSV list cells are pipe-separated ("S|M|L"); specifications is a JSON object
+CSV_LIST_SEPARATOR = "|"
+
+STAGING_TABLE = "product_import_staging"
+COPY_BATCH_SIZE = 1000
+# Errors listed in the report; the total is always returned
+MAX_REPORTED_ERRORS = 200
+EXPORT_FETCH_SIZE = 500
+
+
+def detect_format(filename: Optional[str], requested: Optional[str] = None) -> str:
+    """Pick csv/ndjson from an explicit format or the file extension"""
+    if requested:
+        if requested not in FORMATS:
+            raise BadRequestException(f"Format must be one of: {', '.join(FORMATS)}")
+        return requested
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if name.endswith(".csv"):
+        return "csv"
+    raise BadRequestException("Cannot infer the file format; pass format=csv or format=ndjson")
+
+
+def parse_csv_cell(name: str, value: str) -> Any:
+    """Convert a CSV cell to the value ProductCreate expects; blank cells are omitted"""
+    if value is None or value.strip() == "":
+        return None
+    value = value.strip()
+    if name in LIST_COLUMNS:
+        return [item.strip() for item in value.split(CSV_LIST_SEPARATOR) if item.strip()]
+    if name in BOOL_COLUMNS:
+        lowered = value.lower()
+        if lowered in ("true", "1", "yes"):
+            return True
+        if lowered in ("false", "0", "no"):
+            return False
+        raise ValueError(f"{name} must be true or false")
+    if name in JSON_COLUMNS:
+        return json.loads(value)
+    return value
+
+
+def iter_source_rows(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield (row number, raw record) from an uploaded file without reading it all
+    into memory: a dict of cells for CSV, the line text for NDJSON. Row numbers
+    are 1-based data rows.
+    """
+    reader = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        yield from enumerate(csv.DictReader(reader), start=1)
+    else:
+        number = 0
+        for line in reader:
+            if line.strip():
+                number += 1
+                yield number, line
+
+
+def row_fields(record: Any, fmt: str) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Turn a raw record into ProductCreate keyword arguments (unknown columns are
+    ignored), plus the columns the record provides: the CSV header columns, or
+    the keys of an NDJSON object. Only those are written to existing products;
+    a provided column left blank or null is reset to its default.
+    """
+    if fmt == "csv":
+        if None in record:
+            raise ValueError("Row has more cells than the header")
+        fields = {}
+        for name, value in record.items():
+            if name in PRODUCT_COLUMNS:
+                parsed = parse_csv_cell(name, value)
+                if parsed is not None:
+                    fields[name] = parsed
+        return fields, [name for name in record if name in PRODUCT_COLUMNS]
+    data = json.loads(record)
+    if not isinstance(data, dict):
+        raise ValueError("Each NDJSON line must be a JSON object")
+    fields = {name: value for name, value in data.items() if name in PRODUCT_COLUMNS and value is not None}
+    return fields, [name for name in data if name in PRODUCT_COLUMNS]
+
+
+def _error_messages(error: Exception) -> List[str]:
+    if isinstance(error, ValidationError):
+        return [
+            f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}"
+            for item in error.errors()
+        ]
+    return [str(error)]
+
+
+def validate_row(fields: Dict[str, Any]) -> ProductCreate:
+    """Apply the ProductCreate rules; bulk rows are keyed by SKU, so it is required"""
+    product = ProductCreate(**fields)
+    if not product.sku:
+        raise ValueError("sku is required for bulk import")
+    if product.price is None:
+        raise ValueError("price is required")
+    return product
+
+
+def default_slug(name: str, sku: str) -> str:
+    """Slug for an imported product without one; the SKU suffix keeps it unique"""
+    return re.sub(r"[^a-z0-9]+", "-", f"{name} {sku}".lower()).strip("-")[:255]
+
+
+def read_rows(
+    rows: Iterator[Tuple[int, Any]],
+    fmt: str,
+    limit: int
+) -> Tuple[List[Tuple[int, Optional[str], Optional[ProductCreate], List[str]]], Optional[str]]:
+    """
+    Read and validate up to `limit` rows from iter_source_rows. Blocking (file
+    reads, parsing), so import_products runs it in a worker thread. Returns
+    (row number, sku, product or None, provided columns or error messages)
+    per row, and an error if the input became unreadable.
+    """
+    parsed = []
+    try:
+        for number, record in itertools.islice(rows, limit):
+            try:
+                fields, provided = row_fields(record, fmt)
+                product = validate_row(fields)
+                parsed.append((number, product.sku, product, provided))
+            except (ValidationError, ValueError) as e:
+                sku = record.get("sku") if isinstance(record, dict) else None
+                parsed.append((number, sku, None, _error_messages(e)))
+    except (csv.Error, UnicodeDecodeError) as e:
+        # Broken file structure or encoding: nothing after this point can be trusted
+        return parsed, f"Unreadable input: {e}"
+    return parsed, None
+
+
+def staging_record(product: ProductCreate, provided: List[str]) -> Tuple[Any, ...]:
+    """Row tuple for COPY into the staging table: PRODUCT_COLUMNS order, then the provided columns"""
+    values = product.model_dump()
+    values["specifications"] = json.dumps(values.get("specifications") or {})
+    values["slug"] = values.get("slug") or default_slug(product.name, product.sku)
+    return (*(values.get(name) for name in PRODUCT_COLUMNS), provided)
+
+
+class ProductBulkService:
+    """Bulk product import (COPY into a staging table + upsert by SKU) and streaming export"""
+
+    def _staging_ddl(self) -> str:
+        dialect = postgresql.dialect()
+        columns = []
+        for name in PRODUCT_COLUMNS:
+            column_type = Product.__table__.c[name].type
+            # Stage JSON as text; it is cast on the way into products
+            type_sql = "text" if name in JSON_COLUMNS else column_type.compile(dialect=dialect)
+            columns.append(f"{name} {type_sql}")
+        columns.append("provided text[]")
+        return f"CREATE TEMP TABLE {STAGING_TABLE} ({', '.join(columns)}) ON COMMIT DROP"
+
+    def upsert_statement(self):
+        """
+        INSERT ... SELECT from staging, updating existing products matched by
+        SKU. An existing product keeps the values of columns its row didn't
+        provide (and its slug unless one was given), so partial files only
+        change what they list.
+        """
+        staging = table(STAGING_TABLE, *[column(name) for name in PRODUCT_COLUMNS], column("provided", ARRAY(Text)))
+        existing = Product.__table__.alias("existing")
+
+        def source_column(name: str):
+            staged = cast(staging.c[name], Product.__table__.c[name].type) if name in JSON_COLUMNS else staging.c[name]
+            if name == "sku":
+                return staged
+            kept = func.coalesce(existing.c.slug, staged) if name == "slug" else existing.c[name]
+            written = or_(existing.c.id.is_(None), literal(name) == any_(staging.c.provided))
+            return case((written, staged), else_=kept)
+
+        stmt = insert(Product).from_select(
+            ["id", *PRODUCT_COLUMNS],
+            select(func.gen_random_uuid(), *[source_column(name) for name in PRODUCT_COLUMNS])
+            .select_from(staging.outerjoin(existing, existing.c.sku == staging.c.sku))
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.sku],
+            set_={
+                **{name: stmt.excluded[name] for name in PRODUCT_COLUMNS if name != "sku"},
+                "updated_at": func.now(),
+            }
+        )
+        # xmax is 0 only for freshly inserted rows
+        return stmt.returning(Product.id, Product.slug, literal_column("xmax = 0").label("inserted"))
+
+    async def _copy(self, db: AsyncSession, records: List[Tuple[Any, ...]]) -> None:
+        connection = await db.connection()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            STAGING_TABLE, records=records, columns=[*PRODUCT_COLUMNS, "provided"]
+        )
+
+    async def import_products(self, db: AsyncSession, stream: IO[bytes], fmt: str) -> Dict[str, Any]:
+        """
+        Validate and stage every row, then upsert them in one statement. Rows
+        that fail validation are reported and skipped; the rest are applied in
+        a single transaction. Returns counts, per-row errors and changed products.
+        """
+        errors: List[Dict[str, Any]] = []
+        error_count = 0
+        seen_skus: Dict[str, int] = {}
+        batch: List[Tuple[Any, ...]] = []
+        staged = 0
+
+        await db.execute(text(self._staging_ddl()))
+
+        def add_error(row: int, sku: Optional[str], messages: List[str]) -> None:
+            nonlocal error_count
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": row, "sku": sku, "errors": messages})
+
+        rows = iter_source_rows(stream, fmt)
+        number = 0
+        while True:
+            parsed, unreadable = await asyncio.to_thread(read_rows, rows, fmt, COPY_BATCH_SIZE)
+            for number, sku, product, details in parsed:
+                if product is None:
+                    add_error(number, sku, details)
+                    continue
+                if product.sku in seen_skus:
+                    add_error(number, product.sku, [f"Duplicate SKU (first seen on row {seen_skus[product.sku]})"])
+                    continue
+                seen_skus[product.sku] = number
+                batch.append(staging_record(product, details))
+            if unreadable:
+                add_error(number + 1, None, [unreadable])
+                break
+            if len(batch) >= COPY_BATCH_SIZE:
+                await self._copy(db, batch)
+                staged += len(batch)
+                batch = []
+            if len(parsed) < COPY_BATCH_SIZE:
+                break
+
+        if batch:
+            await self._copy(db, batch)
+            staged += len(batch)
+
+        changed: List[Tuple[Any, Optional[str]]] = []
+        created = 0
+        if staged:
+            result = await db.execute(self.upsert_statement())
+            for product_id, slug, inserted in result.all():
+                changed.append((product_id, slug))
+                created += int(bool(inserted))
+            await variant_service.sync_options(db, [product_id for product_id, _ in changed])
+        await db.commit()
+
+        return {
+            "rows": number,
+            "created": created,
+            "updated": len(changed) - created,
+            "failed": error_count,
+            "errors": errors,
+            "changed": changed,
+        }
+
+    def _export_value(self, name: str, value: Any, fmt: str) -> Any:
+        if fmt == "csv":
+            if value is None:
+                return ""
+            if name in LIST_COLUMNS:
+                return CSV_LIST_SEPARATOR.join(value)
+            if name in JSON_COLUMNS:
+                return json.dumps(value)
+            if name in BOOL_COLUMNS:
+                return "true" if value else "false"
+        return value
+
+    async def export_products(self, fmt: str, is_active: Optional[bool] = None) -> AsyncIterator[str]:
+        """
+        Stream products as CSV or NDJSON from a server-side cursor. Opens its own
+        session because it runs while the response is being sent.
+        """
+        query = select(*[Product.__table__.c[name] for name in PRODUCT_COLUMNS]).order_by(Product.sku)
+        if is_active is not None:
+            query = query.where(Product.is_active == is_active)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == "csv":
+            writer.writerow(PRODUCT_COLUMNS)
+            yield buffer.getvalue()
+
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(query.execution_options(yield_per=EXPORT_FETCH_SIZE))
+            async for partition in result.partitions():
+                buffer.seek(0)
+                buffer.truncate()
+                for row in partition:
+                    values = [self._export_value(name, row[index], fmt) for index, name in enumerate(PRODUCT_COLUMNS)]
+                    if fmt == "csv":
+                        writer.writerow(values)
+                    else:
+                        buffer.write(json.dumps(dict(zip(PRODUCT_COLUMNS, values)), default=str))
+                        buffer.write("\n")
+                yield buffer.getvalue()
+
+
+product_bulk_service = ProductBulkService()
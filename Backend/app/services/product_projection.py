@@ -0,0 +1,83 @@
+from typing import Any, Dict, List, Optional, Sequence
+from datetime import date, datetime
+import json
+import uuid
+from fastapi import Response
+from sqlalchemy.sql.elements import ColumnElement
+from app.core.exceptions import ValidationException
+from app.models.sqlalchemy_models import Product
+from app.schemas.product import ProductResponse
+
+# What a product grid card renders
+CARD_FIELDS = ("id", "name", "slug", "price", "image", "stock_quantity")
+PRESETS = {"card": CARD_FIELDS}
+
+# Response fields backed by a product column, plus `image` (the first image, computed in SQL)
+FIELD_COLUMNS: Dict[str, ColumnElement] = {
+    name: Product.__table__.c[name]
+    for name in ProductResponse.model_fields
+    if name in Product.__table__.c
+}
+FIELD_COLUMNS["image"] = Product.images[1]
+
+
+def parse_fields(value: Optional[str]) -> Optional[List[str]]:
+    """
+    Parse a `fields=` parameter: a preset name ("card") or a comma-separated
+    list of response fields. Returns None (full rows) when not given.
+    """
+    if value is None or not value.strip():
+        return None
+    value = value.strip()
+    if value in PRESETS:
+        return list(PRESETS[value])
+
+    fields: List[str] = []
+    for name in value.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in FIELD_COLUMNS:
+            raise ValidationException(
+                f"Unknown field '{name}'. Use a preset ({', '.join(PRESETS)}) or any of: {', '.join(FIELD_COLUMNS)}"
+            )
+        if name not in fields:
+            fields.append(name)
+    if "id" not in fields:
+        fields.insert(0, "id")
+    return fields
+
+
+def projection_columns(fields: Sequence[str], *extra: ColumnElement) -> List[ColumnElement]:
+    """
+    Labelled columns to select for a projection. `extra` columns (e.g. the sort
+    key needed for a cursor) are selected under their own key but not returned.
+    """
+    columns = [FIELD_COLUMNS[name].label(name) for name in fields]
+    for column in extra:
+        if column.key not in fields:
+            columns.append(column.label(column.key))
+    return columns
+
+
+def project_row(row: Any, fields: Sequence[str]) -> Dict[str, Any]:
+    """Response dict for one projected row"""
+    mapping = row._mapping
+    return {name: mapping[name] for name in fields}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def projected_json(payload: Any) -> Response:
+    """
+    Serialize a projected payload directly. Projected items are plain dicts, so
+    they skip response-model validation and carry only the requested fields.
+    """
+    body = json.dumps(payload, default=_json_default, separators=(",", ":"))
+    return Response(content=body, media_type="application/json")
@@ -0,0 +1,107 @@
+from typing import Any, Dict, List, Optional
+import logging
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.sqlalchemy_models import Product, Review
+
+logger = logging.getLogger(__name__)
+
+STARS = range(1, 6)
+
+
+class RatingService:
+    """
+    Maintains the approved-review aggregates stored on Product (rating_count,
+    rating_sum, per-star histogram; rating_average is a generated column).
+
+    Every review write calls `apply` with the rating the review contributed
+    before and after the write, inside the same transaction, so the counters
+    can never drift from the reviews they summarize.
+    """
+
+    def counted_rating(self, review: Optional[Review]) -> Optional[int]:
+        """Rating a review contributes to the aggregates (None unless approved)"""
+        if review is None or not review.is_approved:
+            return None
+        return review.rating
+
+    def deltas(self, before: Optional[int], after: Optional[int]) -> Dict[int, int]:
+        """Per-star histogram changes for a rating moving from `before` to `after`"""
+        changes: Dict[int, int] = {}
+        if before is not None:
+            changes[before] = changes.get(before, 0) - 1
+        if after is not None:
+            changes[after] = changes.get(after, 0) + 1
+        return {star: delta for star, delta in changes.items() if delta}
+
+    async def apply(
+        self,
+        db: AsyncSession,
+        product_id: Any,
+        before: Optional[int],
+        after: Optional[int]
+    ) -> Optional[str]:
+        """
+        Adjust a product's aggregates in place (a single relative UPDATE, so
+        concurrent review writes don't lose increments). Does not commit.
+        Returns the product slug, or None when nothing changed.
+        """
+        changes = self.deltas(before, after)
+        if not changes:
+            return None
+
+        histogram = array([
+            Product.rating_histogram[star] + changes[star] if star in changes else Product.rating_histogram[star]
+            for star in STARS
+        ])
+        result = await db.execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .values(
+                rating_count=Product.rating_count + ((after is not None) - (before is not None)),
+                rating_sum=Product.rating_sum + ((after or 0) - (before or 0)),
+                rating_histogram=histogram
+            )
+            .returning(Product.slug)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        return row[0] if row else None
+
+    def stats(self, product: Product) -> Dict[str, Any]:
+        """ReviewStats payload read straight from the product row"""
+        histogram: List[int] = list(product.rating_histogram or [0] * 5)
+        return {
+            "total_reviews": product.rating_count or 0,
+            "average_rating": float(product.rating_average or 0),
+            "rating_distribution": {star: histogram[star - 1] for star in STARS},
+        }
+
+    async def rebuild(self, db: AsyncSession, product_id: Any) -> Optional[str]:
+        """
+        Recompute one product's aggregates from its reviews (repair path, see
+        scripts/rebuild_ratings.py). Does not commit. Returns the product slug.
+        """
+        result = await db.execute(
+            select(Review.rating, func.count(Review.id))
+            .where(Review.product_id == product_id, Review.is_approved == True)
+            .group_by(Review.rating)
+        )
+        counts = {rating: count for rating, count in result.fetchall()}
+        result = await db.execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .values(
+                rating_count=sum(counts.values()),
+                rating_sum=sum(rating * count for rating, count in counts.items()),
+                rating_histogram=[counts.get(star, 0) for star in STARS]
+            )
+            .returning(Product.slug)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        return row[0] if row else None
+
+
+rating_service = RatingService()
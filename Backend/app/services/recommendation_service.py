@@ -0,0 +1,228 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+import asyncio
+import logging
+import time
+import numpy as np
+from sqlalchemy import select, delete, insert, func, literal, union_all, Float
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.sqlalchemy_models import (
+    Product, User, Order, OrderItem, Wishlist, Cart, Review, UserRecommendation
+)
+from app.services.trending_service import trending_service, EXCLUDED_ORDER_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Implicit feedback strength per signal (summed per user/product)
+ORDER_WEIGHT = 4.0  # per unit ordered
+WISHLIST_WEIGHT = 2.0
+CART_WEIGHT = 1.0
+REVIEW_WEIGHT = 2.0  # approved reviews of 3+ stars
+# Size of the float32 score matrix for one batch of users when ranking
+SCORE_MEMORY_BYTES = 64 * 1024 * 1024
+WRITE_BATCH_SIZE = 1000
+RANDOM_SEED = 42
+
+Csr = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def to_csr(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, n_rows: int) -> Csr:
+    """(indptr, indices, data) for coordinate triples with no duplicate (row, col)"""
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order], values[order]
+
+
+def _solve_side(matrix: Csr, fixed: np.ndarray, regularization: float, alpha: float) -> np.ndarray:
+    """
+    One ALS half-step: the least-squares factors for every row of `matrix`
+    given the other side's factors. Uses the YᵀY + Yᵤᵀ(Cᵤ − I)Yᵤ identity, so
+    each row only touches the items it interacted with.
+    """
+    indptr, indices, data = matrix
+    n_rows = len(indptr) - 1
+    factors = fixed.shape[1]
+    gram = fixed.T @ fixed + regularization * np.eye(factors)
+    solved = np.zeros((n_rows, factors))
+    for row in range(n_rows):
+        start, end = indptr[row], indptr[row + 1]
+        if start == end:
+            continue
+        interacted = fixed[indices[start:end]]
+        confidence = 1.0 + alpha * data[start:end]
+        a = gram + (interacted.T * (confidence - 1.0)) @ interacted
+        b = interacted.T @ confidence
+        solved[row] = np.linalg.solve(a, b)
+    return solved
+
+
+def train_als(
+    user_items: Csr,
+    item_users: Csr,
+    factors: int,
+    iterations: int,
+    regularization: float,
+    alpha: float,
+    seed: int = RANDOM_SEED
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Implicit-feedback ALS (Hu, Koren & Volinsky 2008): preference 1 for every
+    observed user/item pair, confidence 1 + alpha * weight. Returns
+    (user factors, item factors).
+    """
+    rng = np.random.default_rng(seed)
+    n_users = len(user_items[0]) - 1
+    n_items = len(item_users[0]) - 1
+    user_factors = rng.normal(scale=0.01, size=(n_users, factors))
+    item_factors = rng.normal(scale=0.01, size=(n_items, factors))
+    for _ in range(iterations):
+        user_factors = _solve_side(user_items, item_factors, regularization, alpha)
+        item_factors = _solve_side(item_users, user_factors, regularization, alpha)
+    return user_factors, item_factors
+
+
+def top_n_items(
+    user_factors: np.ndarray,
+    item_factors: np.ndarray,
+    user_items: Csr,
+    n: int,
+    batch_size: Optional[int] = None
+) -> List[np.ndarray]:
+    """
+    Best `n` unseen item indices per user, highest score first. Scores are
+    float32 and users go in batches sized so one batch's scores stay within
+    SCORE_MEMORY_BYTES, whatever the catalog size.
+    """
+    indptr, indices, _data = user_items
+    n_users, n_items = len(user_factors), len(item_factors)
+    n = min(n, n_items)
+    if batch_size is None:
+        batch_size = max(1, SCORE_MEMORY_BYTES // (4 * max(n_items, 1)))
+    items_t = np.ascontiguousarray(item_factors.T, dtype=np.float32)
+    ranked: List[np.ndarray] = []
+    for start in range(0, n_users, batch_size):
+        end = min(start + batch_size, n_users)
+        scores = user_factors[start:end].astype(np.float32) @ items_t
+        # Mask what each user already interacted with
+        seen_rows = np.repeat(np.arange(end - start), np.diff(indptr[start:end + 1]))
+        scores[seen_rows, indices[indptr[start]:indptr[end]]] = -np.inf
+        # Row by row, so no index matrix the size of the batch is allocated
+        for row in scores:
+            candidates = np.argpartition(row, n_items - n)[n_items - n:] if n < n_items else np.arange(n_items)
+            candidate_scores = row[candidates]
+            order = np.argsort(-candidate_scores)
+            ranked.append(candidates[order][np.isfinite(candidate_scores[order])])
+    return ranked
+
+
+def _signal(user_id, product_id, weight):
+    """One branch of the interactions union"""
+    return select(user_id.label("user_id"), product_id.label("product_id"), weight.label("weight"))
+
+
+class RecommendationService:
+    """
+    "Recommended for you" from implicit feedback (orders, wishlist, cart,
+    reviews). Training is a batch job (scripts/train_recommendations.py) that
+    stores each user's top-N product ids in one row; requests read that row and
+    fall back to trending products for users without one.
+    """
+
+    def interactions_query(self):
+        """Summed signal weight per (active user, active product)"""
+        orders = (
+            _signal(Order.user_id, OrderItem.product_id, literal(ORDER_WEIGHT, Float) * OrderItem.quantity)
+            .join(Order, OrderItem.order_id == Order.id)
+            .where(Order.status.notin_(EXCLUDED_ORDER_STATUSES))
+        )
+        wishlist = _signal(Wishlist.user_id, Wishlist.product_id, literal(WISHLIST_WEIGHT, Float))
+        cart = _signal(Cart.user_id, Cart.product_id, literal(CART_WEIGHT, Float))
+        reviews = (
+            _signal(Review.user_id, Review.product_id, literal(REVIEW_WEIGHT, Float))
+            .where(Review.is_approved == True, Review.rating >= 3)
+        )
+        events = union_all(orders, wishlist, cart, reviews).subquery("events")
+        return (
+            select(events.c.user_id, events.c.product_id, func.sum(events.c.weight))
+            .join(User, User.id == events.c.user_id)
+            .join(Product, Product.id == events.c.product_id)
+            .where(User.is_active == True, Product.is_active == True)
+            .group_by(events.c.user_id, events.c.product_id)
+        )
+
+    def fit(self, triples: List[Tuple[Any, Any, float]]) -> Dict[Any, List[Any]]:
+        """Train on (user id, product id, weight) triples; returns top-N product ids per user"""
+        if not triples:
+            return {}
+        user_ids, user_index = np.unique(np.array([t[0] for t in triples], dtype=object), return_inverse=True)
+        item_ids, item_index = np.unique(np.array([t[1] for t in triples], dtype=object), return_inverse=True)
+        weights = np.array([t[2] for t in triples], dtype=np.float64)
+        # Dampen heavy repeat buyers so one user's volume doesn't dominate
+        weights = np.log1p(weights)
+
+        user_items = to_csr(user_index, item_index, weights, len(user_ids))
+        item_users = to_csr(item_index, user_index, weights, len(item_ids))
+        user_factors, item_factors = train_als(
+            user_items,
+            item_users,
+            factors=settings.RECOMMENDER_FACTORS,
+            iterations=settings.RECOMMENDER_ITERATIONS,
+            regularization=settings.RECOMMENDER_REGULARIZATION,
+            alpha=settings.RECOMMENDER_ALPHA
+        )
+        ranked = top_n_items(user_factors, item_factors, user_items, settings.RECOMMENDER_TOP_N)
+        return {
+            user_id: [item_ids[index] for index in items]
+            for user_id, items in zip(user_ids, ranked)
+            if len(items)
+        }
+
+    async def train(self, db: AsyncSession) -> int:
+        """Load interactions, train off the event loop and replace all stored recommendations"""
+        started = time.monotonic()
+        result = await db.execute(self.interactions_query())
+        triples = [(user_id, product_id, float(weight)) for user_id, product_id, weight in result.all()]
+        recommendations = await asyncio.to_thread(self.fit, triples)
+
+        generated_at = datetime.now(timezone.utc)
+        rows = [
+            {"user_id": user_id, "product_ids": product_ids, "generated_at": generated_at}
+            for user_id, product_ids in recommendations.items()
+        ]
+        # Readers keep seeing the previous set until this transaction commits
+        await db.execute(delete(UserRecommendation).execution_options(synchronize_session=False))
+        for start in range(0, len(rows), WRITE_BATCH_SIZE):
+            await db.execute(insert(UserRecommendation), rows[start:start + WRITE_BATCH_SIZE])
+        await db.commit()
+        logger.info(
+            f"Trained recommendations for {len(rows)} users from {len(triples)} interactions "
+            f"in {time.monotonic() - started:.1f}s"
+        )
+        return len(rows)
+
+    async def for_user(self, db: AsyncSession, user_id: Any, limit: int) -> List[Product]:
+        """Stored recommendations (still active products, best first), topped up from trending"""
+        product_ids: List[Any] = (await db.execute(
+            select(UserRecommendation.product_ids).where(UserRecommendation.user_id == user_id)
+        )).scalar() or []
+
+        products: List[Product] = []
+        if product_ids:
+            result = await db.execute(
+                select(Product).where(Product.id.in_(product_ids[:limit * 2]), Product.is_active == True)
+            )
+            by_id = {product.id: product for product in result.scalars().all()}
+            products = [by_id[product_id] for product_id in product_ids if product_id in by_id][:limit]
+
+        if len(products) < limit:
+            # Cold start (or too few left): fill from trending
+            seen = {product.id for product in products}
+            for product, _score in await trending_service.top_products(db, limit + len(products)):
+                if product.id not in seen and len(products) < limit:
+                    products.append(product)
+        return products
+
+
+recommendation_service = RecommendationService()
@@ -0,0 +1,210 @@
+from typing import Deque, Dict, List, Tuple
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+import asyncio
+import heapq
+import logging
+from sqlalchemy import select, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.postgresql import AsyncSessionLocal
+from app.models.sqlalchemy_models import SearchQuery
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("day", "week")
+MAX_QUERY_LENGTH = 255
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so variants of a query count together"""
+    return " ".join(query.lower().split())[:MAX_QUERY_LENGTH]
+
+
+def period_start(period: str, moment: datetime) -> date:
+    """First day of the day/week (ISO, Monday) containing `moment`"""
+    day = moment.astimezone(timezone.utc).date()
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters summary (Metwally et al.). Tracks at most
+    `capacity` items; when a new item arrives and the summary is full it
+    replaces the item with the smallest count and inherits that count as its
+    error bound. Any item occurring more than N/capacity times is guaranteed
+    to be tracked, and reported counts overestimate by at most `error`.
+
+    The smallest count is found with a lazy min-heap: every count change
+    pushes a (count, item) entry and outdated entries are skipped when popped,
+    so an update costs O(log capacity) amortized instead of a scan.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def _push(self, item: str) -> None:
+        heapq.heappush(self._heap, (self._counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            # Drop outdated entries; O(capacity) once every few `capacity` updates
+            self._heap = [(count, item) for item, count in self._counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> str:
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if self._counts.get(item) == count:
+                return item
+
+    def add(self, item: str, count: int = 1) -> None:
+        if item in self._counts:
+            self._counts[item] += count
+        elif len(self._counts) < self.capacity:
+            self._counts[item] = count
+            self._errors[item] = 0
+        else:
+            evicted = self._pop_min()
+            floor = self._counts.pop(evicted)
+            del self._errors[evicted]
+            self._counts[item] = floor + count
+            self._errors[item] = floor
+        self._push(item)
+
+    def top(self, k: int) -> List[Tuple[str, int, int]]:
+        """Top `k` items as (item, estimated count, max overestimate)"""
+        best = heapq.nlargest(k, self._counts.items(), key=lambda entry: (entry[1], entry[0]))
+        return [(item, count, self._errors[item]) for item, count in best]
+
+
+class SearchLog:
+    """
+    Captures search queries without touching the database on the request path.
+
+    `record` appends to an in-memory buffer and updates per-day and per-week
+    Space-Saving summaries (all queries, and zero-result queries separately);
+    a background task writes the buffer to `search_queries` in batches. The
+    summaries are per worker and are re-seeded from the log on startup.
+    """
+
+    def __init__(self):
+        self._buffer: Deque[Tuple[str, int, datetime]] = deque(maxlen=settings.SEARCH_LOG_BUFFER_SIZE)
+        self._flush_requested = asyncio.Event()
+        # (period, "all" | "zero_results") -> (period start, summary)
+        self._summaries: Dict[Tuple[str, str], Tuple[date, SpaceSaving]] = {}
+
+    def _summary(self, period: str, kind: str, moment: datetime) -> SpaceSaving:
+        start = period_start(period, moment)
+        current = self._summaries.get((period, kind))
+        if current is None or current[0] != start:
+            # New day/week: start a fresh summary
+            current = (start, SpaceSaving(settings.SEARCH_TOP_K_CAPACITY))
+            self._summaries[(period, kind)] = current
+        return current[1]
+
+    def _count(self, query: str, zero_results: bool, moment: datetime, times: int = 1, periods=PERIODS) -> None:
+        for period in periods:
+            self._summary(period, "all", moment).add(query, times)
+            if zero_results:
+                self._summary(period, "zero_results", moment).add(query, times)
+
+    def record(self, query: str, result_count: int) -> None:
+        """Log a search; O(log capacity) amortized summary updates, never awaits"""
+        query = normalize_query(query)
+        if not query:
+            return
+        now = datetime.now(timezone.utc)
+        self._count(query, result_count == 0, now)
+        self._buffer.append((query, result_count, now))
+        if len(self._buffer) >= settings.SEARCH_LOG_BATCH_SIZE:
+            self._flush_requested.set()
+
+    def popular(self, period: str, limit: int, zero_results: bool = False) -> List[Dict[str, int]]:
+        """Most frequent queries for the current day/week"""
+        summary = self._summary(period, "zero_results" if zero_results else "all", datetime.now(timezone.utc))
+        return [{"term": term, "count": count} for term, count, _error in summary.top(limit)]
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Write buffered queries in one multi-row INSERT; returns how many were written"""
+        batch = []
+        while self._buffer:
+            query, result_count, created_at = self._buffer.popleft()
+            batch.append({"query": query, "result_count": result_count, "created_at": created_at})
+        if not batch:
+            return 0
+        try:
+            await db.execute(insert(SearchQuery), batch)
+            await db.commit()
+        except Exception:
+            # Put the batch back (oldest first) so the next flush retries it
+            self._buffer.extendleft(
+                (row["query"], row["result_count"], row["created_at"]) for row in reversed(batch)
+            )
+            raise
+        return len(batch)
+
+    def warm_query(self, week_start: datetime, day_start: datetime):
+        """Query counts since week_start, split by today / zero results"""
+        is_today = SearchQuery.created_at >= day_start
+        is_zero = SearchQuery.result_count == 0
+        return (
+            select(SearchQuery.query, is_today, is_zero, func.count())
+            .where(SearchQuery.created_at >= week_start)
+            .group_by(SearchQuery.query, is_today, is_zero)
+        )
+
+    async def warm(self, db: AsyncSession) -> None:
+        """Seed this week's summaries from the persisted log"""
+        now = datetime.now(timezone.utc)
+        week_start = datetime.combine(period_start("week", now), datetime.min.time(), tzinfo=timezone.utc)
+        day_start = datetime.combine(period_start("day", now), datetime.min.time(), tzinfo=timezone.utc)
+        result = await db.execute(self.warm_query(week_start, day_start))
+        for query, is_today, is_zero, count in result.fetchall():
+            self._count(query, is_zero, now, count, PERIODS if is_today else ("week",))
+
+    async def wait_for_flush(self, timeout: float) -> None:
+        """Sleep until the flush interval elapses or a full batch is buffered"""
+        try:
+            await asyncio.wait_for(self._flush_requested.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._flush_requested.clear()
+
+
+search_log = SearchLog()
+
+
+async def flush_search_log() -> None:
+    """Flush buffered search queries in their own session, logging failures"""
+    try:
+        async with AsyncSessionLocal() as db:
+            await search_log.flush(db)
+    except Exception as e:
+        logger.error(f"Failed to flush search query log: {e}")
+
+
+async def warm_search_log() -> None:
+    """Seed popular-search summaries at startup"""
+    try:
+        async with AsyncSessionLocal() as db:
+            await search_log.warm(db)
+    except Exception as e:
+        logger.error(f"Failed to load search query log: {e}")
+
+
+async def flush_search_log_periodically() -> None:
+    """Background task that writes buffered search queries in batches"""
+    try:
+        while True:
+            await search_log.wait_for_flush(settings.SEARCH_LOG_FLUSH_SECONDS)
+            await flush_search_log()
+    finally:
+        # Don't drop what is still buffered on shutdown
+        await asyncio.shield(flush_search_log())
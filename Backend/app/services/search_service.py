@@ -0,0 +1,168 @@
+from typing import Dict, List, Optional, Tuple
+import re
+from sqlalchemy import func, literal, cast, select, or_, desc
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+from app.models.sqlalchemy_models import Product
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration shared by the generated Product.search_vector column
+SEARCH_CONFIG = "english"
+
+# Leather-domain vocabulary. Each group lists interchangeable shopper terms; a query
+# for any member matches products described with any other member. Expansion is done
+# at query time so no dictionary files need to be installed on the database server.
+LEATHER_SYNONYM_GROUPS: List[Tuple[str, ...]] = [
+    ("handbag", "purse", "pocketbook"),
+    ("wallet", "billfold"),
+    ("cardholder", "cardcase"),
+    ("backpack", "rucksack", "knapsack"),
+    ("duffel", "duffle", "holdall"),
+    ("keychain", "keyring", "keyfob"),
+]
+
+LEATHER_SYNONYMS: Dict[str, Tuple[str, ...]] = {
+    term: group for group in LEATHER_SYNONYM_GROUPS for term in group
+}
+
+# One-way expansions: a broad term also matches its narrower kinds ("shoe" finds
+# oxfords), but a narrow term never widens to its siblings or parent.
+LEATHER_NARROWER_TERMS: Dict[str, Tuple[str, ...]] = {
+    "bag": ("handbag", "purse", "clutch", "tote", "satchel", "backpack", "duffel"),
+    "handbag": ("clutch", "tote"),
+    "briefcase": ("attache",),
+    "shoe": ("loafer", "oxford", "brogue"),
+    "footwear": ("shoe", "boot", "loafer", "oxford", "brogue"),
+    "jacket": ("bomber",),
+    "glove": ("gauntlet",),
+    "red": ("oxblood", "burgundy", "maroon"),
+}
+
+MAX_QUERY_TERMS = 8
+
+# Word-similarity threshold for fuzzy name matches. pg_trgm's default of 0.6 misses
+# transposed letters: "jakcet" scores 0.43 against "Leather Jacket". Category matches
+# keep the default similarity threshold (0.3), so it isn't set.
+FUZZY_WORD_SIMILARITY_THRESHOLD = 0.4
+
+
+class SearchService:
+    """Builds Postgres full-text queries against Product.search_vector"""
+
+    def tokenize(self, query: str) -> List[str]:
+        """Split a raw shopper query into lowercase word tokens"""
+        return re.findall(r"\w+", query.lower())[:MAX_QUERY_TERMS]
+
+    def _lookup(self, vocabulary: Dict[str, Tuple[str, ...]], term: str) -> Tuple[str, ...]:
+        found = vocabulary.get(term)
+        if found is None and term.endswith("s"):
+            # Catch simple plurals ("purses", "wallets") before stemming
+            found = vocabulary.get(term[:-1])
+        return found or ()
+
+    def expand_term(self, term: str) -> Tuple[str, ...]:
+        """Return the term together with its synonyms and narrower leather-domain terms"""
+        expanded = [term]
+        for synonym in self._lookup(LEATHER_SYNONYMS, term) or (term,):
+            for alt in (synonym,) + self._lookup(LEATHER_NARROWER_TERMS, synonym):
+                if alt not in expanded:
+                    expanded.append(alt)
+        return tuple(expanded)
+
+    def build_tsquery_text(self, query: str) -> Optional[str]:
+        """
+        Build to_tsquery() input: synonyms are OR-ed inside a group and groups
+        are AND-ed. The last term is prefix-matched so partial words still hit.
+        """
+        terms = self.tokenize(query)
+        if not terms:
+            return None
+
+        groups = []
+        for index, term in enumerate(terms):
+            is_last = index == len(terms) - 1
+            alternatives = [
+                f"{alt}:*" if is_last and alt == term else alt
+                for alt in self.expand_term(term)
+            ]
+            groups.append("(" + " | ".join(alternatives) + ")")
+        return " & ".join(groups)
+
+    def tsquery(self, query: str) -> Optional[ColumnElement]:
+        """SQL tsquery expression for the shopper query, or None if it has no words"""
+        text = self.build_tsquery_text(query)
+        if text is None:
+            return None
+        return func.to_tsquery(cast(literal(SEARCH_CONFIG), REGCONFIG), text)
+
+    def match(self, tsquery: ColumnElement) -> ColumnElement:
+        """GIN-indexable match predicate"""
+        return Product.search_vector.op("@@")(tsquery)
+
+    def rank(self, tsquery: ColumnElement) -> ColumnElement:
+        """Cover-density rank; normalisation 32 scales it into the 0..1 range"""
+        return func.ts_rank_cd(Product.search_vector, tsquery, 32)
+
+    async def enable_fuzzy(self, db: AsyncSession) -> None:
+        """Apply the fuzzy name threshold for the rest of the current transaction"""
+        await db.execute(select(
+            func.set_config("pg_trgm.word_similarity_threshold", str(FUZZY_WORD_SIMILARITY_THRESHOLD), True)
+        ))
+
+    def fuzzy_match(self, query: str) -> ColumnElement:
+        """
+        Trigram predicate on name and category. Both operators are served by the
+        gin_trgm_ops indexes, so typo-tolerant search never falls back to a seq-scan.
+        """
+        query = query.strip().lower()
+        return or_(
+            literal(query).op("<%")(Product.name),
+            Product.category.op("%")(query)
+        )
+
+    def fuzzy_rank(self, query: str) -> ColumnElement:
+        """Best trigram score across name (word similarity) and category"""
+        query = query.strip().lower()
+        return func.greatest(
+            func.word_similarity(query, Product.name),
+            func.similarity(Product.category, query)
+        )
+
+    async def did_you_mean(self, db: AsyncSession, query: str, limit: int = 5) -> List[str]:
+        """Closest product names and categories for a query that found nothing"""
+        await self.enable_fuzzy(db)
+        query = query.strip().lower()
+
+        name_score = func.word_similarity(query, Product.name)
+        names = await db.execute(
+            select(Product.name, name_score.label("score"))
+            .where(Product.is_active == True, literal(query).op("<%")(Product.name))
+            .order_by(desc("score"))
+            .limit(limit)
+        )
+
+        category_score = func.similarity(Product.category, query)
+        categories = await db.execute(
+            select(Product.category, func.max(category_score).label("score"))
+            .where(Product.is_active == True, Product.category.op("%")(query))
+            .group_by(Product.category)
+            .order_by(desc("score"))
+            .limit(limit)
+        )
+
+        ranked = sorted(
+            list(names.fetchall()) + list(categories.fetchall()),
+            key=lambda row: row[1],
+            reverse=True
+        )
+        suggestions: List[str] = []
+        for term, _score in ranked:
+            if term not in suggestions:
+                suggestions.append(term)
+        return suggestions[:limit]
+
+
+search_service = SearchService()
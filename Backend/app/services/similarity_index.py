@@ -0,0 +1,165 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import os
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.postgresql import AsyncSessionLocal
+from app.models.sqlalchemy_models import Product, ImageFeature
+from app.services.image_features import FEATURE_VERSION, FEATURE_DIM, extract_features
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_PREFIX = "/uploads/"
+
+
+def local_image_path(path: str) -> Optional[str]:
+    """Filesystem path for an uploaded image URL path, or None for external/static images"""
+    if not path.startswith(UPLOADS_PREFIX):
+        return None
+    relative = os.path.normpath(path[len(UPLOADS_PREFIX):])
+    if relative.startswith(".."):
+        return None
+    return os.path.join(settings.UPLOAD_DIR, relative)
+
+
+def compute_image_features(paths: Iterable[str]) -> Dict[str, np.ndarray]:
+    """Descriptors for the readable local images among `paths` (blocking; run in a thread)"""
+    vectors = {}
+    for path in paths:
+        local = local_image_path(path)
+        if local is None or not os.path.exists(local):
+            continue
+        vector = extract_features(local)
+        if vector is not None:
+            vectors[path] = vector
+    return vectors
+
+
+async def store_image_features(db: AsyncSession, vectors: Dict[str, np.ndarray]) -> None:
+    """Upsert descriptors keyed by image path. Commits."""
+    if not vectors:
+        return
+    stmt = insert(ImageFeature).values([
+        {"path": path, "version": FEATURE_VERSION, "vector": vector.astype(np.float32).tobytes()}
+        for path, vector in vectors.items()
+    ])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[ImageFeature.path],
+        set_={"version": stmt.excluded.version, "vector": stmt.excluded.vector}
+    ))
+    await db.commit()
+
+
+def product_vectors(
+    products: Sequence[Tuple[str, Sequence[str]]],
+    vectors: Dict[str, np.ndarray]
+) -> Tuple[List[str], np.ndarray]:
+    """Unit-length mean descriptor per product over its analysed images (products with none are skipped)"""
+    ids: List[str] = []
+    rows: List[np.ndarray] = []
+    for product_id, images in products:
+        found = [vectors[path] for path in images or [] if path in vectors]
+        if not found:
+            continue
+        mean = np.mean(found, axis=0)
+        norm = np.linalg.norm(mean)
+        if norm == 0:
+            continue
+        ids.append(product_id)
+        rows.append(mean / norm)
+    matrix = np.ascontiguousarray(np.vstack(rows), dtype=np.float32) if rows else np.zeros((0, FEATURE_DIM), np.float32)
+    return ids, matrix
+
+
+class SimilarityIndex:
+    """
+    In-memory visual similarity over active products: one unit-length
+    float32 row per product in a contiguous matrix, so "more like this" is a
+    single matrix-vector product (cosine similarity) plus a partial sort.
+    Rebuilt from stored image descriptors; swapped in atomically.
+    """
+
+    def __init__(self):
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix = np.zeros((0, FEATURE_DIM), dtype=np.float32)
+        self.is_ready = False
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def load(self, ids: List[str], matrix: np.ndarray) -> None:
+        """Replace the index contents in one step"""
+        self._matrix = matrix
+        self._ids = ids
+        self._rows = {product_id: row for row, product_id in enumerate(ids)}
+        self.is_ready = True
+
+    def similar(self, product_id: str, k: int) -> List[Tuple[str, float]]:
+        """Up to `k` most similar other products as (id, cosine similarity), best first"""
+        ids, rows, matrix = self._ids, self._rows, self._matrix
+        row = rows.get(product_id)
+        if row is None or len(ids) < 2:
+            return []
+        scores = matrix @ matrix[row]
+        scores[row] = -np.inf
+        k = min(k, len(ids) - 1)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(ids[index], float(scores[index])) for index in best]
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        """Rebuild from active products, analysing a bounded number of images that have no descriptor yet"""
+        products_result = await db.execute(select(Product.id, Product.images).where(Product.is_active == True))
+        products = [(str(product_id), images or []) for product_id, images in products_result.fetchall()]
+
+        features_result = await db.execute(
+            select(ImageFeature.path, ImageFeature.vector).where(ImageFeature.version == FEATURE_VERSION)
+        )
+        vectors = {path: np.frombuffer(vector, dtype=np.float32) for path, vector in features_result.fetchall()}
+
+        pending = list(dict.fromkeys(
+            path for _product_id, images in products for path in images
+            if path not in vectors and local_image_path(path) is not None
+        ))[:settings.SIMILARITY_BACKFILL_LIMIT]
+        if pending:
+            computed = await asyncio.to_thread(compute_image_features, pending)
+            await store_image_features(db, computed)
+            vectors.update(computed)
+
+        ids, matrix = product_vectors(products, vectors)
+        self.load(ids, matrix)
+        logger.info(f"Visual similarity index built with {len(ids)} products")
+
+
+similarity_index = SimilarityIndex()
+
+
+async def index_uploaded_images(paths: List[str]) -> None:
+    """Analyse freshly uploaded images and store their descriptors; failures are logged, not raised"""
+    try:
+        vectors = await asyncio.to_thread(compute_image_features, paths)
+        async with AsyncSessionLocal() as db:
+            await store_image_features(db, vectors)
+    except Exception as e:
+        logger.error(f"Failed to index uploaded images: {e}")
+
+
+async def build_similarity_index() -> None:
+    """Build the visual similarity index, logging failures"""
+    try:
+        async with AsyncSessionLocal() as db:
+            await similarity_index.rebuild(db)
+    except Exception as e:
+        logger.error(f"Failed to build visual similarity index: {e}")
+
+
+async def refresh_similarity_index_periodically() -> None:
+    """Background task that rebuilds the index (and backfills descriptors)"""
+    while True:
+        await build_similarity_index()
+        await asyncio.sleep(settings.SIMILARITY_INDEX_REFRESH_SECONDS)
@@ -0,0 +1,223 @@
+from typing import Dict, Iterable, List, Tuple
+from bisect import bisect_left, insort
+from collections import OrderedDict
+import asyncio
+import heapq
+import logging
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.postgresql import AsyncSessionLocal
+from app.models.sqlalchemy_models import Product, OrderItem
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("products", "categories", "tags")
+FEATURED_BOOST = 5.0
+PREFIX_CACHE_SIZE = 2048
+
+
+class PrefixIndex:
+    """
+    Sorted array of lowercase terms searched with bisect. Each term keeps a
+    display form and a popularity weight; results for a prefix are the
+    highest-weighted terms that start with it.
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._display: Dict[str, str] = {}
+        self._weight: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, term: str, weight: float, keep_sorted: bool = True) -> None:
+        """
+        Add weight to a term, inserting it if it is new. Bulk loads pass
+        keep_sorted=False and call sort() once at the end, since an insort per
+        term is quadratic over a whole catalog.
+        """
+        key = term.strip().lower()
+        if not key:
+            return
+        if key not in self._weight:
+            if keep_sorted:
+                insort(self._keys, key)
+            self._display[key] = term.strip()
+            self._weight[key] = 0.0
+        self._weight[key] += weight
+
+    def sort(self) -> None:
+        """Rebuild the sorted keys after adds with keep_sorted=False"""
+        self._keys = sorted(self._weight)
+
+    def remove(self, term: str, weight: float) -> None:
+        """Take weight away from a term, dropping it once nothing references it"""
+        key = term.strip().lower()
+        if key not in self._weight:
+            return
+        self._weight[key] -= weight
+        if self._weight[key] <= 1e-9:
+            index = bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+            del self._weight[key]
+            del self._display[key]
+
+    def search(self, prefix: str, limit: int) -> List[str]:
+        """Top `limit` terms starting with `prefix`, most popular first"""
+        prefix = prefix.strip().lower()
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + "\uffff", lo=start)
+        best = heapq.nlargest(
+            limit,
+            self._keys[start:end],
+            key=lambda key: (self._weight[key], -len(key))
+        )
+        return [self._display[key] for key in best]
+
+
+class SuggestionIndex:
+    """
+    In-process autocomplete index over product names, categories and tags.
+
+    Built once at startup and patched in place by the admin product writes, so
+    /search/suggestions is answered without touching the database. Each worker
+    process holds its own copy; a periodic rebuild picks up writes that were
+    handled by other workers.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, PrefixIndex] = {kind: PrefixIndex() for kind in KINDS}
+        # product_id -> (name, category, tags, weight) as last indexed
+        self._products: Dict[str, Tuple[str, str, Tuple[str, ...], float]] = {}
+        self._sales: Dict[str, float] = {}
+        self._cache: "OrderedDict[Tuple[str, int], Dict[str, List[str]]]" = OrderedDict()
+        self.is_ready = False
+
+    def _terms(self, name: str, category: str, tags: Iterable[str], weight: float):
+        yield "products", name, weight
+        if category:
+            yield "categories", category, 1.0
+        for tag in set(tags or []):
+            if tag:
+                yield "tags", tag, 1.0
+
+    def _index_product(
+        self,
+        product_id: str,
+        name: str,
+        category: str,
+        tags: Iterable[str],
+        weight: float,
+        keep_sorted: bool = True
+    ) -> None:
+        tags = tuple(tags or ())
+        for kind, term, term_weight in self._terms(name, category, tags, weight):
+            self._indexes[kind].add(term, term_weight, keep_sorted)
+        self._products[product_id] = (name, category, tags, weight)
+
+    def _unindex_product(self, product_id: str) -> None:
+        entry = self._products.pop(product_id, None)
+        if entry is None:
+            return
+        for kind, term, term_weight in self._terms(*entry):
+            self._indexes[kind].remove(term, term_weight)
+
+    def _product_weight(self, product_id: str, is_featured: bool) -> float:
+        return 1.0 + self._sales.get(product_id, 0.0) + (FEATURED_BOOST if is_featured else 0.0)
+
+    def upsert_product(self, product: Product) -> None:
+        """Re-index a product after it was created or updated"""
+        product_id = str(product.id)
+        self._unindex_product(product_id)
+        if product.is_active:
+            self._index_product(
+                product_id,
+                product.name,
+                product.category,
+                product.tags,
+                self._product_weight(product_id, product.is_featured)
+            )
+        self._cache.clear()
+
+    def remove_product(self, product_id: str) -> None:
+        """Drop a deleted product from the index"""
+        self._unindex_product(str(product_id))
+        self._cache.clear()
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        """Rebuild the whole index from active products and their sales volume"""
+        sales_result = await db.execute(
+            select(OrderItem.product_id, func.sum(OrderItem.quantity))
+            .group_by(OrderItem.product_id)
+        )
+        sales = {str(product_id): float(quantity or 0) for product_id, quantity in sales_result.fetchall()}
+
+        products_result = await db.execute(
+            select(Product.id, Product.name, Product.category, Product.tags, Product.is_featured)
+            .where(Product.is_active == True)
+        )
+
+        # Built off the event loop: a large catalog would stall every request
+        fresh = await asyncio.to_thread(self._build, sales, products_result.fetchall())
+
+        # Swap in one step so concurrent readers never see a half-built index
+        self._indexes = fresh._indexes
+        self._products = fresh._products
+        self._sales = fresh._sales
+        self._cache.clear()
+        self.is_ready = True
+        logger.info(f"Search suggestion index built with {len(self._products)} products")
+
+    @staticmethod
+    def _build(sales: Dict[str, float], rows: List[Tuple]) -> "SuggestionIndex":
+        """A new index over (id, name, category, tags, is_featured) rows, each term list sorted once"""
+        fresh = SuggestionIndex()
+        fresh._sales = sales
+        for product_id, name, category, tags, is_featured in rows:
+            product_id = str(product_id)
+            fresh._index_product(
+                product_id, name, category, tags, fresh._product_weight(product_id, is_featured), keep_sorted=False
+            )
+        for index in fresh._indexes.values():
+            index.sort()
+        return fresh
+
+    def suggest(self, query: str, limit: int = 10) -> Dict[str, List[str]]:
+        """Suggestions for a typed prefix, grouped by kind"""
+        cache_key = (query.strip().lower(), limit)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._cache.move_to_end(cache_key)
+            return cached
+
+        suggestions = {
+            "products": self._indexes["products"].search(query, min(limit, 5)),
+            "categories": self._indexes["categories"].search(query, 5),
+            "tags": self._indexes["tags"].search(query, 5),
+        }
+        self._cache[cache_key] = suggestions
+        if len(self._cache) > PREFIX_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return suggestions
+
+
+suggestion_index = SuggestionIndex()
+
+
+async def build_suggestion_index() -> None:
+    """Build the suggestion index at startup; search falls back to a lazy build on failure"""
+    try:
+        async with AsyncSessionLocal() as db:
+            await suggestion_index.rebuild(db)
+    except Exception as e:
+        logger.error(f"Failed to build search suggestion index: {e}")
+
+
+async def refresh_suggestion_index_periodically() -> None:
+    """Background task that periodically rebuilds the index from the database"""
+    while True:
+        await asyncio.sleep(settings.SUGGESTION_INDEX_REFRESH_SECONDS)
+        await build_suggestion_index()
@@ -0,0 +1,186 @@
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import math
+from sqlalchemy import select, update, delete, func, literal, desc, union_all, DateTime
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.postgresql import AsyncSessionLocal
+from app.models.sqlalchemy_models import (
+    Product, Order, OrderItem, OrderStatus, Review, ProductTrendingScore
+)
+
+logger = logging.getLogger(__name__)
+
+# pg_try_advisory_xact_lock key, so only one worker folds in each window
+TRENDING_LOCK_ID = 720_001
+# Orders committed slightly after their created_at must still land in a later window
+INGEST_LAG = timedelta(minutes=1)
+# Scores below this are dropped from the ranking table
+MIN_SCORE = 0.01
+# Half-lives of history scanned when the table is empty (~3% residual weight)
+BOOTSTRAP_HALF_LIVES = 5
+EXCLUDED_ORDER_STATUSES = (OrderStatus.CANCELLED, OrderStatus.RETURNED)
+
+
+class TrendingService:
+    """
+    Trending products ranked by exponentially time-decayed order volume plus
+    review velocity.
+
+    All rows in product_trending_scores are valued at the same `scored_at`.
+    Each refresh multiplies them by the decay factor for the elapsed time and
+    adds the decayed weight of orders and reviews created since then, so only
+    the new window is aggregated. Reads are a top-N on the (category, score)
+    index.
+    """
+
+    @property
+    def decay_rate(self) -> float:
+        """Decay constant per second for the configured half-life"""
+        return math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+
+    def decay_factor(self, elapsed: timedelta) -> float:
+        """Multiplier that ages a score by `elapsed`"""
+        return math.exp(-self.decay_rate * max(elapsed.total_seconds(), 0.0))
+
+    def _event_weight(self, as_of: datetime, created_at):
+        # exp(-lambda * age) of an event, valued at as_of
+        age = func.extract("epoch", literal(as_of, DateTime(timezone=True)) - created_at)
+        return func.exp(-self.decay_rate * age)
+
+    def window_scores_query(self, since: datetime, as_of: datetime):
+        """Decayed order + review weight per product for events in (since, as_of]"""
+        orders = (
+            select(
+                OrderItem.product_id.label("product_id"),
+                (OrderItem.quantity * self._event_weight(as_of, OrderItem.created_at)).label("weight")
+            )
+            .join(Order, OrderItem.order_id == Order.id)
+            .where(
+                OrderItem.created_at > since,
+                OrderItem.created_at <= as_of,
+                Order.status.notin_(EXCLUDED_ORDER_STATUSES)
+            )
+        )
+        reviews = (
+            select(
+                Review.product_id.label("product_id"),
+                (settings.TRENDING_REVIEW_WEIGHT * self._event_weight(as_of, Review.created_at)).label("weight")
+            )
+            .where(
+                Review.created_at > since,
+                Review.created_at <= as_of,
+                Review.is_approved == True
+            )
+        )
+        events = union_all(orders, reviews).subquery("events")
+        return (
+            select(
+                events.c.product_id,
+                Product.category,
+                func.sum(events.c.weight).label("score"),
+                literal(as_of, DateTime(timezone=True)).label("scored_at")
+            )
+            .join(Product, Product.id == events.c.product_id)
+            .group_by(events.c.product_id, Product.category)
+        )
+
+    async def refresh(self, db: AsyncSession) -> bool:
+        """
+        Decay the stored scores and fold in events since the last refresh, in
+        one transaction. Returns False if another worker holds the lock.
+        """
+        locked = await db.execute(select(func.pg_try_advisory_xact_lock(TRENDING_LOCK_ID)))
+        if not locked.scalar():
+            await db.rollback()
+            return False
+
+        now = (await db.execute(select(func.now()))).scalar()
+        as_of = now - INGEST_LAG
+        last_scored = (await db.execute(select(func.max(ProductTrendingScore.scored_at)))).scalar()
+        if last_scored is None:
+            since = as_of - timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS * BOOTSTRAP_HALF_LIVES)
+        else:
+            since = last_scored
+        if since >= as_of:
+            await db.rollback()
+            return True
+
+        # Age every stored score to as_of (they share one scored_at, so one factor)
+        if last_scored is not None:
+            await db.execute(
+                update(ProductTrendingScore)
+                .values(score=ProductTrendingScore.score * self.decay_factor(as_of - last_scored), scored_at=as_of)
+                .execution_options(synchronize_session=False)
+            )
+            # Keep the copied category in step with the product
+            await db.execute(
+                update(ProductTrendingScore)
+                .where(
+                    ProductTrendingScore.product_id == Product.id,
+                    ProductTrendingScore.category != Product.category
+                )
+                .values(category=Product.category)
+                .execution_options(synchronize_session=False)
+            )
+
+        window = self.window_scores_query(since, as_of)
+        stmt = insert(ProductTrendingScore).from_select(
+            ["product_id", "category", "score", "scored_at"], window
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProductTrendingScore.product_id],
+            set_={
+                "score": ProductTrendingScore.score + stmt.excluded.score,
+                "category": stmt.excluded.category,
+                "scored_at": stmt.excluded.scored_at,
+            }
+        )
+        await db.execute(stmt)
+        await db.execute(
+            delete(ProductTrendingScore)
+            .where(ProductTrendingScore.score < MIN_SCORE)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return True
+
+    async def top_products(
+        self,
+        db: AsyncSession,
+        limit: int,
+        category: Optional[str] = None
+    ) -> List[Tuple[Product, float]]:
+        """Highest-scoring active products, optionally within one category"""
+        query = (
+            select(Product, ProductTrendingScore.score)
+            .join(ProductTrendingScore, ProductTrendingScore.product_id == Product.id)
+            .where(Product.is_active == True)
+        )
+        if category:
+            query = query.where(ProductTrendingScore.category == category)
+        query = query.order_by(desc(ProductTrendingScore.score)).limit(limit)
+        result = await db.execute(query)
+        return [(product, score) for product, score in result.all()]
+
+
+trending_service = TrendingService()
+
+
+async def refresh_trending_scores() -> None:
+    """Run one trending refresh in its own session, logging failures"""
+    try:
+        async with AsyncSessionLocal() as db:
+            await trending_service.refresh(db)
+    except Exception as e:
+        logger.error(f"Failed to refresh trending scores: {e}")
+
+
+async def refresh_trending_periodically() -> None:
+    """Background task that keeps the trending table current"""
+    while True:
+        await refresh_trending_scores()
+        await asyncio.sleep(settings.TRENDING_REFRESH_SECONDS)
@@ -0,0 +1,83 @@
+from typing import Any, Dict, Optional
+import logging
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.sqlalchemy_models import (
+    Cart, Notification, Order, PaymentStatus, UserCounters, Wishlist
+)
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("order_count", "lifetime_spend", "cart_quantity", "wishlist_count", "unread_notifications")
+
+
+def counted_spend(order: Optional[Order]) -> float:
+    """Amount an order contributes to lifetime spend (its total once payment completed)"""
+    if order is None or order.payment_status != PaymentStatus.COMPLETED:
+        return 0.0
+    return order.total_amount
+
+
+class UserCounterService:
+    """
+    Maintains the per-user counters row behind the account summary: order
+    count, lifetime spend, cart quantity, wishlist count and unread
+    notifications.
+
+    Every cart, wishlist, order and notification write calls `apply` with the
+    change it made, inside the same transaction, so the summary is a single
+    primary-key read that can't drift from the rows it counts.
+    """
+
+    def apply_statement(self, user_id: Any, deltas: Dict[str, Any]):
+        """Relative upsert of the counters; a missing row starts from zero"""
+        statement = insert(UserCounters).values(user_id=user_id, **deltas)
+        return statement.on_conflict_do_update(
+            index_elements=[UserCounters.user_id],
+            set_={
+                **{name: getattr(UserCounters, name) + statement.excluded[name] for name in deltas},
+                "updated_at": func.now()
+            }
+        )
+
+    async def apply(self, db: AsyncSession, user_id: Any, **deltas: Any) -> None:
+        """
+        Add `deltas` (counter name -> change) to a user's counters in one
+        statement, so concurrent writes don't lose increments. Does not commit.
+        """
+        unknown = set(deltas) - set(COUNTERS)
+        if unknown:
+            raise ValueError(f"Unknown counters: {', '.join(sorted(unknown))}")
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        await db.execute(self.apply_statement(user_id, deltas))
+
+    async def summary(self, db: AsyncSession, user_id: Any) -> Dict[str, Any]:
+        """A user's counters by primary key (zeros before their first counted write)"""
+        counters = await db.get(UserCounters, user_id)
+        return {name: getattr(counters, name) if counters else 0 for name in COUNTERS}
+
+    async def rebuild(self, db: AsyncSession, user_id: Any) -> None:
+        """Recompute one user's counters from their rows (repair path). Does not commit."""
+        values = {
+            "order_count": select(func.count(Order.id)).where(Order.user_id == user_id),
+            "lifetime_spend": select(func.coalesce(func.sum(Order.total_amount), 0.0)).where(
+                Order.user_id == user_id, Order.payment_status == PaymentStatus.COMPLETED
+            ),
+            "cart_quantity": select(func.coalesce(func.sum(Cart.quantity), 0)).where(Cart.user_id == user_id),
+            "wishlist_count": select(func.count(Wishlist.id)).where(Wishlist.user_id == user_id),
+            "unread_notifications": select(func.count(Notification.id)).where(
+                Notification.user_id == user_id, Notification.is_read == False
+            ),
+        }
+        values = {name: query.scalar_subquery() for name, query in values.items()}
+        statement = insert(UserCounters).values(user_id=user_id, **values)
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[UserCounters.user_id],
+            set_={**{name: statement.excluded[name] for name in COUNTERS}, "updated_at": func.now()}
+        ))
+
+
+user_counter_service = UserCounterService()
@@ -0,0 +1,154 @@
+from typing import Any, Dict, List, Sequence
+import logging
+from sqlalchemy import select, delete, exists, func, tuple_, literal_column, text, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+from app.core.exceptions import ValidationException
+from app.models.sqlalchemy_models import Product, ProductVariant
+from app.schemas.product import ProductVariantBase
+
+logger = logging.getLogger(__name__)
+
+# A product's size/color options; an empty array means the dimension doesn't apply
+PRODUCT_SIZES_SQL = "CASE WHEN cardinality(p.sizes) > 0 THEN p.sizes ELSE ARRAY['']::varchar[] END"
+PRODUCT_COLORS_SQL = "CASE WHEN cardinality(p.colors) > 0 THEN p.colors ELSE ARRAY['']::varchar[] END"
+
+# Drop variants whose size or color is no longer offered
+SYNC_DELETE_SQL = f"""
+    DELETE FROM product_variants v USING products p
+    WHERE v.product_id = p.id AND p.id = ANY(:product_ids)
+      AND NOT (v.size = ANY({PRODUCT_SIZES_SQL}) AND v.color = ANY({PRODUCT_COLORS_SQL}))
+"""
+# Add missing combinations. A product without variants only has a product-level
+# stock count, which can't be split by option: it all goes to the first
+# combination (first size, first color) so the total is kept. Otherwise new
+# combinations start empty.
+SYNC_INSERT_SQL = f"""
+    INSERT INTO product_variants (id, product_id, size, color, stock_quantity)
+    SELECT gen_random_uuid(), p.id, left(s.size, 50), left(c.color, 50),
+           CASE WHEN s.position = 1 AND c.position = 1
+                     AND NOT EXISTS (SELECT 1 FROM product_variants e WHERE e.product_id = p.id)
+                THEN coalesce(p.stock_quantity, 0) ELSE 0 END
+    FROM products p
+    CROSS JOIN LATERAL unnest({PRODUCT_SIZES_SQL}) WITH ORDINALITY AS s(size, position)
+    CROSS JOIN LATERAL unnest({PRODUCT_COLORS_SQL}) WITH ORDINALITY AS c(color, position)
+    WHERE p.id = ANY(:product_ids) AND (cardinality(p.sizes) > 0 OR cardinality(p.colors) > 0)
+    ON CONFLICT DO NOTHING
+"""
+# Product stock is the total of its variants' stock, for products that have variants
+SYNC_SUMMARY_SQL = """
+    UPDATE products p SET stock_quantity = v.total
+    FROM (
+        SELECT product_id, sum(stock_quantity) AS total FROM product_variants
+        WHERE product_id = ANY(:product_ids) GROUP BY product_id
+    ) v
+    WHERE p.id = v.product_id AND p.stock_quantity IS DISTINCT FROM v.total
+"""
+
+
+class VariantService:
+    """
+    Size/color variants with their own stock. `products.sizes`, `colors` and
+    `stock_quantity` are kept as a summary of the variants (distinct options
+    and total stock) so facets and existing clients keep working; filtering
+    goes through the variant indexes instead of the arrays.
+    """
+
+    def match_condition(self, sizes: Sequence[str], colors: Sequence[str], in_stock: bool) -> ColumnElement:
+        """
+        EXISTS a variant of the product in one of `sizes` and one of `colors`
+        (either may be empty), optionally with stock. With in_stock the probe is
+        answered from the partial in-stock indexes alone.
+        """
+        conditions = [ProductVariant.product_id == Product.id]
+        if sizes:
+            conditions.append(ProductVariant.size.in_(sizes))
+        if colors:
+            conditions.append(ProductVariant.color.in_(colors))
+        if in_stock:
+            # Inlined so generic prepared plans still match the partial index predicate
+            conditions.append(ProductVariant.stock_quantity > literal_column("0"))
+        return exists().where(*conditions)
+
+    async def list_for_product(self, db: AsyncSession, product_id) -> List[ProductVariant]:
+        result = await db.execute(
+            select(ProductVariant)
+            .where(ProductVariant.product_id == product_id)
+            .order_by(ProductVariant.size, ProductVariant.color)
+        )
+        return list(result.scalars().all())
+
+    async def replace_variants(
+        self,
+        db: AsyncSession,
+        product: Product,
+        variants: List[ProductVariantBase]
+    ) -> List[ProductVariant]:
+        """
+        Make `variants` the product's complete variant set (delete the rest,
+        upsert by size/color) and refresh the product's summary columns. The caller commits.
+        """
+        combinations = [(variant.size, variant.color) for variant in variants]
+        if len(set(combinations)) != len(combinations):
+            raise ValidationException("Each size/color combination can only be listed once")
+
+        # Removed first, so a SKU can move to another combination in the same update
+        removed = delete(ProductVariant).where(ProductVariant.product_id == product.id)
+        if combinations:
+            removed = removed.where(tuple_(ProductVariant.size, ProductVariant.color).notin_(combinations))
+        await db.execute(removed)
+
+        if variants:
+            statement = insert(ProductVariant).values([
+                {
+                    "product_id": product.id,
+                    "size": variant.size,
+                    "color": variant.color,
+                    "sku": variant.sku,
+                    "stock_quantity": variant.stock_quantity,
+                }
+                for variant in variants
+            ])
+            await db.execute(statement.on_conflict_do_update(
+                index_elements=[ProductVariant.product_id, ProductVariant.size, ProductVariant.color],
+                set_={
+                    "sku": statement.excluded.sku,
+                    "stock_quantity": statement.excluded.stock_quantity,
+                    "updated_at": func.now(),
+                }
+            ))
+
+        # Summary columns, in the order the variants were given
+        product.sizes = list(dict.fromkeys(variant.size for variant in variants if variant.size))
+        product.colors = list(dict.fromkeys(variant.color for variant in variants if variant.color))
+        product.stock_quantity = sum(variant.stock_quantity for variant in variants)
+        await db.flush()
+        return await self.list_for_product(db, product.id)
+
+    async def sync_options(self, db: AsyncSession, product_ids: List[Any]) -> None:
+        """
+        Align variants with products' `sizes`/`colors` arrays after a write that
+        set those directly (product create/update, bulk import), then recompute
+        the products' stock from their variants. The caller commits.
+        """
+        if not product_ids:
+            return
+        ids = bindparam("product_ids", list(product_ids), type_=ARRAY(UUID(as_uuid=True)))
+        await db.execute(text(SYNC_DELETE_SQL).bindparams(ids))
+        await db.execute(text(SYNC_INSERT_SQL).bindparams(ids))
+        await db.execute(text(SYNC_SUMMARY_SQL).bindparams(ids))
+
+    async def check_product_update(self, db: AsyncSession, product_id: Any, update_data: Dict[str, Any]) -> None:
+        """Reject a direct stock_quantity write to a product whose stock is kept per variant"""
+        if "stock_quantity" not in update_data:
+            return
+        has_variants = await db.scalar(select(exists().where(ProductVariant.product_id == product_id)))
+        if has_variants:
+            raise ValidationException(
+                "This product's stock is the total of its variants; set it with PUT /admin/products/{id}/variants"
+            )
+
+
+variant_service = VariantService()
@@ -6,6 +6,7 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 import os
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -13,6 +14,15 @@ from app.core.config import settings
 from app.core.database import init_db
 from app.api.v1.api import api_router
 from app.core.exceptions import setup_exception_handlers
+from app.core.cache import catalog_cache
+from app.services.suggestion_index import build_suggestion_index, refresh_suggestion_index_periodically
+from app.services.trending_service import refresh_trending_periodically
+from app.services.bought_together_service import refresh_bought_together_periodically
+from app.services.similarity_index import refresh_similarity_index_periodically
+from app.services.landing_pages import refresh_landing_pages_periodically
+from app.services.feed_service import refresh_feeds_periodically
+from app.services.search_log import warm_search_log, flush_search_log_periodically
+from app.services.guest_cart_service import guest_cart_service
 
 # Configure logging
 logging.basicConfig(
@@ -33,15 +43,33 @@ async def lifespan(app: FastAPI):
         logger.info("Initializing database...")
         await init_db()
         logger.info("Database initialized successfully")
+        await build_suggestion_index()
+        await warm_search_log()
         logger.info("ZOREL LEATHER Backend is ready!")
         logger.info(f"Environment: {settings.ENVIRONMENT}")
         logger.info(f"Database: {settings.DATABASE_NAME}")
     except Exception as e:
         logger.error(f"Startup failed: {str(e)}")
         raise
+    
+    # Background jobs
+    background_tasks = [
+        asyncio.create_task(refresh_suggestion_index_periodically()),
+        asyncio.create_task(refresh_trending_periodically()),
+        asyncio.create_task(refresh_bought_together_periodically()),
+        asyncio.create_task(refresh_similarity_index_periodically()),
+        asyncio.create_task(refresh_landing_pages_periodically()),
+        asyncio.create_task(refresh_feeds_periodically()),
+        asyncio.create_task(flush_search_log_periodically()),
+    ]
     yield
     # Shutdown
     logger.info("Shutting down ZOREL LEATHER Backend...")
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await catalog_cache.close()
+    await guest_cart_service.close()
 
 
 app = FastAPI(
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Recompute the approved-review aggregates stored on products from the reviews
+themselves. Review writes keep them in step; run this after fixing reviews
+directly in the database or to check for drift.
+
+Usage: python scripts/rebuild_ratings.py [product_id ...]   (all products by default)
+"""
+
+import asyncio
+import sys
+import os
+import uuid
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from app.core.cache import catalog_cache
+from app.core.postgresql import AsyncSessionLocal, engine
+from app.models.sqlalchemy_models import Product
+from app.services.catalog_service import catalog_service
+from app.services.rating_service import rating_service
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def rebuild_ratings(product_ids):
+    """Rebuild the aggregates of the given products (or all), then drop their cached entries"""
+    try:
+        async with AsyncSessionLocal() as db:
+            if not product_ids:
+                product_ids = (await db.execute(select(Product.id))).scalars().all()
+            rebuilt = []
+            for product_id in product_ids:
+                rebuilt.append((product_id, await rating_service.rebuild(db, product_id)))
+            await db.commit()
+        for product_id, slug in rebuilt:
+            await catalog_service.product_stats_changed(product_id, slug)
+        logger.info(f"Rebuilt rating aggregates of {len(rebuilt)} products")
+    except Exception as e:
+        logger.error(f"Rating rebuild failed: {str(e)}")
+        raise
+    finally:
+        await catalog_cache.close()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_ratings([uuid.UUID(arg) for arg in sys.argv[1:]]))
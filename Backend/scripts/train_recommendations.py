@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Train the "recommended for you" model and store each user's top products.
+Run periodically (e.g. nightly from cron); it runs outside the API workers so
+training never competes with request handling.
+"""
+
+import asyncio
+import sys
+import os
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.postgresql import AsyncSessionLocal, engine
+from app.services.recommendation_service import recommendation_service
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def train_recommendations():
+    """Train on all stored interactions and replace the stored recommendations"""
+    try:
+        async with AsyncSessionLocal() as db:
+            users = await recommendation_service.train(db)
+        logger.info(f"Stored recommendations for {users} users")
+    except Exception as e:
+        logger.error(f"Recommendation training failed: {str(e)}")
+        raise
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(train_recommendations())
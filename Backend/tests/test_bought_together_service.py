@@ -0,0 +1,57 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.services.bought_together_service import bought_together_service
+
+
+def compile_sql(query):
+    return str(query.compile(dialect=postgresql.dialect()))
+
+
+def test_pair_counts_self_join_one_basket_scan():
+    """Test that pair counting self-joins a single baskets CTE bounded to the new window"""
+    as_of = datetime(2025, 1, 2, tzinfo=timezone.utc)
+    baskets = bought_together_service.window_baskets(as_of - timedelta(minutes=15), as_of)
+    sql = compile_sql(bought_together_service.pair_counts_query(baskets))
+    assert sql.startswith("WITH baskets AS")
+    assert "FROM baskets JOIN baskets AS other_baskets" in sql
+    assert "other_baskets.product_id != baskets.product_id" in sql
+    assert "order_items.created_at > " in sql
+    assert "order_items.created_at <= " in sql
+
+
+def test_first_window_counts_all_history():
+    """Test that the bootstrap window has no lower bound"""
+    baskets = bought_together_service.window_baskets(None, datetime(2025, 1, 2, tzinfo=timezone.utc))
+    assert "order_items.created_at > " not in compile_sql(bought_together_service.pair_counts_query(baskets))
+
+
+def test_ranking_keeps_top_n_by_lift():
+    """Test that neighbors are ranked per product by lift and cut at the configured N"""
+    query = bought_together_service.ranking_query(1000)
+    sql = compile_sql(query)
+    assert "row_number() OVER (PARTITION BY product_co_occurrences.product_id ORDER BY" in sql
+    assert "ranked.rank <= " in sql
+    params = query.compile(dialect=postgresql.dialect()).params
+    assert settings.BOUGHT_TOGETHER_TOP_N in params.values()
+    assert settings.BOUGHT_TOGETHER_MIN_CO_ORDERS in params.values()
+
+
+def test_cart_neighbors_exclude_cart_items():
+    """Test that cart suggestions never repeat what is already in the cart"""
+    sql = compile_sql(bought_together_service.for_products_query([uuid.uuid4()], 4))
+    assert "product_bought_together.product_id IN" in sql
+    assert "product_bought_together.neighbor_id NOT IN" in sql
+
+
+def test_ranking_can_be_limited_to_changed_anchors():
+    """Test that a refresh re-ranks only the products whose pair counts changed"""
+    anchor = uuid.uuid4()
+    query = bought_together_service.ranking_query(1000, [anchor])
+    sql = compile_sql(query)
+    assert "product_co_occurrences.product_id = ANY (%(anchor_ids)s::UUID[])" in sql
+    assert query.compile(dialect=postgresql.dialect()).params["anchor_ids"] == [anchor]
+    assert "anchor_ids" not in compile_sql(bought_together_service.ranking_query(1000))
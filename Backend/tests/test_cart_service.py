@@ -0,0 +1,154 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql
+
+from app.core.exceptions import BadRequestException, NotFoundException
+from app.models.sqlalchemy_models import Cart
+from app.schemas.cart import CartBatchOperation, CartBatchRequest
+from app.services.cart_service import cart_service
+
+USER_ID = uuid.uuid4()
+
+
+class FakeSession:
+    """Answers the cart query, then the product query, and records writes"""
+
+    def __init__(self, rows, products):
+        self.results = [rows, products]
+        self.executed, self.statements = 0, []
+        self.added, self.deleted, self.flushes = [], [], 0
+
+    async def execute(self, statement):
+        rows = self.results[self.executed]
+        self.executed += 1
+        self.statements.append(statement)
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: rows))
+
+    def add_all(self, rows):
+        self.added.extend(rows)
+
+    async def delete(self, row):
+        self.deleted.append(row)
+
+    async def flush(self):
+        self.flushes += 1
+
+
+def _product(stock=10, active=True):
+    return SimpleNamespace(id=uuid.uuid4(), stock_quantity=stock, is_active=active)
+
+
+def _row(product, quantity=1, size="M", color="Black"):
+    return Cart(id=uuid.uuid4(), user_id=USER_ID, product_id=product.id, quantity=quantity, size=size, color=color)
+
+
+def _ops(*operations):
+    return CartBatchRequest(operations=list(operations)).operations
+
+
+def test_products_load_with_one_array_bind():
+    """Test that referenced products are fetched with = ANY(:product_ids)"""
+    sql = str(cart_service.products_query([uuid.uuid4()]).compile(dialect=postgresql.dialect()))
+    assert "products.id = ANY (%(product_ids)s::UUID[])" in sql
+
+
+def test_batch_applies_every_operation_with_one_flush():
+    """Test add (merging into an existing line), update and remove in one pass"""
+    jacket, wallet, belt = _product(), _product(), _product()
+    jacket_row, wallet_row = _row(jacket), _row(wallet, quantity=3)
+    db = FakeSession([jacket_row, wallet_row], [jacket, wallet, belt])
+
+    change = asyncio.run(cart_service.apply_batch(db, USER_ID, _ops(
+        {"op": "add", "product_id": str(jacket.id), "quantity": 2, "size": "M", "color": "Black"},
+        {"op": "update", "cart_item_id": str(wallet_row.id), "quantity": 5, "color": "Brown"},
+        {"op": "add", "product_id": str(belt.id), "quantity": 1},
+        {"op": "remove", "cart_item_id": str(jacket_row.id)},
+    )))
+
+    assert db.executed == 2 and db.flushes == 1
+    assert change == (5 + 1) - (1 + 3)
+    assert str(db.statements[0].compile(dialect=postgresql.dialect())).endswith("FOR UPDATE")
+    assert db.deleted == [jacket_row]
+    assert [row.product_id for row in db.added] == [belt.id]
+    assert (wallet_row.quantity, wallet_row.size, wallet_row.color) == (5, None, "Brown")
+
+
+def test_batch_is_rejected_as_a_whole():
+    """Test that a failing operation reports its index and nothing is flushed"""
+    jacket = _product(stock=2)
+    db = FakeSession([_row(jacket, quantity=2)], [jacket])
+    with pytest.raises(BadRequestException) as error:
+        asyncio.run(cart_service.apply_batch(db, USER_ID, _ops(
+            {"op": "add", "product_id": str(jacket.id), "quantity": 1, "size": "M", "color": "Black"},
+        )))
+    assert error.value.detail.startswith("Operation 0: Only 2 items")
+    assert db.flushes == 0
+
+    db = FakeSession([], [])
+    with pytest.raises(NotFoundException):
+        asyncio.run(cart_service.apply_batch(db, USER_ID, _ops({"op": "remove", "cart_item_id": str(uuid.uuid4())})))
+
+
+def test_operations_require_their_fields():
+    """Test per-operation required fields"""
+    with pytest.raises(ValidationError):
+        CartBatchOperation(op="update", cart_item_id=str(uuid.uuid4()))
+    with pytest.raises(ValidationError):
+        CartBatchOperation(op="add", quantity=1)
+    with pytest.raises(ValidationError):
+        CartBatchRequest(operations=[])
+
+
+def test_add_is_one_upsert_on_the_line_index():
+    """Test that add/increment is a single INSERT ... ON CONFLICT DO UPDATE guarded by stock"""
+    sql = str(cart_service.add_statement(USER_ID, uuid.uuid4(), 2, "M", None).compile(dialect=postgresql.dialect()))
+    assert sql.startswith("WITH upserted AS")
+    assert "ON CONFLICT (user_id, product_id, coalesce(size, ''), coalesce(color, '')) DO UPDATE" in sql
+    assert "SET quantity = (cart.quantity + excluded.quantity)" in sql
+    assert "WHERE cart.quantity + excluded.quantity <= coalesce(nullif((SELECT products.stock_quantity" in sql
+    assert "JOIN products ON products.id = upserted.product_id" in sql
+
+
+def test_batch_never_writes_the_same_line_key_twice():
+    """Test that re-adding a removed line revives it and moving onto another line merges"""
+    jacket, wallet = _product(), _product()
+    jacket_row, wallet_m, wallet_l = _row(jacket), _row(wallet, size="M"), _row(wallet, quantity=2, size="L")
+    db = FakeSession([jacket_row, wallet_m, wallet_l], [jacket, wallet])
+
+    asyncio.run(cart_service.apply_batch(db, USER_ID, _ops(
+        {"op": "remove", "cart_item_id": str(jacket_row.id)},
+        {"op": "add", "product_id": str(jacket.id), "quantity": 3, "size": "M", "color": "Black"},
+        {"op": "update", "cart_item_id": str(wallet_m.id), "quantity": 4, "size": "L", "color": "Black"},
+    )))
+
+    assert db.added == []
+    assert db.deleted == [wallet_m]
+    assert jacket_row.quantity == 3
+    assert wallet_l.quantity == 6
+
+
+def test_batch_moving_onto_a_vacated_key_flushes_in_two_steps():
+    """Test that a line moving onto the size another line leaves is parked before taking it"""
+    jacket = _product()
+    medium, large = _row(jacket, quantity=1, size="M"), _row(jacket, quantity=2, size="L")
+    db = FakeSession([medium, large], [jacket])
+    keys_at_flush = []
+
+    async def flush():
+        db.flushes += 1
+        keys_at_flush.append({(row.size, row.color) for row in (medium, large)})
+
+    db.flush = flush
+    change = asyncio.run(cart_service.apply_batch(db, USER_ID, _ops(
+        {"op": "update", "cart_item_id": str(medium.id), "quantity": 1, "size": "S", "color": "Black"},
+        {"op": "update", "cart_item_id": str(large.id), "quantity": 2, "size": "M", "color": "Black"},
+    )))
+
+    assert change == 0 and db.flushes == 2
+    assert keys_at_flush[0] == {(f"~{medium.id.hex}", None), (f"~{large.id.hex}", None)}
+    assert keys_at_flush[1] == {("S", "Black"), ("M", "Black")}
+    assert db.added == [] and db.deleted == []
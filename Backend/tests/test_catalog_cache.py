@@ -0,0 +1,262 @@
+import asyncio
+import json
+
+from redis.exceptions import ConnectionError
+
+from app.core.cache import CatalogCache
+from app.core.config import settings
+
+
+class FakeRedis:
+    """Keys in a dict; every command fails while `up` is False"""
+
+    def __init__(self, up=True):
+        self.values = {}
+        self.up = up
+
+    def _check(self):
+        if not self.up:
+            raise ConnectionError("Redis is down")
+
+    async def get(self, key):
+        self._check()
+        return self.values.get(key)
+
+    async def mget(self, keys):
+        self._check()
+        return [self.values.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None):
+        self._check()
+        self.values[key] = value
+
+    async def eval(self, script, numkeys, key, generation_key, value, ttl, generation):
+        # Mirrors STORE_SCRIPT
+        self._check()
+        return self._store(key, generation_key, value, generation)
+
+    def _store(self, key, generation_key, value, generation):
+        if (self.values.get(generation_key) or b"").decode() != generation:
+            return 0
+        self.values[key] = value
+        return 1
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis, self.commands = redis, []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self):
+        self.redis._check()
+        results = []
+        for name, args, kwargs in self.commands:
+            if name == "delete":
+                self.redis.values.pop(args[0], None)
+                results.append(1)
+            elif name == "set":
+                # Like Redis, values read back as bytes
+                self.redis.values[args[0]] = args[1].encode() if isinstance(args[1], str) else args[1]
+                results.append(True)
+            elif name == "eval":
+                results.append(self.redis._store(args[2], args[3], args[4], args[6]))
+        return results
+
+
+def make_cache():
+    """Cache whose Redis is down and backing off, exercising the L1 path"""
+    cache = CatalogCache()
+    cache._redis = FakeRedis(up=False)
+    cache._redis_down_until = float("inf")
+    return cache
+
+
+def test_concurrent_misses_share_one_load():
+    """Test that concurrent misses for a key are coalesced into one loader call"""
+    cache = make_cache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"name": "Biker Jacket"}
+
+    async def run():
+        return await asyncio.gather(*[cache.get_or_load("product:1", loader) for _ in range(10)])
+
+    bodies = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(json.loads(body) == {"name": "Biker Jacket"} for body in bodies)
+
+
+def test_invalidate_forces_reload():
+    """Test that invalidation drops the cached body"""
+    cache = make_cache()
+    versions = iter([1, 2])
+
+    async def loader():
+        return {"version": next(versions)}
+
+    async def run():
+        first = await cache.get_or_load("product:1", loader)
+        cached = await cache.get_or_load("product:1", loader)
+        await cache.invalidate("product:1")
+        reloaded = await cache.get_or_load("product:1", loader)
+        return first, cached, reloaded
+
+    first, cached, reloaded = asyncio.run(run())
+    assert json.loads(first) == json.loads(cached) == {"version": 1}
+    assert json.loads(reloaded) == {"version": 2}
+
+
+def test_missing_values_are_not_cached():
+    """Test that a None result is returned but not stored"""
+    cache = make_cache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return None
+
+    async def run():
+        await cache.get_or_load("product:missing", loader)
+        return await cache.get_or_load("product:missing", loader)
+
+    assert asyncio.run(run()) is None
+    assert len(calls) == 2
+
+
+def test_load_invalidated_midway_is_not_stored():
+    """Test that a write during a load keeps the stale result out of the cache"""
+    cache = make_cache()
+
+    async def run():
+        async def slow_loader():
+            await cache.invalidate("product:1")
+            return {"version": "stale"}
+
+        await cache.get_or_load("product:1", slow_loader)
+        return f"{settings.CACHE_KEY_PREFIX}product:1" in cache._l1
+
+    assert asyncio.run(run()) is False
+
+
+def test_get_many_loads_only_misses_in_one_call():
+    """Test that a batch read loads all misses together and serves hits from cache"""
+    cache = make_cache()
+    calls = []
+
+    async def loader(keys):
+        calls.append(sorted(keys))
+        return {key: {"key": key} for key in keys if key != "product:missing"}
+
+    async def run():
+        first = await cache.get_many_or_load(["product:1", "product:2", "product:missing"], loader)
+        second = await cache.get_many_or_load(["product:2", "product:3"], loader)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert calls == [["product:1", "product:2", "product:missing"], ["product:3"]]
+    assert set(first) == {"product:1", "product:2"}
+    assert json.loads(second["product:2"]) == {"key": "product:2"}
+
+
+def test_set_then_get_without_loader():
+    """Test that values stored directly are readable until they go stale"""
+    cache = make_cache()
+
+    async def run():
+        missing = await cache.get("catalog:count:abc")
+        await cache.set("catalog:count:abc", 25000, ttl=60)
+        return missing, await cache.get("catalog:count:abc")
+
+    missing, stored = asyncio.run(run())
+    assert missing is None
+    assert json.loads(stored) == 25000
+
+
+def test_invalidation_during_backoff_is_sent_and_replayed():
+    """Test that invalidations ignore the read backoff and failed ones are replayed on reconnect"""
+    cache = CatalogCache()
+    redis = cache._redis = FakeRedis()
+    key = f"{settings.CACHE_KEY_PREFIX}product:1"
+
+    async def loader():
+        return {"version": 1}
+
+    async def run():
+        await cache.get_or_load("product:1", loader)
+        cache._redis_down_until = float("inf")
+        await cache.invalidate("product:1")
+        sent = key not in redis.values
+
+        redis.values[key] = b"stale"
+        redis.up = False
+        await cache.invalidate("product:1")
+        redis.up = True
+        cache._redis_down_until = 0.0
+        await cache.get("product:2")
+        return sent
+
+    assert asyncio.run(run()) is True
+    assert key not in redis.values and not cache._pending
+
+
+def test_load_invalidated_by_another_worker_is_not_stored():
+    """Test that the shared generation keeps another worker's in-flight load out of both levels"""
+    redis = FakeRedis()
+    loading, writer = CatalogCache(), CatalogCache()
+    loading._redis = writer._redis = redis
+
+    async def run():
+        async def slow_loader():
+            await writer.invalidate("product:1")
+            return {"version": "stale"}
+
+        async def batch_loader(keys):
+            await writer.invalidate("product:2")
+            return {key: {"version": "stale"} for key in keys}
+
+        await loading.get_or_load("product:1", slow_loader)
+        await loading.get_many_or_load(["product:2"], batch_loader)
+
+    asyncio.run(run())
+    prefix = settings.CACHE_KEY_PREFIX
+    assert f"{prefix}product:1" not in redis.values and f"{prefix}product:2" not in redis.values
+    assert not loading._l1
+    assert f"{prefix}product:1:generation" in redis.values
+
+
+def test_load_started_after_an_invalidation_is_stored():
+    """Test that an invalidation only refuses loads that began before it"""
+    redis = FakeRedis()
+    cache, writer = CatalogCache(), CatalogCache()
+    cache._redis = writer._redis = redis
+
+    async def loader():
+        return {"version": "new"}
+
+    async def batch_loader(keys):
+        return {key: {"version": "new"} for key in keys}
+
+    async def run():
+        await writer.invalidate("product:1", "product:2")
+        await cache.get_or_load("product:1", loader)
+        await cache.get_many_or_load(["product:2"], batch_loader)
+
+    asyncio.run(run())
+    prefix = settings.CACHE_KEY_PREFIX
+    assert json.loads(json.loads(redis.values[f"{prefix}product:1"])["body"]) == {"version": "new"}
+    assert f"{prefix}product:2" in redis.values
+    assert set(cache._l1) == {f"{prefix}product:1", f"{prefix}product:2"}
@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql
+
+from app.core.exceptions import ValidationException
+from app.schemas.product import ProductFilters
+from app.services.catalog_query import CatalogQuery, TOTAL_LABEL
+
+
+def compile_sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_filters_compile_once_into_one_where_clause():
+    """Test that every filter becomes a condition of the shared WHERE clause"""
+    query = CatalogQuery(ProductFilters(
+        category="jackets", min_price=100, max_price=500, tags="leather, biker",
+        is_featured=True, is_on_sale=True, min_rating=4, search="black"
+    ))
+    sql = compile_sql(query.where)
+    assert "products.is_active = true" in sql
+    assert "products.category = " in sql
+    assert "products.tags && " in sql
+    assert "products.original_price > products.price" in sql
+    assert "products.rating_average >= " in sql
+    assert query.filters.tags == ["leather", "biker"]
+
+
+def test_category_match_mode_is_explicit():
+    """Test that category equality vs. ILIKE is a filter option, not router-specific code"""
+    assert "products.category = " in compile_sql(CatalogQuery(ProductFilters(category="bags")).where)
+    contains = CatalogQuery(ProductFilters(category="bags", category_contains=True)).where
+    assert "products.category ILIKE " in compile_sql(contains)
+
+
+def test_fulltext_search_requires_words_and_sets_rank():
+    """Test that full-text mode matches the search vector and enables relevance ordering"""
+    query = CatalogQuery(ProductFilters(search="leather jacket", search_mode="fulltext"))
+    assert query.rank is not None
+    assert "products.search_vector @@" in compile_sql(query.where)
+    order = [compile_sql(clause) for clause in query.order_by("relevance", "desc")]
+    assert order[0].startswith("ts_rank_cd") and order[-1] == "products.id DESC"
+
+    with pytest.raises(ValidationException):
+        CatalogQuery(ProductFilters(search="!!", search_mode="fulltext"))
+
+
+def test_relevance_without_text_search_falls_back_to_newest():
+    """Test that relevance sort degrades to creation time when nothing is ranked"""
+    order = [compile_sql(clause) for clause in CatalogQuery(ProductFilters()).order_by("relevance", "desc")]
+    assert order == ["products.created_at DESC", "products.id DESC"]
+
+
+def test_page_and_total_share_one_statement():
+    """Test that the page query carries count(*) OVER () instead of a second COUNT query"""
+    query = CatalogQuery(ProductFilters(category="jackets"))
+    statement = (
+        query.select(["id", "name"], query.sort_column("price"))
+        .order_by(*query.order_by("price", "asc"))
+        .add_columns(func.count().over().label(TOTAL_LABEL))
+    )
+    sql = compile_sql(statement)
+    assert f"count(*) OVER () AS {TOTAL_LABEL}" in sql
+    assert "products.price AS price" in sql
+
+
+def test_count_key_depends_on_filters():
+    """Test that cached approximate counts are keyed by the whole filter set"""
+    jackets = CatalogQuery(ProductFilters(category="jackets")).count_key()
+    assert jackets == CatalogQuery(ProductFilters(category="jackets")).count_key()
+    assert jackets != CatalogQuery(ProductFilters(category="bags")).count_key()
@@ -0,0 +1,41 @@
+import asyncio
+import json
+import uuid
+
+from sqlalchemy.dialects import postgresql
+
+from app.core.cache import catalog_cache
+from app.services.catalog_service import catalog_service, product_id_key, product_slug_key, version_bump_statement
+
+
+def test_batch_query_uses_array_binds():
+    """Test that a batch lookup is a single = ANY(array) query"""
+    sql = str(catalog_service.batch_query([uuid.uuid4()], ["biker-jacket"]).compile(dialect=postgresql.dialect()))
+    assert "products.id = ANY (%(ids)s::UUID[])" in sql
+    assert "products.slug = ANY (%(slugs)s" in sql
+
+
+def test_batch_keeps_request_order_and_reports_misses(monkeypatch):
+    """Test that batch results follow the request order with misses listed"""
+    monkeypatch.setattr(catalog_cache, "_redis_down_until", float("inf"))
+    product_id = uuid.uuid4()
+
+    async def load_batch(keys, refs):
+        return {
+            key: {"name": name}
+            for key, name in [(product_id_key(product_id), "Wallet"), (product_slug_key("biker-jacket"), "Jacket")]
+            if key in keys
+        }
+
+    monkeypatch.setattr(catalog_service, "_load_batch", load_batch)
+    refs = ["biker-jacket", "no-such-slug", str(product_id), "biker-jacket"]
+    products, missing = asyncio.run(catalog_service.get_products_batch(refs))
+    assert [json.loads(body)["name"] for body in products] == ["Jacket", "Wallet"]
+    assert missing == ["no-such-slug"]
+
+
+def test_version_bump_is_one_upsert():
+    """Test that the listing ETag version is an incremented counter, created if missing"""
+    sql = str(version_bump_statement().compile(dialect=postgresql.dialect()))
+    assert "INSERT INTO catalog_version" in sql
+    assert "ON CONFLICT (id) DO UPDATE SET version = (catalog_version.version + %(version_1)s)" in sql
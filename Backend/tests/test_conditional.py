@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+from starlette.requests import Request
+
+from app.core.conditional import conditional_json, http_date, is_not_modified, make_etag
+
+
+def make_request(**headers):
+    """Bare GET request carrying the given headers"""
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw, "query_string": b""})
+
+
+UPDATED_AT = datetime(2025, 3, 1, 12, 30, 15, 250000, tzinfo=timezone.utc)
+
+
+def test_etag_changes_with_parts():
+    """Test that ETags are stable and depend on every part"""
+    assert make_etag("v1", "page=1") == make_etag("v1", "page=1")
+    assert make_etag("v1", "page=1") != make_etag("v2", "page=1")
+    assert make_etag("v1", "page=1").startswith('W/"')
+
+
+def test_if_none_match():
+    """Test weak comparison, lists and wildcard in If-None-Match"""
+    etag = make_etag("body")
+    assert is_not_modified(make_request(if_none_match=etag), etag)
+    assert is_not_modified(make_request(if_none_match=etag.removeprefix("W/")), etag)
+    assert is_not_modified(make_request(if_none_match=f'"other", {etag}'), etag)
+    assert is_not_modified(make_request(if_none_match="*"), etag)
+    assert not is_not_modified(make_request(if_none_match='"other"'), etag)
+    assert not is_not_modified(make_request(), etag)
+
+
+def test_if_modified_since():
+    """Test second-resolution If-Modified-Since and its precedence rules"""
+    etag = make_etag("body")
+    assert is_not_modified(make_request(if_modified_since=http_date(UPDATED_AT)), etag, UPDATED_AT)
+    assert not is_not_modified(
+        make_request(if_modified_since="Sat, 01 Mar 2025 12:30:14 GMT"), etag, UPDATED_AT
+    )
+    # If-None-Match wins when both are present
+    assert not is_not_modified(
+        make_request(if_none_match='"other"', if_modified_since=http_date(UPDATED_AT)), etag, UPDATED_AT
+    )
+    assert not is_not_modified(make_request(if_modified_since="not a date"), etag, UPDATED_AT)
+
+
+def test_conditional_json():
+    """Test that a matching validator yields an empty 304 with the same headers"""
+    body = b'{"name":"Biker Jacket"}'
+    first = conditional_json(make_request(), body, UPDATED_AT)
+    assert first.status_code == 200
+    assert first.body == body
+    assert first.headers["Last-Modified"] == "Sat, 01 Mar 2025 12:30:15 GMT"
+
+    second = conditional_json(make_request(if_none_match=first.headers["ETag"]), body, UPDATED_AT)
+    assert second.status_code == 304
+    assert second.body == b""
+    assert second.headers["ETag"] == first.headers["ETag"]
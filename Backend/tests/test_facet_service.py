@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from app.models.sqlalchemy_models import Product
+from app.services.facet_service import (
+    facet_service, GROUPING_CATEGORY, GROUPING_PRICE_BUCKET, GROUPING_ARRAY_VALUE, GROUPING_TOTAL
+)
+
+
+def row(grouping_id, category=None, price_bucket=None, kind=None, value=None,
+        products=0, hits=0, min_price=None, max_price=None, avg_price=None):
+    return SimpleNamespace(
+        grouping_id=grouping_id, category=category, price_bucket=price_bucket, kind=kind,
+        value=value, products=products, hits=hits,
+        min_price=min_price, max_price=max_price, avg_price=avg_price
+    )
+
+
+def test_facet_query_is_a_single_grouping_sets_statement():
+    """Test that all facets come from one GROUPING SETS query"""
+    sql = str(facet_service.build_query(Product.is_active == True).compile(dialect=postgresql.dialect()))
+    assert sql.count("GROUPING SETS") == 1
+    assert "unnest(filtered.tags)" in sql
+    assert "width_bucket" in sql
+
+
+def test_parse_rows_folds_grouping_sets():
+    """Test that grouping-set rows are folded into the facet structure"""
+    facets = facet_service.parse_rows([
+        row(GROUPING_CATEGORY, category="bags", products=2),
+        row(GROUPING_CATEGORY, category="jackets", products=5),
+        row(GROUPING_PRICE_BUCKET, price_bucket=2, products=3),
+        row(GROUPING_PRICE_BUCKET, price_bucket=8, products=1),
+        row(GROUPING_ARRAY_VALUE, kind="tags", value="vintage", hits=4),
+        row(GROUPING_ARRAY_VALUE, kind="colors", value="tan", hits=2),
+        row(GROUPING_ARRAY_VALUE, products=7),  # product "self" rows
+        row(GROUPING_TOTAL, products=7, min_price=40.0, max_price=1200.0, avg_price=210.5),
+    ])
+    assert facets["total"] == 7
+    assert facets["categories"][0] == {"value": "jackets", "count": 5}
+    assert facets["price_buckets"] == [
+        {"min": 50, "max": 100, "count": 3},
+        {"min": 1000, "max": None, "count": 1},
+    ]
+    assert facets["tags"] == [{"value": "vintage", "count": 4}]
+    assert facets["colors"] == [{"value": "tan", "count": 2}]
+    assert facets["sizes"] == []
+    assert facets["price_range"] == {"min": 40.0, "max": 1200.0, "avg": 210.5}
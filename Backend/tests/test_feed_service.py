@@ -0,0 +1,115 @@
+import asyncio
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.feed_service import (
+    FeedService, FORMATS, PREFIX_SPACE, merchant_item, merchant_tsv_entry, merchant_xml_entry,
+    shard_bounds, shard_count, sitemap_entry, sitemap_header
+)
+
+
+def _row(**overrides):
+    values = dict(
+        id=uuid.uuid4(), slug="biker-jacket", name="Biker Jacket", description="Lambskin\twith zips",
+        price=199.0, original_price=249.0, images=["/uploads/products/a.jpg", "https://cdn.example.com/b.jpg"],
+        category="men", subcategory="jackets", brand=None, sku="ZL-1", stock_quantity=0,
+        created_at=datetime(2024, 1, 1, tzinfo=timezone.utc), updated_at=None
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_shard_bounds_match_the_sql_shard_number():
+    """Test that each id falls in the range of the shard the SQL expression assigns it"""
+    shards = 7
+    for _ in range(500):
+        product_id = uuid.uuid4()
+        shard = (product_id.int >> 96) * shards // PREFIX_SPACE
+        low, high = shard_bounds(shard, shards)
+        assert low is None or product_id >= low
+        assert high is None or product_id < high
+    assert shard_count(0) == 1
+    assert shard_count(80_001) == 3
+
+
+def test_signature_query_groups_by_shard():
+    """Test that the signature query computes one row per shard"""
+    sql = str(FeedService().signature_query(4).compile(dialect=postgresql.dialect()))
+    assert "::bit(32) AS BIGINT)" in sql
+    assert "hashtext" in sql
+    assert sql.count("GROUP BY") == 1
+    assert "products.slug IS NOT NULL" in sql
+    assert "products.slug IS NOT NULL" in str(FeedService().shard_query(0, 4).compile(dialect=postgresql.dialect()))
+
+
+def test_merchant_item_attributes():
+    """Test sale pricing, absolute image links and availability in a feed item"""
+    item = merchant_item(_row())
+    assert item["price"] == "249.00 USD"
+    assert item["sale_price"] == "199.00 USD"
+    assert item["image_link"].endswith("/uploads/products/a.jpg")
+    assert item["image_link"].startswith("http")
+    assert item["additional_image_link"] == "https://cdn.example.com/b.jpg"
+    assert item["availability"] == "out_of_stock"
+    assert item["product_type"] == "men > jackets"
+    assert "\t" not in merchant_tsv_entry(item).split("\t")[2]
+
+
+def test_changed_shards_only_regenerates_what_changed(tmp_path):
+    """Test that only shards with a new signature (or missing files) are regenerated"""
+    service = FeedService(str(tmp_path))
+    signatures = {0: [10, "2024-01-01T00:00:00+00:00", 5], 1: [12, "2024-01-02T00:00:00+00:00", 7]}
+    previous = {"shards": 2, "signatures": {"0": signatures[0], "1": signatures[1]}}
+    for index in range(2):
+        for fmt in FORMATS:
+            open(service.shard_path(2, index, fmt), "w").close()
+
+    assert service.changed_shards(previous, 2, signatures) == []
+    changed = dict(signatures)
+    changed[1] = [12, "2024-02-01T00:00:00+00:00", 7]
+    assert service.changed_shards(previous, 2, changed) == [1]
+    assert service.changed_shards(previous, 3, signatures) == [0, 1, 2]
+
+
+def test_previous_shard_split_is_kept_for_one_refresh(tmp_path):
+    """Test that re-splitting keeps the last generation's files and drops older ones"""
+    service = FeedService(str(tmp_path))
+    for shards in (1, 2, 3):
+        for index in range(shards):
+            open(service.shard_path(shards, index, "sitemap"), "w").close()
+
+    service._remove_stale_files(3, 2)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "products-2-0.sitemap.xml", "products-2-1.sitemap.xml",
+        "products-3-0.sitemap.xml", "products-3-1.sitemap.xml", "products-3-2.sitemap.xml",
+    ]
+
+
+def test_feed_is_assembled_from_shard_fragments(tmp_path):
+    """Test that the streamed XML feed and a sitemap shard are well-formed documents"""
+    service = FeedService(str(tmp_path))
+    rows = [_row(), _row(slug="tote-&-wallet", name="Tote & Wallet", original_price=None, stock_quantity=3)]
+    for index, row in enumerate(rows):
+        (tmp_path / f"products-2-{index}.items.xml").write_text(merchant_xml_entry(merchant_item(row)))
+    manifest = {"shards": 2, "signatures": {"0": [1, None, 0], "1": [1, None, 0]}}
+
+    async def collect():
+        return b"".join([chunk async for chunk in service.stream_feed(manifest, "xml")])
+
+    channel = ET.fromstring(asyncio.run(collect())).find("channel")
+    assert [item.find("title").text for item in channel.findall("item")] == ["Biker Jacket", "Tote & Wallet"]
+
+    sitemap = ET.fromstring(sitemap_header() + "".join(sitemap_entry(row) for row in rows) + "</urlset>\n")
+    assert len(sitemap) == 2
+
+
+def test_sitemap_index_lists_every_shard():
+    """Test that the index has one entry per shard with its last change"""
+    manifest = {"shards": 2, "signatures": {"0": [3, "2024-01-05T00:00:00+00:00", 1], "1": [0, None, 0]}}
+    index = ET.fromstring(FeedService().sitemap_index(manifest, lambda i: f"https://example.com/s-{i}.xml"))
+    assert len(index) == 2
+    assert FeedService().last_modified(manifest) == datetime(2024, 1, 5, tzinfo=timezone.utc)
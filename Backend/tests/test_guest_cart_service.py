@@ -0,0 +1,212 @@
+import asyncio
+import re
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.exceptions import BadRequestException
+from app.services.cart_service import cart_service
+from app.services.guest_cart_service import GuestCartService, cart_key, line_field, line_id
+
+
+class FakeRedis:
+    """Hashes in a dict; pipelines queue commands and run them on execute()"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.expiring = set()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis, self.commands = redis, []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((name, args))
+
+    async def execute(self):
+        hashes = self.redis.hashes
+        results = []
+        for name, args in self.commands:
+            key = args[0]
+            if name == "hgetall":
+                results.append({field.encode(): str(value).encode() for field, value in hashes.get(key, {}).items()})
+            elif name == "hincrby":
+                line = hashes.setdefault(key, {})
+                line[args[1]] = line.get(args[1], 0) + args[2]
+                results.append(line[args[1]])
+            elif name == "hset":
+                hashes.setdefault(key, {})[args[1]] = args[2]
+                results.append(1)
+            elif name == "hdel":
+                results.append(int(hashes.get(key, {}).pop(args[1], None) is not None))
+            elif name == "delete":
+                results.append(int(hashes.pop(key, None) is not None))
+            elif name == "expire":
+                self.redis.expiring.add(key)
+                results.append(True)
+        return results
+
+
+class FakeSession:
+    """Answers product queries from a fixed catalog and records statements"""
+
+    def __init__(self, products, fail=False, added=0):
+        self.products = products
+        self.fail = fail
+        self.added = added
+        self.statements, self.commits, self.rollbacks = [], 0, 0
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        if self.fail and len(self.statements) > 1:
+            raise RuntimeError("database unavailable")
+        return SimpleNamespace(
+            scalars=lambda: SimpleNamespace(all=lambda: self.products),
+            scalar_one_or_none=lambda: self.products[0] if self.products else None,
+            scalar_one=lambda: self.added
+        )
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def _product(price=100.0, stock=5):
+    return SimpleNamespace(id=uuid.uuid4(), name="Jacket", images=[], price=price, stock_quantity=stock, is_active=True)
+
+
+def _service():
+    service = GuestCartService()
+    service._redis = FakeRedis()
+    return service
+
+
+def test_guest_cart_lives_in_redis():
+    """Test add, update onto another line and pricing without a database write"""
+    service = _service()
+    jacket = _product(stock=5)
+    db = FakeSession([jacket])
+    cart_id = uuid.uuid4().hex
+
+    async def run():
+        await service.add_item(db, cart_id, jacket.id, 2, "M", None)
+        await service.add_item(db, cart_id, jacket.id, 1, "L", "")
+        with pytest.raises(BadRequestException):
+            await service.add_item(db, cart_id, jacket.id, 4, "M")
+        await service.update_item(db, cart_id, line_id(line_field(jacket.id, "L", None)), 2, "M")
+        return await service.quote(db, cart_id)
+
+    quote = asyncio.run(run())
+    assert service._redis.hashes[cart_key(cart_id)] == {line_field(jacket.id, "M", None): 4}
+    assert cart_key(cart_id) in service._redis.expiring
+    assert [(item["quantity"], item["size"], item["color"]) for item in quote["items"]] == [(4, "M", None)]
+    assert quote["subtotal"] == 400.0
+    assert db.commits == 0
+
+
+def test_merge_is_one_upsert_and_claims_the_cart(monkeypatch):
+    """Test that login merges with one bulk upsert, clamped to stock, counts it and empties the guest cart"""
+    service = _service()
+    jacket, wallet = _product(stock=3), _product(stock=0)
+    cart_id = uuid.uuid4().hex
+    service._redis.hashes[cart_key(cart_id)] = {
+        line_field(jacket.id, "M", None): 5,
+        line_field(wallet.id, None, "Brown"): 2,
+        line_field(uuid.uuid4(), None, None): 1,
+    }
+    db = FakeSession([jacket, wallet], added=5)
+    merged_lines = []
+    merge_statement = cart_service.merge_statement
+
+    def record(user_id, lines):
+        merged_lines.extend(lines)
+        return merge_statement(user_id, lines)
+
+    monkeypatch.setattr(cart_service, "merge_statement", record)
+    added = asyncio.run(service.merge_into_user(db, cart_id, uuid.uuid4()))
+
+    assert added == 5 and db.commits == 1
+    assert cart_key(cart_id) not in service._redis.hashes
+    assert sorted(line["quantity"] for line in merged_lines) == [2, 3]
+    products, upsert, counters = db.statements
+    sql = str(upsert.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (user_id, product_id, coalesce(size, ''), coalesce(color, '')) DO UPDATE" in sql
+    assert "WHERE products.id = excluded.product_id" in sql
+    assert "user_counters.cart_quantity + excluded.cart_quantity" in str(counters.compile(dialect=postgresql.dialect()))
+
+
+def test_failed_merge_puts_the_guest_cart_back():
+    """Test that a database error rolls back and restores the claimed lines"""
+    service = _service()
+    jacket = _product()
+    cart_id = uuid.uuid4().hex
+    lines = {line_field(jacket.id, "M", None): 2}
+    service._redis.hashes[cart_key(cart_id)] = dict(lines)
+    db = FakeSession([jacket], fail=True)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.merge_into_user(db, cart_id, uuid.uuid4()))
+
+    assert db.rollbacks == 1 and db.commits == 0
+    assert service._redis.hashes[cart_key(cart_id)] == lines
+
+
+def test_merge_statement_adds_every_line_at_once():
+    """Test that all guest lines go into a single multi-row INSERT"""
+    lines = [
+        {"product_id": uuid.uuid4(), "quantity": 1, "size": "M", "color": None},
+        {"product_id": uuid.uuid4(), "quantity": 2, "size": None, "color": "Black"},
+    ]
+    sql = str(cart_service.merge_statement(uuid.uuid4(), lines).compile(dialect=postgresql.dialect()))
+    assert sql.count("INSERT INTO cart") == 1
+    assert len(re.findall(r"\(%\(param_\d+\)s::UUID, %\(param_\d+\)s::UUID", sql)) == 2  # One VALUES row per line
+    assert "FROM upserted LEFT OUTER JOIN existing ON existing.id = upserted.id" in sql
+    assert "SET quantity = least(cart.quantity + excluded.quantity, greatest(cart.quantity" in sql
+
+
+def test_failed_merge_does_not_fail_the_login(monkeypatch):
+    """Test that the login's merge hook logs a failed merge without touching the expired user"""
+    from app.api.v1.endpoints import auth
+
+    service = _service()
+    jacket = _product()
+    cart_id = uuid.uuid4().hex
+    service._redis.hashes[cart_key(cart_id)] = {line_field(jacket.id, "M", None): 2}
+    db = FakeSession([jacket])
+
+    class ExpiredUser:
+        """Like a User expired by the rollback: loading an attribute would need a lazy refresh"""
+
+        id, _email = uuid.uuid4(), "buyer@example.com"
+
+        @property
+        def email(self):
+            if db.rollbacks:
+                raise RuntimeError("greenlet_spawn has not been called")
+            return self._email
+
+    async def fail(*args):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(auth, "guest_cart_service", service)
+    monkeypatch.setattr(auth, "verify_guest_cart_token", lambda token: cart_id)
+    monkeypatch.setattr(cart_service, "merge_lines", fail)
+
+    asyncio.run(auth._merge_guest_cart(db, ExpiredUser(), "token"))
+
+    assert db.rollbacks == 1 and db.commits == 0
+    assert cart_key(cart_id) in service._redis.hashes
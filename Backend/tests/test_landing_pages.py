@@ -0,0 +1,91 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.models.sqlalchemy_models import Product
+from app.schemas.product import ProductFilters, ProductListResponse
+from app.services.landing_pages import LandingPages, landing_body
+
+
+def _product(index: int) -> Product:
+    return Product(
+        id=uuid.uuid4(),
+        name=f"Wallet {index}",
+        slug=f"wallet-{index}",
+        price=50.0 + index,
+        images=[],
+        category="accessories",
+        tags=[],
+        specifications={},
+        features=[],
+        sizes=[],
+        colors=[],
+        stock_quantity=5,
+        is_active=True,
+        is_featured=False,
+        rating_average=0,
+        rating_count=0,
+        created_at=datetime(2024, 1, 1) - timedelta(days=index)
+    )
+
+
+def test_serves_only_default_combinations():
+    """Test that only plain category listings in a landing sort and page range are precomputed"""
+    landing = LandingPages()
+    size = settings.CATALOG_LANDING_PAGE_SIZE
+    assert landing.serves(ProductFilters(category="men"), "created_at", "desc", 1, size)
+    assert landing.serves(ProductFilters(), "price", "asc", settings.CATALOG_LANDING_PAGES, size)
+    assert not landing.serves(ProductFilters(category="men", min_price=10), "created_at", "desc", 1, size)
+    assert not landing.serves(ProductFilters(category="men", tags="biker"), "created_at", "desc", 1, size)
+    assert not landing.serves(ProductFilters(category="men"), "name", "asc", 1, size)
+    assert not landing.serves(ProductFilters(category="men"), "created_at", "desc", settings.CATALOG_LANDING_PAGES + 1, size)
+    assert not landing.serves(ProductFilters(category="men"), "created_at", "desc", 1, size + 1)
+
+
+def test_page_payloads_split_one_fetch_into_pages(monkeypatch):
+    """Test that the rows of the first N pages become per-page payloads with cursors"""
+    monkeypatch.setattr(settings, "CATALOG_LANDING_PAGES", 3)
+    monkeypatch.setattr(settings, "CATALOG_LANDING_PAGE_SIZE", 2)
+    products = [_product(index) for index in range(5)]
+
+    payloads = LandingPages()._page_payloads(products, 5, False, "created_at", "desc")
+    assert [[item["name"] for item in payloads[page]["products"]] for page in (1, 2, 3)] == [
+        ["Wallet 0", "Wallet 1"], ["Wallet 2", "Wallet 3"], ["Wallet 4"]
+    ]
+    assert payloads[1]["total_pages"] == 3
+    assert payloads[2]["next_cursor"] is not None
+    assert payloads[3]["next_cursor"] is None
+
+
+def test_landing_body_is_a_product_list_response():
+    """Test that a stored page and facet counts combine into a valid response body"""
+    page = json.dumps({"products": [], "total": 0, "page": 1, "limit": 20, "total_pages": 0,
+                       "next_cursor": None, "suggestions": []}).encode()
+    facets = json.dumps({"categories": [{"value": "men", "count": 3}]}).encode()
+
+    with_facets = ProductListResponse.model_validate_json(landing_body(page, facets))
+    assert with_facets.facets == {"categories": [{"value": "men", "count": 3}]}
+    assert ProductListResponse.model_validate_json(landing_body(page, None)).facets is None
+
+
+def test_writes_queue_their_categories(monkeypatch):
+    """Test that marked categories (plus the unfiltered listing) are rebuilt, and no arguments means all"""
+    monkeypatch.setattr("app.services.landing_pages.REFRESH_DEBOUNCE_SECONDS", 0)
+
+    async def scenario():
+        landing = LandingPages()
+        landing.mark_changed("men", None)
+        landing.mark_changed("women", "men")
+        changed = await landing.wait_for_changes(1)
+        landing.mark_changed("men")
+        landing.mark_changed()
+        everything = await landing.wait_for_changes(1)
+        idle = await landing.wait_for_changes(0.01)
+        return changed, everything, idle
+
+    changed, everything, idle = asyncio.run(scenario())
+    assert changed == {None, "men", "women"}
+    assert everything is None
+    assert idle is None
@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+import uuid
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.exceptions import ValidationException
+from app.core.pagination import encode_cursor, decode_cursor, keyset_condition
+from app.models.sqlalchemy_models import Product
+
+
+def test_cursor_round_trip_datetime():
+    """Test that created_at cursors decode back to the same position"""
+    row_id = uuid.uuid4()
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    cursor = encode_cursor("created_at", "desc", created_at, row_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "created_at", "desc") == (created_at, row_id)
+
+
+def test_cursor_round_trip_price():
+    """Test that price cursors keep the exact float value"""
+    row_id = uuid.uuid4()
+    cursor = encode_cursor("price", "asc", 249.99, row_id)
+    assert decode_cursor(cursor, "price", "asc") == (249.99, row_id)
+
+
+def test_cursor_rejects_other_sort():
+    """Test that a cursor cannot be replayed against a different sort"""
+    cursor = encode_cursor("price", "asc", 10.0, uuid.uuid4())
+    with pytest.raises(ValidationException):
+        decode_cursor(cursor, "price", "desc")
+
+
+def test_cursor_rejects_garbage():
+    """Test that malformed cursors are a validation error"""
+    with pytest.raises(ValidationException):
+        decode_cursor("not-a-cursor", "created_at", "desc")
+
+
+def test_cursor_rejects_wrong_sort_value_type():
+    """Test that a sort value of the wrong type for its key is a validation error"""
+    row_id = uuid.uuid4()
+    for sort_by, value in (("price", "cheap"), ("price", True), ("name", 5), ("created_at", 1700000000), ("rating", None)):
+        with pytest.raises(ValidationException):
+            decode_cursor(encode_cursor(sort_by, "asc", value, row_id), sort_by, "asc")
+
+
+def test_keyset_condition_direction():
+    """Test that the seek predicate follows the sort direction"""
+    row_id = uuid.uuid4()
+    desc_sql = str(keyset_condition(Product.price, Product.id, "desc", 5.0, row_id).compile(dialect=postgresql.dialect()))
+    asc_sql = str(keyset_condition(Product.price, Product.id, "asc", 5.0, row_id).compile(dialect=postgresql.dialect()))
+    assert "(products.price, products.id) <" in desc_sql
+    assert "(products.price, products.id) >" in asc_sql
@@ -0,0 +1,151 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.cache import CatalogCache
+from app.core.exceptions import ConflictException
+from app.services import pricing_service as pricing_module
+from app.services.pricing_service import PricingService, coupon_discount, money, price_lines
+
+NOW = datetime(2024, 3, 1, 12, 0)
+
+
+def _coupon(**overrides):
+    values = dict(
+        code="WELCOME10", discount_type="percentage", discount_value=10.0, minimum_amount=None,
+        maximum_discount=None, usage_limit=None, used_count=0, is_active=True,
+        valid_from=NOW - timedelta(days=1), valid_until=NOW + timedelta(days=1)
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def _lines(*prices_and_quantities):
+    return [{"product_price": price, "quantity": quantity} for price, quantity in prices_and_quantities]
+
+
+def test_totals_follow_one_rule_set():
+    """Test flat shipping below the threshold, free shipping from it, and untaxed shipping"""
+    quote = price_lines(_lines((49.995, 2)))
+    assert quote["subtotal"] == 99.99
+    assert quote["shipping_cost"] == 9.99
+    assert quote["tax"] == money(99.99 * 0.08)
+    assert quote["total"] == money(99.99 + 9.99 + quote["tax"])
+    assert quote["total_items"] == 2
+
+    assert price_lines(_lines((250.0, 1)))["shipping_cost"] == 0.0
+    assert price_lines([])["total"] == 0.0
+
+
+def test_discount_applies_before_shipping_threshold_and_tax():
+    """Test that a coupon lowers the taxable amount and can drop the order below free shipping"""
+    quote = price_lines(_lines((210.0, 1)), "WELCOME10", _coupon(), NOW)
+    assert quote["discount"] == 21.0
+    assert quote["shipping_cost"] == 9.99
+    assert quote["tax"] == money(189.0 * 0.08)
+    assert quote["coupon_error"] is None
+
+
+def test_coupon_rules():
+    """Test coupon validity checks and discount caps"""
+    assert coupon_discount(None, 100, NOW) == (0.0, "Invalid coupon code")
+    assert coupon_discount(_coupon(valid_until=NOW - timedelta(seconds=1)), 100, NOW)[1] == "Coupon has expired"
+    assert coupon_discount(_coupon(usage_limit=5, used_count=5), 100, NOW)[1] == "Coupon usage limit exceeded"
+    assert coupon_discount(_coupon(minimum_amount=150), 100, NOW)[0] == 0.0
+    assert coupon_discount(_coupon(maximum_discount=5), 100, NOW) == (5.0, None)
+    assert coupon_discount(_coupon(discount_type="fixed", discount_value=80), 50, NOW) == (50.0, None)
+
+
+def test_cart_quote_is_reused_until_an_epoch_changes(monkeypatch):
+    """Test that a cached quote is served until a cart or price write bumps its version"""
+    store = {}
+    cache = CatalogCache()
+    cache._client = lambda: object()
+
+    async def mget(keys):
+        return [store.get(key) for key in keys]
+
+    async def set_value(key, value, ttl):
+        store[key] = value
+
+    async def write_through(writes):
+        store.update({key: write[0] for key, write in writes.items()})
+
+    cache._redis_mget = mget
+    cache._redis_set = set_value
+    cache._write_through = write_through
+    monkeypatch.setattr(pricing_module, "catalog_cache", cache)
+
+    service = PricingService()
+    loads = []
+
+    async def cart_lines(db, user_id):
+        loads.append(user_id)
+        return [{"id": "c1", "product_id": "p1", "product_price": 120.0, "quantity": 1}]
+
+    service._cart_lines = cart_lines
+
+    async def run():
+        first = await service.cart_quote(None, "u1")
+        again = await service.cart_quote(None, "u1")
+        await service.cart_changed("u1")
+        after_cart = await service.cart_quote(None, "u1")
+        await service.prices_changed()
+        after_prices = await service.cart_quote(None, "u1")
+        return first, again, after_cart, after_prices
+
+    first, again, after_cart, after_prices = asyncio.run(run())
+    assert first == again
+    assert len(loads) == 3
+    assert len({first["version"], after_cart["version"], after_prices["version"]}) == 3
+    assert first["total"] == money(120.0 + 9.99 + 120.0 * 0.08)
+
+
+def test_redeem_only_counts_valid_coupons():
+    """Test that the guarded increment also checks the coupon is active and within its dates"""
+    sql = str(PricingService().redeem_statement("WELCOME10", NOW).compile(dialect=postgresql.dialect()))
+    assert "coupons.is_active = true" in sql
+    assert "coupons.valid_from <= %(valid_from_1)s" in sql
+    assert "coupons.valid_until >= %(valid_until_1)s" in sql
+
+
+def test_checkout_rechecks_prices_of_the_deleted_rows():
+    """Test that a price change the quote missed is a conflict, rolled back and outdating quotes"""
+    service = PricingService()
+    bumped = []
+
+    async def prices_changed():
+        bumped.append("prices")
+
+    async def cart_changed(user_id):
+        bumped.append("cart")
+
+    service.prices_changed, service.cart_changed = prices_changed, cart_changed
+    cart_id = uuid.uuid4()
+    quote = {"items": [{"id": str(cart_id), "quantity": 2, "product_price": 120.0}]}
+
+    class Session:
+        def __init__(self, price):
+            self.price, self.rollbacks, self.statements = price, 0, []
+
+        async def execute(self, statement):
+            self.statements.append(statement)
+            return SimpleNamespace(all=lambda: [(cart_id, 2, self.price, True)])
+
+        async def rollback(self):
+            self.rollbacks += 1
+
+    db = Session(120.0)
+    asyncio.run(service.take_quoted_cart(db, uuid.uuid4(), quote))
+    sql = str(db.statements[0].compile(dialect=postgresql.dialect()))
+    assert "DELETE FROM cart" in sql and "FOR SHARE OF products" in sql
+    assert db.rollbacks == 0
+
+    db = Session(99.0)
+    with pytest.raises(ConflictException):
+        asyncio.run(service.take_quoted_cart(db, uuid.uuid4(), quote))
+    assert db.rollbacks == 1 and bumped == ["prices"]
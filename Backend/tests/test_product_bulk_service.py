@@ -0,0 +1,97 @@
+import io
+
+import pytest
+from pydantic import ValidationError
+
+from app.core.exceptions import BadRequestException
+from sqlalchemy.dialects import postgresql
+
+from app.services.product_bulk_service import (
+    PRODUCT_COLUMNS, detect_format, iter_source_rows, product_bulk_service, read_rows, row_fields,
+    staging_record, validate_row
+)
+
+CSV_DATA = (
+    "sku,name,price,category,sizes,specifications,is_featured,unknown\n"
+    'JK-001,Biker Jacket,299.5,Jackets,S|M|L,"{""leather"": ""cowhide""}",yes,ignored\n'
+    "WL-002,Slim Wallet,,wallets,,,,\n"
+)
+
+
+def test_detect_format():
+    """Test format selection from the query parameter or file extension"""
+    assert detect_format("catalog.CSV") == "csv"
+    assert detect_format("catalog.jsonl") == "ndjson"
+    assert detect_format("catalog.txt", "ndjson") == "ndjson"
+    with pytest.raises(BadRequestException):
+        detect_format("catalog.txt")
+
+
+def test_csv_rows_are_parsed_and_validated():
+    """Test CSV cell conversion and ProductCreate validation per row"""
+    rows = list(iter_source_rows(io.BytesIO(CSV_DATA.encode()), "csv"))
+    assert [number for number, _record in rows] == [1, 2]
+
+    fields, provided = row_fields(rows[0][1], "csv")
+    product = validate_row(fields)
+    assert provided == ["sku", "name", "price", "category", "sizes", "specifications", "is_featured"]
+    assert product.sku == "JK-001"
+    assert product.category == "jackets"
+    assert product.sizes == ["S", "M", "L"]
+    assert product.specifications == {"leather": "cowhide"}
+    assert product.is_featured is True
+
+    with pytest.raises(ValueError, match="price is required"):
+        validate_row(row_fields(rows[1][1], "csv")[0])
+
+
+def test_ndjson_rows_and_errors():
+    """Test NDJSON parsing and per-row validation errors"""
+    data = (
+        '{"sku": "BG-1", "name": "Tote", "price": 150, "category": "bags", "tags": ["tote"]}\n'
+        "\n"
+        '{"name": "No SKU", "price": 10, "category": "bags"}\n'
+        '{"sku": "BG-3", "name": "Bad", "price": 10, "category": "hats"}\n'
+    )
+    rows = list(iter_source_rows(io.BytesIO(data.encode()), "ndjson"))
+    assert [number for number, _record in rows] == [1, 2, 3]
+
+    assert validate_row(row_fields(rows[0][1], "ndjson")[0]).tags == ["tote"]
+    with pytest.raises(ValueError, match="sku is required"):
+        validate_row(row_fields(rows[1][1], "ndjson")[0])
+    with pytest.raises(ValidationError):
+        validate_row(row_fields(rows[2][1], "ndjson")[0])
+
+
+def test_staging_record_matches_column_order():
+    """Test that staged tuples follow PRODUCT_COLUMNS and serialize specifications"""
+    product = validate_row({"sku": "BL-1", "name": "Belt", "price": 40, "category": "belts"})
+    staged = staging_record(product, ["sku", "name", "price", "category"])
+    record = dict(zip(PRODUCT_COLUMNS, staged))
+    assert record["sku"] == "BL-1"
+    assert record["slug"] == "belt-bl-1"
+    assert record["specifications"] == "{}"
+    assert record["is_active"] is True
+    assert staged[len(PRODUCT_COLUMNS):] == (["sku", "name", "price", "category"],)
+
+
+def test_read_rows_in_batches():
+    """Test that batch reads resume where the last one stopped and report invalid rows"""
+    rows = iter_source_rows(io.BytesIO(CSV_DATA.encode()), "csv")
+    first, _ = read_rows(rows, "csv", 1)
+    second, unreadable = read_rows(rows, "csv", 10)
+    assert [(number, sku, product is not None) for number, sku, product, _details in first + second] == [
+        (1, "JK-001", True), (2, "WL-002", False)
+    ]
+    assert second[0][3] == ["price is required"]
+    assert unreadable is None
+    assert read_rows(iter_source_rows(io.BytesIO(b"sku\n\xff\xfe"), "csv"), "csv", 10)[1].startswith("Unreadable")
+
+
+def test_upsert_only_overwrites_provided_columns():
+    """Test that existing products keep columns their row didn't provide"""
+    sql = str(product_bulk_service.upsert_statement().compile(dialect=postgresql.dialect()))
+    assert "LEFT OUTER JOIN products AS existing ON existing.sku = product_import_staging.sku" in sql
+    assert "= ANY (product_import_staging.provided)) THEN product_import_staging.name ELSE existing.name END" in sql
+    assert "ELSE coalesce(existing.slug, product_import_staging.slug) END" in sql
+    assert "ON CONFLICT (sku) DO UPDATE SET" in sql
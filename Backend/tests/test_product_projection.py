@@ -0,0 +1,49 @@
+import json
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.core.exceptions import ValidationException
+from app.models.sqlalchemy_models import Product
+from app.services.product_projection import CARD_FIELDS, parse_fields, projection_columns, projected_json
+
+
+def test_parse_fields_presets_and_lists():
+    """Test the card preset, explicit lists and the implicit id"""
+    assert parse_fields(None) is None
+    assert parse_fields("card") == list(CARD_FIELDS)
+    assert parse_fields("name, price,name") == ["id", "name", "price"]
+    with pytest.raises(ValidationException):
+        parse_fields("name,search_vector")
+
+
+def test_card_projection_selects_only_card_columns():
+    """Test that a projected listing query no longer selects wide columns"""
+    query = select(Product).where(Product.is_active == True).order_by(Product.price, Product.id)
+    query = query.with_only_columns(*projection_columns(parse_fields("card"), Product.price, Product.id))
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert "products.images[" in sql
+    assert "AS image" in sql
+    for wide in ("description", "specifications", "features", "seo_title"):
+        assert wide not in sql
+    assert "WHERE products.is_active = true" in sql
+
+
+def test_extra_columns_are_selected_under_their_key():
+    """Test that cursor keys outside the projection are still selected"""
+    columns = projection_columns(["id", "name"], Product.rating_average, Product.id)
+    assert [column.key for column in columns] == ["id", "name", "rating_average"]
+
+
+def test_projected_json_serializes_rows():
+    """Test direct serialization of projected items"""
+    import uuid
+    from datetime import datetime, timezone
+
+    product_id = uuid.uuid4()
+    created = datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    response = projected_json([{"id": product_id, "name": "Belt", "created_at": created}])
+    assert json.loads(response.body) == [
+        {"id": str(product_id), "name": "Belt", "created_at": "2025-01-02T03:04:05+00:00"}
+    ]
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+from app.services.rating_service import rating_service
+
+
+def test_counted_rating_only_for_approved_reviews():
+    """Test that only approved reviews contribute to the aggregates"""
+    assert rating_service.counted_rating(SimpleNamespace(rating=4, is_approved=True)) == 4
+    assert rating_service.counted_rating(SimpleNamespace(rating=4, is_approved=False)) is None
+    assert rating_service.counted_rating(None) is None
+
+
+def test_deltas_for_each_review_transition():
+    """Test histogram deltas for create, edit, delete, approval and no-op writes"""
+    assert rating_service.deltas(None, 5) == {5: 1}
+    assert rating_service.deltas(3, 5) == {3: -1, 5: 1}
+    assert rating_service.deltas(4, None) == {4: -1}
+    assert rating_service.deltas(4, 4) == {}
+    assert rating_service.deltas(None, None) == {}
+
+
+def test_stats_from_product_row():
+    """Test that review stats are read from the product's counters"""
+    product = SimpleNamespace(rating_count=4, rating_average=4.25, rating_histogram=[0, 0, 1, 1, 2])
+    assert rating_service.stats(product) == {
+        "total_reviews": 4,
+        "average_rating": 4.25,
+        "rating_distribution": {1: 0, 2: 0, 3: 1, 4: 1, 5: 2},
+    }
+
+
+def test_stats_for_unreviewed_product():
+    """Test defaults for a product row that predates the counters"""
+    product = SimpleNamespace(rating_count=None, rating_average=None, rating_histogram=None)
+    stats = rating_service.stats(product)
+    assert stats["total_reviews"] == 0
+    assert stats["average_rating"] == 0.0
+    assert stats["rating_distribution"] == {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
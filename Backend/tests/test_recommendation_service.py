@@ -0,0 +1,76 @@
+import numpy as np
+
+from app.core.config import settings
+
+from app.services import recommendation_service as recommendation_module
+from app.services.recommendation_service import to_csr, train_als, top_n_items, recommendation_service
+
+
+def block_interactions():
+    """Two taste groups: users 0-5 buy items 0-3, users 6-11 buy items 4-7; each skips one item"""
+    rows, cols = [], []
+    for user in range(12):
+        group_items = range(0, 4) if user < 6 else range(4, 8)
+        for item in group_items:
+            if item != (user % 4) + (0 if user < 6 else 4):
+                rows.append(user)
+                cols.append(item)
+    return np.array(rows), np.array(cols), np.ones(len(rows))
+
+
+def test_to_csr_groups_by_row():
+    """Test that coordinate triples become sorted CSR rows"""
+    indptr, indices, data = to_csr(np.array([1, 0, 1]), np.array([2, 1, 0]), np.array([3.0, 1.0, 2.0]), 3)
+    assert indptr.tolist() == [0, 1, 3, 3]
+    assert indices.tolist() == [1, 0, 2]
+    assert data.tolist() == [1.0, 2.0, 3.0]
+
+
+def test_als_recommends_the_missing_item_from_the_same_group():
+    """Test that ALS ranks the unseen item of a user's own group first"""
+    rows, cols, values = block_interactions()
+    user_items = to_csr(rows, cols, values, 12)
+    item_users = to_csr(cols, rows, values, 8)
+    users, items = train_als(user_items, item_users, factors=2, iterations=10, regularization=0.1, alpha=10.0)
+
+    ranked = top_n_items(users, items, user_items, 1)
+    for user in range(12):
+        expected = (user % 4) + (0 if user < 6 else 4)
+        assert ranked[user].tolist() == [expected]
+
+
+def test_top_n_never_returns_seen_items():
+    """Test that already interacted items are masked out, even when n exceeds what is left"""
+    rows, cols, values = block_interactions()
+    user_items = to_csr(rows, cols, values, 12)
+    rng = np.random.default_rng(0)
+    ranked = top_n_items(rng.normal(size=(12, 3)), rng.normal(size=(8, 3)), user_items, 20, batch_size=5)
+    for user in range(12):
+        seen = set(cols[rows == user].tolist())
+        assert len(ranked[user]) == 8 - len(seen)
+        assert not seen & set(ranked[user].tolist())
+
+
+def test_top_n_batches_fit_the_memory_budget(monkeypatch):
+    """Test that a budget of a few score rows ranks the same as scoring everyone at once"""
+    rows, cols, values = block_interactions()
+    user_items = to_csr(rows, cols, values, 12)
+    rng = np.random.default_rng(1)
+    users, items = rng.normal(size=(12, 3)), rng.normal(size=(8, 3))
+    expected = top_n_items(users, items, user_items, 3, batch_size=12)
+
+    monkeypatch.setattr(recommendation_module, "SCORE_MEMORY_BYTES", 3 * 8 * 4)  # Three float32 rows of 8 items
+    ranked = top_n_items(users, items, user_items, 3)
+    assert [row.tolist() for row in ranked] == [row.tolist() for row in expected]
+    scores = users @ items.T
+    assert all(np.all(np.diff(scores[user, row]) <= 0) for user, row in enumerate(ranked))
+
+
+def test_fit_maps_back_to_ids(monkeypatch):
+    """Test that fit returns product ids keyed by user id"""
+    monkeypatch.setattr(settings, "RECOMMENDER_FACTORS", 2)
+    rows, cols, values = block_interactions()
+    triples = [(f"user-{r}", f"product-{c}", float(v)) for r, c, v in zip(rows, cols, values)]
+    recommendations = recommendation_service.fit(triples)
+    assert set(recommendations) == {f"user-{r}" for r in range(12)}
+    assert recommendations["user-0"][0] == "product-0"
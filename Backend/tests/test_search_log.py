@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+
+from app.services.search_log import SearchLog, SpaceSaving, normalize_query, period_start
+
+
+def test_space_saving_keeps_heavy_hitters():
+    """Test that frequent items survive a stream of one-off items"""
+    summary = SpaceSaving(capacity=5)
+    for i in range(200):
+        summary.add("leather jacket")
+        if i % 2 == 0:
+            summary.add("wallet")
+        summary.add(f"rare term {i}")
+
+    assert len(summary) == 5
+    top = summary.top(2)
+    assert [item for item, _count, _error in top] == ["leather jacket", "wallet"]
+    for item, count, error in top:
+        true_count = 200 if item == "leather jacket" else 100
+        assert count - error <= true_count <= count
+
+
+def test_space_saving_eviction_inherits_minimum():
+    """Test that a newcomer replaces the smallest counter and records the error"""
+    summary = SpaceSaving(capacity=2)
+    summary.add("a", 3)
+    summary.add("b", 1)
+    summary.add("c")
+    assert summary.top(2) == [("a", 3, 0), ("c", 2, 1)]
+
+
+def test_space_saving_evicts_the_current_minimum():
+    """Test that eviction follows counts that changed after the item was first seen"""
+    summary = SpaceSaving(capacity=3)
+    summary.add("a")
+    summary.add("b")
+    summary.add("c")
+    summary.add("a", 5)
+    summary.add("c", 2)
+    summary.add("d")  # Evicts b (1)
+    summary.add("e")  # Evicts d (2), not c (3)
+    assert sorted(item for item, _count, _error in summary.top(3)) == ["a", "c", "e"]
+    for i in range(100):
+        summary.add(f"one-off {i}")
+    assert len(summary._heap) <= 4 * summary.capacity
+
+
+def test_normalize_and_periods():
+    """Test query normalization and day/week bucketing"""
+    assert normalize_query("  Leather   JACKET ") == "leather jacket"
+    thursday = datetime(2025, 3, 6, 15, 0, tzinfo=timezone.utc)
+    assert period_start("day", thursday).isoformat() == "2025-03-06"
+    assert period_start("week", thursday).isoformat() == "2025-03-03"
+
+
+def test_record_tracks_popular_and_zero_result_queries():
+    """Test that recording buffers the query and updates both summaries"""
+    log = SearchLog()
+    log.record("Wallet", 12)
+    log.record("wallet", 12)
+    log.record("bomber", 4)
+    log.record("crocodile boots", 0)
+    log.record("   ", 0)
+
+    assert log.popular("day", 2) == [{"term": "wallet", "count": 2}, {"term": "crocodile boots", "count": 1}]
+    assert log.popular("week", 10, zero_results=True) == [{"term": "crocodile boots", "count": 1}]
+    assert len(log._buffer) == 4
@@ -0,0 +1,50 @@
+from app.services.search_service import search_service
+
+
+def test_tsquery_expands_leather_synonyms():
+    """Test that shopper terms are expanded with leather-domain synonyms"""
+    text = search_service.build_tsquery_text("billfold")
+    assert "wallet" in text
+    assert "billfold:*" in text
+
+
+def test_tsquery_handles_plurals():
+    """Test that plural shopper terms still pick up their synonym group"""
+    text = search_service.build_tsquery_text("purses")
+    assert "handbag" in text
+
+
+def test_tsquery_expands_broad_terms_one_way():
+    """Test that a broad term picks up its narrower kinds but not the reverse"""
+    assert "oxford" in search_service.build_tsquery_text("shoes")
+    assert "shoe" not in search_service.build_tsquery_text("oxford")
+    assert "strap" not in search_service.build_tsquery_text("belt")
+    assert "blazer" not in search_service.build_tsquery_text("jacket")
+
+
+def test_tsquery_ands_term_groups():
+    """Test that each query word becomes its own AND-ed group"""
+    text = search_service.build_tsquery_text("brown leather belt")
+    assert text.count("&") == 2
+    assert text.startswith("(brown)")
+
+
+def test_tsquery_ignores_operators():
+    """Test that tsquery operators in user input are stripped"""
+    text = search_service.build_tsquery_text("jacket & | ! (boot)")
+    assert "!" not in text
+    assert "jacket" in text and "boot" in text
+
+
+def test_tsquery_empty_query():
+    """Test that a query without words yields no tsquery"""
+    assert search_service.build_tsquery_text("  -- ") is None
+    assert search_service.tsquery("!!!") is None
+
+
+def test_fuzzy_match_uses_trigram_operators():
+    """Test that fuzzy mode compiles to index-backed pg_trgm operators"""
+    from sqlalchemy.dialects import postgresql
+    sql = str(search_service.fuzzy_match("Lether Jaket").compile(dialect=postgresql.dialect()))
+    assert "<%" in sql
+    assert "products.category %" in sql
@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+import uuid
+
+from app.services.suggestion_index import PrefixIndex, SuggestionIndex
+
+
+def make_product(name, category="jackets", tags=(), is_featured=False, is_active=True):
+    return SimpleNamespace(
+        id=uuid.uuid4(), name=name, category=category, tags=list(tags),
+        is_featured=is_featured, is_active=is_active
+    )
+
+
+def test_prefix_index_orders_by_weight():
+    """Test that prefix matches come back most popular first"""
+    index = PrefixIndex()
+    index.add("Leather Wallet", 1)
+    index.add("Leather Jacket", 10)
+    index.add("Belt", 50)
+    assert index.search("lea", 5) == ["Leather Jacket", "Leather Wallet"]
+    assert index.search("x", 5) == []
+
+
+def test_prefix_index_remove_drops_unreferenced_terms():
+    """Test that a term disappears once its weight is fully removed"""
+    index = PrefixIndex()
+    index.add("tote", 1)
+    index.add("tote", 1)
+    index.remove("tote", 1)
+    assert index.search("to", 5) == ["tote"]
+    index.remove("tote", 1)
+    assert len(index) == 0
+
+
+def test_suggestion_index_incremental_updates():
+    """Test that product upserts and removals patch the index in place"""
+    index = SuggestionIndex()
+    jacket = make_product("Biker Jacket", tags=["black", "biker"])
+    index.upsert_product(jacket)
+    assert index.suggest("bik")["products"] == ["Biker Jacket"]
+    assert index.suggest("bik")["tags"] == ["biker"]
+
+    jacket.name = "Bomber Jacket"
+    index.upsert_product(jacket)
+    assert index.suggest("bik")["products"] == []
+    assert index.suggest("bom")["products"] == ["Bomber Jacket"]
+
+    index.remove_product(jacket.id)
+    assert index.suggest("ja")["categories"] == []
+
+
+def test_suggestion_index_featured_products_rank_first():
+    """Test that featured products are boosted in name suggestions"""
+    index = SuggestionIndex()
+    index.upsert_product(make_product("Classic Belt", category="belts"))
+    index.upsert_product(make_product("Classic Bag", category="bags", is_featured=True))
+    assert index.suggest("classic")["products"][0] == "Classic Bag"
+
+
+def test_inactive_products_are_not_suggested():
+    """Test that deactivating a product removes it from suggestions"""
+    index = SuggestionIndex()
+    product = make_product("Oxblood Boot", category="shoes")
+    index.upsert_product(product)
+    product.is_active = False
+    index.upsert_product(product)
+    assert index.suggest("ox")["products"] == []
+
+
+def test_rebuild_sorts_each_index_once_and_stays_patchable():
+    """Test that a bulk build matches one built term by term, and upserts still insert in order"""
+    rows = [
+        (uuid.uuid4(), "Biker Jacket", "jackets", ["black"], False),
+        (uuid.uuid4(), "Belt", "belts", ["black", "brown"], True),
+        (uuid.uuid4(), "Bag", "bags", [], False),
+    ]
+    built = SuggestionIndex._build({str(rows[0][0]): 3.0}, rows)
+    for kind, index in built._indexes.items():
+        assert index._keys == sorted(index._keys) and len(index) == len(index._weight)
+    assert built.suggest("b")["products"] == ["Belt", "Biker Jacket", "Bag"]
+
+    built.upsert_product(make_product("Backpack", category="bags"))
+    assert built._indexes["products"]._keys == sorted(built._indexes["products"]._keys)
+    assert "Backpack" in built.suggest("ba")["products"]
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.services.trending_service import trending_service
+
+
+def test_decay_halves_per_half_life():
+    """Test that a score halves after one configured half-life"""
+    half_life = timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS)
+    assert abs(trending_service.decay_factor(half_life) - 0.5) < 1e-9
+    assert abs(trending_service.decay_factor(half_life * 2) - 0.25) < 1e-9
+    assert trending_service.decay_factor(timedelta(0)) == 1.0
+
+
+def test_incremental_decay_matches_full_recompute():
+    """Test that decaying then adding new events equals scoring all events at once"""
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    events = [(start + timedelta(hours=hours), quantity) for hours, quantity in [(1, 2), (20, 1), (50, 3), (90, 1)]]
+
+    def score(as_of, window):
+        return sum(q * trending_service.decay_factor(as_of - t) for t, q in window)
+
+    first_run = start + timedelta(hours=48)
+    second_run = start + timedelta(hours=96)
+    stored = score(first_run, [e for e in events if e[0] <= first_run])
+    stored = stored * trending_service.decay_factor(second_run - first_run)
+    stored += score(second_run, [e for e in events if first_run < e[0] <= second_run])
+
+    assert abs(stored - score(second_run, events)) < 1e-9
+
+
+def test_window_query_only_scans_new_events():
+    """Test that the window query is bounded on both ends and skips cancelled orders"""
+    as_of = datetime(2025, 1, 2, tzinfo=timezone.utc)
+    sql = str(trending_service.window_scores_query(as_of - timedelta(minutes=5), as_of).compile(
+        dialect=postgresql.dialect()
+    ))
+    assert "order_items.created_at > " in sql
+    assert "order_items.created_at <= " in sql
+    assert "reviews.created_at > " in sql
+    assert "orders.status NOT IN" in sql
+    assert "GROUP BY events.product_id, products.category" in sql
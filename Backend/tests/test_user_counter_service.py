@@ -0,0 +1,76 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.sqlalchemy_models import PaymentStatus, UserCounters
+from app.services.user_counter_service import counted_spend, user_counter_service
+
+USER_ID = uuid.uuid4()
+
+
+class FakeSession:
+    def __init__(self, counters=None):
+        self.counters = counters
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+    async def get(self, model, key):
+        assert model is UserCounters and key == USER_ID
+        return self.counters
+
+
+def _sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_apply_is_one_relative_upsert():
+    """Test that only the changed counters are incremented, in one statement"""
+    db = FakeSession()
+    asyncio.run(user_counter_service.apply(db, USER_ID, order_count=1, lifetime_spend=0.0, cart_quantity=-2))
+
+    (statement,) = db.statements
+    sql = _sql(statement)
+    assert "ON CONFLICT (user_id) DO UPDATE SET" in sql
+    assert "order_count = (user_counters.order_count + excluded.order_count)" in sql
+    assert "cart_quantity = (user_counters.cart_quantity + excluded.cart_quantity)" in sql
+    assert "lifetime_spend = " not in sql
+
+
+def test_apply_skips_no_op_and_rejects_unknown_counters():
+    """Test that zero deltas write nothing and a misspelled counter fails loudly"""
+    db = FakeSession()
+    asyncio.run(user_counter_service.apply(db, USER_ID, cart_quantity=0))
+    assert db.statements == []
+    with pytest.raises(ValueError):
+        asyncio.run(user_counter_service.apply(db, USER_ID, cart_count=1))
+
+
+def test_summary_is_a_primary_key_read():
+    """Test the summary from the counters row, and zeros before the user's first write"""
+    counters = UserCounters(
+        user_id=USER_ID, order_count=3, lifetime_spend=412.5, cart_quantity=2, wishlist_count=4, unread_notifications=1
+    )
+    summary = asyncio.run(user_counter_service.summary(FakeSession(counters), USER_ID))
+    assert summary == {
+        "order_count": 3, "lifetime_spend": 412.5, "cart_quantity": 2, "wishlist_count": 4, "unread_notifications": 1
+    }
+    assert set(asyncio.run(user_counter_service.summary(FakeSession(), USER_ID)).values()) == {0}
+
+
+def test_only_completed_payments_count_as_spend():
+    """Test counted_spend and the repair path that recomputes every counter"""
+    assert counted_spend(SimpleNamespace(payment_status=PaymentStatus.COMPLETED, total_amount=99.5)) == 99.5
+    assert counted_spend(SimpleNamespace(payment_status=PaymentStatus.PENDING, total_amount=99.5)) == 0.0
+    assert counted_spend(None) == 0.0
+
+    db = FakeSession()
+    asyncio.run(user_counter_service.rebuild(db, USER_ID))
+    sql = _sql(db.statements[0])
+    assert "orders.payment_status = %(payment_status_1)s" in sql
+    assert "notifications.is_read = false" in sql
+    assert "order_count = excluded.order_count" in sql
@@ -0,0 +1,94 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.exceptions import ValidationException
+from app.models.sqlalchemy_models import Product
+from app.schemas.product import ProductFilters, ProductVariantBase
+from app.services.catalog_query import CatalogQuery
+from app.services.landing_pages import landing_pages
+from app.services.variant_service import variant_service
+
+
+def compile_sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_match_condition_probes_variants():
+    """Test that size/color filters become one EXISTS over the variants"""
+    sql = compile_sql(variant_service.match_condition(["M", "L"], ["Black"], True))
+    assert sql.startswith("EXISTS (SELECT")
+    assert "product_variants.product_id = products.id" in sql
+    assert "product_variants.size IN " in sql
+    assert "product_variants.color IN " in sql
+    # A literal, so the partial in-stock index predicate is provably implied
+    assert "product_variants.stock_quantity > 0" in sql
+
+    sql = compile_sql(variant_service.match_condition([], ["Brown"], False))
+    assert "product_variants.size" not in sql
+    assert "stock_quantity" not in sql
+
+
+def test_catalog_query_size_color_and_stock_filters():
+    """Test that variants are only joined in when a size or color is asked for"""
+    filters = ProductFilters(sizes="M, L", colors="Black")
+    assert filters.sizes == ["M", "L"]
+    assert "EXISTS (SELECT" in compile_sql(CatalogQuery(filters).where)
+
+    sql = compile_sql(CatalogQuery(ProductFilters(in_stock=True)).where)
+    assert "EXISTS" not in sql
+    assert "products.stock_quantity > " in sql
+
+    assert "EXISTS" not in compile_sql(CatalogQuery(ProductFilters(category="bags")).where)
+
+
+def test_variant_filters_bypass_landing_pages():
+    """Test that a size filter is never answered from the precomputed listings"""
+    assert landing_pages.serves(ProductFilters(category="bags"), "created_at", "desc", 1, 20)
+    assert not landing_pages.serves(ProductFilters(category="bags", sizes=["M"]), "created_at", "desc", 1, 20)
+    assert not landing_pages.serves(ProductFilters(in_stock=True), "created_at", "desc", 1, 20)
+
+
+def test_replace_variants_rejects_duplicate_combinations():
+    """Test that a size/color combination can only be listed once"""
+    product = Product(id=uuid.uuid4())
+    variants = [
+        ProductVariantBase(size="M", color="Black", stock_quantity=2),
+        ProductVariantBase(size=" M ", color="Black", stock_quantity=1),
+    ]
+    assert variants[1].size == "M"
+    with pytest.raises(ValidationException):
+        asyncio.run(variant_service.replace_variants(None, product, variants))
+
+
+def test_sync_options_keeps_the_stock_total():
+    """Test that seeding puts product stock on one combination and the summary is recomputed"""
+    statements = []
+
+    class Session:
+        async def execute(self, statement):
+            statements.append(str(statement))
+
+    asyncio.run(variant_service.sync_options(Session(), [uuid.uuid4()]))
+    delete_sql, insert_sql, summary_sql = statements
+    assert "WHEN s.position = 1 AND c.position = 1" in insert_sql
+    assert "WITH ORDINALITY" in insert_sql
+    assert "UPDATE products p SET stock_quantity = v.total" in summary_sql
+
+
+def test_direct_stock_write_rejected_for_products_with_variants():
+    """Test that stock_quantity can't be written on a product whose stock is kept per variant"""
+    class Session:
+        def __init__(self, has_variants):
+            self.has_variants = has_variants
+
+        async def scalar(self, statement):
+            return self.has_variants
+
+    product_id = uuid.uuid4()
+    with pytest.raises(ValidationException):
+        asyncio.run(variant_service.check_product_update(Session(True), product_id, {"stock_quantity": 5}))
+    asyncio.run(variant_service.check_product_update(Session(False), product_id, {"stock_quantity": 5}))
+    asyncio.run(variant_service.check_product_update(Session(True), product_id, {"price": 10.0}))
@@ -0,0 +1,91 @@
+import numpy as np
+from PIL import Image
+
+from app.services.image_features import FEATURE_DIM, rgb_to_lab, features_from_rgb, extract_features
+from app.services.similarity_index import SimilarityIndex, local_image_path, product_vectors
+
+TAN = (0.76, 0.55, 0.35)
+DARK_TAN = (0.70, 0.50, 0.31)
+OXBLOOD = (0.29, 0.0, 0.05)
+
+
+def swatch(color, size=64, background=None, noise=0.0, seed=0):
+    """Solid leather swatch, optionally grainy and/or centred on a white backdrop"""
+    rgb = np.ones((size, size, 3)) * np.array(color)
+    if noise:
+        rgb = rgb + np.random.default_rng(seed).normal(scale=noise, size=(size, size, 1))
+    if background is not None:
+        framed = np.ones((size * 2, size * 2, 3)) * np.array(background)
+        framed[size // 2:size // 2 + size, size // 2:size // 2 + size] = rgb
+        rgb = framed
+    return np.clip(rgb, 0.0, 1.0)
+
+
+def test_rgb_to_lab_reference_points():
+    """Test white and black map to L=100 and L=0 with no chroma"""
+    lab = rgb_to_lab(np.array([[1.0, 1.0, 1.0], [0.0, 0.0, 0.0]]))
+    assert np.allclose(lab[0], [100.0, 0.0, 0.0], atol=0.05)
+    assert np.allclose(lab[1], [0.0, 0.0, 0.0], atol=0.05)
+
+
+def test_close_colors_are_more_similar_than_distinct_ones():
+    """Test that tan is nearer to a darker tan than to oxblood"""
+    tan, dark_tan, oxblood = (features_from_rgb(swatch(color)) for color in (TAN, DARK_TAN, OXBLOOD))
+    assert tan.shape == (FEATURE_DIM,) and tan.dtype == np.float32
+    assert abs(np.linalg.norm(tan) - 1.0) < 1e-5
+    assert tan @ dark_tan > tan @ oxblood
+
+
+def test_texture_separates_pebbled_from_smooth():
+    """Test that grain changes the descriptor for the same color"""
+    smooth = features_from_rgb(swatch(TAN))
+    pebbled = features_from_rgb(swatch(TAN, noise=0.08))
+    pebbled_again = features_from_rgb(swatch(TAN, noise=0.08, seed=1))
+    assert pebbled @ pebbled_again > pebbled @ smooth
+
+
+def test_white_backdrop_is_ignored():
+    """Test that a studio shot matches a full-frame swatch of the same leather"""
+    studio = features_from_rgb(swatch(OXBLOOD, background=(1.0, 1.0, 1.0)))
+    full_frame = features_from_rgb(swatch(OXBLOOD))
+    assert studio @ full_frame > 0.95
+
+
+def test_extract_features_reads_files(tmp_path):
+    """Test extraction from an image file, and None for unreadable files"""
+    path = tmp_path / "bag.jpg"
+    Image.fromarray((swatch(TAN) * 255).astype(np.uint8)).save(path)
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"not an image")
+    assert extract_features(str(path)).shape == (FEATURE_DIM,)
+    assert extract_features(str(broken)) is None
+
+
+def test_local_image_path_stays_inside_uploads():
+    """Test that only /uploads/ paths without traversal map to files"""
+    assert local_image_path("/uploads/products/a.jpg").endswith("products/a.jpg")
+    assert local_image_path("/uploads/../main.py") is None
+    assert local_image_path("/elegant-brown-leather-handbag.jpg") is None
+
+
+def test_index_returns_nearest_products_excluding_itself():
+    """Test cosine top-K over the product matrix"""
+    vectors = {
+        "/uploads/products/tan.jpg": features_from_rgb(swatch(TAN)),
+        "/uploads/products/dark-tan.jpg": features_from_rgb(swatch(DARK_TAN)),
+        "/uploads/products/oxblood.jpg": features_from_rgb(swatch(OXBLOOD)),
+    }
+    products = [
+        ("tan-bag", ["/uploads/products/tan.jpg"]),
+        ("dark-tan-bag", ["/uploads/products/dark-tan.jpg", "/static/missing.jpg"]),
+        ("oxblood-bag", ["/uploads/products/oxblood.jpg"]),
+        ("no-images", []),
+    ]
+    index = SimilarityIndex()
+    index.load(*product_vectors(products, vectors))
+
+    assert len(index) == 3
+    matches = index.similar("tan-bag", 5)
+    assert [product_id for product_id, _score in matches] == ["dark-tan-bag", "oxblood-bag"]
+    assert matches[0][1] > matches[1][1]
+    assert index.similar("no-images", 5) == []
@@ -242,6 +242,8 @@ class ApiClient {
     search?: string
     sort_by?: string
     sort_order?: 'asc' | 'desc'
+    after?: string
+    fields?: string
   }) {
     const searchParams = new URLSearchParams()
     if (params) {